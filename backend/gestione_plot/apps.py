@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GestionePlotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestione_plot'
+
+    def ready(self):
+        import gestione_plot.signals  # noqa: F401
@@ -164,7 +164,7 @@ class CreazioneGuidataSceltaViewSet(viewsets.ModelViewSet):
 
 
 def _creazione_guidata_aperta_giocatori():
-    return bool(ConfigurazioneSito.get_config().creazione_guidata_aperta_giocatori)
+    return bool(ConfigurazioneSito.get_config_cached().creazione_guidata_aperta_giocatori)
 
 
 @api_view(['GET', 'PATCH'])
@@ -1,18 +1,31 @@
 """
 Accredito una tantum di PC e crediti d'evento ai PG iscritti, al login in sessione
 durante un giorno d'evento (finestra GiornoEvento; se non ci sono giorni, usa data_inizio/data_fine evento).
+
+La liquidazione è per evento e a insiemi (``liquida_premi_presenza_evento``): membership e
+premi già assegnati si leggono in blocco, gli importi si calcolano in memoria e record premio,
+movimenti PC/crediti e log Prestigio si scrivono con ``bulk_create``. È idempotente: il vincolo
+unico evento/PG decide chi riceve il premio, anche con più liquidazioni concorrenti.
 """
 
 from __future__ import annotations
 
 import logging
+import uuid
 from decimal import Decimal
 
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
-from personaggi.models import Personaggio, PersonaggioCarrieraMembership
+from personaggi.models import (
+    CreditoMovimento,
+    Personaggio,
+    PersonaggioCarrieraMembership,
+    PersonaggioLog,
+    PuntiCaratteristicaMovimento,
+)
 
 from .models import Evento, EventoPremioPersonaggio
 
@@ -37,23 +50,27 @@ def _membership_attive_evento(personaggio: Personaggio, ts):
     )
 
 
-def calcola_crediti_premio_evento(evento: Evento, personaggio: Personaggio, ts=None) -> Decimal:
-    when = ts or timezone.now()
-    totale = Decimal(evento.crediti_base_inizio_evento or 0)
-    for membership in _membership_attive_evento(personaggio, when).select_related("carriera", "carica"):
-        totale += Decimal(getattr(membership.carriera, "bonus_crediti_evento", 0) or 0)
-        carica = getattr(membership, "carica", None)
-        if carica:
-            totale += Decimal(getattr(carica, "bonus_crediti_evento", 0) or 0)
-    return totale
+def _membership_attive_per_personaggi(personaggi_ids, ts) -> dict:
+    """personaggio_id -> membership attive a ``ts`` (stesso ordinamento del modello), una query."""
+    out: dict = {}
+    qs = (
+        PersonaggioCarrieraMembership.objects.filter(
+            personaggio_id__in=list(personaggi_ids),
+            data_da__lte=ts,
+        )
+        .filter(Q(data_a__isnull=True) | Q(data_a__gt=ts))
+        .select_related("carriera", "carica", "tipo_carriera")
+    )
+    for membership in qs:
+        out.setdefault(membership.personaggio_id, []).append(membership)
+    return out
 
 
-def dettaglio_crediti_premio_evento(evento: Evento, personaggio: Personaggio, ts=None) -> dict:
-    when = ts or timezone.now()
+def _dettaglio_da_membership(evento: Evento, memberships) -> dict:
     base_evento = Decimal(evento.crediti_base_inizio_evento or 0)
     righe = []
     totale_bonus = Decimal("0")
-    for membership in _membership_attive_evento(personaggio, when).select_related("carriera", "carica"):
+    for membership in memberships:
         carriera_bonus = Decimal(getattr(membership.carriera, "bonus_crediti_evento", 0) or 0)
         carica_bonus = Decimal(getattr(membership.carica, "bonus_crediti_evento", 0) or 0) if membership.carica_id else Decimal("0")
         totale_riga = carriera_bonus + carica_bonus
@@ -80,39 +97,131 @@ def dettaglio_crediti_premio_evento(evento: Evento, personaggio: Personaggio, ts
     }
 
 
-def applica_premio_presenza_personaggio(evento: Evento, pg: Personaggio, when=None) -> bool:
+def calcola_crediti_premio_evento(evento: Evento, personaggio: Personaggio, ts=None) -> Decimal:
+    when = ts or timezone.now()
+    memberships = _membership_attive_evento(personaggio, when).select_related("carriera", "carica", "tipo_carriera")
+    return Decimal(_dettaglio_da_membership(evento, memberships)["totale_crediti"])
+
+
+def dettaglio_crediti_premio_evento(evento: Evento, personaggio: Personaggio, ts=None) -> dict:
+    when = ts or timezone.now()
+    memberships = _membership_attive_evento(personaggio, when).select_related(
+        "carriera", "carica", "tipo_carriera"
+    )
+    return _dettaglio_da_membership(evento, memberships)
+
+
+def dettagli_crediti_premio_evento(evento: Evento, personaggi_ids, ts=None) -> dict:
+    """``dettaglio_crediti_premio_evento`` per più PG: personaggio_id -> dettaglio."""
+    when = ts or timezone.now()
+    per_pg = _membership_attive_per_personaggi(personaggi_ids, when)
+    return {pid: _dettaglio_da_membership(evento, per_pg.get(pid, ())) for pid in personaggi_ids}
+
+
+def liquida_premi_presenza_evento(evento: Evento, personaggi_ids=None, when=None) -> dict:
+    """
+    Assegna il premio presenza (PC, crediti d'evento, Prestigio) ai partecipanti dell'evento
+    che non l'hanno ancora ricevuto; ``personaggi_ids`` limita ai PG indicati (se iscritti).
+
+    Numero di query indipendente dai partecipanti. Ritorna i conteggi
+    ``premi_applicati`` / ``gia_presenti``.
+    """
     ts = when or timezone.now()
+    iscritti = evento.partecipanti.all()
+    if personaggi_ids is not None:
+        iscritti = iscritti.filter(pk__in=list(personaggi_ids))
+    ids = set(iscritti.values_list("pk", flat=True))
+    if not ids:
+        return {"premi_applicati": 0, "gia_presenti": 0}
+
     with transaction.atomic():
-        _row, created = EventoPremioPersonaggio.objects.get_or_create(
-            evento=evento,
-            personaggio=pg,
+        gia = set(
+            EventoPremioPersonaggio.objects.filter(evento=evento, personaggio_id__in=ids).values_list(
+                "personaggio_id", flat=True
+            )
         )
-        if not created:
-            return False
-        desc = f"Inizio evento «{evento.titolo}»"[:198]
-        n_pc = int(evento.pc_guadagnati or 0)
-        if n_pc > 0:
-            pg.modifica_pc(n_pc, desc)
-        cred = calcola_crediti_premio_evento(evento, pg, ts=ts)
+        candidati = {pid: uuid.uuid4() for pid in sorted(ids - gia)}
+        if candidati:
+            EventoPremioPersonaggio.objects.bulk_create(
+                [EventoPremioPersonaggio(id=row_id, evento=evento, personaggio_id=pid) for pid, row_id in candidati.items()],
+                ignore_conflicts=True,
+            )
+            # Con ignore_conflicts non sappiamo chi è stato inserito: rileggiamo i nostri id.
+            inseriti = set(
+                EventoPremioPersonaggio.objects.filter(id__in=list(candidati.values())).values_list(
+                    "personaggio_id", flat=True
+                )
+            )
+        else:
+            inseriti = set()
+        if inseriti:
+            _accredita_premi(evento, sorted(inseriti), ts)
+
+    return {"premi_applicati": len(inseriti), "gia_presenti": len(ids) - len(inseriti)}
+
+
+def _accredita_premi(evento: Evento, personaggi_ids, ts) -> None:
+    from personaggi.economia_crediti import CONTO_CORRENTE, _d2
+
+    desc = f"Inizio evento «{evento.titolo}»"[:198]
+    n_pc = int(evento.pc_guadagnati or 0)
+    if n_pc > 0:
+        PuntiCaratteristicaMovimento.objects.bulk_create(
+            [PuntiCaratteristicaMovimento(personaggio_id=pid, importo=n_pc, descrizione=desc) for pid in personaggi_ids]
+        )
+
+    dettagli = dettagli_crediti_premio_evento(evento, personaggi_ids, ts=ts)
+    movimenti = []
+    for pid in personaggi_ids:
+        cred = _d2(dettagli[pid]["totale_crediti"])
         if cred > 0:
-            from personaggi.economia_crediti import CONTO_CORRENTE
+            movimenti.append(
+                CreditoMovimento(
+                    personaggio_id=pid,
+                    importo=cred,
+                    descrizione=desc[:200],
+                    conto=CONTO_CORRENTE,
+                    evento_id=evento.pk,
+                )
+            )
+    if movimenti:
+        CreditoMovimento.objects.bulk_create(movimenti)
+
+    n_pr = int(getattr(evento, "prestigio_base_inizio_evento", 0) or 0)
+    if n_pr != 0:
+        # Stessa regola di Personaggio.modifica_prestigio (minimo 1), in un solo UPDATE.
+        Personaggio.objects.filter(pk__in=personaggi_ids).update(
+            peso_influencer=Greatest(Greatest(F("peso_influencer"), Value(1)) + n_pr, Value(1)),
+            updated_at=timezone.now(),
+        )
+        segno = "+" if n_pr >= 0 else ""
+        PersonaggioLog.objects.bulk_create(
+            [
+                PersonaggioLog(personaggio_id=pid, testo_log=f"Prestigio {segno}{n_pr} (ora {nuovo}) — {desc}")
+                for pid, nuovo in Personaggio.objects.filter(pk__in=personaggi_ids)
+                .order_by("pk")
+                .values_list("pk", "peso_influencer")
+            ]
+        )
 
-            pg.modifica_crediti(cred, desc, conto=CONTO_CORRENTE, evento=evento)
-        n_pr = int(getattr(evento, "prestigio_base_inizio_evento", 0) or 0)
-        if n_pr != 0:
-            pg.modifica_prestigio(n_pr, desc)
-        return True
+
+def applica_premio_presenza_personaggio(evento: Evento, pg: Personaggio, when=None) -> bool:
+    """Premio presenza per un solo PG iscritto; False se già assegnato."""
+    esito = liquida_premi_presenza_evento(evento, personaggi_ids=[pg.pk], when=when)
+    if esito["premi_applicati"] and int(getattr(evento, "prestigio_base_inizio_evento", 0) or 0):
+        pg.refresh_from_db(fields=["peso_influencer", "updated_at"])
+    return bool(esito["premi_applicati"])
 
 
 def report_ricompense_evento(evento: Evento, ts=None) -> dict:
     when = ts or timezone.now()
     rows = []
-    partecipanti = evento.partecipanti.all().select_related("tipologia")
+    partecipanti = list(evento.partecipanti.all().select_related("tipologia"))
     premi_ids = set(
         EventoPremioPersonaggio.objects.filter(evento=evento).values_list("personaggio_id", flat=True)
     )
+    dettagli = dettagli_crediti_premio_evento(evento, [pg.id for pg in partecipanti], ts=when)
     for pg in partecipanti:
-        dettagli_crediti = dettaglio_crediti_premio_evento(evento, pg, ts=when)
         rows.append(
             {
                 "personaggio_id": pg.id,
@@ -120,7 +229,7 @@ def report_ricompense_evento(evento: Evento, ts=None) -> dict:
                 "premio_gia_assegnato": pg.id in premi_ids,
                 "pc_evento": int(evento.pc_guadagnati or 0),
                 "prestigio_evento": int(getattr(evento, "prestigio_base_inizio_evento", 0) or 0),
-                **dettagli_crediti,
+                **dettagli[pg.id],
             }
         )
     return {
@@ -147,27 +256,27 @@ def applica_premi_presenza_eventi(user):
     premi_applicati = 0
     gia_presenti = 0
 
+    pgs_per_evento: dict = {}
+    eventi: dict = {}
     pgs = Personaggio.objects.filter(proprietario=user).prefetch_related(
         "eventi_partecipati",
         "eventi_partecipati__giorni",
     )
-
     for pg in pgs:
         for ev in pg.eventi_partecipati.all():
-            if not _evento_in_finestra_presenza(ev, now):
-                continue
-            try:
-                with transaction.atomic():
-                    created = applica_premio_presenza_personaggio(ev, pg, when=now)
-                    if not created:
-                        gia_presenti += 1
-                        continue
-                    premi_applicati += 1
-            except Exception:
-                logger.exception(
-                    "Errore applicazione premio evento ev=%s pg=%s",
-                    getattr(ev, "id", None),
-                    getattr(pg, "id", None),
-                )
+            eventi[ev.pk] = ev
+            pgs_per_evento.setdefault(ev.pk, []).append(pg.pk)
+
+    for ev_id, pg_ids in pgs_per_evento.items():
+        ev = eventi[ev_id]
+        if not _evento_in_finestra_presenza(ev, now):
+            continue
+        try:
+            esito = liquida_premi_presenza_evento(ev, personaggi_ids=pg_ids, when=now)
+        except Exception:
+            logger.exception("Errore applicazione premio evento ev=%s pg=%s", ev_id, pg_ids)
+            continue
+        premi_applicati += esito["premi_applicati"]
+        gia_presenti += esito["gia_presenti"]
 
     return {"premi_applicati": premi_applicati, "gia_presenti": gia_presenti}
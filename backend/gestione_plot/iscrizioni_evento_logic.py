@@ -1,5 +1,8 @@
 """
 Calcolo importi, posti e validazione scelte per iscrizione eventi con opzioni accessorie.
+
+I posti occupati si leggono dai contatori per opzione (gestione_plot.iscrizioni_evento_posti);
+la prenotazione vera e propria avviene in ``riserva_posti`` alla creazione dell'ordine.
 """
 
 from __future__ import annotations
@@ -8,6 +11,7 @@ from decimal import Decimal
 from typing import Iterable
 from uuid import UUID
 
+from .iscrizioni_evento_posti import posti_occupati_per_opzioni
 from .models import Evento, EventoIscrizioneOpzione, IscrizioneEventoPagamento, IscrizioneEventoPagamentoOpzione
 
 
@@ -17,19 +21,15 @@ def opzioni_attive(evento: Evento):
 
 def posti_occupati_opzione(opzione: EventoIscrizioneOpzione) -> int:
     """Posti riservati da pagamenti in corso o completati."""
-    return IscrizioneEventoPagamentoOpzione.objects.filter(
-        opzione=opzione,
-        pagamento__stato__in=(
-            IscrizioneEventoPagamento.Stato.PENDING,
-            IscrizioneEventoPagamento.Stato.CAPTURED,
-        ),
-    ).count()
+    return posti_occupati_per_opzioni([opzione]).get(opzione.id, 0)
 
 
-def posti_disponibili(opzione: EventoIscrizioneOpzione) -> int | None:
+def posti_disponibili(opzione: EventoIscrizioneOpzione, *, occupati: int | None = None) -> int | None:
     if opzione.posti_limite is None:
         return None
-    return max(0, opzione.posti_limite - posti_occupati_opzione(opzione))
+    if occupati is None:
+        occupati = posti_occupati_opzione(opzione)
+    return max(0, opzione.posti_limite - occupati)
 
 
 def _user_opzione_sync_ids(evento: Evento, utente) -> set[str]:
@@ -44,10 +44,16 @@ def _user_opzione_sync_ids(evento: Evento, utente) -> set[str]:
     return {str(s) for s in rows}
 
 
-def serialize_opzione_for_api(opzione: EventoIscrizioneOpzione, *, gia_acquistata: bool) -> dict:
-    occupati = posti_occupati_opzione(opzione)
+def serialize_opzione_for_api(
+    opzione: EventoIscrizioneOpzione,
+    *,
+    gia_acquistata: bool,
+    occupati: int | None = None,
+) -> dict:
+    if occupati is None:
+        occupati = posti_occupati_opzione(opzione)
     limite = opzione.posti_limite
-    disponibili = posti_disponibili(opzione)
+    disponibili = posti_disponibili(opzione, occupati=occupati)
     esaurita = limite is not None and disponibili == 0 and not gia_acquistata
     return {
         "sync_id": str(opzione.sync_id),
@@ -112,6 +118,7 @@ def risolvi_scelte_iscrizione(
     """
     errori: list[str] = []
     attive = list(opzioni_attive(evento))
+    occupati = posti_occupati_per_opzioni(attive)
     by_sync = {op.sync_id: op for op in attive}
     selezionate = _parse_sync_ids(opzione_sync_ids_raw)
     gia_acquistate = _user_opzione_sync_ids(evento, utente) if utente else set()
@@ -133,7 +140,7 @@ def risolvi_scelte_iscrizione(
             if str(op.sync_id) in gia_acquistate:
                 errori.append(f"Hai già acquistato «{op.nome}».")
                 continue
-            disp = posti_disponibili(op)
+            disp = posti_disponibili(op, occupati=occupati.get(op.id, 0))
             if disp is not None and disp < 1:
                 errori.append(f"Posti esauriti per «{op.nome}».")
                 continue
@@ -150,7 +157,7 @@ def risolvi_scelte_iscrizione(
             if op.obbligatoria and op.scelta_giocatore:
                 errori.append(f"Devi selezionare l'opzione obbligatoria «{op.nome}».")
             continue
-        disp = posti_disponibili(op)
+        disp = posti_disponibili(op, occupati=occupati.get(op.id, 0))
         if disp is not None and disp < 1:
             msg = f"Posti esauriti per «{op.nome}»"
             if not op.scelta_giocatore:
@@ -165,13 +172,15 @@ def risolvi_scelte_iscrizione(
 
 def opzioni_integrabili(evento: Evento, utente) -> list[EventoIscrizioneOpzione]:
     gia = _user_opzione_sync_ids(evento, utente)
+    attive = list(opzioni_attive(evento))
+    occupati = posti_occupati_per_opzioni(attive)
     out = []
-    for op in opzioni_attive(evento):
+    for op in attive:
         if not op.scelta_giocatore:
             continue
         if str(op.sync_id) in gia:
             continue
-        if posti_disponibili(op) == 0:
+        if posti_disponibili(op, occupati=occupati.get(op.id, 0)) == 0:
             continue
         out.append(op)
     return out
@@ -0,0 +1,167 @@
+"""
+Contatori posti per opzione iscrizione (EventoIscrizioneOpzionePosti).
+
+La disponibilità si legge da una riga per opzione invece di contare le righe pagamento.
+La prenotazione è un UPDATE condizionale (``riservati + confermati < posti_limite``)
+nella stessa transazione che crea il pagamento PENDING: con richieste concorrenti
+il lock di riga serializza gli incrementi e non si vende oltre il limite.
+I cambi di stato dei pagamenti (cattura, annullo, scadenza) ricalcolano i contatori
+delle opzioni coinvolte sotto lock (signal in gestione_plot.signals).
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    EventoIscrizioneOpzione,
+    EventoIscrizioneOpzionePosti,
+    IscrizioneEventoPagamento,
+    IscrizioneEventoPagamentoOpzione,
+)
+
+PRENOTAZIONE_TTL_MINUTI_DEFAULT = 30
+
+
+class PostiEsauriti(Exception):
+    def __init__(self, opzione: EventoIscrizioneOpzione):
+        self.opzione = opzione
+        super().__init__(f"Posti esauriti per «{opzione.nome}».")
+
+
+def _conta_righe_subquery(stato: str):
+    return Subquery(
+        IscrizioneEventoPagamentoOpzione.objects.filter(
+            opzione_id=OuterRef("opzione_id"),
+            pagamento__stato=stato,
+        )
+        .order_by()
+        .values("opzione_id")
+        .annotate(n=Count("id"))
+        .values("n"),
+        output_field=IntegerField(),
+    )
+
+
+def ricalcola_posti_opzioni(opzione_ids: Iterable) -> None:
+    """
+    Riallinea i contatori esistenti dalle righe pagamento. Blocca prima le righe
+    contatore, poi conta con una nuova istruzione: vede anche le prenotazioni appena
+    committate. Le righe mancanti le crea ``posti_occupati_per_opzioni``.
+    """
+    ids = sorted({op_id for op_id in opzione_ids if op_id}, key=str)
+    if not ids:
+        return
+    with transaction.atomic():
+        list(
+            EventoIscrizioneOpzionePosti.objects.select_for_update()
+            .filter(opzione_id__in=ids)
+            .order_by("opzione_id")
+            .values_list("opzione_id", flat=True)
+        )
+        EventoIscrizioneOpzionePosti.objects.filter(opzione_id__in=ids).update(
+            riservati=Coalesce(_conta_righe_subquery(IscrizioneEventoPagamento.Stato.PENDING), Value(0)),
+            confermati=Coalesce(_conta_righe_subquery(IscrizioneEventoPagamento.Stato.CAPTURED), Value(0)),
+            updated_at=timezone.now(),
+        )
+
+
+def posti_occupati_per_opzioni(opzioni: Iterable[EventoIscrizioneOpzione]) -> dict:
+    """opzione.id -> posti occupati (riservati + confermati), con una sola lettura."""
+    ids = {op.id for op in opzioni}
+    if not ids:
+        return {}
+    occupati = {
+        op_id: riservati + confermati
+        for op_id, riservati, confermati in EventoIscrizioneOpzionePosti.objects.filter(
+            opzione_id__in=ids
+        ).values_list("opzione_id", "riservati", "confermati")
+    }
+    mancanti = ids - set(occupati)
+    if mancanti:
+        EventoIscrizioneOpzionePosti.objects.bulk_create(
+            [EventoIscrizioneOpzionePosti(opzione_id=op_id) for op_id in mancanti],
+            ignore_conflicts=True,
+        )
+        ricalcola_posti_opzioni(mancanti)
+        occupati.update(
+            EventoIscrizioneOpzionePosti.objects.filter(opzione_id__in=mancanti)
+            .annotate(occupati=F("riservati") + F("confermati"))
+            .values_list("opzione_id", "occupati")
+        )
+    return occupati
+
+
+def _prenota(opzione: EventoIscrizioneOpzione) -> bool:
+    qs = EventoIscrizioneOpzionePosti.objects.filter(opzione_id=opzione.id)
+    if opzione.posti_limite is not None:
+        qs = qs.filter(riservati__lt=Value(opzione.posti_limite) - F("confermati"))
+    return qs.update(riservati=F("riservati") + 1, updated_at=timezone.now()) == 1
+
+
+def riserva_posti(opzioni: Iterable[EventoIscrizioneOpzione]) -> None:
+    """
+    Prenota un posto per ogni opzione; da chiamare dentro ``transaction.atomic`` insieme
+    alla creazione delle righe pagamento. Le opzioni che risultano piene liberano prima
+    le prenotazioni scadute; se non basta solleva PostiEsauriti (la transazione va annullata).
+    """
+    opzioni = sorted(opzioni, key=lambda op: str(op.id))
+    occupati = posti_occupati_per_opzioni(opzioni)  # crea anche le righe contatore mancanti
+    piene = [
+        op.id
+        for op in opzioni
+        if op.posti_limite is not None and occupati.get(op.id, 0) >= op.posti_limite
+    ]
+    if piene:
+        rilascia_prenotazioni_scadute(opzione_ids=piene)
+    for opzione in opzioni:
+        if not _prenota(opzione):
+            raise PostiEsauriti(opzione)
+
+
+def rilascia_prenotazioni_scadute(*, ttl_minuti: int | None = None, opzione_ids=None) -> int:
+    """
+    Annulla i pagamenti PENDING più vecchi del TTL (popup PayPal abbandonati) e libera i
+    loro posti. Ritorna il numero di pagamenti annullati.
+    """
+    if ttl_minuti is None:
+        ttl_minuti = getattr(settings, "ISCRIZIONE_PRENOTAZIONE_TTL_MINUTI", PRENOTAZIONE_TTL_MINUTI_DEFAULT)
+    soglia = timezone.now() - timedelta(minutes=ttl_minuti)
+    qs = IscrizioneEventoPagamento.objects.filter(
+        stato=IscrizioneEventoPagamento.Stato.PENDING,
+        created_at__lt=soglia,
+    )
+    if opzione_ids is not None:
+        qs = qs.filter(
+            pk__in=IscrizioneEventoPagamentoOpzione.objects.filter(
+                opzione_id__in=list(opzione_ids)
+            ).values("pagamento_id")
+        )
+    with transaction.atomic():
+        pagamenti_ids = list(
+            qs.order_by("pk").select_for_update(skip_locked=True).values_list("pk", flat=True)
+        )
+        if not pagamenti_ids:
+            return 0
+        coinvolte = set(
+            IscrizioneEventoPagamentoOpzione.objects.filter(pagamento_id__in=pagamenti_ids).values_list(
+                "opzione_id", flat=True
+            )
+        )
+        annullati = IscrizioneEventoPagamento.objects.filter(
+            pk__in=pagamenti_ids,
+            stato=IscrizioneEventoPagamento.Stato.PENDING,
+        ).update(
+            stato=IscrizioneEventoPagamento.Stato.CANCELLED,
+            ultimo_errore="Prenotazione scaduta: pagamento non completato in tempo.",
+            updated_at=timezone.now(),
+        )
+        ricalcola_posti_opzioni(coinvolte)
+    return annullati
@@ -33,13 +33,20 @@ from .iscrizioni_evento_logic import (
     risolvi_scelte_iscrizione,
     serialize_opzione_for_api,
 )
+from .iscrizioni_evento_posti import PostiEsauriti, posti_occupati_per_opzioni, riserva_posti
 from .models import (
     Evento,
     IscrizioneEventoPagamento,
     IscrizioneEventoPagamentoOpzione,
     PayPalImpostazioniGlobali,
 )
-from .paypal_api import format_euro_amount, paypal_capture_order, paypal_create_order, paypal_get_access_token
+from .paypal_api import (
+    format_euro_amount,
+    paypal_capture_order,
+    paypal_create_order,
+    paypal_get_access_token,
+    paypal_refund_capture,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -178,9 +185,15 @@ def _build_event_payload(ev: Evento, user, *, checks_ok: bool, blocking: list, p
 
     gia_acquistate = _user_opzione_sync_ids(ev, user) if registered else set()
 
+    attive = list(opzioni_attive(ev))
+    occupati = posti_occupati_per_opzioni(attive)
     opzioni_payload = [
-        serialize_opzione_for_api(op, gia_acquistata=str(op.sync_id) in gia_acquistate)
-        for op in opzioni_attive(ev)
+        serialize_opzione_for_api(
+            op,
+            gia_acquistata=str(op.sync_id) in gia_acquistate,
+            occupati=occupati.get(op.id, 0),
+        )
+        for op in attive
     ]
     integrabili = opzioni_integrabili(ev, user) if registered else []
     costo_min = importo_minimo_iscrizione(ev)
@@ -265,12 +278,15 @@ def iscrizioni_evento_eligibility(request):
 
 
 def _crea_righe_opzioni_pending(pagamento: IscrizioneEventoPagamento, opzioni):
+    """Righe dell'ordine; i posti sono già stati prenotati da ``riserva_posti``."""
     for op in opzioni:
-        IscrizioneEventoPagamentoOpzione.objects.create(
+        riga = IscrizioneEventoPagamentoOpzione(
             pagamento=pagamento,
             opzione=op,
             costo_euro=op.costo_euro,
         )
+        riga._posto_riservato = True
+        riga.save()
 
 
 @api_view(["POST"])
@@ -390,18 +406,23 @@ def iscrizioni_evento_crea_ordine(request):
     if not order_id:
         return Response({"error": "PayPal non ha restituito id ordine"}, status=status.HTTP_502_BAD_GATEWAY)
 
-    with transaction.atomic():
-        pagamento = IscrizioneEventoPagamento.objects.create(
-            evento=evento,
-            personaggio=pg,
-            utente=request.user,
-            paypal_order_id=str(order_id),
-            stato=IscrizioneEventoPagamento.Stato.PENDING,
-            importo_euro=importo,
-            sandbox_usato=sandbox,
-            tipo_ordine=tipo_ordine,
-        )
-        _crea_righe_opzioni_pending(pagamento, opzioni)
+    try:
+        with transaction.atomic():
+            riserva_posti(opzioni)
+            pagamento = IscrizioneEventoPagamento.objects.create(
+                evento=evento,
+                personaggio=pg,
+                utente=request.user,
+                paypal_order_id=str(order_id),
+                stato=IscrizioneEventoPagamento.Stato.PENDING,
+                importo_euro=importo,
+                sandbox_usato=sandbox,
+                tipo_ordine=tipo_ordine,
+            )
+            _crea_righe_opzioni_pending(pagamento, opzioni)
+    except PostiEsauriti as exc:
+        # L'ordine PayPal resta non approvato e scade lato PayPal: nessun addebito.
+        return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
 
     return Response(
         {
@@ -453,6 +474,23 @@ def iscrizioni_evento_annulla(request):
     return Response({"status": "cancelled"}, status=status.HTTP_200_OK)
 
 
+def _rimborsa_capture(row, *, token: str, sandbox: bool, capture_id: str, motivo: str) -> Response:
+    """Capture incassata su prenotazione scaduta e posti non più disponibili: rimborso e FAILED."""
+    try:
+        paypal_refund_capture(access_token=token, sandbox=sandbox, capture_id=capture_id)
+        errore = f"{motivo} Pagamento rimborsato."
+    except Exception:
+        logger.exception("PayPal refund failed for capture %s", capture_id)
+        errore = f"{motivo} Rimborso PayPal non riuscito: da eseguire manualmente."
+    IscrizioneEventoPagamento.objects.filter(pk=row.pk).update(
+        stato=IscrizioneEventoPagamento.Stato.FAILED,
+        paypal_capture_id=capture_id,
+        ultimo_errore=errore[:2000],
+        updated_at=timezone.now(),
+    )
+    return Response({"error": errore}, status=status.HTTP_409_CONFLICT)
+
+
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
 def iscrizioni_evento_cattura(request):
@@ -518,13 +556,18 @@ def iscrizioni_evento_cattura(request):
 
     try:
         with transaction.atomic():
-            row_locked = (
-                IscrizioneEventoPagamento.objects.select_for_update()
-                .filter(pk=row.pk, stato=IscrizioneEventoPagamento.Stato.PENDING)
-                .first()
-            )
-            if not row_locked:
+            row_locked = IscrizioneEventoPagamento.objects.select_for_update().get(pk=row.pk)
+            if row_locked.stato == IscrizioneEventoPagamento.Stato.CAPTURED:
                 return Response({"status": "already_captured"}, status=status.HTTP_200_OK)
+            if row_locked.stato == IscrizioneEventoPagamento.Stato.CANCELLED:
+                # Prenotazione scaduta (TTL) mentre l'utente era su PayPal: il pagamento è
+                # già incassato, si riprendono i posti se ci sono ancora.
+                riserva_posti(
+                    [r.opzione for r in row_locked.righe_opzioni.select_related("opzione")]
+                )
+            elif row_locked.stato != IscrizioneEventoPagamento.Stato.PENDING:
+                logger.error("Capture %s su pagamento %s in stato %s", capture_id, row.pk, row_locked.stato)
+                return Response({"error": "Ordine non in stato atteso"}, status=status.HTTP_409_CONFLICT)
 
             ev = Evento.objects.select_for_update().get(pk=row_locked.evento_id)
 
@@ -545,6 +588,8 @@ def iscrizioni_evento_cattura(request):
             row_locked.stato = IscrizioneEventoPagamento.Stato.CAPTURED
             row_locked.ultimo_errore = ""
             row_locked.save(update_fields=["paypal_capture_id", "stato", "ultimo_errore", "updated_at"])
+    except PostiEsauriti as exc:
+        return _rimborsa_capture(row, token=token, sandbox=sandbox, capture_id=capture_id, motivo=str(exc))
     except Exception as exc:
         logger.exception("DB capture finalize failed")
         return Response({"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from kor35.sync_tombstone import compatta_tombstone
+
+
+class Command(BaseCommand):
+    help = "Elimina le tombstone di sync già confermate da tutti i nodi noti (oltre la retention)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help="Età minima delle tombstone da eliminare (default: SYNC_TOMBSTONE_RETENTION_DAYS).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Conta senza eliminare.")
+
+    def handle(self, *args, **options):
+        n = compatta_tombstone(retention_days=options.get("retention_days"), dry_run=bool(options.get("dry_run")))
+        verbo = "da eliminare" if options.get("dry_run") else "eliminate"
+        self.stdout.write(self.style.SUCCESS(f"Tombstone {verbo}: {n}."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestione_plot.evento_premi import liquida_premi_presenza_evento
+from gestione_plot.models import Evento
+
+
+class Command(BaseCommand):
+    help = (
+        "Assegna il premio presenza (PC, crediti d'evento, Prestigio) a tutti i PG iscritti "
+        "a un evento che non l'hanno ancora ricevuto. Idempotente: si può rieseguire."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("evento", type=int, help="Id numerico dell'evento.")
+
+    def handle(self, *args, **options):
+        evento = Evento.objects.filter(pk=options["evento"]).first()
+        if evento is None:
+            raise CommandError(f"Evento {options['evento']} non trovato.")
+        stats = liquida_premi_presenza_evento(evento)
+        self.stdout.write(self.style.SUCCESS(
+            f"Evento «{evento.titolo}»: premi_applicati={stats['premi_applicati']} "
+            f"già_presenti={stats['gia_presenti']}"
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from kor35.sync_media import pota_blob
+
+
+class Command(BaseCommand):
+    help = "Elimina i blob media del sync non più collegati a file media (e i .part abbandonati)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help="Giorni minimi senza collegamenti (default: SYNC_MEDIA_BLOB_RETENTION_DAYS).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Conta senza eliminare.")
+
+    def handle(self, *args, **options):
+        n = pota_blob(retention_days=options.get("retention_days"), dry_run=bool(options.get("dry_run")))
+        verbo = "da eliminare" if options.get("dry_run") else "eliminati"
+        self.stdout.write(self.style.SUCCESS(f"Blob {verbo}: {n}."))
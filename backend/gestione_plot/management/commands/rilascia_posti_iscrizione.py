@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from gestione_plot.iscrizioni_evento_posti import rilascia_prenotazioni_scadute
+
+
+class Command(BaseCommand):
+    help = (
+        "Annulla i pagamenti iscrizione PENDING scaduti (popup PayPal abbandonati) e "
+        "libera i posti prenotati sulle opzioni. Da eseguire periodicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl-minuti",
+            type=int,
+            default=None,
+            help="Età minima dei PENDING da annullare (default: settings.ISCRIZIONE_PRENOTAZIONE_TTL_MINUTI o 30).",
+        )
+
+    def handle(self, *args, **options):
+        annullati = rilascia_prenotazioni_scadute(ttl_minuti=options.get("ttl_minuti"))
+        self.stdout.write(self.style.SUCCESS(f"Prenotazioni scadute annullate: {annullati}"))
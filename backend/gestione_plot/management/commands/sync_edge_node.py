@@ -1,13 +1,14 @@
 import json
 import os
 from pathlib import Path
+from urllib.parse import urlparse
 
 import requests
 from django.apps import apps
 from django.contrib.auth.models import Group, User
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import IntegrityError, transaction
 from django.db.models import ForeignKey, UniqueConstraint
 from django.utils import timezone
@@ -22,18 +23,36 @@ from kor35.syncing import (
     try_apply_mti_child_fields_when_skipped,
     try_apply_pagina_regolamento_structure_when_skipped,
 )
+from kor35.sync_digest import AlberiDigest, bucket_divergenti, righe_bucket, tombstone_bucket
+from kor35.sync_media import (
+    BLOB_CHUNK,
+    MEDIA_MANCANTI_KEY,
+    MEDIA_MANIFEST_KEY,
+    accoda_parziale,
+    completa_blob,
+    costruisci_manifest,
+    materializza,
+    offset_parziale,
+    percorso_blob,
+    voci_mancanti,
+)
 from kor35.sync_tombstone import (
     TOMBSTONE_PAYLOAD_KEY,
     apply_tombstone_rows,
     build_tombstones_outgoing,
     clear_stale_tombstone_before_record_apply,
+    compatta_tombstone,
     get_sync_model_registry,
+    registra_conferma_nodo,
     tombstone_blocks_record_apply,
 )
 from personaggi.models import AuthGroupSyncState, AuthUserSyncState
 from social.mention_tags import suppress_mention_notify
 
 
+MEDIA_UPLOAD_CHUNK = 8 * 1024 * 1024
+
+
 class Command(BaseCommand):
     help = "Sincronizzazione bidirezionale Replica <-> Master (LWW)."
 
@@ -44,6 +63,11 @@ class Command(BaseCommand):
             action="store_true",
             help="Scarica e applica solo dati dal Master, senza inviare modifiche locali.",
         )
+        parser.add_argument(
+            "--digest",
+            action="store_true",
+            help="Verifica anti-entropia a hash per bucket: trasferisce solo le righe divergenti.",
+        )
         parser.add_argument(
             "--diagnose-zodiac",
             action="store_true",
@@ -65,27 +89,50 @@ class Command(BaseCommand):
         since = self._load_since(state_path, options.get("since"))
         pull_only = bool(options.get("pull_only"))
         diagnose_zodiac = bool(options.get("diagnose_zodiac"))
-        outgoing = {} if pull_only else self._build_outgoing_payload(model_registry, since)
 
         headers = {"Content-Type": "application/json"}
         if sync_token:
             headers["Authorization"] = f"EdgeToken {sync_token}"
 
+        if options.get("digest"):
+            self._verify_digest(sync_url, headers, model_registry, pull_only)
+            return
+
+        inizio_export = timezone.now()
+        outgoing = {} if pull_only else self._build_outgoing_payload(model_registry, since)
+
         payload = {
             "source_node": getattr(settings, "EDGE_NODE_NAME", "replica"),
             "last_sync_timestamp": since.isoformat() if since else None,
             "records": outgoing,
         }
 
+        if outgoing:
+            self._push_media(sync_url, headers, model_registry, outgoing)
+        incoming_payload = self._post_master(sync_url, headers, payload).get("records", {})
+        self._pull_media(sync_url, headers, incoming_payload.get(MEDIA_MANIFEST_KEY))
+        self._apply_incoming_payload(model_registry, incoming_payload)
+        if diagnose_zodiac:
+            self._print_zodiac_diagnostics()
+        if not pull_only:
+            # Push riuscito: il Master ha le nostre tombstone fino all'inizio dell'export.
+            registra_conferma_nodo(urlparse(sync_url).netloc or "master", inizio_export)
+        compatta_tombstone()
+        self._save_state(state_path, timezone.now())
+        self.stdout.write(self.style.SUCCESS("Sync completata."))
+
+    def _read_timeout_seconds(self):
         try:
             read_timeout_seconds = int(os.getenv("EDGE_SYNC_HTTP_TIMEOUT", "120"))
         except ValueError:
             read_timeout_seconds = 120
-        read_timeout_seconds = max(read_timeout_seconds, 30)
+        return max(read_timeout_seconds, 30)
 
+    def _post_master(self, url, headers, payload):
+        read_timeout_seconds = self._read_timeout_seconds()
         try:
             response = requests.post(
-                sync_url,
+                url,
                 headers=headers,
                 json=payload,
                 timeout=(10, read_timeout_seconds),
@@ -111,17 +158,146 @@ class Command(BaseCommand):
             raise
 
         try:
-            incoming_payload = response.json().get("records", {})
+            return response.json()
         except ValueError:
             self.stderr.write(self.style.ERROR("Risposta non JSON:"))
             self.stderr.write(response.text[:12000])
             raise
 
+    def _verify_digest(self, sync_url, headers, model_registry, pull_only):
+        """
+        Anti-entropia (kor35.sync_digest): confronta radici e bucket col Master e scambia
+        solo le righe dei bucket divergenti. Non tocca il watermark del sync incrementale.
+        """
+        digest_url = (getattr(settings, "EDGE_SYNC_DIGEST_URL", "") or "").strip() or (
+            sync_url.rstrip("/") + "/digest/"
+        )
+        alberi = AlberiDigest(model_registry)
+        radici_master = self._post_master(digest_url, headers, {"fase": "radici"}).get("radici", {})
+        modelli = [key for key, radice in alberi.radici().items() if radici_master.get(key) != radice]
+        if not modelli:
+            self.stdout.write(self.style.SUCCESS(f"Digest allineato ({len(model_registry)} modelli)."))
+            return
+
+        bucket_master = self._post_master(digest_url, headers, {"fase": "bucket", "modelli": modelli}).get(
+            "bucket", {}
+        )
+        buckets = {}
+        for key in modelli:
+            divergenti = bucket_divergenti(alberi.bucket(key), bucket_master.get(key, {}))
+            if divergenti:
+                buckets[key] = divergenti
+
+        outgoing = {}
+        if not pull_only:
+            outgoing = {key: righe_bucket(model_registry[key], b) for key, b in buckets.items()}
+            outgoing[TOMBSTONE_PAYLOAD_KEY] = tombstone_bucket(buckets)
+            self._push_media(sync_url, headers, model_registry, outgoing)
+        incoming_payload = self._post_master(
+            digest_url, headers, {"fase": "righe", "bucket": buckets, "records": outgoing}
+        ).get("records", {})
+        self._pull_media(sync_url, headers, incoming_payload.get(MEDIA_MANIFEST_KEY))
         self._apply_incoming_payload(model_registry, incoming_payload)
-        if diagnose_zodiac:
-            self._print_zodiac_diagnostics()
-        self._save_state(state_path, timezone.now())
-        self.stdout.write(self.style.SUCCESS("Sync completata."))
+
+        inviate = sum(len(rows) for key, rows in outgoing.items() if key != TOMBSTONE_PAYLOAD_KEY)
+        ricevute = sum(
+            len(rows) for key, rows in incoming_payload.items() if key not in (TOMBSTONE_PAYLOAD_KEY, MEDIA_MANIFEST_KEY)
+        )
+        for key, b in buckets.items():
+            self.stdout.write(f"  {key}: {len(b)} bucket divergenti")
+        self.stdout.write(
+            self.style.WARNING(
+                f"Digest riparato: {len(modelli)} modelli divergenti, "
+                f"{sum(len(b) for b in buckets.values())} bucket, {inviate} righe inviate, {ricevute} ricevute."
+            )
+        )
+
+    def _push_media(self, sync_url, headers, model_registry, outgoing):
+        """Prima del push righe: invia al Master solo i blob dei file referenziati che gli mancano."""
+        manifest = costruisci_manifest(model_registry, outgoing)
+        if not manifest:
+            return
+        media_url = sync_url.rstrip("/") + "/media/"
+        mancanti = self._post_master(media_url, headers, {MEDIA_MANIFEST_KEY: manifest}).get(MEDIA_MANCANTI_KEY, [])
+        per_blob = {}
+        for voce in mancanti:
+            per_blob.setdefault(voce["sha256"], []).append(voce["path"])
+        for sha256, paths in per_blob.items():
+            self._upload_blob(f"{media_url}{sha256}/", headers, sha256, paths)
+        if per_blob:
+            self.stdout.write(f"Media inviati: {len(per_blob)} blob per {len(mancanti)} file.")
+
+    def _pull_media(self, sync_url, headers, manifest):
+        """Prima di applicare le righe: scarica solo i blob che mancano nello store locale."""
+        mancanti = voci_mancanti(manifest or [])
+        per_blob = {}
+        for voce in mancanti:
+            per_blob.setdefault(voce["sha256"], []).append(voce["path"])
+        media_url = sync_url.rstrip("/") + "/media/"
+        for sha256, paths in per_blob.items():
+            self._download_blob(f"{media_url}{sha256}/", headers, sha256)
+            materializza(sha256, paths)
+        if per_blob:
+            self.stdout.write(f"Media scaricati: {len(per_blob)} blob per {len(mancanti)} file.")
+
+    def _download_blob(self, url, headers, sha256):
+        offset = offset_parziale(sha256)
+        request_headers = {k: v for k, v in headers.items() if k != "Content-Type"}
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+        try:
+            with requests.get(
+                url, headers=request_headers, stream=True, timeout=(10, self._read_timeout_seconds())
+            ) as response:
+                # 416: il .part contiene già tutto il blob, resta solo la verifica.
+                if response.status_code != 416:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        offset = 0
+                    accoda_parziale(sha256, response.iter_content(BLOB_CHUNK), offset)
+        except requests.RequestException as exc:
+            self.stderr.write(self.style.ERROR(f"Download media {sha256} fallito: {exc}"))
+            raise
+        if not completa_blob(sha256):
+            raise CommandError(f"Blob {sha256}: contenuto non corrispondente all'hash, riprovare.")
+
+    def _upload_blob(self, url, headers, sha256, paths):
+        blob = percorso_blob(sha256)
+        totale = blob.stat().st_size
+        timeout = (10, self._read_timeout_seconds())
+        try:
+            stato = requests.head(url, headers=headers, timeout=timeout)
+            # 200: blob già completo sul Master, basta un PUT vuoto per collegare i percorsi.
+            offset = totale if stato.status_code == 200 else int(stato.headers.get("X-Blob-Offset") or 0)
+            conflitti = 0
+            with blob.open("rb") as fh:
+                while True:
+                    fh.seek(offset)
+                    chunk = fh.read(MEDIA_UPLOAD_CHUNK)
+                    fine = offset + len(chunk)
+                    response = requests.put(
+                        url,
+                        params={"path": paths},
+                        data=chunk,
+                        headers={
+                            **headers,
+                            "Content-Type": "application/octet-stream",
+                            "Content-Range": f"bytes {offset}-{max(fine - 1, offset)}/{totale}",
+                        },
+                        timeout=timeout,
+                    )
+                    if response.status_code == 409 and conflitti < 3:
+                        conflitti += 1
+                        offset = int(response.headers.get("X-Blob-Offset") or 0)
+                        continue
+                    response.raise_for_status()
+                    if response.status_code == 201:
+                        return
+                    conflitti = 0
+                    offset = fine
+        except requests.RequestException as exc:
+            self.stderr.write(self.style.ERROR(f"Upload media {sha256} fallito: {exc}"))
+            raise
 
     def _model_registry(self):
         return get_sync_model_registry(
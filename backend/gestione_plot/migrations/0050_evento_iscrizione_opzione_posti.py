@@ -0,0 +1,51 @@
+# Contatori posti per opzione iscrizione (gestione_plot.iscrizioni_evento_posti)
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def backfill_contatori_posti(apps, schema_editor):
+    Opzione = apps.get_model("gestione_plot", "EventoIscrizioneOpzione")
+    Posti = apps.get_model("gestione_plot", "EventoIscrizioneOpzionePosti")
+    righe = Opzione.objects.annotate(
+        n_riservati=Count("acquisti", filter=Q(acquisti__pagamento__stato="PENDING")),
+        n_confermati=Count("acquisti", filter=Q(acquisti__pagamento__stato="CAPTURED")),
+    ).values_list("id", "n_riservati", "n_confermati")
+    Posti.objects.bulk_create(
+        [Posti(opzione_id=op_id, riservati=r, confermati=c) for op_id, r, c in righe],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gestione_plot", "0049_evento_trasferimento_deposito"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventoIscrizioneOpzionePosti",
+            fields=[
+                (
+                    "opzione",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="contatore_posti",
+                        serialize=False,
+                        to="gestione_plot.eventoiscrizioneopzione",
+                    ),
+                ),
+                ("riservati", models.PositiveIntegerField(default=0)),
+                ("confermati", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Contatore posti opzione iscrizione",
+                "verbose_name_plural": "Contatori posti opzioni iscrizione",
+            },
+        ),
+        migrations.RunPython(backfill_contatori_posti, migrations.RunPython.noop),
+    ]
@@ -25,19 +25,31 @@ def fattore_for_korp(korp) -> Decimal:
     return _q2(getattr(korp, "fattore_task", 1) or 1)
 
 
-def personaggio_ha_korp(personaggio, korp_id) -> bool:
+def korp_ids_personaggio(personaggio) -> set[int]:
+    """KORP attive del PG, da passare come ``korp_ids`` quando si valutano più task."""
+    return {int(x) for x in get_active_korp_ids(personaggio)}
+
+
+def personaggio_ha_korp(personaggio, korp_id, *, korp_ids: set[int] | None = None) -> bool:
     if not personaggio or not korp_id:
         return False
-    return int(korp_id) in {int(x) for x in get_active_korp_ids(personaggio)}
+    if korp_ids is None:
+        korp_ids = korp_ids_personaggio(personaggio)
+    return int(korp_id) in korp_ids
 
 
-def personaggio_puo_svolgere(missione: Missione, personaggio: Personaggio) -> bool:
+def personaggio_puo_svolgere(
+    missione: Missione,
+    personaggio: Personaggio,
+    *,
+    korp_ids: set[int] | None = None,
+) -> bool:
     """Esclusive: solo membri della KORP. Altrimenti tutti."""
     if not missione.esclusiva:
         return True
     if not missione.korp_id:
         return False
-    return personaggio_ha_korp(personaggio, missione.korp_id)
+    return personaggio_ha_korp(personaggio, missione.korp_id, korp_ids=korp_ids)
 
 
 def calcola_ricompensa_base(missione: Missione, *, is_primo: bool) -> tuple[Decimal, int]:
@@ -58,11 +70,13 @@ def applica_fattore_korp(
     personaggio: Personaggio | None,
     cr: Decimal,
     pr: int,
+    *,
+    korp_ids: set[int] | None = None,
 ) -> tuple[Decimal, int, bool, Decimal]:
     """Fattore solo se PG membro della KORP della task."""
     if not missione.korp_id or not personaggio:
         return _q2(cr), int(pr), False, Decimal("1.00")
-    if not personaggio_ha_korp(personaggio, missione.korp_id):
+    if not personaggio_ha_korp(personaggio, missione.korp_id, korp_ids=korp_ids):
         return _q2(cr), int(pr), False, Decimal("1.00")
     fattore = fattore_for_korp(missione.korp)
     cr2 = _q2(cr * fattore)
@@ -70,9 +84,9 @@ def applica_fattore_korp(
     return cr2, pr2, True, fattore
 
 
-def ricompensa_per_visualizzazione(missione, personaggio, *, is_primo=True) -> dict:
+def ricompensa_per_visualizzazione(missione, personaggio, *, is_primo=True, korp_ids=None) -> dict:
     cr, pr = calcola_ricompensa_base(missione, is_primo=is_primo)
-    cr2, pr2, is_bonus, fattore = applica_fattore_korp(missione, personaggio, cr, pr)
+    cr2, pr2, is_bonus, fattore = applica_fattore_korp(missione, personaggio, cr, pr, korp_ids=korp_ids)
     return {
         "reward_crediti": cr2,
         "reward_prestigio": pr2,
@@ -150,18 +164,19 @@ def assegna_risoluzione(
 ) -> MissioneRisoluzione:
     if not MissioneEvento.objects.filter(missione=missione, evento=evento).exists():
         raise ValueError("La task non è associata a questo evento.")
-    if not personaggio_puo_svolgere(missione, personaggio):
+    korp_ids = korp_ids_personaggio(personaggio)
+    if not personaggio_puo_svolgere(missione, personaggio, korp_ids=korp_ids):
         raise ValueError("Task esclusiva: il personaggio non appartiene alla KORP richiesta.")
     if MissioneRisoluzione.objects.filter(
         missione=missione, evento=evento, personaggio=personaggio
     ).exists():
         raise ValueError("Questo personaggio ha già risolto questa task per l'evento.")
-    if missione.premio_solo_primo and not _is_primo(missione.id, evento.id):
+    is_primo = _is_primo(missione.id, evento.id)
+    if missione.premio_solo_primo and not is_primo:
         raise ValueError("Task a premio solo al primo: già risolta da un altro personaggio.")
 
-    is_primo = _is_primo(missione.id, evento.id)
     cr, pr = calcola_ricompensa_base(missione, is_primo=is_primo)
-    cr, pr, _, _ = applica_fattore_korp(missione, personaggio, cr, pr)
+    cr, pr, _, _ = applica_fattore_korp(missione, personaggio, cr, pr, korp_ids=korp_ids)
 
     ris = MissioneRisoluzione.objects.create(
         missione=missione,
@@ -231,26 +246,43 @@ def lista_missioni_per_personaggio(personaggio: Personaggio) -> list[dict]:
     """
     Visibili al giocatore solo le task legate a eventi ATTIVI,
     non esclusive (oppure esclusive della propria KORP).
+
+    Numero fisso di query (eventi attivi, legami task–evento, task, risoluzioni del PG,
+    primi claim delle task solo-primo, KORP del PG): il resto si calcola in memoria.
     """
     attivi = set(eventi_attivi_ids())
     if not attivi:
         return []
 
+    eventi_per_missione: dict = {}
+    for mid, eid in (
+        MissioneEvento.objects.filter(evento_id__in=attivi, missione__attiva=True)
+        .order_by("evento_id")
+        .values_list("missione_id", "evento_id")
+    ):
+        eventi_per_missione.setdefault(mid, []).append(eid)
+    if not eventi_per_missione:
+        return []
+
     missioni = list(
-        Missione.objects.filter(attiva=True, eventi__id__in=attivi)
+        Missione.objects.filter(id__in=list(eventi_per_missione))
         .select_related("korp")
-        .prefetch_related("eventi")
-        .distinct()
         .order_by("ordine", "titolo")
     )
-    miei = list(
-        MissioneRisoluzione.objects.filter(personaggio=personaggio, missione__in=missioni)
+    korp_ids = korp_ids_personaggio(personaggio)
+    missioni = [m for m in missioni if personaggio_puo_svolgere(m, personaggio, korp_ids=korp_ids)]
+
+    rmap: dict = {}
+    for r in (
+        MissioneRisoluzione.objects.filter(
+            personaggio=personaggio,
+            missione_id__in=[m.id for m in missioni],
+            evento_id__in=attivi,
+        )
         .select_related("evento")
         .order_by("resolved_at")
-    )
-    rmap: dict[str, list] = {}
-    for r in miei:
-        rmap.setdefault(str(r.missione_id), []).append({
+    ):
+        rmap.setdefault(r.missione_id, []).append({
             "id": str(r.id),
             "evento_id": r.evento_id,
             "evento_titolo": r.evento.titolo if r.evento_id else None,
@@ -263,39 +295,32 @@ def lista_missioni_per_personaggio(personaggio: Personaggio) -> list[dict]:
         })
 
     solo_primo_ids = [m.id for m in missioni if m.premio_solo_primo]
-    presi = set()
+    presi: set = set()
     if solo_primo_ids:
-        for mid, eid in MissioneRisoluzione.objects.filter(
-            missione_id__in=solo_primo_ids,
-            evento_id__in=attivi,
-        ).values_list("missione_id", "evento_id"):
-            presi.add((str(mid), eid))
+        presi = set(
+            MissioneRisoluzione.objects.filter(
+                missione_id__in=solo_primo_ids,
+                evento_id__in=attivi,
+            )
+            .order_by()
+            .values_list("missione_id", "evento_id")
+            .distinct()
+        )
 
-    korp_ids = set(get_active_korp_ids(personaggio))
     rows = []
     for m in missioni:
-        if not personaggio_puo_svolgere(m, personaggio):
-            continue
-        # Solo eventi attivi per questa task
-        eventi_ids = [eid for eid in m.eventi.values_list("id", flat=True) if eid in attivi]
-        if not eventi_ids:
-            continue
-        miei_r = [r for r in rmap.get(str(m.id), []) if r["evento_id"] in attivi]
+        eventi_ids = eventi_per_missione.get(m.id, [])
+        miei_r = rmap.get(m.id, [])
         svolta = len(miei_r) > 0
-        effettuabile = False
-        for eid in eventi_ids:
-            gia_mia = any(r["evento_id"] == eid for r in miei_r)
-            if gia_mia:
-                continue
-            if m.premio_solo_primo and (str(m.id), eid) in presi:
-                continue
-            effettuabile = True
-            break
-        if not effettuabile and not svolta:
-            if m.premio_solo_primo:
-                continue
-
-        view = ricompensa_per_visualizzazione(m, personaggio, is_primo=True)
+        eventi_miei = {r["evento_id"] for r in miei_r}
+        effettuabile = any(
+            eid not in eventi_miei and not (m.premio_solo_primo and (m.id, eid) in presi)
+            for eid in eventi_ids
+        )
+        if not effettuabile and not svolta and m.premio_solo_primo:
+            continue
+
+        view = ricompensa_per_visualizzazione(m, personaggio, is_primo=True, korp_ids=korp_ids)
         rows.append({
             "id": str(m.id),
             "sync_id": str(m.sync_id),
@@ -5,6 +5,7 @@ from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from personaggi.models import Personaggio, Manifesto, Inventario, QrCode, Tier, Punteggio
+from kor35.config_cache import bump_revision, get_cached
 from kor35.syncing import SyncableModel
 
 # --- 1. SEZIONE TEMPLATE (L'ANAGRAFICA GENERALE) ---
@@ -1261,6 +1262,8 @@ class ConfigurazioneSito(SyncableModel, models.Model):
     # Metadata
     ultima_modifica = models.DateTimeField(auto_now=True)
     
+    CONFIG_CACHE_NAMESPACE = "configurazione_sito"
+
     class Meta:
         verbose_name = "Configurazione Sito"
         verbose_name_plural = "Configurazione Sito"
@@ -1272,6 +1275,7 @@ class ConfigurazioneSito(SyncableModel, models.Model):
         # Assicura che esista un solo record (Singleton pattern)
         self.pk = 1
         super().save(*args, **kwargs)
+        bump_revision(self.CONFIG_CACHE_NAMESPACE)
     
     @classmethod
     def get_config(cls):
@@ -1279,6 +1283,14 @@ class ConfigurazioneSito(SyncableModel, models.Model):
         config, created = cls.objects.get_or_create(pk=1)
         return config
 
+    @classmethod
+    def get_config_cached(cls):
+        """
+        Configurazione dalla cache di processo (middleware, context processor, consumer).
+        Istanza condivisa tra richieste: solo lettura, per modificare usare get_config().
+        """
+        return get_cached(cls.CONFIG_CACHE_NAMESPACE, None, cls.get_config)
+
 
 class LinkSocial(SyncableModel, models.Model):
     """
@@ -1434,6 +1446,35 @@ class IscrizioneEventoPagamentoOpzione(SyncableModel, models.Model):
         return f"{self.pagamento_id} — {self.opzione_id}"
 
 
+class EventoIscrizioneOpzionePosti(models.Model):
+    """
+    Contatore posti di un'opzione iscrizione: righe pagamento PENDING (riservati) e
+    CAPTURED (confermati). Derivato dalle righe, locale al nodo e non sincronizzato;
+    aggiornato da gestione_plot.iscrizioni_evento_posti.
+    """
+
+    opzione = models.OneToOneField(
+        EventoIscrizioneOpzione,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="contatore_posti",
+    )
+    riservati = models.PositiveIntegerField(default=0)
+    confermati = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Contatore posti opzione iscrizione"
+        verbose_name_plural = "Contatori posti opzioni iscrizione"
+
+    @property
+    def occupati(self) -> int:
+        return self.riservati + self.confermati
+
+    def __str__(self):
+        return f"{self.opzione_id}: {self.riservati} riservati, {self.confermati} confermati"
+
+
 # --- TASK / MISSIONI GIOCATORI ---
 
 class Missione(SyncableModel, models.Model):
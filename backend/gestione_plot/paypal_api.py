@@ -1,5 +1,5 @@
 """
-Chiamate HTTP all'API PayPal Orders v2 (token + crea ordine + capture).
+Chiamate HTTP all'API PayPal Orders v2 (token + crea ordine + capture) e Payments v2 (rimborso).
 """
 
 from __future__ import annotations
@@ -91,6 +91,24 @@ def paypal_capture_order(*, access_token: str, sandbox: bool, order_id: str) ->
     return resp.json()
 
 
+def paypal_refund_capture(*, access_token: str, sandbox: bool, capture_id: str) -> dict[str, Any]:
+    """Rimborso totale di una capture (Payments v2)."""
+    url = f"{_api_base(sandbox=sandbox)}/v2/payments/captures/{capture_id}/refund"
+    resp = requests.post(
+        url,
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        },
+        json={},
+        timeout=45,
+    )
+    if not resp.ok:
+        logger.warning("PayPal refund: %s %s", resp.status_code, resp.text[:800])
+        resp.raise_for_status()
+    return resp.json()
+
+
 def format_euro_amount(value: Decimal) -> str:
     q = value.quantize(Decimal("0.01"))
     return format(q, "f")
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .iscrizioni_evento_posti import ricalcola_posti_opzioni
+from .models import IscrizioneEventoPagamento, IscrizioneEventoPagamentoOpzione
+
+
+@receiver(post_save, sender=IscrizioneEventoPagamento)
+def pagamento_iscrizione_ricalcola_posti(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and "stato" not in update_fields):
+        return
+    ricalcola_posti_opzioni(instance.righe_opzioni.values_list("opzione_id", flat=True))
+
+
+@receiver(post_save, sender=IscrizioneEventoPagamentoOpzione)
+def riga_pagamento_ricalcola_posti(sender, instance, created, **kwargs):
+    # Le righe create da crea_ordine hanno già prenotato il posto (riserva_posti).
+    if created and getattr(instance, "_posto_riservato", False):
+        return
+    ricalcola_posti_opzioni([instance.opzione_id])
+
+
+@receiver(post_delete, sender=IscrizioneEventoPagamentoOpzione)
+def riga_pagamento_eliminata_ricalcola_posti(sender, instance, **kwargs):
+    ricalcola_posti_opzioni([instance.opzione_id])
@@ -0,0 +1,109 @@
+"""Liquidazione a insiemi del premio presenza evento."""
+
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from gestione_plot.evento_premi import (
+    applica_premio_presenza_personaggio,
+    liquida_premi_presenza_evento,
+    report_ricompense_evento,
+)
+from gestione_plot.models import Evento, EventoPremioPersonaggio
+from personaggi.models import (
+    Campagna,
+    Carica,
+    Carriera,
+    CreditoMovimento,
+    Personaggio,
+    PersonaggioCarrieraMembership,
+    PuntiCaratteristicaMovimento,
+    TIER_3,
+    TipoCarriera,
+)
+
+
+class LiquidazionePremiEventoTests(TestCase):
+    def setUp(self):
+        self.campagna = Campagna.objects.filter(slug="kor35").first() or Campagna.objects.create(
+            slug="kor35", nome="KOR35", attiva=True, is_default=True
+        )
+        now = timezone.now()
+        self.evento = Evento.objects.create(
+            titolo="Evento premi",
+            data_inizio=now,
+            data_fine=now,
+            pc_guadagnati=2,
+            crediti_base_inizio_evento=Decimal("10"),
+            prestigio_base_inizio_evento=3,
+        )
+        tipo, _ = TipoCarriera.objects.get_or_create(codice="professione", defaults={"nome": "Professione"})
+        self.carriera = Carriera.objects.create(
+            nome="Carriera Premi",
+            descrizione="",
+            tipo=TIER_3,
+            tipo_carriera=tipo,
+            bonus_crediti_evento=Decimal("5"),
+        )
+        carica = Carica.objects.create(nome="Capo", bonus_crediti_evento=Decimal("7"))
+        carica.carriere.add(self.carriera)
+        self.pgs = [Personaggio.objects.create(nome=f"PG premio {i}", campagna=self.campagna) for i in range(3)]
+        PersonaggioCarrieraMembership.objects.create(
+            personaggio=self.pgs[0],
+            carriera=self.carriera,
+            tipo_carriera=tipo,
+            carica=carica,
+            data_da=now - timezone.timedelta(days=1),
+        )
+        self.evento.partecipanti.add(*self.pgs)
+
+    def test_liquidazione_idempotente_e_report_coerente(self):
+        applica_premio_presenza_personaggio(self.evento, self.pgs[1])
+
+        esito = liquida_premi_presenza_evento(self.evento)
+        self.assertEqual(esito, {"premi_applicati": 2, "gia_presenti": 1})
+        self.assertEqual(EventoPremioPersonaggio.objects.filter(evento=self.evento).count(), 3)
+        crediti = dict(
+            CreditoMovimento.objects.filter(evento=self.evento).values_list("personaggio_id", "importo")
+        )
+        self.assertEqual(crediti[self.pgs[0].id], Decimal("22.00"))
+        self.assertEqual(crediti[self.pgs[2].id], Decimal("10.00"))
+        self.assertEqual(PuntiCaratteristicaMovimento.objects.filter(personaggio__in=self.pgs).count(), 3)
+        self.assertEqual(
+            set(Personaggio.objects.filter(pk__in=[pg.pk for pg in self.pgs]).values_list("peso_influencer", flat=True)),
+            {4},
+        )
+
+        self.assertEqual(liquida_premi_presenza_evento(self.evento), {"premi_applicati": 0, "gia_presenti": 3})
+        self.assertEqual(CreditoMovimento.objects.filter(evento=self.evento).count(), 3)
+
+        report = {r["personaggio_id"]: r for r in report_ricompense_evento(self.evento)["ricompense"]}
+        self.assertEqual(report[self.pgs[0].id]["totale_crediti"], "22.00")
+        self.assertTrue(all(r["premio_gia_assegnato"] for r in report.values()))
+
+    def test_query_costanti_rispetto_ai_partecipanti(self):
+        altro = Evento.objects.create(
+            titolo="Evento grande",
+            data_inizio=self.evento.data_inizio,
+            data_fine=self.evento.data_fine,
+            pc_guadagnati=1,
+            prestigio_base_inizio_evento=1,
+        )
+        altro.partecipanti.add(*self.pgs)
+        with CaptureQueriesContext(connection) as pochi:
+            liquida_premi_presenza_evento(self.evento)
+        molti = [Personaggio.objects.create(nome=f"PG extra {i}", campagna=self.campagna) for i in range(6)]
+        altro.partecipanti.add(*molti)
+        with CaptureQueriesContext(connection) as tanti:
+            self.assertEqual(liquida_premi_presenza_evento(altro)["premi_applicati"], 9)
+        self.assertEqual(len(tanti), len(pochi))
+
+    def test_comando(self):
+        out = StringIO()
+        call_command("liquida_premi_evento", str(self.evento.pk), stdout=out)
+        self.assertIn("premi_applicati=3", out.getvalue())
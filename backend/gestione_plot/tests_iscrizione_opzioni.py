@@ -1,10 +1,32 @@
+from datetime import timedelta
 from decimal import Decimal
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.test import TestCase
 from django.utils import timezone
+from rest_framework.test import APIClient
 
-from gestione_plot.iscrizioni_evento_logic import importo_minimo_iscrizione, risolvi_scelte_iscrizione
-from gestione_plot.models import Evento, EventoIscrizioneOpzione
+from gestione_plot.iscrizioni_evento_logic import (
+    importo_minimo_iscrizione,
+    posti_occupati_opzione,
+    risolvi_scelte_iscrizione,
+)
+from gestione_plot.iscrizioni_evento_posti import (
+    PostiEsauriti,
+    rilascia_prenotazioni_scadute,
+    riserva_posti,
+)
+from gestione_plot.models import (
+    Evento,
+    EventoIscrizioneOpzione,
+    EventoIscrizioneOpzionePosti,
+    IscrizioneEventoPagamento,
+    IscrizioneEventoPagamentoOpzione,
+    PayPalImpostazioniGlobali,
+)
+from personaggi.models import Personaggio
 
 User = get_user_model()
 
@@ -91,3 +113,133 @@ class IscrizioneOpzioniLogicTests(TestCase):
             opzione_sync_ids_raw=[],
         )
         self.assertTrue(any("obbligatoria" in e.lower() for e in err))
+
+
+class IscrizioneOpzioniPostiTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.evento = Evento.objects.create(
+            titolo="Posti",
+            data_inizio=now,
+            data_fine=now,
+            iscrizione_costo_euro=Decimal("30.00"),
+            iscrizione_apertura=now,
+            iscrizione_chiusura=now,
+        )
+        self.user = User.objects.create_user(username="posti", password="x")
+        self.pg = Personaggio.objects.create(nome="Iscritto", proprietario=self.user)
+        self.cena = EventoIscrizioneOpzione.objects.create(
+            evento=self.evento,
+            nome="Cena",
+            costo_euro=Decimal("10"),
+            posti_limite=2,
+        )
+
+    def _ordine(self, n):
+        with transaction.atomic():
+            riserva_posti([self.cena])
+            pagamento = IscrizioneEventoPagamento.objects.create(
+                evento=self.evento,
+                personaggio=self.pg,
+                utente=self.user,
+                paypal_order_id=f"ORD-{n}",
+                importo_euro=Decimal("40"),
+            )
+            riga = IscrizioneEventoPagamentoOpzione(pagamento=pagamento, opzione=self.cena, costo_euro=Decimal("10"))
+            riga._posto_riservato = True
+            riga.save()
+        return pagamento
+
+    def _contatore(self):
+        return EventoIscrizioneOpzionePosti.objects.values_list("riservati", "confermati").get(opzione=self.cena)
+
+    def test_prenotazione_oltre_limite_rifiutata(self):
+        self._ordine(1)
+        self._ordine(2)
+        self.assertEqual(self._contatore(), (2, 0))
+        with self.assertRaises(PostiEsauriti):
+            self._ordine(3)
+        self.assertEqual(IscrizioneEventoPagamento.objects.count(), 2)
+        self.assertEqual(self._contatore(), (2, 0))
+        _, _, err = risolvi_scelte_iscrizione(
+            self.evento,
+            modalita="integra",
+            utente=self.user,
+            opzione_sync_ids_raw=[str(self.cena.sync_id)],
+        )
+        self.assertTrue(any("esauriti" in e for e in err))
+
+    def test_cambi_stato_aggiornano_contatori(self):
+        primo = self._ordine(1)
+        secondo = self._ordine(2)
+        primo.stato = IscrizioneEventoPagamento.Stato.CAPTURED
+        primo.save(update_fields=["stato", "updated_at"])
+        self.assertEqual(self._contatore(), (1, 1))
+        secondo.stato = IscrizioneEventoPagamento.Stato.CANCELLED
+        secondo.save(update_fields=["stato", "updated_at"])
+        self.assertEqual(self._contatore(), (0, 1))
+        self.assertEqual(posti_occupati_opzione(self.cena), 1)
+        self._ordine(3)
+        self.assertEqual(self._contatore(), (1, 1))
+
+    def test_prenotazioni_scadute_liberano_posti(self):
+        vecchio = self._ordine(1)
+        self._ordine(2)
+        IscrizioneEventoPagamento.objects.filter(pk=vecchio.pk).update(
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+        # Opzione piena: la prenotazione libera prima il PENDING scaduto.
+        self._ordine(3)
+        vecchio.refresh_from_db()
+        self.assertEqual(vecchio.stato, IscrizioneEventoPagamento.Stato.CANCELLED)
+        self.assertEqual(self._contatore(), (2, 0))
+        self.assertEqual(rilascia_prenotazioni_scadute(ttl_minuti=30), 0)
+
+    def _cattura_dopo_scadenza(self, pagamento, durante_paypal):
+        """La prenotazione scade mentre l'utente è su PayPal; poi la capture va a buon fine."""
+        IscrizioneEventoPagamento.objects.filter(pk=pagamento.pk).update(
+            created_at=timezone.now() - timedelta(hours=2), sandbox_usato=True
+        )
+        paypal = PayPalImpostazioniGlobali.get_solo()
+        paypal.sandbox_client_id = "id"
+        paypal.sandbox_client_secret = "secret"
+        paypal.save()
+
+        def capture(**kwargs):
+            durante_paypal()
+            return {"status": "COMPLETED", "purchase_units": [{"payments": {"captures": [{"id": "CAP-1"}]}}]}
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with mock.patch("gestione_plot.iscrizioni_evento_views.paypal_get_access_token", return_value="tok"), \
+                mock.patch("gestione_plot.iscrizioni_evento_views.paypal_capture_order", side_effect=capture), \
+                mock.patch("gestione_plot.iscrizioni_evento_views.paypal_refund_capture") as refund:
+            response = client.post(
+                "/api/plot/iscrizioni-evento/cattura/", {"paypal_order_id": pagamento.paypal_order_id}, format="json"
+            )
+        pagamento.refresh_from_db()
+        return response, pagamento, refund
+
+    def test_cattura_dopo_scadenza_riprenota_e_iscrive(self):
+        response, pagamento, refund = self._cattura_dopo_scadenza(
+            self._ordine(1), lambda: rilascia_prenotazioni_scadute(ttl_minuti=30)
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["status"], "ok")
+        self.assertEqual(pagamento.stato, IscrizioneEventoPagamento.Stato.CAPTURED)
+        self.assertEqual(pagamento.paypal_capture_id, "CAP-1")
+        self.assertTrue(self.evento.partecipanti.filter(pk=self.pg.pk).exists())
+        self.assertEqual(self._contatore(), (0, 1))
+        refund.assert_not_called()
+
+    def test_cattura_dopo_scadenza_senza_posti_rimborsa(self):
+        scaduto = self._ordine(1)
+        self._ordine(2)
+        # Un terzo ordine libera il posto del PENDING scaduto e lo occupa.
+        response, pagamento, refund = self._cattura_dopo_scadenza(scaduto, lambda: self._ordine(3))
+        self.assertEqual(response.status_code, 409)
+        refund.assert_called_once_with(access_token="tok", sandbox=True, capture_id="CAP-1")
+        self.assertEqual(pagamento.stato, IscrizioneEventoPagamento.Stato.FAILED)
+        self.assertEqual(pagamento.paypal_capture_id, "CAP-1")
+        self.assertFalse(self.evento.partecipanti.filter(pk=self.pg.pk).exists())
+        self.assertEqual(self._contatore(), (2, 0))
@@ -1,8 +1,13 @@
 from decimal import Decimal
 
-from django.test import SimpleTestCase
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from gestione_plot.missioni_service import calcola_ricompensa_base
+from gestione_plot.missioni_service import calcola_ricompensa_base, lista_missioni_per_personaggio
+from gestione_plot.models import Evento, Missione, MissioneRisoluzione
+from personaggi.models import Campagna, Personaggio
 
 
 class _FakeMissione:
@@ -57,3 +62,45 @@ class MissioniRiepilogoLogicTests(SimpleTestCase):
         non = [m for m in missioni if m.korp_id != korp_id and not m.esclusiva]
         self.assertEqual(len(di), 1)
         self.assertEqual(sum(m.reward_crediti for m in non), Decimal("25"))  # 20 + 5, non 50 esclusiva
+
+
+class ListaMissioniPersonaggioTests(TestCase):
+    def setUp(self):
+        self.campagna = Campagna.objects.filter(slug="kor35").first() or Campagna.objects.create(
+            slug="kor35", nome="KOR35", attiva=True, is_default=True
+        )
+        self.pg = Personaggio.objects.create(nome="PG Task", campagna=self.campagna)
+        self.rivale = Personaggio.objects.create(nome="PG Rivale", campagna=self.campagna)
+        now = timezone.now()
+        self.evento = Evento.objects.create(titolo="Evento attivo", data_inizio=now, data_fine=now, started_at=now)
+        self.chiuso = Evento.objects.create(
+            titolo="Evento chiuso", data_inizio=now, data_fine=now, started_at=now, ended_at=now
+        )
+
+    def _missione(self, titolo, **kwargs):
+        m = Missione.objects.create(titolo=titolo, **kwargs)
+        m.eventi.add(self.evento)
+        return m
+
+    def test_query_costanti_e_stato_task(self):
+        libera = self._missione("A libera")
+        presa = self._missione("B presa dal rivale", premio_solo_primo=True)
+        fuori = Missione.objects.create(titolo="C solo evento chiuso")
+        fuori.eventi.add(self.chiuso)
+        MissioneRisoluzione.objects.create(missione=presa, evento=self.evento, personaggio=self.rivale)
+        MissioneRisoluzione.objects.create(missione=libera, evento=self.evento, personaggio=self.pg)
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = lista_missioni_per_personaggio(self.pg)
+        self.assertEqual([r["titolo"] for r in rows], ["A libera"])
+        self.assertTrue(rows[0]["svolta"])
+        self.assertFalse(rows[0]["effettuabile"])
+        self.assertEqual(rows[0]["eventi_ids"], [self.evento.id])
+
+        for i in range(5):
+            self._missione(f"D extra {i}", premio_solo_primo=bool(i % 2))
+        with CaptureQueriesContext(connection) as ctx_molte:
+            rows = lista_missioni_per_personaggio(self.pg)
+        self.assertEqual(len(rows), 6)
+        self.assertTrue(all(r["effettuabile"] for r in rows if r["titolo"].startswith("D")))
+        self.assertEqual(len(ctx_molte), len(ctx))
@@ -268,12 +268,9 @@ class EventoViewSet(viewsets.ModelViewSet):
             evento.started_at = now
             evento.ended_at = None
             evento.save(update_fields=["started_at", "ended_at", "updated_at"])
-            from .evento_premi import applica_premio_presenza_personaggio
+            from .evento_premi import liquida_premi_presenza_evento
 
-            premi_applicati = 0
-            for pg in evento.partecipanti.all():
-                if applica_premio_presenza_personaggio(evento, pg, when=now):
-                    premi_applicati += 1
+            premi_applicati = liquida_premi_presenza_evento(evento, when=now)["premi_applicati"]
         return Response(
             {
                 "ok": True,
@@ -0,0 +1,140 @@
+"""
+Viste async per le letture leggere ad alta frequenza (polling), servite da Daphne.
+
+Nginx instrada questi percorsi al processo ASGI già attivo per i WebSocket: i poll economici
+(revisioni cache, non letti, stato orologio, ticket console, stato tick/LED) non aspettano in
+coda dietro i render pesanti dei worker gunicorn.
+
+L'autenticazione equivale alle classi DRF di default: token (``Authorization: Token``) e
+sessione con l'ORM async; gli altri schemi (OAuth2 Bearer) passano dagli autenticatori DRF
+configurati, in un thread. Errori con lo stesso corpo e status delle viste DRF.
+Le letture in cache usano un client ``redis.asyncio`` su stesso DB, chiavi e serializzazione
+di ``django.core.cache``.
+"""
+from __future__ import annotations
+
+import asyncio
+from functools import wraps
+from typing import Any, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+# (event loop, client): un solo client redis.asyncio per processo, legato al loop di Daphne.
+_client_redis: Optional[tuple[asyncio.AbstractEventLoop, Any]] = None
+
+
+def risposta_json(data: Any, status_code: int = 200) -> JsonResponse:
+    return JsonResponse(data, status=status_code, safe=False, json_dumps_params={"ensure_ascii": False})
+
+
+def risposta_errore_api(exc: exceptions.APIException, www_authenticate: Optional[str] = None) -> JsonResponse:
+    """Come l'exception handler DRF: 401 con ``WWW-Authenticate`` se lo schema lo prevede, altrimenti 403."""
+    status_code = exc.status_code
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)) and not www_authenticate:
+        status_code = 403
+    response = risposta_json({"detail": str(exc.detail)}, status_code)
+    if www_authenticate and status_code == 401:
+        response["WWW-Authenticate"] = www_authenticate
+    return response
+
+
+def _autenticatori_drf() -> list:
+    return [cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+
+
+def _autentica_drf(request):
+    return Request(request, authenticators=_autenticatori_drf()).user
+
+
+async def autentica_utente(request):
+    """
+    Utente come lo autenticherebbe DRF con le classi di default; None se anonimo.
+    Credenziali presenti ma non valide: ``AuthenticationFailed``.
+    """
+    schema, _sep, chiave = (request.headers.get("Authorization") or "").strip().partition(" ")
+    chiave = chiave.strip()
+    if schema.lower() == "token" and chiave and " " not in chiave:
+        token = await Token.objects.select_related("user").filter(key=chiave).afirst()
+        if token is None:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return token.user
+    if schema:
+        user = await sync_to_async(_autentica_drf)(request)
+    else:
+        user = await request.auser()
+    return user if user is not None and user.is_authenticated else None
+
+
+def vista_get_async(*, autenticata: bool = True):
+    """
+    Decoratore per viste async in sola lettura: solo GET e, se ``autenticata``, utente
+    autenticato (IsAuthenticated) disponibile come ``request.user``.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def view(request, *args, **kwargs):
+            if request.method != "GET":
+                return HttpResponseNotAllowed(["GET"])
+            if autenticata:
+                www_authenticate = _autenticatori_drf()[0].authenticate_header(request)
+                try:
+                    user = await autentica_utente(request)
+                except exceptions.AuthenticationFailed as exc:
+                    return risposta_errore_api(exc, www_authenticate)
+                if user is None:
+                    return risposta_errore_api(exceptions.NotAuthenticated(), www_authenticate)
+                request.user = user
+            return await func(request, *args, **kwargs)
+
+        return view
+
+    return decorator
+
+
+def _redis_async():
+    """
+    Client ``redis.asyncio`` condiviso, costruito dalla configurazione della cache di default
+    (primo server e ``OPTIONS`` passate al pool, come fa ``RedisCacheClient``); None se la
+    cache non è Redis. Le connessioni appartengono all'event loop: il client si ricrea solo
+    se il loop cambia (test, comandi), altrimenti resta lo stesso per tutta la vita del processo.
+    """
+    global _client_redis
+    from django.core.cache.backends.redis import RedisCache
+
+    backend = caches["default"]
+    if not isinstance(backend, RedisCache):
+        return None
+    loop = asyncio.get_running_loop()
+    if _client_redis is None or _client_redis[0] is not loop:
+        import redis.asyncio as redis_async
+
+        # Pool e parser sincroni di Django non valgono per asyncio; il serializer si usa a parte.
+        opzioni = {
+            k: v for k, v in backend._options.items() if k not in ("pool_class", "parser_class", "serializer")
+        }
+        pool = redis_async.ConnectionPool.from_url(backend._servers[0], **opzioni)
+        _client_redis = (loop, redis_async.Redis(connection_pool=pool))
+    return _client_redis[1]
+
+
+async def cache_aget_many(chiavi: Iterable[str]) -> dict:
+    """Come ``cache.get_many`` (stesse chiavi e valori) ma con I/O Redis asincrono."""
+    chiavi = list(chiavi)
+    backend = caches["default"]
+    client = _redis_async()
+    if client is None:
+        return await backend.aget_many(chiavi)
+    chiavi_redis = [backend.make_and_validate_key(k) for k in chiavi]
+    valori = await client.mget(chiavi_redis)
+    serializer = backend._cache._serializer
+    return {k: serializer.loads(v) for k, v in zip(chiavi, valori) if v is not None}
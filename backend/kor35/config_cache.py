@@ -0,0 +1,155 @@
+"""
+Cache di processo per configurazioni singleton (ConfigurazioneSito, economia campagna, …).
+
+Ogni voce resta in memoria del worker (gunicorn, Daphne, tick) ed è validata da una
+revisione condivisa nella cache Django (Redis):
+
+- al salvataggio della configurazione ``bump_revision`` svuota la copia locale e,
+  a commit avvenuto, scrive una nuova revisione → gli altri worker ricaricano al
+  controllo successivo;
+- la revisione condivisa si rilegge al massimo ogni ``CONFIG_CACHE_CHECK_SECONDS``
+  (default 2s): nel mezzo la lettura è un lookup in un dict;
+- se Redis non risponde si usa la copia locale per ``CONFIG_CACHE_FALLBACK_SECONDS``
+  (default 30s), poi si ricarica dal DB: mai errori verso il chiamante.
+
+I valori letti dentro una transazione aperta si memorizzano solo a commit avvenuto
+(prima potrebbero essere annullati da un rollback) e solo se nel frattempo non c'è
+stato un ``bump_revision`` sulla stessa voce.
+I valori restituiti sono condivisi tra richieste: vanno trattati in sola lettura.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .perf_metrics import segnala_cache
+
+logger = logging.getLogger(__name__)
+
+REVISION_KEY_PREFIX = "kor35:cfgrev"
+
+DEFAULT_CHECK_SECONDS = 2.0
+DEFAULT_FALLBACK_SECONDS = 30.0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    revision: str | None
+    loaded_at: float
+    checked_at: float
+
+
+_entries: dict[tuple[str, Hashable], _Entry] = {}
+_generations: dict[tuple[str, Hashable], int] = {}
+
+
+def _check_seconds() -> float:
+    return float(getattr(settings, "CONFIG_CACHE_CHECK_SECONDS", DEFAULT_CHECK_SECONDS))
+
+
+def _fallback_seconds() -> float:
+    return float(getattr(settings, "CONFIG_CACHE_FALLBACK_SECONDS", DEFAULT_FALLBACK_SECONDS))
+
+
+def revision_key(namespace: str, key: Hashable = None) -> str:
+    return f"{REVISION_KEY_PREFIX}:{namespace}:{key if key is not None else '-'}"
+
+
+def _shared_revision(namespace: str, key: Hashable) -> str:
+    """Revisione corrente in Redis; la inizializza se assente (flush/eviction)."""
+    rk = revision_key(namespace, key)
+    rev = cache.get(rk)
+    if rev is None:
+        cache.add(rk, uuid.uuid4().hex, timeout=None)
+        rev = cache.get(rk)
+    return str(rev)
+
+
+def get_cached(namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+    """Valore in cache di processo per (namespace, key); ``loader`` lo ricostruisce dal DB."""
+    ck = (namespace, key)
+    now = time.monotonic()
+    entry = _entries.get(ck)
+    if entry is not None and now - entry.checked_at < _check_seconds():
+        segnala_cache(True)
+        return entry.value
+
+    try:
+        revision = _shared_revision(namespace, key)
+    except Exception as exc:
+        if entry is not None and now - entry.loaded_at < _fallback_seconds():
+            entry.checked_at = now
+            segnala_cache(True)
+            return entry.value
+        logger.warning("Config cache: revisione %s non leggibile (%s), ricarico dal DB", ck, exc)
+        revision = None
+
+    if entry is not None and revision is not None and entry.revision == revision:
+        entry.checked_at = now
+        segnala_cache(True)
+        return entry.value
+
+    segnala_cache(False)
+    generation = _generations.get(ck, 0)
+    value = loader()
+    if not connection.in_atomic_block:
+        _entries[ck] = _Entry(value=value, revision=revision, loaded_at=now, checked_at=now)
+    else:
+        transaction.on_commit(lambda: _store_after_commit(ck, generation, value, revision, now))
+    return value
+
+
+def _store_after_commit(ck, generation: int, value: Any, revision: str | None, loaded_at: float) -> None:
+    """Memorizza un valore letto in transazione solo se nel frattempo nessun bump l'ha invalidato."""
+    if _generations.get(ck, 0) != generation or ck in _entries:
+        return
+    _entries[ck] = _Entry(value=value, revision=revision, loaded_at=loaded_at, checked_at=loaded_at)
+
+
+def _publish_revision(namespace: str, key: Hashable) -> None:
+    _entries.pop((namespace, key), None)
+    try:
+        cache.set(revision_key(namespace, key), uuid.uuid4().hex, timeout=None)
+    except Exception as exc:
+        logger.warning("Config cache: bump revisione %s:%s fallito (%s)", namespace, key, exc)
+
+
+def bump_revision(namespace: str, key: Hashable = None) -> None:
+    """
+    Invalida la voce in tutti i worker.
+
+    La copia locale si svuota subito; la revisione condivisa cambia a commit avvenuto
+    (subito, se non c'è una transazione aperta).
+    """
+    _entries.pop((namespace, key), None)
+    _generations[(namespace, key)] = _generations.get((namespace, key), 0) + 1
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _publish_revision(namespace, key))
+    else:
+        _publish_revision(namespace, key)
+
+
+def local_generation(namespace: str, key: Hashable = None) -> int:
+    """
+    Contatore dei bump_revision eseguiti in questo processo (anche dentro transazione).
+    Serve a invalidare memo di breve durata (es. per istanza) senza interrogare Redis.
+    """
+    return _generations.get((namespace, key), 0)
+
+
+def clear_local(namespace: str | None = None) -> None:
+    """Svuota la cache di processo (tutta o un solo namespace); utile nei test."""
+    if namespace is None:
+        _entries.clear()
+        return
+    for ck in [ck for ck in _entries if ck[0] == namespace]:
+        _entries.pop(ck, None)
@@ -10,7 +10,7 @@ def build_info(_request):
 
 
 def maintenance_context(_request):
-    config = ConfigurazioneSito.get_config()
+    config = ConfigurazioneSito.get_config_cached()
     return {
         "KOR35_MAINTENANCE_MODE": bool(config.maintenance_mode),
         "KOR35_MAINTENANCE_ADMIN_NOTE": config.maintenance_admin_note,
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import re
 from dataclasses import dataclass
 
 from django.apps import apps
@@ -8,6 +9,7 @@ from django.conf import settings
 from django.contrib.auth.models import Group, Permission, User
 from django.db import IntegrityError, transaction
 from django.db.models import ForeignKey, UniqueConstraint
+from django.http import FileResponse
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
@@ -25,12 +27,27 @@ from kor35.syncing import (
     try_apply_mti_child_fields_when_skipped,
     try_apply_pagina_regolamento_structure_when_skipped,
 )
+from kor35.sync_digest import AlberiDigest, righe_bucket, tombstone_bucket
+from kor35.sync_media import (
+    BLOB_CHUNK,
+    MEDIA_MANCANTI_KEY,
+    MEDIA_MANIFEST_KEY,
+    OffsetBlobErrato,
+    accoda_parziale,
+    completa_blob,
+    costruisci_manifest,
+    materializza,
+    offset_parziale,
+    percorso_blob,
+    voci_mancanti,
+)
 from kor35.sync_tombstone import (
     TOMBSTONE_PAYLOAD_KEY,
     apply_tombstone_rows,
     build_tombstones_outgoing,
     clear_stale_tombstone_before_record_apply,
     get_sync_model_registry,
+    registra_conferma_nodo,
     tombstone_blocks_record_apply,
 )
 from personaggi.models import AuthGroupSyncState, AuthUserSyncState
@@ -86,6 +103,7 @@ class EdgeSyncView(APIView):
             )
 
             outgoing = self._build_outgoing(last_sync_timestamp)
+            outgoing[MEDIA_MANIFEST_KEY] = costruisci_manifest(self._sync_model_registry(), outgoing)
         except ValidationError:
             raise
         except Exception as exc:
@@ -97,6 +115,13 @@ class EdgeSyncView(APIView):
                 payload["pgcode"] = exc.__cause__.pgcode
             return Response(payload, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        # Il watermark della replica conferma le tombstone già ricevute nei sync precedenti.
+        # Best-effort: il payload è pronto; la compattazione gira fuori richiesta (compatta_tombstone_sync).
+        try:
+            registra_conferma_nodo(request.data.get("source_node") or "replica", last_sync_timestamp)
+        except Exception:
+            logger.exception("Edge sync: conferma tombstone non registrata")
+
         return Response(
             {
                 "status": "ok",
@@ -790,3 +815,142 @@ class EdgeSyncView(APIView):
             if obj is not None:
                 resolved.append(obj)
         return resolved
+
+
+class EdgeSyncDigestView(APIView):
+    """
+    Verifica anti-entropia (vedi kor35.sync_digest), in tre fasi richieste dall'edge:
+
+    - ``radici``: hash radice per ogni modello sincronizzato;
+    - ``bucket``: hash dei bucket per i modelli in ``modelli`` (radice divergente);
+    - ``righe``: applica (LWW) le righe e i tombstone dell'edge per i ``bucket`` divergenti
+      e restituisce le righe del Master negli stessi bucket, già riconciliate.
+    """
+
+    permission_classes = [HasEdgeSyncToken]
+    authentication_classes = []
+
+    def post(self, request):
+        registry = EdgeSyncView()._sync_model_registry()
+        fase = request.data.get("fase") or "radici"
+        if fase == "radici":
+            return Response({"radici": AlberiDigest(registry).radici()}, status=status.HTTP_200_OK)
+        if fase == "bucket":
+            alberi = AlberiDigest(registry)
+            modelli = [key for key in request.data.get("modelli") or [] if key in registry]
+            return Response({"bucket": {key: alberi.bucket(key) for key in modelli}}, status=status.HTTP_200_OK)
+        if fase != "righe":
+            raise ValidationError({"fase": "Valori ammessi: radici, bucket, righe."})
+
+        buckets = {key: list(b) for key, b in (request.data.get("bucket") or {}).items() if key in registry}
+        incoming_records = request.data.get("records", {}) or {}
+        sync_view = EdgeSyncView()
+        try:
+            with transaction.atomic():
+                with suppress_mention_notify():
+                    sync_view._apply_sync_models(
+                        {key: rows for key, rows in incoming_records.items() if key in buckets}
+                    )
+            apply_tombstone_rows(registry, incoming_records.get(TOMBSTONE_PAYLOAD_KEY, []) or [])
+        except ValidationError:
+            raise
+        except Exception as exc:
+            logger.exception("Edge sync digest repair failed")
+            verbose = getattr(settings, "EDGE_SYNC_VERBOSE_ERRORS", True)
+            detail = str(exc) if (verbose or settings.DEBUG) else "Edge sync error"
+            return Response(
+                {"detail": detail, "error_type": exc.__class__.__name__},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        outgoing = {key: righe_bucket(registry[key], b) for key, b in buckets.items()}
+        outgoing[TOMBSTONE_PAYLOAD_KEY] = tombstone_bucket(buckets)
+        outgoing[MEDIA_MANIFEST_KEY] = costruisci_manifest(registry, outgoing)
+        return Response(
+            {"status": "ok", "server_timestamp": timezone.now().isoformat(), "records": outgoing},
+            status=status.HTTP_200_OK,
+        )
+
+
+class EdgeSyncMediaView(APIView):
+    """
+    POST {"media.manifest": [...]} dall'edge prima del push: risponde con le voci i cui blob
+    mancano sul Master (vedi kor35.sync_media); le altre sono già materializzate dallo store.
+    """
+
+    permission_classes = [HasEdgeSyncToken]
+    authentication_classes = []
+
+    def post(self, request):
+        manifest = request.data.get(MEDIA_MANIFEST_KEY) or []
+        return Response({MEDIA_MANCANTI_KEY: voci_mancanti(manifest)}, status=status.HTTP_200_OK)
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d+)-$")
+_CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class EdgeSyncBlobView(APIView):
+    """
+    Blob per sha256. GET con ``Range: bytes=N-`` riprende un download interrotto; HEAD
+    indica in ``X-Blob-Offset`` quanto è già arrivato di un upload (404 finché incompleto).
+    PUT a pezzi con ``Content-Range: bytes N-M/T`` (offset diverso dal ricevuto: 409 e
+    ``X-Blob-Offset``); a blob completo e verificato lo collega ai ``?path=`` indicati.
+    """
+
+    permission_classes = [HasEdgeSyncToken]
+    authentication_classes = []
+
+    def head(self, request, sha256):
+        blob = percorso_blob(sha256)
+        if blob is None:
+            raise ValidationError({"sha256": "Hash non valido."})
+        completo = blob.exists()
+        response = Response(status=status.HTTP_200_OK if completo else status.HTTP_404_NOT_FOUND)
+        response["X-Blob-Offset"] = str(blob.stat().st_size if completo else offset_parziale(sha256))
+        return response
+
+    def get(self, request, sha256):
+        blob = percorso_blob(sha256)
+        if blob is None or not blob.exists():
+            return Response({"detail": "Blob non trovato."}, status=status.HTTP_404_NOT_FOUND)
+        size = blob.stat().st_size
+        match = _RANGE_RE.match(request.headers.get("Range", ""))
+        start = int(match.group(1)) if match else 0
+        if start >= size and start:
+            response = Response(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        fh = blob.open("rb")
+        fh.seek(start)
+        response = FileResponse(fh, content_type="application/octet-stream")
+        if match:
+            response.status_code = status.HTTP_206_PARTIAL_CONTENT
+            response["Content-Range"] = f"bytes {start}-{size - 1}/{size}"
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    def put(self, request, sha256):
+        blob = percorso_blob(sha256)
+        if blob is None:
+            raise ValidationError({"sha256": "Hash non valido."})
+        if blob.exists():
+            materializza(sha256, request.query_params.getlist("path"))
+            return Response(status=status.HTTP_201_CREATED)
+        match = _CONTENT_RANGE_RE.match(request.headers.get("Content-Range", ""))
+        offset, totale = (int(match.group(1)), int(match.group(3))) if match else (0, None)
+        chunks = iter(lambda: request.stream.read(BLOB_CHUNK), b"") if request.stream else []
+        try:
+            ricevuti = accoda_parziale(sha256, chunks, offset)
+        except OffsetBlobErrato as exc:
+            response = Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+            response["X-Blob-Offset"] = str(exc.offset)
+            return response
+        if totale is not None and ricevuti < totale:
+            response = Response(status=status.HTTP_202_ACCEPTED)
+            response["X-Blob-Offset"] = str(ricevuti)
+            return response
+        if not completa_blob(sha256):
+            raise ValidationError({"sha256": "Contenuto non corrispondente all'hash."})
+        materializza(sha256, request.query_params.getlist("path"))
+        return Response(status=status.HTTP_201_CREATED)
@@ -32,7 +32,7 @@ class MaintenanceModeMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        config = ConfigurazioneSito.get_config()
+        config = ConfigurazioneSito.get_config_cached()
         if not config.maintenance_mode:
             return self.get_response(request)
 
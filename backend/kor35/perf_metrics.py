@@ -0,0 +1,233 @@
+"""
+Strumentazione opzionale (PERF_METRICS_ENABLED): query, tempo DB, cache e latenza
+per rotta, in un istogramma in memoria del processo.
+
+- HTTP: ``PerfMetricsMiddleware`` (in testa a MIDDLEWARE quando abilitata);
+  chiave ``"<METODO> <route>"`` dalla rotta risolta (es. ``GET api/pilot/stato/``).
+- Channels: ``PerfMetricsConsumerMixin`` sui consumer, un campione per messaggio
+  gestito (chiave ``"WS <Consumer>.<tipo messaggio>"``).
+- Le query si contano con un execute_wrapper installato su ogni connessione, che
+  registra solo quando nel contesto corrente c'è una misura attiva (vale anche per i
+  thread di ``database_sync_to_async``, che ereditano il contesto).
+- Cache: ``segnala_cache(hit)`` dai layer di cache applicativi (kor35.config_cache).
+
+Ogni rotta tiene gli ultimi ``PERF_METRICS_SAMPLES`` campioni; i dati sono per
+processo (ogni worker ha i suoi) e si leggono da ``/api/perf/metrics/`` (staff).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+DEFAULT_SAMPLES = 512
+LATENZA_BUCKET_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+@dataclass
+class Misura:
+    queries: int = 0
+    db_ms: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+@dataclass(frozen=True)
+class Campione:
+    latenza_ms: float
+    queries: int
+    db_ms: float
+    cache_hits: int
+    cache_misses: int
+
+
+_misura_corrente: contextvars.ContextVar[Misura | None] = contextvars.ContextVar(
+    "kor35_perf_misura", default=None
+)
+_campioni: dict[str, deque] = {}
+_lock = threading.Lock()
+_wrapper_installato = False
+
+
+def metrics_enabled() -> bool:
+    return bool(getattr(settings, "PERF_METRICS_ENABLED", False))
+
+
+def _max_campioni() -> int:
+    return int(getattr(settings, "PERF_METRICS_SAMPLES", DEFAULT_SAMPLES))
+
+
+# ---------------------------------------------------------------------------
+# Raccolta
+# ---------------------------------------------------------------------------
+
+def _query_wrapper(execute, sql, params, many, context):
+    misura = _misura_corrente.get()
+    if misura is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        misura.queries += 1
+        misura.db_ms += (time.perf_counter() - start) * 1000
+
+
+def _installa_su_connessione(connection, **kwargs):
+    if _query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_query_wrapper)
+
+
+def installa_wrapper_query() -> None:
+    """Aggancia il wrapper alle connessioni esistenti (thread corrente) e future."""
+    global _wrapper_installato
+    if not _wrapper_installato:
+        connection_created.connect(_installa_su_connessione, dispatch_uid="kor35.perf_metrics")
+        _wrapper_installato = True
+    for conn in connections.all(initialized_only=True):
+        _installa_su_connessione(conn)
+
+
+def segnala_cache(hit: bool) -> None:
+    misura = _misura_corrente.get()
+    if misura is None:
+        return
+    if hit:
+        misura.cache_hits += 1
+    else:
+        misura.cache_misses += 1
+
+
+def registra_campione(chiave: str, campione: Campione) -> None:
+    with _lock:
+        serie = _campioni.get(chiave)
+        if serie is None or serie.maxlen != _max_campioni():
+            serie = deque(serie or (), maxlen=_max_campioni())
+            _campioni[chiave] = serie
+        serie.append(campione)
+
+
+@contextmanager
+def misura_richiesta(chiave_fn):
+    """
+    Misura il blocco; alla fine registra il campione sotto ``chiave_fn()``
+    (callable: la rotta è nota solo dopo il dispatch). Chiave None = non registrare.
+    """
+    installa_wrapper_query()
+    misura = Misura()
+    token = _misura_corrente.set(misura)
+    start = time.perf_counter()
+    try:
+        yield misura
+    finally:
+        latenza_ms = (time.perf_counter() - start) * 1000
+        _misura_corrente.reset(token)
+        chiave = chiave_fn()
+        if chiave:
+            registra_campione(
+                chiave,
+                Campione(
+                    latenza_ms=latenza_ms,
+                    queries=misura.queries,
+                    db_ms=misura.db_ms,
+                    cache_hits=misura.cache_hits,
+                    cache_misses=misura.cache_misses,
+                ),
+            )
+
+
+# ---------------------------------------------------------------------------
+# HTTP / Channels
+# ---------------------------------------------------------------------------
+
+def _chiave_http(request) -> str | None:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    route = match.route or match.view_name or "?"
+    return f"{request.method} {route}"
+
+
+class PerfMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics_enabled():
+            return self.get_response(request)
+        with misura_richiesta(lambda: _chiave_http(request)):
+            return self.get_response(request)
+
+
+class PerfMetricsConsumerMixin:
+    """Da mettere prima della classe consumer Channels nelle basi."""
+
+    async def dispatch(self, message):
+        if not metrics_enabled():
+            return await super().dispatch(message)
+        chiave = f"WS {type(self).__name__}.{message.get('type', '?')}"
+        with misura_richiesta(lambda: chiave):
+            return await super().dispatch(message)
+
+
+# ---------------------------------------------------------------------------
+# Lettura
+# ---------------------------------------------------------------------------
+
+def _percentile(valori_ordinati: list[float], p: float) -> float:
+    if not valori_ordinati:
+        return 0.0
+    idx = min(len(valori_ordinati) - 1, int(round(p * (len(valori_ordinati) - 1))))
+    return valori_ordinati[idx]
+
+
+def _riepilogo(campioni: list[Campione]) -> dict:
+    latenze = sorted(c.latenza_ms for c in campioni)
+    queries = sorted(c.queries for c in campioni)
+    n = len(campioni)
+    bucket = {f"le_{soglia}ms": 0 for soglia in LATENZA_BUCKET_MS}
+    bucket["gt_max"] = 0
+    for lat in latenze:
+        for soglia in LATENZA_BUCKET_MS:
+            if lat <= soglia:
+                bucket[f"le_{soglia}ms"] += 1
+                break
+        else:
+            bucket["gt_max"] += 1
+    return {
+        "campioni": n,
+        "latenza_ms": {
+            "p50": round(_percentile(latenze, 0.5), 2),
+            "p95": round(_percentile(latenze, 0.95), 2),
+            "max": round(latenze[-1], 2),
+            "media": round(sum(latenze) / n, 2),
+        },
+        "queries": {
+            "media": round(sum(queries) / n, 2),
+            "p95": _percentile(queries, 0.95),
+            "max": queries[-1],
+        },
+        "db_ms_media": round(sum(c.db_ms for c in campioni) / n, 2),
+        "cache_hits": sum(c.cache_hits for c in campioni),
+        "cache_misses": sum(c.cache_misses for c in campioni),
+        "istogramma_latenza": bucket,
+    }
+
+
+def snapshot() -> dict:
+    with _lock:
+        copie = {k: list(v) for k, v in _campioni.items() if v}
+    return {chiave: _riepilogo(campioni) for chiave, campioni in sorted(copie.items())}
+
+
+def reset() -> None:
+    with _lock:
+        _campioni.clear()
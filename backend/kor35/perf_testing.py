@@ -0,0 +1,34 @@
+"""
+Helper per i test: budget di query per endpoint.
+
+``assertMaxQueries`` è come ``assertNumQueries`` ma con tetto massimo (il numero esatto
+cambia con cache/fixture, il tetto no); ``assertEndpointQueryBudget`` chiama l'endpoint
+con il client di test e verifica stato HTTP e budget.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    @contextmanager
+    def assertMaxQueries(self, budget: int, using: str = "default"):
+        with CaptureQueriesContext(connections[using]) as ctx:
+            yield ctx
+        eseguite = len(ctx.captured_queries)
+        if eseguite > budget:
+            elenco = "\n".join(
+                f"{i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, start=1)
+            )
+            self.fail(f"{eseguite} query eseguite, budget {budget}:\n{elenco}")
+
+    def assertEndpointQueryBudget(self, client, method: str, url: str, budget: int, *, status_code=200, **kwargs):
+        with self.assertMaxQueries(budget) as ctx:
+            response = getattr(client, method.lower())(url, **kwargs)
+        self.assertEqual(response.status_code, status_code, getattr(response, "data", None))
+        response.query_count = len(ctx.captured_queries)
+        return response
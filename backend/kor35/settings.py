@@ -155,6 +155,7 @@ WEBPUSH_SETTINGS = {
 }
 
 MIDDLEWARE = [
+   'kor35.perf_metrics.PerfMetricsMiddleware',  # no-op se PERF_METRICS_ENABLED è falso
    'django.middleware.security.SecurityMiddleware',
    'django.contrib.sessions.middleware.SessionMiddleware',
    'corsheaders.middleware.CorsMiddleware',  # Django CORS Headers
@@ -301,6 +302,16 @@ EDGE_SYNC_STATE_FILE = env(
     "EDGE_SYNC_STATE_FILE",
     default=str(BASE_DIR / ".edge_sync_state.json"),
 )
+# Tombstone compattate solo se confermate da tutti i nodi noti e più vecchie di così.
+SYNC_TOMBSTONE_RETENTION_DAYS = env.int("SYNC_TOMBSTONE_RETENTION_DAYS", default=30)
+# Conferme di nodi non più visti da tanti giorni ignorate dalla compattazione (replica dismessa).
+SYNC_REPLICA_ACK_HORIZON_DAYS = env.int("SYNC_REPLICA_ACK_HORIZON_DAYS", default=90)
+# Blob media del sync non più collegati a file media (kor35.sync_media.pota_blob) eliminati dopo tanti giorni.
+SYNC_MEDIA_BLOB_RETENTION_DAYS = env.int("SYNC_MEDIA_BLOB_RETENTION_DAYS", default=7)
+
+# Strumentazione query/latenza per rotta (kor35.perf_metrics), esposta su /api/perf/metrics/.
+PERF_METRICS_ENABLED = env("PERF_METRICS_ENABLED", default="false").strip().lower() == "true"
+PERF_METRICS_SAMPLES = env.int("PERF_METRICS_SAMPLES", default=512)
 
 # OTA smartwatch (T-Watch): manifest + firmware bin serviti da frontend/nginx.
 WATCH_OTA_ENABLED = env("WATCH_OTA_ENABLED", default="true").strip().lower() == "true"
@@ -0,0 +1,129 @@
+"""
+Anti-entropia Master ↔ edge: alberi hash per modello sincronizzato.
+
+Ogni riga vale sha1(sync_id | updated_at | hash contenuto), dove il contenuto è il payload di
+``serialize_for_sync`` (FK come sync key, quindi confrontabile tra nodi con PK locali diverse).
+Le righe cadono nel bucket dato dai primi ``DIGEST_PREFISSO`` caratteri esadecimali del sync_id;
+l'hash del bucket copre i digest riga ordinati, la radice del modello copre i bucket.
+
+Il confronto scende radice → bucket → righe: a DB allineati la verifica scambia una radice per
+modello (pochi KB), la riparazione trasferisce e riapplica (LWW) solo le righe dei bucket
+divergenti. Fuori dall'albero: ``auth.user``, ``auth.group`` e il catalogo zodiacale, che
+restano al sync incrementale.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import uuid
+from typing import Any, Iterable
+
+from django.apps import apps
+from django.db import models
+from django.db.models import Q
+
+from kor35.sync_tombstone import serialize_tombstone_row, tombstone_table_ready
+from kor35.syncing import serialize_for_sync
+
+DIGEST_PREFISSO = 2  # 256 bucket per modello
+DIGEST_CHUNK = 500
+
+_BIT_UUID = 128
+
+
+def _sha1(*parti: str) -> str:
+    return hashlib.sha1("|".join(parti).encode("utf-8")).hexdigest()
+
+
+def bucket_di(sync_id) -> str:
+    return str(sync_id).replace("-", "")[:DIGEST_PREFISSO].lower()
+
+
+def campi_m2m(model: type[models.Model]) -> list[str]:
+    return [f.name for f in model._meta.many_to_many if not f.auto_created]
+
+
+def digest_riga(row: dict[str, Any], m2m: Iterable[str] = ()) -> str:
+    """Le liste M2M arrivano nell'ordine del DB, diverso tra nodi: si ordinano prima dell'hash."""
+    contenuto = {k: v for k, v in row.items() if k != "updated_at"}
+    for campo in m2m:
+        if isinstance(contenuto.get(campo), list):
+            contenuto[campo] = sorted(contenuto[campo], key=str)
+    raw = json.dumps(contenuto, sort_keys=True, default=str, separators=(",", ":"))
+    return _sha1(str(row.get("sync_id")), str(row.get("updated_at")), hashlib.sha1(raw.encode("utf-8")).hexdigest())
+
+
+def radice_da_bucket(bucket: dict[str, str]) -> str:
+    return _sha1(*(f"{b}:{h}" for b, h in sorted(bucket.items())))
+
+
+def _queryset_digest(model: type[models.Model]):
+    """FK e M2M caricati in blocco: ``serialize_for_sync`` non fa query per riga."""
+    fk = [f.name for f in model._meta.concrete_fields if isinstance(f, models.ForeignKey)]
+    return model.objects.select_related(*fk).prefetch_related(*campi_m2m(model)).order_by()
+
+
+def _filtro_bucket(buckets: Iterable[str]) -> Q:
+    """Intervalli di sync_id (range sull'indice unique) invece di LIKE sul cast a testo."""
+    filtro = Q(pk__in=[])
+    shift = _BIT_UUID - 4 * DIGEST_PREFISSO
+    for b in buckets:
+        try:
+            n = int(b, 16)
+        except (TypeError, ValueError):
+            continue
+        if len(b) != DIGEST_PREFISSO:
+            continue
+        intervallo = Q(sync_id__gte=uuid.UUID(int=n << shift))
+        fine = (n + 1) << shift
+        if fine < 1 << _BIT_UUID:
+            intervallo &= Q(sync_id__lt=uuid.UUID(int=fine))
+        filtro |= intervallo
+    return filtro
+
+
+def hash_bucket_modello(model: type[models.Model]) -> dict[str, str]:
+    """{bucket: hash} dei soli bucket non vuoti del modello."""
+    per_bucket: dict[str, list[str]] = {}
+    m2m = campi_m2m(model)
+    for obj in _queryset_digest(model).iterator(chunk_size=DIGEST_CHUNK):
+        per_bucket.setdefault(bucket_di(obj.sync_id), []).append(digest_riga(serialize_for_sync(obj), m2m))
+    return {b: _sha1(*sorted(righe)) for b, righe in sorted(per_bucket.items())}
+
+
+def righe_bucket(model: type[models.Model], buckets: Iterable[str]) -> list[dict[str, Any]]:
+    """Payload di sync completo delle righe che cadono nei bucket indicati."""
+    qs = _queryset_digest(model).filter(_filtro_bucket(buckets))
+    return [serialize_for_sync(obj) for obj in qs.iterator(chunk_size=DIGEST_CHUNK)]
+
+
+def tombstone_bucket(buckets_per_modello: dict[str, Iterable[str]]) -> list[dict[str, Any]]:
+    """Tombstone dei bucket divergenti: una riga cancellata da un lato non va resuscitata dall'altro."""
+    if not tombstone_table_ready() or not buckets_per_modello:
+        return []
+    SyncTombstone = apps.get_model("personaggi", "SyncTombstone")
+    filtro = Q(pk__in=[])
+    for model_key, buckets in buckets_per_modello.items():
+        filtro |= Q(model_label=model_key) & _filtro_bucket(buckets)
+    qs = SyncTombstone.objects.filter(filtro).order_by("deleted_at")
+    return [serialize_tombstone_row(row) for row in qs.iterator()]
+
+
+def bucket_divergenti(locali: dict[str, str], remoti: dict[str, str]) -> list[str]:
+    return sorted(b for b in set(locali) | set(remoti) if locali.get(b) != remoti.get(b))
+
+
+class AlberiDigest:
+    """Hash dei bucket calcolati una volta per modello e riusati tra le fasi del confronto."""
+
+    def __init__(self, registry: dict[str, type[models.Model]]):
+        self.registry = registry
+        self._bucket: dict[str, dict[str, str]] = {}
+
+    def bucket(self, model_key: str) -> dict[str, str]:
+        if model_key not in self._bucket:
+            self._bucket[model_key] = hash_bucket_modello(self.registry[model_key])
+        return self._bucket[model_key]
+
+    def radici(self) -> dict[str, str]:
+        return {key: radice_da_bucket(self.bucket(key)) for key in self.registry}
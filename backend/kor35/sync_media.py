@@ -0,0 +1,251 @@
+"""
+Media nel sync edge, indirizzati per contenuto.
+
+Le righe sincronizzate portano i nomi dei file (FileField/ImageField); accanto alle righe viaggia
+``media.manifest``: per ogni file referenziato nome, sha256 e dimensione. Ciascun lato scarica
+(o invia) solo i blob che non ha, sullo stesso canale HTTP EdgeToken del sync DB e prima di
+applicare le righe: niente scansioni dell'albero media, niente righe che puntano a file assenti.
+
+Store locale deduplicato in ``MEDIA_ROOT/.blobs/<ab>/<sha256>``, collegato ai percorsi media con
+hardlink (stesso contenuto, un solo inode; copia se il filesystem non li supporta). I trasferimenti
+interrotti riprendono dal ``.part`` (Range in download, Content-Range in upload). L'hash di un file
+si ricalcola solo se ne cambiano dimensione o mtime (indice nella cache Django). I blob non più
+collegati a nessun file media si eliminano con ``pota_blob`` (``manage.py pota_blob_media``).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import stat
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+
+logger = logging.getLogger(__name__)
+
+MEDIA_MANIFEST_KEY = "media.manifest"
+MEDIA_MANCANTI_KEY = "media.mancanti"
+BLOB_DIRNAME = ".blobs"
+BLOB_CHUNK = 1024 * 1024
+HASH_CACHE_PREFIX = "kor35:mediahash"
+HASH_CACHE_TTL_SECONDS = 30 * 24 * 3600
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class OffsetBlobErrato(Exception):
+    """Upload ripreso da un offset diverso da quanto già ricevuto nel ``.part``."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Offset atteso {offset}")
+        self.offset = offset
+
+
+def _media_root() -> Path:
+    return Path(settings.MEDIA_ROOT)
+
+
+def percorso_media(name: Any) -> Optional[Path]:
+    """Percorso sotto MEDIA_ROOT; None per nomi non sicuri o interni allo store blob."""
+    if not name or not isinstance(name, str):
+        return None
+    norm = os.path.normpath(name.replace("\\", "/"))
+    if os.path.isabs(norm) or norm in (".", "..") or norm.startswith("../"):
+        return None
+    if norm.split("/", 1)[0] == BLOB_DIRNAME:
+        return None
+    return _media_root() / norm
+
+
+def percorso_blob(sha256: Any) -> Optional[Path]:
+    if not isinstance(sha256, str) or not _SHA256_RE.match(sha256):
+        return None
+    return _media_root() / BLOB_DIRNAME / sha256[:2] / sha256
+
+
+def _percorso_parziale(sha256: str) -> Path:
+    blob = percorso_blob(sha256)
+    return blob.with_name(f"{blob.name}.part")
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(BLOB_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_media(name: str) -> Optional[tuple[str, int]]:
+    """(sha256, dimensione) del file media; None se assente."""
+    path = percorso_media(name)
+    if path is None:
+        return None
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    key = f"{HASH_CACHE_PREFIX}:{hashlib.sha1(name.encode('utf-8')).hexdigest()}:{st.st_size}:{st.st_mtime_ns}"
+    sha256 = cache.get(key)
+    if not sha256:
+        sha256 = _sha256_file(path)
+        cache.set(key, sha256, timeout=HASH_CACHE_TTL_SECONDS)
+    return sha256, st.st_size
+
+
+def _collega(sorgente: Path, destinazione: Path) -> None:
+    """Hardlink con fallback a copia; la destinazione è sostituita in modo atomico."""
+    destinazione.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destinazione.with_name(f".{destinazione.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.link(sorgente, tmp)
+    except OSError:
+        shutil.copyfile(sorgente, tmp)
+    os.replace(tmp, destinazione)
+
+
+def campi_file(model: type[models.Model]) -> list[str]:
+    return [f.name for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+
+
+def nomi_referenziati(registry: dict[str, type[models.Model]], records: dict[str, list]) -> set[str]:
+    nomi: set[str] = set()
+    for model_key, rows in records.items():
+        model = registry.get(model_key)
+        campi = campi_file(model) if model else []
+        if not campi:
+            continue
+        for row in rows or []:
+            for campo in campi:
+                valore = row.get(campo)
+                if valore and isinstance(valore, str):
+                    nomi.add(valore)
+    return nomi
+
+
+def costruisci_manifest(registry: dict[str, type[models.Model]], records: dict[str, list]) -> list[dict[str, Any]]:
+    """
+    Manifest dei file referenziati dalle righe in uscita, già presenti nello store blob.
+    I file assenti su questo nodo restano fuori: la riga viaggia comunque, come prima.
+    """
+    manifest = []
+    for name in sorted(nomi_referenziati(registry, records)):
+        info = hash_media(name)
+        if info is None:
+            continue
+        sha256, size = info
+        blob = percorso_blob(sha256)
+        try:
+            if not blob.exists():
+                _collega(percorso_media(name), blob)
+        except OSError as exc:
+            logger.warning("Sync media: blob %s per %s non archiviato (%s)", sha256, name, exc)
+            continue
+        manifest.append({"path": name, "sha256": sha256, "size": size})
+    return manifest
+
+
+def materializza(sha256: str, paths: Iterable[str]) -> None:
+    blob = percorso_blob(sha256)
+    for name in paths:
+        destinazione = percorso_media(name)
+        if destinazione is not None:
+            _collega(blob, destinazione)
+
+
+def voci_mancanti(manifest: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Voci del manifest non disponibili su questo nodo. Quelle il cui blob è già nello store
+    (stesso contenuto sotto un altro nome) sono materializzate subito, senza trasferimento.
+    """
+    mancanti = []
+    for voce in manifest or []:
+        sha256 = voce.get("sha256")
+        blob = percorso_blob(sha256)
+        if blob is None or percorso_media(voce.get("path")) is None:
+            continue
+        info = hash_media(voce["path"])
+        if info is not None and info[0] == sha256:
+            continue
+        if blob.exists():
+            materializza(sha256, [voce["path"]])
+            continue
+        mancanti.append(voce)
+    return mancanti
+
+
+def offset_parziale(sha256: str) -> int:
+    try:
+        return _percorso_parziale(sha256).stat().st_size
+    except OSError:
+        return 0
+
+
+def accoda_parziale(sha256: str, chunks: Iterable[bytes], offset: int = 0) -> int:
+    """Scrive nel ``.part`` a partire da ``offset`` (0 riparte da capo); ritorna la dimensione."""
+    parziale = _percorso_parziale(sha256)
+    parziale.parent.mkdir(parents=True, exist_ok=True)
+    if offset:
+        attuale = offset_parziale(sha256)
+        if offset != attuale:
+            raise OffsetBlobErrato(attuale)
+    with parziale.open("ab" if offset else "wb") as fh:
+        for chunk in chunks:
+            if chunk:
+                fh.write(chunk)
+    return parziale.stat().st_size
+
+
+def completa_blob(sha256: str) -> bool:
+    """Verifica il ``.part`` e lo promuove a blob; se l'hash non torna lo scarta."""
+    parziale = _percorso_parziale(sha256)
+    if not parziale.exists():
+        return percorso_blob(sha256).exists()
+    if _sha256_file(parziale) != sha256:
+        parziale.unlink(missing_ok=True)
+        return False
+    os.replace(parziale, percorso_blob(sha256))
+    return True
+
+
+def pota_blob(*, retention_days: Optional[int] = None, dry_run: bool = False) -> int:
+    """
+    Elimina dallo store i blob che nessun file media usa più (``st_nlink == 1``) e i ``.part``
+    abbandonati, fermi da almeno ``retention_days`` (default SYNC_MEDIA_BLOB_RETENTION_DAYS).
+    Ritorna quanti file (da) eliminare. Con la copia al posto degli hardlink ogni blob ha un solo
+    link: la potatura resta sicura (lo store si riforma al sync successivo) ma non deduplica più.
+    """
+    if retention_days is None:
+        retention_days = int(getattr(settings, "SYNC_MEDIA_BLOB_RETENTION_DAYS", 7))
+    soglia = time.time() - retention_days * 86400
+    radice = _media_root() / BLOB_DIRNAME
+    if not radice.is_dir():
+        return 0
+    eliminati = 0
+    for path in radice.glob("*/*"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if not stat.S_ISREG(st.st_mode) or max(st.st_mtime, st.st_ctime) >= soglia:
+            continue
+        if not path.name.endswith(".part") and st.st_nlink > 1:
+            continue
+        if not dry_run:
+            try:
+                path.unlink()
+            except OSError as exc:
+                logger.warning("Sync media: blob %s non eliminato (%s)", path.name, exc)
+                continue
+        eliminati += 1
+    return eliminati
@@ -2,6 +2,8 @@
 Tombstone di sincronizzazione: propaga le cancellazioni tra Master e mirror/edge.
 
 Conflitti: deleted_at del tombstone vs updated_at del record (Last-Write-Wins).
+Le cancellazioni locali accumulano le tombstone per transazione (un bulk upsert al commit);
+``compatta_tombstone`` elimina quelle già confermate da tutti i nodi noti (``SyncReplicaAck``).
 """
 
 from __future__ import annotations
@@ -10,10 +12,13 @@ import logging
 import uuid
 from contextlib import contextmanager
 from contextvars import ContextVar
+from datetime import timedelta
 from typing import Any, Iterator, Literal
 
 from django.apps import apps
-from django.db import IntegrityError, connection, models, transaction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, models, transaction
+from django.db.models import Min
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 
@@ -27,7 +32,11 @@ _skip_tombstone_on_delete: ContextVar[bool] = ContextVar("skip_tombstone_on_dele
 
 EXCLUDED_SYNC_LABELS = frozenset({"personaggi.segnozodiacale", "personaggi.synctombstone"})
 
+TOMBSTONE_BULK_BATCH = 1000
+_PENDENTI_ATTR = "_kor35_tombstone_pendenti"
+
 _tombstone_table_ready_cache: bool | None = None
+_ack_table_ready_cache: bool | None = None
 
 
 def tombstone_table_ready() -> bool:
@@ -47,6 +56,21 @@ def tombstone_table_ready() -> bool:
         return False
 
 
+def replica_ack_table_ready() -> bool:
+    """False finché non è applicata 0259 (``SyncReplicaAck``)."""
+    global _ack_table_ready_cache
+    if _ack_table_ready_cache is True:
+        return True
+    try:
+        SyncReplicaAck = apps.get_model("personaggi", "SyncReplicaAck")
+        ready = SyncReplicaAck._meta.db_table in connection.introspection.table_names()
+        if ready:
+            _ack_table_ready_cache = True
+        return ready
+    except Exception:
+        return False
+
+
 def get_sync_model_registry(
     app_labels: tuple[str, ...] = ("personaggi", "gestione_plot", "social", "pilotaggio"),
 ) -> dict[str, type[models.Model]]:
@@ -87,29 +111,93 @@ def tombstone_on_delete_suppressed() -> bool:
     return _skip_tombstone_on_delete.get()
 
 
+class _TombstonePendenti:
+    """Tombstone della transazione corrente, scritte dal callback on_commit ``scrivi``."""
+
+    def __init__(self):
+        self.voci: dict[tuple[str, uuid.UUID], tuple[type[models.Model], Any]] = {}
+        self.scrivi = lambda: scrivi_tombstone(self.voci)
+
+
+def _tombstone_pendenti(using: str) -> _TombstonePendenti | None:
+    """Buffer della transazione aperta su ``using``; None in autocommit."""
+    conn = connections[using]
+    if not conn.in_atomic_block:
+        return None
+    pendenti = getattr(conn, _PENDENTI_ATTR, None)
+    # Dopo commit o rollback il callback non è più in coda: serve un buffer nuovo.
+    if pendenti is not None and any(entry[1] is pendenti.scrivi for entry in conn.run_on_commit):
+        return pendenti
+    pendenti = _TombstonePendenti()
+    transaction.on_commit(pendenti.scrivi, using=using, robust=True)
+    setattr(conn, _PENDENTI_ATTR, pendenti)
+    return pendenti
+
+
+def scrivi_tombstone(voci: dict[tuple[str, uuid.UUID], tuple[type[models.Model], Any]]) -> int:
+    """
+    Upsert in blocco di ``{(label, sync_id): (model, deleted_at)}``. Salta le righe ancora
+    presenti (savepoint annullato, record ricreato) e le tombstone esistenti più recenti.
+    """
+    if not voci or not tombstone_table_ready():
+        return 0
+    SyncTombstone = apps.get_model("personaggi", "SyncTombstone")
+    per_label: dict[str, dict[uuid.UUID, tuple[type[models.Model], Any]]] = {}
+    for (label, sync_id), voce in voci.items():
+        per_label.setdefault(label, {})[sync_id] = voce
+    righe = []
+    for label, per_id in per_label.items():
+        model = next(iter(per_id.values()))[0]
+        vivi = set(model._base_manager.filter(sync_id__in=list(per_id)).order_by().values_list("sync_id", flat=True))
+        esistenti = dict(
+            SyncTombstone.objects.filter(model_label=label, sync_id__in=list(per_id)).values_list(
+                "sync_id", "deleted_at"
+            )
+        )
+        for sync_id, (_model, when) in per_id.items():
+            if sync_id in vivi or (sync_id in esistenti and esistenti[sync_id] >= when):
+                continue
+            righe.append(SyncTombstone(model_label=label, sync_id=sync_id, deleted_at=when))
+    SyncTombstone.objects.bulk_create(
+        righe,
+        batch_size=TOMBSTONE_BULK_BATCH,
+        update_conflicts=True,
+        unique_fields=["model_label", "sync_id"],
+        update_fields=["deleted_at"],
+    )
+    return len(righe)
+
+
 def record_tombstone_for_instance(instance: models.Model, *, deleted_at=None) -> None:
-    """Registra (o aggiorna) tombstone alla cancellazione locale."""
+    """
+    Registra (o aggiorna) tombstone alla cancellazione locale. In transazione (sempre, per le
+    delete a cascata) si accumula e va su DB con un solo bulk upsert al commit.
+    """
     if not tombstone_table_ready() or tombstone_on_delete_suppressed():
         return
     model_label = instance_sync_label(instance)
     if not model_label:
         return
-    SyncTombstone = apps.get_model("personaggi", "SyncTombstone")
+    key = (model_label, uuid.UUID(str(instance.sync_id)))
     when = deleted_at or timezone.now()
-    sync_id = instance.sync_id
-    existing = SyncTombstone.objects.filter(model_label=model_label, sync_id=sync_id).first()
-    if existing and existing.deleted_at >= when:
+    pendenti = _tombstone_pendenti(instance._state.db or DEFAULT_DB_ALIAS)
+    if pendenti is None:
+        scrivi_tombstone({key: (instance.__class__, when)})
         return
-    SyncTombstone.objects.update_or_create(
-        model_label=model_label,
-        sync_id=sync_id,
-        defaults={"deleted_at": when},
-    )
+    precedente = pendenti.voci.get(key)
+    if precedente is None or precedente[1] < when:
+        pendenti.voci[key] = (instance.__class__, when)
 
 
 def clear_tombstone(model_label: str, sync_id) -> None:
     if not tombstone_table_ready():
         return
+    pendenti = getattr(connection, _PENDENTI_ATTR, None)
+    if pendenti is not None:
+        try:
+            pendenti.voci.pop((model_label, uuid.UUID(str(sync_id))), None)
+        except (TypeError, ValueError):
+            pass
     SyncTombstone = apps.get_model("personaggi", "SyncTombstone")
     SyncTombstone.objects.filter(model_label=model_label, sync_id=sync_id).delete()
 
@@ -235,3 +323,41 @@ def apply_one_tombstone_row(
         )
         return "deferred"
     return "deleted"
+
+
+def registra_conferma_nodo(nodo: str, confermato_fino_a) -> None:
+    """Il nodo ``nodo`` ha ricevuto le nostre tombstone fino a ``confermato_fino_a``."""
+    if not nodo or not confermato_fino_a or not replica_ack_table_ready():
+        return
+    SyncReplicaAck = apps.get_model("personaggi", "SyncReplicaAck")
+    SyncReplicaAck.objects.update_or_create(nodo=nodo[:120], defaults={"confermato_fino_a": confermato_fino_a})
+
+
+def compatta_tombstone(*, retention_days: int | None = None, dry_run: bool = False) -> int:
+    """
+    Elimina le tombstone confermate da tutti i nodi noti e più vecchie della retention.
+    Senza alcun nodo noto non elimina nulla: una replica mai vista potrebbe ancora servirle.
+    Nodi silenti da più di ``SYNC_REPLICA_ACK_HORIZON_DAYS`` non bloccano la compattazione.
+    """
+    if not tombstone_table_ready() or not replica_ack_table_ready():
+        return 0
+    SyncTombstone = apps.get_model("personaggi", "SyncTombstone")
+    SyncReplicaAck = apps.get_model("personaggi", "SyncReplicaAck")
+    orizzonte = timezone.now() - timedelta(days=getattr(settings, "SYNC_REPLICA_ACK_HORIZON_DAYS", 90))
+    confermato = SyncReplicaAck.objects.filter(ultimo_contatto__gte=orizzonte).aggregate(
+        minimo=Min("confermato_fino_a")
+    )["minimo"]
+    if confermato is None:
+        return 0
+    if retention_days is None:
+        retention_days = getattr(settings, "SYNC_TOMBSTONE_RETENTION_DAYS", 30)
+    limite = min(confermato, timezone.now() - timedelta(days=retention_days))
+    qs = SyncTombstone.objects.filter(deleted_at__lt=limite)
+    if dry_run:
+        return qs.count()
+    eliminate = 0
+    while True:
+        ids = list(qs.values_list("pk", flat=True)[:TOMBSTONE_BULK_BATCH])
+        if not ids:
+            return eliminate
+        eliminate += SyncTombstone.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from kor35 import config_cache
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CONFIG_CACHE_CHECK_SECONDS=0)
+class ConfigCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.clear_local()
+        self.calls = 0
+
+    def tearDown(self):
+        config_cache.clear_local()
+
+    def _loader(self):
+        self.calls += 1
+        return {"versione": self.calls}
+
+    def test_second_read_is_served_from_memory(self):
+        first = config_cache.get_cached("test", 1, self._loader)
+        second = config_cache.get_cached("test", 1, self._loader)
+        self.assertIs(first, second)
+        self.assertEqual(self.calls, 1)
+
+    def test_bump_revision_forces_reload(self):
+        config_cache.get_cached("test", 1, self._loader)
+        config_cache.bump_revision("test", 1)
+        value = config_cache.get_cached("test", 1, self._loader)
+        self.assertEqual(value, {"versione": 2})
+
+    def test_revision_changed_by_other_worker_forces_reload(self):
+        config_cache.get_cached("test", 1, self._loader)
+        cache.set(config_cache.revision_key("test", 1), "altro-worker", timeout=None)
+        value = config_cache.get_cached("test", 1, self._loader)
+        self.assertEqual(value, {"versione": 2})
+
+    def test_keys_are_isolated(self):
+        config_cache.get_cached("test", 1, self._loader)
+        config_cache.get_cached("test", 2, self._loader)
+        config_cache.bump_revision("test", 2)
+        config_cache.get_cached("test", 1, self._loader)
+        self.assertEqual(self.calls, 2)
+
+    def test_redis_down_uses_local_copy_then_db(self):
+        config_cache.get_cached("test", 1, self._loader)
+        with mock.patch.object(config_cache.cache, "get", side_effect=ConnectionError("down")):
+            self.assertEqual(config_cache.get_cached("test", 1, self._loader), {"versione": 1})
+            config_cache.clear_local()
+            self.assertEqual(config_cache.get_cached("test", 2, self._loader), {"versione": 2})
+        self.assertEqual(self.calls, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CONFIG_CACHE_CHECK_SECONDS=60)
+class ConfigCacheTransactionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.clear_local()
+        self.calls = 0
+
+    def tearDown(self):
+        config_cache.clear_local()
+
+    def _loader(self):
+        self.calls += 1
+        return {"versione": self.calls}
+
+    def test_valore_letto_in_transazione_memorizzato_al_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            config_cache.get_cached("test_tx", 1, self._loader)
+            config_cache.get_cached("test_tx", 1, self._loader)
+        self.assertEqual(self.calls, 2)
+        config_cache.get_cached("test_tx", 1, self._loader)
+        self.assertEqual(self.calls, 2)
+
+    def test_bump_in_transazione_non_memorizza_valore_vecchio(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            config_cache.get_cached("test_tx", 1, self._loader)
+            config_cache.bump_revision("test_tx", 1)
+        self.assertEqual(config_cache.get_cached("test_tx", 1, self._loader), {"versione": 2})
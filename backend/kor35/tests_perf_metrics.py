@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from kor35 import perf_metrics
+from kor35.edge_sync import EdgeSyncView
+from kor35.perf_testing import QueryBudgetMixin
+from personaggi.models import Campagna, Manifesto, Personaggio, QrCode
+
+STAFF_PERSONAGGI_URL = "/api/personaggi/api/staff/personaggi/"
+
+# Budget query per endpoint caldi con le fixture di questo modulo (valori misurati +
+# un piccolo margine): abbassarli quando si ottimizza una vista, mai alzarli senza motivo.
+BUDGET_STAFF_PERSONAGGI_LISTA = 26
+BUDGET_PERSONAGGIO_DETTAGLIO = 90
+BUDGET_QR_DETTAGLIO = 26
+# Sync edge e digest: una query per modello del registro più un fisso (utenti, gruppi,
+# tombstone, ack per il sync; prefetch M2M dei modelli non vuoti per il digest).
+EDGE_SYNC_URL = "/api/sync/edge/"
+EDGE_SYNC_DIGEST_URL = "/api/sync/edge/digest/"
+BUDGET_SYNC_EDGE_FISSO = 30
+BUDGET_DIGEST_FISSO = 25
+
+
+class PerfMetricsTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        perf_metrics.reset()
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            username="perf_staff", password="x", is_staff=True, is_superuser=True
+        )
+        self.campagna = Campagna.objects.create(slug="perf-camp", nome="Perf", attiva=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+
+    def tearDown(self):
+        perf_metrics.reset()
+
+    def _crea_personaggi(self, n, offset=0):
+        for i in range(offset, offset + n):
+            Personaggio.objects.create(nome=f"Perf PG {i}", campagna=self.campagna)
+
+    @override_settings(PERF_METRICS_ENABLED=True)
+    def test_middleware_registra_query_e_latenza_per_rotta(self):
+        self._crea_personaggi(2)
+        self.client.get(STAFF_PERSONAGGI_URL, {"campagna": self.campagna.slug})
+        self.client.get(STAFF_PERSONAGGI_URL, {"campagna": self.campagna.slug})
+        snap = perf_metrics.snapshot()
+        chiavi = [k for k in snap if k.startswith("GET ") and "staff/personaggi" in k]
+        self.assertEqual(len(chiavi), 1, snap.keys())
+        dati = snap[chiavi[0]]
+        self.assertEqual(dati["campioni"], 2)
+        self.assertGreater(dati["queries"]["max"], 0)
+        self.assertEqual(sum(dati["istogramma_latenza"].values()), 2)
+
+    def test_disabilitato_non_registra(self):
+        self.client.get(STAFF_PERSONAGGI_URL, {"campagna": self.campagna.slug})
+        self.assertEqual(perf_metrics.snapshot(), {})
+
+    def test_endpoint_metriche_solo_staff(self):
+        utente = get_user_model().objects.create_user(username="perf_user", password="x")
+        client = APIClient()
+        client.force_authenticate(user=utente)
+        self.assertEqual(client.get("/api/perf/metrics/").status_code, 403)
+        resp = self.client.get("/api/perf/metrics/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("routes", resp.data)
+
+    def test_budget_lista_staff_personaggi(self):
+        self._crea_personaggi(3)
+        params = {"campagna": self.campagna.slug}
+        self.client.get(STAFF_PERSONAGGI_URL, params)  # riscaldamento (impostazioni CMS utente)
+        resp = self.assertEndpointQueryBudget(
+            self.client, "get", STAFF_PERSONAGGI_URL, BUDGET_STAFF_PERSONAGGI_LISTA, data=params
+        )
+        self.assertEqual(resp.data["count"], 3)
+
+    def test_budget_dettaglio_personaggio(self):
+        proprietario = get_user_model().objects.create_user(username="perf_owner", password="x")
+        pg = Personaggio.objects.create(
+            nome="Perf Dettaglio", proprietario=proprietario, campagna=self.campagna
+        )
+        client = APIClient()
+        client.force_authenticate(user=proprietario)
+        url = f"/api/personaggi/api/personaggi/{pg.pk}/"
+        params = {"campagna": self.campagna.slug}
+        client.get(url, params)
+        self.assertEndpointQueryBudget(
+            client, "get", url, BUDGET_PERSONAGGIO_DETTAGLIO, data=params
+        )
+
+    def test_budget_scansione_qr_manifesto(self):
+        proprietario = get_user_model().objects.create_user(username="perf_qr", password="x")
+        pg = Personaggio.objects.create(nome="Perf QR", proprietario=proprietario, campagna=self.campagna)
+        qr = QrCode.objects.create(vista=Manifesto.objects.create(nome="Perf", testo="", requisiti_lettura=[]))
+        client = APIClient()
+        client.force_authenticate(user=proprietario)
+        url = f"/api/personaggi/api/qrcode/{qr.id}/"
+        params = {"personaggio_id": pg.pk}
+        client.get(url, params)
+        resp = self.assertEndpointQueryBudget(client, "get", url, BUDGET_QR_DETTAGLIO, data=params)
+        self.assertEqual(resp.data["tipo_modello"], "manifesto")
+
+
+@override_settings(EDGE_SYNC_TOKEN="perf-test")
+class SyncQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Gli endpoint di sync scalano col numero di modelli sincronizzati, non con le righe."""
+
+    auth = {"HTTP_AUTHORIZATION": "EdgeToken perf-test"}
+
+    def setUp(self):
+        self.modelli = len(EdgeSyncView()._sync_model_registry())
+
+    def _post(self, url, data, budget):
+        return self.assertEndpointQueryBudget(
+            self.client, "post", url, budget, data=data, content_type="application/json", **self.auth
+        )
+
+    def test_budget_sync_incrementale_senza_modifiche(self):
+        dati = {"since": timezone.now().isoformat(), "records": {}}
+        self._post(EDGE_SYNC_URL, dati, self.modelli + BUDGET_SYNC_EDGE_FISSO)
+
+    def test_budget_digest_radici(self):
+        self._post(EDGE_SYNC_DIGEST_URL, {"fase": "radici"}, self.modelli + BUDGET_DIGEST_FISSO)
@@ -0,0 +1,101 @@
+import uuid
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from gestione_plot.models import Evento
+from kor35.sync_digest import (
+    AlberiDigest,
+    bucket_di,
+    bucket_divergenti,
+    campi_m2m,
+    digest_riga,
+    hash_bucket_modello,
+    righe_bucket,
+)
+from kor35.syncing import serialize_for_sync
+from personaggi.models import Personaggio
+from pilotaggio.models import SottosistemaNave
+
+LABEL = "pilotaggio.sottosistemanave"
+
+
+def _sync_id(prefisso):
+    return uuid.UUID(prefisso + uuid.uuid4().hex[len(prefisso):])
+
+
+class SyncDigestTests(TestCase):
+    def setUp(self):
+        SottosistemaNave.objects.filter(codice__in=["7", "8", "9"]).delete()
+        self.a = SottosistemaNave.objects.create(codice="7", nome="Scudi", sync_id=_sync_id("00"))
+        self.b = SottosistemaNave.objects.create(codice="8", nome="Motori", sync_id=_sync_id("ff"))
+        self.c = SottosistemaNave.objects.create(codice="9", nome="Sensori", sync_id=_sync_id("7a"))
+
+    def test_modifica_senza_bump_cade_in_un_solo_bucket(self):
+        prima = hash_bucket_modello(SottosistemaNave)
+        self.assertEqual(prima, hash_bucket_modello(SottosistemaNave))
+
+        # Deriva "silenziosa": update() senza updated_at, invisibile al sync incrementale.
+        SottosistemaNave.objects.filter(pk=self.c.pk).update(nome="Sensori (edge)")
+        self.assertEqual(bucket_divergenti(prima, hash_bucket_modello(SottosistemaNave)), ["7a"])
+
+    def test_righe_bucket_ai_bordi_dello_spazio_uuid(self):
+        # Il DB di test ha sottosistemi di seed con sync_id casuali: si guardano solo i nostri.
+        codici = lambda rows: sorted(r["codice"] for r in rows if r["codice"] in {"7", "8", "9"})
+        self.assertEqual(codici(righe_bucket(SottosistemaNave, ["00"])), ["7"])
+        self.assertEqual(codici(righe_bucket(SottosistemaNave, ["ff", "7a"])), ["8", "9"])
+        self.assertEqual(righe_bucket(SottosistemaNave, ["zz", ""]), [])
+        self.assertEqual(bucket_di(self.b.sync_id), "ff")
+
+    def test_digest_indipendente_dall_ordine_m2m(self):
+        ora = timezone.now()
+        evento = Evento.objects.create(titolo="Digest M2M", data_inizio=ora, data_fine=ora)
+        evento.partecipanti.add(
+            Personaggio.objects.create(nome="Digest A"), Personaggio.objects.create(nome="Digest B")
+        )
+        riga = serialize_for_sync(evento)
+        self.assertEqual(len(riga["partecipanti"]), 2)
+        altro_nodo = {**riga, "partecipanti": list(reversed(riga["partecipanti"]))}
+        m2m = campi_m2m(Evento)
+        self.assertIn("partecipanti", m2m)
+        self.assertEqual(digest_riga(riga, m2m), digest_riga(altro_nodo, m2m))
+
+
+@override_settings(EDGE_SYNC_TOKEN="digest-test")
+class EdgeSyncDigestViewTests(TestCase):
+    url = "/api/sync/edge/digest/"
+    auth = {"HTTP_AUTHORIZATION": "EdgeToken digest-test"}
+
+    def setUp(self):
+        SottosistemaNave.objects.filter(codice__in=["5", "6"]).delete()
+        self.locale = SottosistemaNave.objects.create(codice="5", nome="Scudi", sync_id=_sync_id("3c"))
+
+    def _post(self, data):
+        return self.client.post(self.url, data, content_type="application/json", **self.auth)
+
+    def test_fasi_radici_bucket_righe_riparano_solo_il_divergente(self):
+        self.assertEqual(self.client.post(self.url, {}, content_type="application/json").status_code, 403)
+
+        alberi = AlberiDigest({LABEL: SottosistemaNave})
+        radici = self._post({"fase": "radici"}).json()["radici"]
+        self.assertEqual(radici[LABEL], alberi.radici()[LABEL])
+
+        # Lato edge: la stessa riga rinominata più di recente e una riga che il Master non ha.
+        riga_edge = serialize_for_sync(self.locale)
+        riga_edge["nome"] = "Scudi (edge)"
+        riga_edge["updated_at"] = (timezone.now() + timedelta(minutes=1)).isoformat()
+        nuova = {**riga_edge, "sync_id": str(_sync_id("3c")), "codice": "6", "nome": "Deflettori"}
+
+        bucket = self._post({"fase": "bucket", "modelli": [LABEL, "nope.modello"]}).json()["bucket"]
+        self.assertEqual(list(bucket), [LABEL])
+        self.assertIn("3c", bucket[LABEL])
+
+        response = self._post({"fase": "righe", "bucket": {LABEL: ["3c"]}, "records": {LABEL: [riga_edge, nuova]}})
+        self.assertEqual(response.status_code, 200)
+        righe = response.json()["records"][LABEL]
+        self.assertEqual(sorted(r["nome"] for r in righe if r["codice"] in {"5", "6"}), ["Deflettori", "Scudi (edge)"])
+        self.locale.refresh_from_db()
+        self.assertEqual(self.locale.nome, "Scudi (edge)")
+
+        self.assertEqual(self._post({"fase": "boh"}).status_code, 400)
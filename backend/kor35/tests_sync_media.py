@@ -0,0 +1,125 @@
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from kor35.sync_media import (
+    MEDIA_MANCANTI_KEY,
+    MEDIA_MANIFEST_KEY,
+    accoda_parziale,
+    costruisci_manifest,
+    percorso_blob,
+    percorso_media,
+    pota_blob,
+    voci_mancanti,
+)
+from social.models import SocialPost
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+CONTENUTO = b"ritratto" * 1000
+SHA = hashlib.sha256(CONTENUTO).hexdigest()
+
+
+class _MediaTempMixin:
+    def setUp(self):
+        super().setUp()
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=str(self.media_root), CACHES=LOCMEM_CACHES)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+    def _scrivi(self, name, data=CONTENUTO):
+        path = self.media_root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return path
+
+
+class SyncMediaManifestTests(_MediaTempMixin, TestCase):
+    def test_manifest_deduplica_e_materializza_dallo_store(self):
+        self._scrivi("social/a.jpg")
+        self._scrivi("social/b.jpg")
+        records = {
+            "social.socialpost": [
+                {"immagine": "social/a.jpg", "video": None},
+                {"immagine": "social/b.jpg", "video": "social/assente.mp4"},
+            ]
+        }
+        manifest = costruisci_manifest({"social.socialpost": SocialPost}, records)
+        self.assertEqual([v["path"] for v in manifest], ["social/a.jpg", "social/b.jpg"])
+        self.assertEqual({v["sha256"] for v in manifest}, {SHA})
+        self.assertEqual(percorso_blob(SHA).read_bytes(), CONTENUTO)
+
+        # Stesso contenuto sotto un nome nuovo: nessun trasferimento, collegato dallo store.
+        nuova = [{"path": "social/c.jpg", "sha256": SHA, "size": len(CONTENUTO)}]
+        self.assertEqual(voci_mancanti(manifest + nuova), [])
+        self.assertEqual((self.media_root / "social/c.jpg").read_bytes(), CONTENUTO)
+
+        altro = {"path": "social/d.jpg", "sha256": "0" * 64, "size": 1}
+        self.assertEqual(voci_mancanti([altro, {"path": "../fuori", "sha256": SHA}]), [altro])
+        self.assertIsNone(percorso_media(".blobs/aa/x"))
+
+    def test_potatura_blob_senza_collegamenti(self):
+        registry = {"social.socialpost": SocialPost}
+        self._scrivi("social/a.jpg")
+        orfano = self._scrivi("social/b.jpg", b"rimosso")
+        costruisci_manifest(registry, {"social.socialpost": [{"immagine": "social/a.jpg"}, {"immagine": "social/b.jpg"}]})
+        orfano.unlink()
+        sha_orfano = hashlib.sha256(b"rimosso").hexdigest()
+        accoda_parziale("1" * 64, [b"interrotto"])
+
+        self.assertEqual(pota_blob(retention_days=7), 0)
+        self.assertEqual(pota_blob(retention_days=0, dry_run=True), 2)
+        self.assertTrue(percorso_blob(sha_orfano).exists())
+        self.assertEqual(pota_blob(retention_days=0), 2)
+        self.assertFalse(percorso_blob(sha_orfano).exists())
+        self.assertEqual(percorso_blob(SHA).read_bytes(), CONTENUTO)
+        self.assertEqual((self.media_root / "social/a.jpg").read_bytes(), CONTENUTO)
+
+
+@override_settings(EDGE_SYNC_TOKEN="media-test")
+class EdgeSyncBlobViewTests(_MediaTempMixin, TestCase):
+    auth = {"HTTP_AUTHORIZATION": "EdgeToken media-test"}
+
+    def _url(self, sha=SHA):
+        return f"/api/sync/edge/media/{sha}/"
+
+    def _put(self, data, content_range=None, path="social/up.jpg"):
+        extra = {"HTTP_CONTENT_RANGE": content_range} if content_range else {}
+        return self.client.put(
+            f"{self._url()}?path={path}", data, content_type="application/octet-stream", **self.auth, **extra
+        )
+
+    def test_upload_a_pezzi_ripreso_e_download_con_range(self):
+        totale = len(CONTENUTO)
+        self.assertEqual(self.client.head(self._url(), **self.auth)["X-Blob-Offset"], "0")
+        self.assertEqual(self._put(CONTENUTO[:3000], f"bytes 0-2999/{totale}").status_code, 202)
+
+        # Ripresa da un offset sbagliato: il Master indica da dove continuare.
+        response = self._put(CONTENUTO[5000:], f"bytes 5000-{totale - 1}/{totale}")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.head(self._url(), **self.auth)["X-Blob-Offset"], response["X-Blob-Offset"])
+        self.assertEqual(self._put(CONTENUTO[3000:], f"bytes 3000-{totale - 1}/{totale}").status_code, 201)
+        self.assertEqual((self.media_root / "social/up.jpg").read_bytes(), CONTENUTO)
+
+        response = self.client.get(self._url(), HTTP_RANGE="bytes=7000-", **self.auth)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), CONTENUTO[7000:])
+
+        manifest = [{"path": "social/up2.jpg", "sha256": SHA, "size": totale}]
+        response = self.client.post(
+            "/api/sync/edge/media/", {MEDIA_MANIFEST_KEY: manifest}, content_type="application/json", **self.auth
+        )
+        self.assertEqual(response.json()[MEDIA_MANCANTI_KEY], [])
+        self.assertTrue((self.media_root / "social/up2.jpg").exists())
+
+    def test_upload_con_hash_errato_scartato(self):
+        self.assertEqual(self._put(b"altro contenuto").status_code, 400)
+        self.assertFalse(percorso_blob(SHA).exists())
+        self.assertEqual(self.client.get(self._url(), **self.auth).status_code, 404)
+        self.assertEqual(self.client.get(self._url()).status_code, 403)
@@ -20,7 +20,7 @@ from rest_framework.authtoken.views import obtain_auth_token
 from django.conf import settings
 from django.conf.urls.static import static
 from personaggi import views as personaggi_views
-from kor35.edge_sync import EdgeSyncView
+from kor35.edge_sync import EdgeSyncBlobView, EdgeSyncDigestView, EdgeSyncMediaView, EdgeSyncView
 
 from django.views.decorators.csrf import csrf_exempt
 from django.http import HttpResponse
@@ -60,6 +60,7 @@ def healthz(_request):
 urlpatterns = [
     path("api/healthz/", healthz, name="healthz"),
     path("api/version/", kor35_views.version, name="version"),
+    path("api/perf/metrics/", kor35_views.perf_metrics, name="perf_metrics"),
     # --- UTILITIES & ADMIN ---
     path('admin/doc/', include('django.contrib.admindocs.urls')),
     re_path(r'^admin/', admin.site.urls),
@@ -83,6 +84,9 @@ urlpatterns = [
         path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
         path('icon-widget-api/', include('icon_widget.urls')),
         path('sync/edge/', EdgeSyncView.as_view(), name='edge_sync'),
+        path('sync/edge/digest/', EdgeSyncDigestView.as_view(), name='edge_sync_digest'),
+        path('sync/edge/media/', EdgeSyncMediaView.as_view(), name='edge_sync_media'),
+        path('sync/edge/media/<str:sha256>/', EdgeSyncBlobView.as_view(), name='edge_sync_blob'),
     ])),
 
     # DISABILITATO o DA SPOSTARE, per lasciare la root a React
@@ -1,7 +1,10 @@
+import os
+
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 
+from . import perf_metrics as perf_metrics_module
 from .build_info import get_build_info
 
 
@@ -14,3 +17,21 @@ def version(_request):
     """
     return Response({"backend": get_build_info()})
 
+
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAdminUser])
+def perf_metrics(request):
+    """
+    Istogramma query/latenza per rotta del worker che risponde (kor35.perf_metrics).
+    DELETE azzera i campioni.
+    """
+    if request.method == "DELETE":
+        perf_metrics_module.reset()
+        return Response(status=204)
+    return Response(
+        {
+            "enabled": perf_metrics_module.metrics_enabled(),
+            "pid": os.getpid(),
+            "routes": perf_metrics_module.snapshot(),
+        }
+    )
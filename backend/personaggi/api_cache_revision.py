@@ -1,7 +1,7 @@
 """
 Revisione temporale (max updated_at) per cache condizionale lato client.
 
-Usata da GET /api/personaggi/api/cache-revision/ per evitare di riscaricare
+Usata da GET /api/personaggi/api/cache-revision/ (views_async) per evitare di riscaricare
 payload pesanti quando i dati sul server non sono cambiati.
 """
 
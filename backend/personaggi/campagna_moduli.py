@@ -8,13 +8,24 @@ Pattern allineato a ConfigurazioneCarteCollezionabili.accesso_modo.
 
 Le chiavi assenti in Campagna.moduli_accesso usano i default del registry
 (tranne «carte», che in assenza di override legge la config carte legacy).
+
+Le parti che richiedono query (modo carte dalla config legacy, utenti tester della
+campagna) stanno in una ``MatriceModuliCampagna`` nella cache di processo
+(kor35.config_cache), invalidata dai segnali su ConfigurazioneCarteCollezionabili e
+CampagnaUtente: ogni gate è un lookup in memoria. ``Campagna.moduli_accesso`` resta fuori
+dalla matrice e si legge dall'istanza passata al gate.
 """
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Any
 
 from django.core.exceptions import ValidationError
 
+from kor35.config_cache import bump_revision, get_cached
+
+MODULI_ACCESSO_CACHE_NAMESPACE = "campagna_moduli"
+
 MODULO_ACCESSO_OFF = "OFF"
 MODULO_ACCESSO_TEST = "TEST"
 MODULO_ACCESSO_OPEN = "OPEN"
@@ -140,21 +151,61 @@ def has_explicit_modulo(campagna, key: str) -> bool:
     return val in MODULO_ACCESSO_VALIDI
 
 
-def _carte_accesso_from_config(campagna) -> str:
-    """Legge solo ConfigurazioneCarteCollezionabili (senza moduli_accesso)."""
+@dataclass(frozen=True)
+class MatriceModuliCampagna:
+    """Dati di accesso moduli di una campagna che richiedono query (sola lettura)."""
+
+    campagna_id: Any
+    carte_config_modo: str
+    tester_user_ids: frozenset
+
+
+def _build_matrice(campagna_id) -> MatriceModuliCampagna:
     from personaggi.carte_collezionabili_models import (
         CARTE_ACCESSO_OFF,
         CARTE_ACCESSO_OPEN,
         ConfigurazioneCarteCollezionabili,
     )
+    from personaggi.models import (
+        CAMPAGNA_ROLE_HEAD_MASTER,
+        CAMPAGNA_ROLE_MASTER,
+        CAMPAGNA_ROLE_STAFFER,
+        CampagnaUtente,
+    )
+
+    cfg = (
+        ConfigurazioneCarteCollezionabili.objects.filter(campagna_id=campagna_id)
+        .values("accesso_modo", "abilitata")
+        .first()
+    )
+    carte = CARTE_ACCESSO_OFF
+    if cfg:
+        carte = cfg["accesso_modo"] or CARTE_ACCESSO_OFF
+        if carte == CARTE_ACCESSO_OFF and cfg["abilitata"]:
+            carte = CARTE_ACCESSO_OPEN
+    testers = frozenset(
+        CampagnaUtente.objects.filter(
+            campagna_id=campagna_id,
+            attivo=True,
+            ruolo__in=(CAMPAGNA_ROLE_STAFFER, CAMPAGNA_ROLE_MASTER, CAMPAGNA_ROLE_HEAD_MASTER),
+        ).values_list("user_id", flat=True)
+    )
+    return MatriceModuliCampagna(campagna_id=campagna_id, carte_config_modo=carte, tester_user_ids=testers)
+
+
+def matrice_moduli_campagna(campagna) -> MatriceModuliCampagna:
+    return get_cached(MODULI_ACCESSO_CACHE_NAMESPACE, campagna.pk, lambda: _build_matrice(campagna.pk))
 
-    cfg = ConfigurazioneCarteCollezionabili.objects.filter(campagna=campagna).first()
-    if not cfg:
-        return CARTE_ACCESSO_OFF
-    modo = getattr(cfg, "accesso_modo", None) or CARTE_ACCESSO_OFF
-    if modo == CARTE_ACCESSO_OFF and getattr(cfg, "abilitata", False):
-        return CARTE_ACCESSO_OPEN
-    return modo
+
+def invalida_matrice_moduli(campagna_id) -> None:
+    """Da chiamare quando cambiano config carte o membership staff della campagna."""
+    if campagna_id:
+        bump_revision(MODULI_ACCESSO_CACHE_NAMESPACE, campagna_id)
+
+
+def _carte_accesso_from_config(campagna) -> str:
+    """Legge solo ConfigurazioneCarteCollezionabili (senza moduli_accesso)."""
+    return matrice_moduli_campagna(campagna).carte_config_modo
 
 
 def get_modulo_accesso(campagna, key: str) -> str:
@@ -254,19 +305,7 @@ def user_is_modulo_tester(user, campagna) -> bool:
         return True
     if not campagna:
         return False
-    from personaggi.models import (
-        CAMPAGNA_ROLE_HEAD_MASTER,
-        CAMPAGNA_ROLE_MASTER,
-        CAMPAGNA_ROLE_STAFFER,
-        CampagnaUtente,
-    )
-
-    ruolo = (
-        CampagnaUtente.objects.filter(campagna=campagna, user=user, attivo=True)
-        .values_list("ruolo", flat=True)
-        .first()
-    )
-    return ruolo in (CAMPAGNA_ROLE_STAFFER, CAMPAGNA_ROLE_MASTER, CAMPAGNA_ROLE_HEAD_MASTER)
+    return user.pk in matrice_moduli_campagna(campagna).tester_user_ids
 
 
 def is_png_non_giocante(personaggio) -> bool:
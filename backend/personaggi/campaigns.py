@@ -1,6 +1,15 @@
 from django.db import transaction
 
-from personaggi.models import CAMPAGNA_ROLE_PLAYER, Campagna, CampagnaUtente
+from kor35.config_cache import get_cached
+from personaggi.models import (
+    CAMPAGNA_ROLE_PLAYER,
+    FEATURE_MODE_SHARED,
+    Campagna,
+    CampagnaFeaturePolicy,
+    CampagnaUtente,
+)
+
+FEATURE_POLICY_CACHE_NAMESPACE = "campagna_feature_policy"
 
 
 def get_or_create_base_campaign():
@@ -38,3 +47,26 @@ def ensure_user_in_base_campaign(user):
             membership.attivo = True
             membership.save(update_fields=["attivo"])
         return membership
+
+
+def feature_modes_for_campaign(campagna):
+    """
+    Mappa feature_key → mode delle policy della campagna, dalla cache di processo
+    (invalidata dai salvataggi di CampagnaFeaturePolicy, vedi personaggi.signals).
+    """
+    if not campagna:
+        return {}
+
+    def _load():
+        return dict(
+            CampagnaFeaturePolicy.objects.filter(campagna_id=campagna.pk).values_list("feature_key", "mode")
+        )
+
+    return get_cached(FEATURE_POLICY_CACHE_NAMESPACE, campagna.pk, _load)
+
+
+def feature_mode_for_campaign(campagna, feature_key):
+    """Modo SHARED/EXCLUSIVE della feature; la campagna base kor35 è sempre condivisa."""
+    if not campagna or campagna.slug == "kor35":
+        return FEATURE_MODE_SHARED
+    return feature_modes_for_campaign(campagna).get(feature_key, FEATURE_MODE_SHARED)
@@ -1171,6 +1171,15 @@ class OffertaScambioCarte(SyncableModel, models.Model):
         verbose_name = "Offerta scambio carte"
         verbose_name_plural = "Offerte scambio carte"
         ordering = ["-updated_at"]
+        indexes = [
+            models.Index(
+                fields=["campagna", "stato", "-updated_at", "-id"],
+                name="offerta_scambio_mercato_idx",
+            ),
+            models.Index(fields=["offerente", "stato"], name="offerta_scambio_offerente_idx"),
+            models.Index(fields=["carta_offerta", "stato"], name="offerta_scambio_cp_idx"),
+            models.Index(fields=["richiesta_carta", "stato"], name="offerta_scambio_richiesta_idx"),
+        ]
 
     def __str__(self):
         richiesta = self.richiesta_carta.nome if self.richiesta_carta_id else "crediti"
@@ -69,21 +69,9 @@ def get_config_carte(campagna, *, create: bool = False) -> ConfigurazioneCarteCo
 
 def get_carte_accesso_modo(campagna) -> str:
     """OFF/TEST/OPEN: preferisce Campagna.moduli_accesso['carte'], altrimenti config legacy."""
-    from personaggi.campagna_moduli import (
-        MODULO_CARTE,
-        get_modulo_accesso,
-        has_explicit_modulo,
-    )
+    from personaggi.campagna_moduli import MODULO_CARTE, get_modulo_accesso
 
-    if campagna and has_explicit_modulo(campagna, MODULO_CARTE):
-        return get_modulo_accesso(campagna, MODULO_CARTE)
-    cfg = get_config_carte(campagna, create=False)
-    if not cfg:
-        return CARTE_ACCESSO_OFF
-    modo = getattr(cfg, "accesso_modo", None) or CARTE_ACCESSO_OFF
-    if modo == CARTE_ACCESSO_OFF and getattr(cfg, "abilitata", False):
-        return CARTE_ACCESSO_OPEN
-    return modo
+    return get_modulo_accesso(campagna, MODULO_CARTE)
 
 
 def is_png_staff_personaggio(personaggio: Personaggio) -> bool:
@@ -1,22 +1,112 @@
 """
 Applicazione runtime delle errata carta.
+
+Le errata attive di tutte le carte stanno in uno snapshot immutabile nella cache di
+processo (``kor35.config_cache``), ricostruito con una query quando cambia la revisione
+(signal su CartaErrata in personaggi.signals). I valori base arrivano dall'istanza
+carta già caricata: ``gameplay_view`` non interroga il DB per carta.
 """
 from __future__ import annotations
 
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping
+
 from django.utils import timezone
 
+from kor35.config_cache import bump_revision, get_cached
+
+CARTE_ERRATA_CACHE_NAMESPACE = "carte_errata"
+ERRATA_STORICO_MAX = 6
+
+
+@dataclass(frozen=True)
+class ErrataSnapshot:
+    id: str
+    effective_from: datetime
+    updated_at: datetime | None
+    titolo: str
+    descrizione: str
+    versione: str
+    pubblicata: bool
+    pubblicata_at: datetime | None
+    pubblicata_nota: str
+    testo_gioco_override: str
+    costo_gioco_override: int | None
+    attacco_override: int | None
+    salute_override: int | None
+    iniziativa_override: int | None
+    effect_scripts_override: tuple
+
+
+@dataclass(frozen=True)
+class CatalogoErrata:
+    # carta_id -> errata attive, dalla più recente (effective_from, updated_at desc)
+    per_carta: Mapping[str, tuple[ErrataSnapshot, ...]]
+
+    def errata_carta(self, carta_id) -> tuple[ErrataSnapshot, ...]:
+        return self.per_carta.get(str(carta_id), ())
+
+
+def _build_catalogo_errata() -> CatalogoErrata:
+    from personaggi.carte_collezionabili_models import CartaErrata
 
-def _errata_attiva(carta, *, when=None):
+    per_carta: dict[str, list[ErrataSnapshot]] = {}
+    qs = CartaErrata.objects.filter(attiva=True).order_by("carta_id", "-effective_from", "-updated_at")
+    for err in qs.iterator():
+        per_carta.setdefault(str(err.carta_id), []).append(
+            ErrataSnapshot(
+                id=str(err.id),
+                effective_from=err.effective_from,
+                updated_at=err.updated_at,
+                titolo=err.titolo,
+                descrizione=err.descrizione,
+                versione=err.versione,
+                pubblicata=err.pubblicata,
+                pubblicata_at=err.pubblicata_at,
+                pubblicata_nota=err.pubblicata_nota,
+                testo_gioco_override=err.testo_gioco_override,
+                costo_gioco_override=err.costo_gioco_override,
+                attacco_override=err.attacco_override,
+                salute_override=err.salute_override,
+                iniziativa_override=err.iniziativa_override,
+                effect_scripts_override=tuple(err.effect_scripts_override or ()),
+            )
+        )
+    return CatalogoErrata(per_carta=MappingProxyType({k: tuple(v) for k, v in per_carta.items()}))
+
+
+def get_catalogo_errata() -> CatalogoErrata:
+    return get_cached(CARTE_ERRATA_CACHE_NAMESPACE, None, _build_catalogo_errata)
+
+
+def invalida_catalogo_errata() -> None:
+    bump_revision(CARTE_ERRATA_CACHE_NAMESPACE)
+
+
+def _errata_attiva(carta, *, when=None, catalogo: CatalogoErrata | None = None):
     when = when or timezone.now()
-    try:
-        return carta.errata.filter(attiva=True, effective_from__lte=when).order_by("-effective_from", "-updated_at").first()
-    except Exception:
-        return None
+    catalogo = catalogo or get_catalogo_errata()
+    for err in catalogo.errata_carta(carta.pk):
+        if err.effective_from <= when:
+            return err
+    return None
+
 
+def prossima_variazione_errata(carta, *, when=None, catalogo: CatalogoErrata | None = None):
+    """Istante in cui entra in vigore la prossima errata schedulata (None se nessuna)."""
+    when = when or timezone.now()
+    catalogo = catalogo or get_catalogo_errata()
+    futuri = [e.effective_from for e in catalogo.errata_carta(carta.pk) if e.effective_from > when]
+    return min(futuri) if futuri else None
 
-def gameplay_view(carta, *, when=None) -> dict:
+
+def gameplay_view(carta, *, when=None, catalogo: CatalogoErrata | None = None) -> dict:
     """Valori gameplay effettivi carta (base + eventuale errata attiva)."""
-    err = _errata_attiva(carta, when=when)
+    when = when or timezone.now()
+    catalogo = catalogo or get_catalogo_errata()
+    err = _errata_attiva(carta, when=when, catalogo=catalogo)
     out = {
         "costo_gioco": carta.costo_gioco,
         "attacco": carta.attacco,
@@ -26,7 +116,11 @@ def gameplay_view(carta, *, when=None) -> dict:
         "effect_scripts": carta.effect_scripts or [],
         "errata": None,
         "errata_storico": [],
+        "prossima_variazione": None,
     }
+    prossima = prossima_variazione_errata(carta, when=when, catalogo=catalogo)
+    if prossima is not None:
+        out["prossima_variazione"] = prossima.isoformat()
     if not err:
         return out
     if err.costo_gioco_override is not None:
@@ -40,22 +134,21 @@ def gameplay_view(carta, *, when=None) -> dict:
     if (err.testo_gioco_override or "").strip():
         out["testo_gioco"] = err.testo_gioco_override
     if err.effect_scripts_override:
-        out["effect_scripts"] = err.effect_scripts_override
+        out["effect_scripts"] = list(err.effect_scripts_override)
     out["errata"] = {
-        "id": str(err.id),
+        "id": err.id,
         "effective_from": err.effective_from.isoformat(),
         "titolo": err.titolo,
         "descrizione": err.descrizione,
         "versione": err.versione,
         "pubblicata_nota": err.pubblicata_nota,
     }
-    hist_qs = (
-        carta.errata.filter(attiva=True, pubblicata=True, effective_from__lte=when or timezone.now())
-        .order_by("-effective_from", "-updated_at")[:6]
-    )
+    storico = [
+        e for e in catalogo.errata_carta(carta.pk) if e.pubblicata and e.effective_from <= when
+    ][:ERRATA_STORICO_MAX]
     out["errata_storico"] = [
         {
-            "id": str(e.id),
+            "id": e.id,
             "effective_from": e.effective_from.isoformat(),
             "titolo": e.titolo,
             "descrizione": e.descrizione,
@@ -63,6 +156,6 @@ def gameplay_view(carta, *, when=None) -> dict:
             "pubblicata_at": e.pubblicata_at.isoformat() if e.pubblicata_at else None,
             "pubblicata_nota": e.pubblicata_nota,
         }
-        for e in hist_qs
+        for e in storico
     ]
     return out
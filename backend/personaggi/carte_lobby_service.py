@@ -66,18 +66,9 @@ def _ruolo_in_duello(duello: DuelloCarte, personaggio: Personaggio) -> str:
 
 
 def _qr_image_data_uri(qr_id) -> str:
-    import base64
-    import io
-
-    import qrcode
-
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=8, border=3)
-    qr.add_data(str(qr_id))
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
+    from personaggi.qr_render import qr_data_uri
+
+    return qr_data_uri(str(qr_id), box_size=8, border=3)
 
 
 def _ensure_qr_lobby(duello: DuelloCarte) -> QrCode:
@@ -1,13 +1,21 @@
 """
 Mercato scambio carte tra personaggi della stessa campagna.
+
+Le offerte aperte si leggono a pagine (cursore su updated_at, id) con filtri per carta,
+rarità, espansione, offerente e carta richiesta; la scambiabilità delle copie si calcola
+una volta per gruppo di personaggi (``blocchi_scambio``) invece che per singola carta.
 """
 from __future__ import annotations
 
+import base64
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
 from decimal import Decimal
 
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.utils import timezone
 
 from personaggi.carte_collezionabili_models import (
@@ -21,6 +29,7 @@ from personaggi.carte_collezionabili_models import (
     DUELLO_STATO_FINITO,
     MazzoDuello,
     OffertaScambioCarte,
+    ReliquiarioSlot,
 )
 from personaggi.carte_collezionabili_service import (
     assert_personaggio_puo_accedere_carte,
@@ -31,32 +40,88 @@ from personaggi.carte_collezionabili_service import (
 from personaggi.models import Personaggio
 
 
-def _motivo_carta_non_scambiabile(cp: CartaPosseduta, *, offerta_esclusa_id=None) -> str | None:
-    if cp.slot_reliquiario.exists():
-        return "La carta è equipaggiata nel reliquiario."
-    offerte_aperte = OffertaScambioCarte.objects.filter(
-        carta_offerta=cp,
-        stato=SCAMBIO_STATO_APERTA,
-    )
-    if offerta_esclusa_id:
-        offerte_aperte = offerte_aperte.exclude(pk=offerta_esclusa_id)
-    if offerte_aperte.exists():
-        return "La carta è già in un'offerta aperta."
-    cp_id = str(cp.id)
-    for mazzo in MazzoDuello.objects.filter(personaggio=cp.personaggio):
-        ids = [str(x) for x in (mazzo.carte_possedute_ids or [])]
-        if cp_id in ids or mazzo.leader_carta_posseduta_id == cp_id:
+STATI_DUELLO_BLOCCANTI = frozenset({"LOB", "PRE", "ATT", "COR"})
+MERCATO_PAGE_SIZE = 30
+MERCATO_PAGE_SIZE_MAX = 100
+
+
+@dataclass
+class BlocchiScambio:
+    """
+    Carte possedute non scambiabili per un gruppo di personaggi, calcolate con un numero
+    fisso di query (slot reliquiario, offerte aperte, mazzi, duelli attivi) invece che
+    per singola carta. Mazzi e duelli contano solo per il proprietario attuale della copia.
+    """
+
+    in_reliquiario: set = field(default_factory=set)
+    offerte_aperte: dict = field(default_factory=dict)  # cp_id -> {offerta_id}
+    in_mazzo: set = field(default_factory=set)  # (personaggio_id, cp_id)
+    in_duello: set = field(default_factory=set)  # (personaggio_id, cp_id)
+
+    def motivo(self, cp_id, personaggio_id, *, offerta_esclusa_id=None) -> str | None:
+        cp_id = str(cp_id)
+        if cp_id in self.in_reliquiario:
+            return "La carta è equipaggiata nel reliquiario."
+        offerte = self.offerte_aperte.get(cp_id, set())
+        if offerta_esclusa_id:
+            offerte = offerte - {str(offerta_esclusa_id)}
+        if offerte:
+            return "La carta è già in un'offerta aperta."
+        if (personaggio_id, cp_id) in self.in_mazzo:
             return "La carta è inclusa in un mazzo duello."
-    stati_bloccanti = {"LOB", "PRE", "ATT", "COR"}
-    duelli = DuelloCarte.objects.filter(
-        campagna_id=cp.personaggio.campagna_id,
-        stato__in=stati_bloccanti,
-    ).filter(Q(sfidante=cp.personaggio) | Q(sfidato=cp.personaggio))
-    for duello in duelli:
-        for field in (duello.mazzo_sfidante_ids or [], duello.mazzo_sfidato_ids or []):
-            if cp_id in [str(x) for x in field]:
-                return "La carta è in un duello attivo."
-    return None
+        if (personaggio_id, cp_id) in self.in_duello:
+            return "La carta è in un duello attivo."
+        return None
+
+    def bloccate(self, personaggio_id) -> set[str]:
+        """Id delle copie non scambiabili del personaggio (per escluderle in query)."""
+        out = set(self.in_reliquiario) | set(self.offerte_aperte)
+        out.update(cp_id for pid, cp_id in self.in_mazzo | self.in_duello if pid == personaggio_id)
+        return out
+
+
+def blocchi_scambio(personaggi_ids) -> BlocchiScambio:
+    ids = {pid for pid in personaggi_ids if pid}
+    blocchi = BlocchiScambio()
+    if not ids:
+        return blocchi
+    blocchi.in_reliquiario = {
+        str(cp_id)
+        for cp_id in ReliquiarioSlot.objects.filter(
+            carta_posseduta__personaggio_id__in=ids,
+        ).order_by().values_list("carta_posseduta_id", flat=True)
+    }
+    for cp_id, offerta_id in OffertaScambioCarte.objects.filter(
+        carta_offerta__personaggio_id__in=ids,
+        stato=SCAMBIO_STATO_APERTA,
+    ).order_by().values_list("carta_offerta_id", "id"):
+        blocchi.offerte_aperte.setdefault(str(cp_id), set()).add(str(offerta_id))
+    for pid, carte_ids, leader_id in MazzoDuello.objects.filter(personaggio_id__in=ids).order_by().values_list(
+        "personaggio_id", "carte_possedute_ids", "leader_carta_posseduta_id"
+    ):
+        blocchi.in_mazzo.update((pid, str(x)) for x in (carte_ids or []))
+        if leader_id:
+            blocchi.in_mazzo.add((pid, str(leader_id)))
+    for sfidante_id, sfidato_id, mazzo_sfidante, mazzo_sfidato in DuelloCarte.objects.filter(
+        stato__in=STATI_DUELLO_BLOCCANTI,
+    ).filter(Q(sfidante_id__in=ids) | Q(sfidato_id__in=ids)).order_by().values_list(
+        "sfidante_id", "sfidato_id", "mazzo_sfidante_ids", "mazzo_sfidato_ids"
+    ):
+        carte = [str(x) for x in (mazzo_sfidante or []) + (mazzo_sfidato or [])]
+        for pid in (sfidante_id, sfidato_id):
+            if pid in ids:
+                blocchi.in_duello.update((pid, cp_id) for cp_id in carte)
+    return blocchi
+
+
+def _motivo_carta_non_scambiabile(
+    cp: CartaPosseduta,
+    *,
+    offerta_esclusa_id=None,
+    blocchi: BlocchiScambio | None = None,
+) -> str | None:
+    blocchi = blocchi or blocchi_scambio([cp.personaggio_id])
+    return blocchi.motivo(cp.id, cp.personaggio_id, offerta_esclusa_id=offerta_esclusa_id)
 
 
 def _serializza_carta_breve(carta: CartaCollezionabile | None) -> dict | None:
@@ -81,20 +146,10 @@ def _serializza_posseduta_breve(cp: CartaPosseduta | None) -> dict | None:
     }
 
 
-def serializza_offerta_scambio(offerta: OffertaScambioCarte) -> dict:
-    offerta = (
-        OffertaScambioCarte.objects.select_related(
-            "offerente",
-            "accettante",
-            "carta_offerta__carta",
-            "carta_contropartita__carta",
-            "richiesta_carta",
-            "campagna",
-        )
-        .filter(pk=offerta.pk)
-        .first()
-        or offerta
-    )
+def serializza_offerta_scambio(offerta: OffertaScambioCarte, *, ricarica: bool = True) -> dict:
+    """``ricarica=False`` quando l'offerta arriva già da ``_offerte_queryset`` (relazioni caricate)."""
+    if ricarica:
+        offerta = _offerte_queryset().filter(pk=offerta.pk).first() or offerta
     return {
         "id": str(offerta.id),
         "stato": offerta.stato,
@@ -127,6 +182,17 @@ def serializza_offerta_scambio(offerta: OffertaScambioCarte) -> dict:
     }
 
 
+def _offerte_queryset():
+    return OffertaScambioCarte.objects.select_related(
+        "offerente",
+        "accettante",
+        "carta_offerta__carta",
+        "carta_contropartita__carta",
+        "richiesta_carta",
+        "campagna",
+    )
+
+
 def _catalogo_richieste_mercato(campagna_id) -> list[dict]:
     return [
         _serializza_carta_breve(c)
@@ -136,7 +202,163 @@ def _catalogo_richieste_mercato(campagna_id) -> list[dict]:
     ]
 
 
+def _page_size(value, default=MERCATO_PAGE_SIZE) -> int:
+    try:
+        size = int(value or default)
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MERCATO_PAGE_SIZE_MAX))
+
+
+def _encode_cursor(offerta: OffertaScambioCarte) -> str:
+    raw = f"{offerta.updated_at.isoformat()}|{offerta.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_iso, offerta_id = raw.split("|", 1)
+        updated_at = datetime.fromisoformat(updated_iso)
+        return updated_at, uuid.UUID(offerta_id)
+    except (ValueError, TypeError, UnicodeDecodeError) as exc:
+        raise ValidationError("Cursore non valido.") from exc
+
+
+def _filtra_offerte(qs, filtri: dict, *, escludi: str | None = None):
+    """Filtri del mercato (carta, rarita, espansione, offerente, richiesta); ``escludi`` per le faccette."""
+    mappa = {
+        "carta": "carta_offerta__carta_id",
+        "rarita": "carta_offerta__carta__rarita",
+        "espansione": "carta_offerta__carta__espansione_id",
+        "offerente": "offerente_id",
+        "richiesta": "richiesta_carta_id",
+    }
+    for chiave, lookup in mappa.items():
+        valore = (filtri or {}).get(chiave)
+        if chiave != escludi and valore not in (None, ""):
+            qs = qs.filter(**{lookup: valore})
+    return qs
+
+
+def _offerte_aperte_personaggio(personaggio: Personaggio, *, mie: bool):
+    qs = _offerte_queryset().filter(
+        campagna_id=personaggio.campagna_id,
+        stato=SCAMBIO_STATO_APERTA,
+    )
+    if mie:
+        return qs.filter(offerente=personaggio)
+    return qs.exclude(offerente=personaggio)
+
+
+def faccette_offerte_mercato(personaggio: Personaggio, filtri: dict | None = None) -> dict:
+    """Conteggi delle offerte aperte di altri per rarità ed espansione (due GROUP BY)."""
+    base = _offerte_aperte_personaggio(personaggio, mie=False)
+    rarita = (
+        _filtra_offerte(base, filtri, escludi="rarita")
+        .order_by()
+        .values_list("carta_offerta__carta__rarita")
+        .annotate(n=Count("id"))
+    )
+    espansioni = (
+        _filtra_offerte(base, filtri, escludi="espansione")
+        .order_by()
+        .values_list("carta_offerta__carta__espansione_id", "carta_offerta__carta__espansione__nome")
+        .annotate(n=Count("id"))
+    )
+    return {
+        "rarita": {codice: n for codice, n in rarita},
+        "espansioni": [
+            {"id": str(esp_id) if esp_id else None, "nome": nome or "", "count": n}
+            for esp_id, nome, n in sorted(espansioni, key=lambda r: (r[1] or "").lower())
+        ],
+    }
+
+
+def lista_offerte_mercato(
+    personaggio: Personaggio,
+    *,
+    filtri: dict | None = None,
+    mie: bool = False,
+    cursor: str | None = None,
+    page_size=None,
+) -> dict:
+    """
+    Pagina di offerte aperte ordinate per (updated_at, id) discendenti con cursore keyset:
+    il costo dipende dalla pagina, non dal numero di offerte della campagna.
+    """
+    size = _page_size(page_size)
+    qs = _filtra_offerte(_offerte_aperte_personaggio(personaggio, mie=mie), filtri)
+    if cursor:
+        updated_at, offerta_id = _decode_cursor(cursor)
+        qs = qs.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=offerta_id))
+    offerte = list(qs.order_by("-updated_at", "-id")[: size + 1])
+    has_next = len(offerte) > size
+    offerte = offerte[:size]
+
+    blocchi = blocchi_scambio(
+        {o.carta_offerta.personaggio_id for o in offerte} | {personaggio.id}
+    )
+    results = []
+    for offerta in offerte:
+        row = serializza_offerta_scambio(offerta, ricarica=False)
+        row["mio"] = offerta.offerente_id == personaggio.id
+        row["posso_accettare"] = (
+            offerta.offerente_id != personaggio.id
+            and _posso_accettare_offerta(personaggio, offerta, blocchi=blocchi)[0]
+        )
+        results.append(row)
+    return {
+        "results": results,
+        "next_cursor": _encode_cursor(offerte[-1]) if has_next and offerte else None,
+    }
+
+
+def lista_carte_scambio(
+    personaggio: Personaggio,
+    *,
+    filtri: dict | None = None,
+    solo_scambiabili: bool = False,
+    offset=0,
+    page_size=None,
+) -> dict:
+    """Copie possedute con stato di scambiabilità, a pagine; i blocchi si calcolano una volta."""
+    size = _page_size(page_size)
+    try:
+        offset = max(0, int(offset or 0))
+    except (TypeError, ValueError):
+        offset = 0
+    filtri = filtri or {}
+    blocchi = blocchi_scambio([personaggio.id])
+    qs = CartaPosseduta.objects.filter(personaggio=personaggio).select_related("carta")
+    for chiave, lookup in (
+        ("carta", "carta_id"),
+        ("rarita", "carta__rarita"),
+        ("espansione", "carta__espansione_id"),
+    ):
+        if filtri.get(chiave) not in (None, ""):
+            qs = qs.filter(**{lookup: filtri[chiave]})
+    if solo_scambiabili:
+        qs = qs.exclude(pk__in=blocchi.bloccate(personaggio.id))
+    carte = list(qs.order_by("carta__nome", "id")[offset : offset + size + 1])
+    has_next = len(carte) > size
+    results = []
+    for cp in carte[:size]:
+        motivo = blocchi.motivo(cp.id, personaggio.id)
+        results.append({
+            "id": str(cp.id),
+            "carta": _serializza_carta_breve(cp.carta),
+            "scambiabile": motivo is None,
+            "motivo_blocco": motivo,
+        })
+    return {"results": results, "next_offset": offset + size if has_next else None}
+
+
 def build_mercato_payload(personaggio: Personaggio) -> dict:
+    """
+    Riepilogo mercato: prima pagina di offerte altrui, proprie e copie possedute.
+    Le pagine successive passano da ``lista_offerte_mercato`` / ``lista_carte_scambio``.
+    """
     if not personaggio_puo_accedere_carte(personaggio):
         return {
             "puo_accedere": False,
@@ -150,58 +372,33 @@ def build_mercato_payload(personaggio: Personaggio) -> dict:
     cfg = get_config_carte(personaggio.campagna, create=False)
     commissione_pct = float(cfg.mercato_commissione_pct) if cfg else 8.0
 
-    offerte_qs = (
-        OffertaScambioCarte.objects.filter(campagna=personaggio.campagna)
-        .select_related(
-            "offerente",
-            "accettante",
-            "carta_offerta__carta",
-            "carta_contropartita__carta",
-            "richiesta_carta",
-        )
-        .order_by("-updated_at")
-    )
-
-    offerte_aperte = []
-    mie_offerte = []
-    for offerta in offerte_qs.filter(stato=SCAMBIO_STATO_APERTA):
-        row = serializza_offerta_scambio(offerta)
-        row["mio"] = offerta.offerente_id == personaggio.id
-        row["posso_accettare"] = (
-            offerta.offerente_id != personaggio.id
-            and _posso_accettare_offerta(personaggio, offerta)[0]
-        )
-        if offerta.offerente_id == personaggio.id:
-            mie_offerte.append(row)
-        else:
-            offerte_aperte.append(row)
+    altrui = lista_offerte_mercato(personaggio)
+    mie = lista_offerte_mercato(personaggio, mie=True)
+    carte = lista_carte_scambio(personaggio)
 
     storico = []
-    for offerta in offerte_qs.filter(stato=SCAMBIO_STATO_ACCETTATA).filter(
-        Q(offerente=personaggio) | Q(accettante=personaggio)
-    )[:30]:
-        row = serializza_offerta_scambio(offerta)
+    for offerta in (
+        _offerte_queryset()
+        .filter(campagna=personaggio.campagna, stato=SCAMBIO_STATO_ACCETTATA)
+        .filter(Q(offerente=personaggio) | Q(accettante=personaggio))
+        .order_by("-updated_at")[:30]
+    ):
+        row = serializza_offerta_scambio(offerta, ricarica=False)
         row["mio"] = offerta.offerente_id == personaggio.id
         storico.append(row)
 
-    carte_scambiabili = []
-    for cp in CartaPosseduta.objects.filter(personaggio=personaggio).select_related("carta"):
-        motivo = _motivo_carta_non_scambiabile(cp)
-        carte_scambiabili.append({
-            "id": str(cp.id),
-            "carta": _serializza_carta_breve(cp.carta),
-            "scambiabile": motivo is None,
-            "motivo_blocco": motivo,
-        })
-
     return {
         "puo_accedere": True,
         "commissione_pct": commissione_pct,
-        "offerte_aperte": offerte_aperte,
-        "mie_offerte": mie_offerte,
+        "offerte_aperte": altrui["results"],
+        "offerte_aperte_next_cursor": altrui["next_cursor"],
+        "mie_offerte": mie["results"],
+        "mie_offerte_next_cursor": mie["next_cursor"],
         "storico": storico,
         "catalogo_richieste": _catalogo_richieste_mercato(personaggio.campagna_id),
-        "carte_scambiabili": carte_scambiabili,
+        "carte_scambiabili": carte["results"],
+        "carte_scambiabili_next_offset": carte["next_offset"],
+        "faccette": faccette_offerte_mercato(personaggio),
         "crediti": float(personaggio.crediti),
     }
 
@@ -211,6 +408,7 @@ def _posso_accettare_offerta(
     offerta: OffertaScambioCarte,
     *,
     carta_contropartita_id=None,
+    blocchi: BlocchiScambio | None = None,
 ) -> tuple[bool, str]:
     if offerta.stato != SCAMBIO_STATO_APERTA:
         return False, "Offerta non più disponibile."
@@ -233,7 +431,7 @@ def _posso_accettare_offerta(
         ).first()
         if not cp:
             return False, "Carta contropartita non valida."
-        motivo = _motivo_carta_non_scambiabile(cp)
+        motivo = _motivo_carta_non_scambiabile(cp, blocchi=blocchi)
         if motivo:
             return False, motivo
     elif not offerta.richiesta_crediti or offerta.richiesta_crediti <= 0:
@@ -242,6 +440,7 @@ def _posso_accettare_offerta(
     motivo_offerta = _motivo_carta_non_scambiabile(
         offerta.carta_offerta,
         offerta_esclusa_id=offerta.id,
+        blocchi=blocchi,
     )
     if motivo_offerta:
         return False, f"Carta offerta non più disponibile: {motivo_offerta}"
@@ -399,21 +598,11 @@ def accetta_offerta_scambio(
 
 
 def lista_scambi_staff(campagna, *, stato=None, limit=100) -> dict:
-    qs = (
-        OffertaScambioCarte.objects.filter(campagna=campagna)
-        .select_related(
-            "offerente",
-            "accettante",
-            "carta_offerta__carta",
-            "carta_contropartita__carta",
-            "richiesta_carta",
-        )
-        .order_by("-updated_at")
-    )
+    qs = _offerte_queryset().filter(campagna=campagna).order_by("-updated_at")
     if stato:
         qs = qs.filter(stato=stato)
 
-    rows = [serializza_offerta_scambio(o) for o in qs[:limit]]
+    rows = [serializza_offerta_scambio(o, ricarica=False) for o in qs[:limit]]
     summary = {
         "aperte": OffertaScambioCarte.objects.filter(
             campagna=campagna, stato=SCAMBIO_STATO_APERTA
@@ -1,6 +1,20 @@
-"""Valutazione combo reliquiario staff-defined."""
+"""
+Valutazione combo reliquiario staff-defined.
+
+Le combo attive di una campagna sono compilate in un indice (``IndiceCombo``) per
+chiave richiesta — legame_id, set_collezione, codice carta, famiglia di energie —
+tenuto nella cache di processo ``kor35.config_cache`` per campagna e invalidato dai
+signal su ComboReliquiario. Per un reliquiario si valutano solo le combo le cui
+chiavi compaiono tra le carte equipaggiate: il costo dipende dalle carte equipaggiate,
+non dalla dimensione del catalogo combo.
+"""
 from __future__ import annotations
 
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+from kor35.config_cache import bump_revision, get_cached
 from personaggi.carte_collezionabili_models import (
     CARTA_ENERGIE_NATURALI,
     CARTA_ENERGIE_SOPRANNATURALI,
@@ -111,30 +125,133 @@ def valuta_combo_reliquiario(combo: ComboReliquiario, entries: list[dict]) -> di
     return None
 
 
+COMBO_RELIQUIARIO_CACHE_NAMESPACE = "combo_reliquiario"
+
+
+@dataclass(frozen=True)
+class ComboCompilata:
+    """Definizione combo in sola lettura (stessi attributi usati da valuta_combo_reliquiario)."""
+
+    id: str
+    codice: str
+    nome: str
+    testo: str
+    colore: str
+    ordine: int
+    tipo_trigger: str
+    param_legame_id: str
+    param_set_collezione: str
+    param_carte_codici: tuple[str, ...]
+    param_min_count: int
+
+
+@dataclass(frozen=True)
+class IndiceCombo:
+    per_legame: Mapping[str, tuple[ComboCompilata, ...]]
+    per_set: Mapping[str, tuple[ComboCompilata, ...]]
+    per_codice: Mapping[str, tuple[ComboCompilata, ...]]
+    energie_naturali: tuple[ComboCompilata, ...]
+    energie_soprannaturali: tuple[ComboCompilata, ...]
+
+    def candidate(self, entries: list[dict]) -> list[ComboCompilata]:
+        """Combo con tutte le chiavi richieste presenti tra le carte equipaggiate."""
+        trovate: dict[str, ComboCompilata] = {}
+        codici = {e["codice"] for e in entries}
+        for legame in {e["legame_id"] for e in entries if e["legame_id"]}:
+            trovate.update((c.id, c) for c in self.per_legame.get(legame, ()))
+        for set_slug in {e["set_collezione"] for e in entries if e["set_collezione"]}:
+            trovate.update((c.id, c) for c in self.per_set.get(set_slug, ()))
+        for codice in codici:
+            for combo in self.per_codice.get(codice, ()):
+                if combo.id not in trovate and codici.issuperset(combo.param_carte_codici):
+                    trovate[combo.id] = combo
+        energie = {e["energia"] for e in entries}
+        if energie & CARTA_ENERGIE_NATURALI:
+            trovate.update((c.id, c) for c in self.energie_naturali)
+        if energie & CARTA_ENERGIE_SOPRANNATURALI:
+            trovate.update((c.id, c) for c in self.energie_soprannaturali)
+        return sorted(trovate.values(), key=lambda c: (c.ordine, c.nome))
+
+
+def _compila_combo(combo: ComboReliquiario) -> ComboCompilata:
+    return ComboCompilata(
+        id=str(combo.id),
+        codice=combo.codice,
+        nome=combo.nome,
+        testo=combo.testo or "",
+        colore=combo.colore or "#10b981",
+        ordine=int(combo.ordine or 0),
+        tipo_trigger=combo.tipo_trigger,
+        param_legame_id=(combo.param_legame_id or "").strip(),
+        param_set_collezione=(combo.param_set_collezione or "").strip(),
+        param_carte_codici=tuple(
+            str(c).strip() for c in (combo.param_carte_codici or []) if str(c).strip()
+        ),
+        param_min_count=max(1, int(combo.param_min_count or 1)),
+    )
+
+
+def _build_indice_combo(campagna_id) -> IndiceCombo:
+    per_legame: dict[str, list] = {}
+    per_set: dict[str, list] = {}
+    per_codice: dict[str, list] = {}
+    naturali: list = []
+    soprannaturali: list = []
+    for combo in ComboReliquiario.objects.filter(campagna_id=campagna_id, attiva=True):
+        c = _compila_combo(combo)
+        if c.tipo_trigger == COMBO_TRIGGER_LEGAME and c.param_legame_id:
+            per_legame.setdefault(c.param_legame_id, []).append(c)
+        elif c.tipo_trigger == COMBO_TRIGGER_SET and c.param_set_collezione:
+            per_set.setdefault(c.param_set_collezione, []).append(c)
+        elif c.tipo_trigger == COMBO_TRIGGER_CARTE and c.param_carte_codici:
+            # Basta indicizzare un codice: la combo richiede comunque tutti i codici.
+            per_codice.setdefault(c.param_carte_codici[0], []).append(c)
+        elif c.tipo_trigger == COMBO_TRIGGER_ENERGIE_NAT:
+            naturali.append(c)
+        elif c.tipo_trigger == COMBO_TRIGGER_ENERGIE_SOP:
+            soprannaturali.append(c)
+
+    def _freeze(d):
+        return MappingProxyType({k: tuple(v) for k, v in d.items()})
+
+    return IndiceCombo(
+        per_legame=_freeze(per_legame),
+        per_set=_freeze(per_set),
+        per_codice=_freeze(per_codice),
+        energie_naturali=tuple(naturali),
+        energie_soprannaturali=tuple(soprannaturali),
+    )
+
+
+def get_indice_combo(campagna_id) -> IndiceCombo:
+    return get_cached(
+        COMBO_RELIQUIARIO_CACHE_NAMESPACE,
+        str(campagna_id),
+        lambda: _build_indice_combo(campagna_id),
+    )
+
+
+def invalida_indice_combo(campagna_id) -> None:
+    bump_revision(COMBO_RELIQUIARIO_CACHE_NAMESPACE, str(campagna_id))
+
+
 def calcola_combo_reliquiario_attive(personaggio) -> list[dict]:
     entries = _equipped_entries(personaggio)
     if not entries:
         return []
 
-    combos = (
-        ComboReliquiario.objects.filter(
-            campagna_id=personaggio.campagna_id,
-            attiva=True,
-        )
-        .order_by("ordine", "nome")
-    )
     legami = []
-    for combo in combos:
+    for combo in get_indice_combo(personaggio.campagna_id).candidate(entries):
         match = valuta_combo_reliquiario(combo, entries)
         if not match:
             continue
         legami.append({
-            "id": str(combo.id),
+            "id": combo.id,
             "codice": combo.codice,
             "nome": combo.nome,
-            "testo": combo.testo or "",
+            "testo": combo.testo,
             "descrizione": combo.testo or combo.nome,
-            "colore": combo.colore or "#10b981",
+            "colore": combo.colore,
             "slot_indices": match["slot_indices"],
             "carta_codici": match["carta_codici"],
         })
@@ -0,0 +1,172 @@
+"""
+Catalogo regole in memoria: Punteggio (caratteristiche, aure, elementi, …), Statistica e Mattone.
+
+Tabelle piccole e modificate di rado ma lette migliaia di volte nel calcolo scheda:
+lo snapshot immutabile (dataclass frozen, indicizzate per id / sigla / nome) vive nella
+cache di processo ``kor35.config_cache`` ed è ricostruito quando cambia la revisione
+del catalogo (signal su salvataggio/cancellazione dei modelli, vedi personaggi.signals).
+
+Le entry non sono istanze Django: per FK e scritture usare ``.id``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping
+
+from kor35.config_cache import bump_revision, get_cached, local_generation
+
+CATALOGO_REGOLE_CACHE_NAMESPACE = "catalogo_regole"
+
+
+@dataclass(frozen=True)
+class PunteggioInfo:
+    id: int
+    nome: str
+    sigla: str
+    tipo: str
+    ordine: int
+    is_generica: bool
+    is_mattone: bool
+    is_soprannaturale: bool
+    caratteristica_relativa_id: int | None
+
+
+@dataclass(frozen=True)
+class StatisticaInfo(PunteggioInfo):
+    parametro: str | None
+    valore_predefinito: int
+    valore_base_predefinito: int
+    tipo_modificatore: str
+    is_primaria: bool
+    is_risorsa_pool: bool
+    pool_corrente_default_pieno_se_assente: bool
+    auto_recupero_attivo: bool
+    auto_recupero_intervallo_secondi: int
+    auto_recupero_step: int
+    massimo_pool_sigla: str | None
+
+
+@dataclass(frozen=True)
+class MattoneInfo(PunteggioInfo):
+    aura_id: int
+    caratteristica_associata_id: int
+    indice_componente: int | None
+
+
+@dataclass(frozen=True)
+class CatalogoRegole:
+    punteggi: Mapping[int, PunteggioInfo]
+    per_sigla: Mapping[str, PunteggioInfo]
+    per_nome: Mapping[str, PunteggioInfo]
+    # Statistiche nell'ordinamento di Statistica.Meta (formula, ordine, nome).
+    statistiche: tuple[StatisticaInfo, ...]
+    statistiche_per_nome: Mapping[str, StatisticaInfo] = field(default_factory=dict)
+    nomi_per_tipo: Mapping[str, frozenset] = field(default_factory=dict)
+
+    def punteggio(self, pk) -> PunteggioInfo | None:
+        return self.punteggi.get(pk)
+
+    def punteggio_per_sigla(self, sigla, tipo: str | None = None) -> PunteggioInfo | None:
+        p = self.per_sigla.get(sigla)
+        if p is None or (tipo is not None and p.tipo != tipo):
+            return None
+        return p
+
+    def nomi_tipo(self, tipo: str) -> frozenset:
+        return self.nomi_per_tipo.get(tipo, frozenset())
+
+    def statistica(self, sigla) -> StatisticaInfo | None:
+        p = self.per_sigla.get(sigla)
+        return p if isinstance(p, StatisticaInfo) else None
+
+    def statistica_per_nome(self, nome) -> StatisticaInfo | None:
+        return self.statistiche_per_nome.get(nome)
+
+    def statistiche_con_parametro(self) -> tuple[StatisticaInfo, ...]:
+        return tuple(s for s in self.statistiche if s.parametro)
+
+    def aura_generica(self, tipo_aura: str) -> PunteggioInfo | None:
+        for p in self.punteggi.values():
+            if p.tipo == tipo_aura and p.is_generica:
+                return p
+        return None
+
+
+def _punteggio_kwargs(obj) -> dict:
+    return {
+        "id": obj.pk,
+        "nome": obj.nome,
+        "sigla": obj.sigla,
+        "tipo": obj.tipo,
+        "ordine": obj.ordine,
+        "is_generica": bool(obj.is_generica),
+        "is_mattone": bool(obj.is_mattone),
+        "is_soprannaturale": bool(obj.is_soprannaturale),
+        "caratteristica_relativa_id": obj.caratteristica_relativa_id,
+    }
+
+
+def _build_catalogo() -> CatalogoRegole:
+    from .models import Mattone, Punteggio, Statistica
+
+    statistiche = [
+        StatisticaInfo(
+            **_punteggio_kwargs(s),
+            parametro=s.parametro or None,
+            valore_predefinito=s.valore_predefinito,
+            valore_base_predefinito=s.valore_base_predefinito,
+            tipo_modificatore=s.tipo_modificatore,
+            is_primaria=bool(s.is_primaria),
+            is_risorsa_pool=bool(s.is_risorsa_pool),
+            pool_corrente_default_pieno_se_assente=bool(s.pool_corrente_default_pieno_se_assente),
+            auto_recupero_attivo=bool(s.auto_recupero_attivo),
+            auto_recupero_intervallo_secondi=s.auto_recupero_intervallo_secondi,
+            auto_recupero_step=s.auto_recupero_step,
+            massimo_pool_sigla=s.massimo_pool_sigla or None,
+        )
+        for s in Statistica.objects.all()
+    ]
+    speciali: dict[int, PunteggioInfo] = {s.id: s for s in statistiche}
+    statistiche_per_nome: dict[str, StatisticaInfo] = {}
+    for s in statistiche:
+        statistiche_per_nome.setdefault(s.nome, s)
+    for m in Mattone.objects.all():
+        speciali[m.pk] = MattoneInfo(
+            **_punteggio_kwargs(m),
+            aura_id=m.aura_id,
+            caratteristica_associata_id=m.caratteristica_associata_id,
+            indice_componente=m.indice_componente,
+        )
+
+    punteggi: dict[int, PunteggioInfo] = {}
+    per_sigla: dict[str, PunteggioInfo] = {}
+    per_nome: dict[str, PunteggioInfo] = {}
+    nomi_per_tipo: dict[str, set] = {}
+    for p in Punteggio.objects.all():
+        info = speciali.get(p.pk) or PunteggioInfo(**_punteggio_kwargs(p))
+        punteggi[info.id] = info
+        per_sigla.setdefault(info.sigla, info)
+        per_nome.setdefault(info.nome, info)
+        nomi_per_tipo.setdefault(info.tipo, set()).add(info.nome)
+
+    return CatalogoRegole(
+        punteggi=MappingProxyType(punteggi),
+        per_sigla=MappingProxyType(per_sigla),
+        per_nome=MappingProxyType(per_nome),
+        statistiche=tuple(statistiche),
+        statistiche_per_nome=MappingProxyType(statistiche_per_nome),
+        nomi_per_tipo=MappingProxyType({k: frozenset(v) for k, v in nomi_per_tipo.items()}),
+    )
+
+
+def get_catalogo_regole() -> CatalogoRegole:
+    return get_cached(CATALOGO_REGOLE_CACHE_NAMESPACE, None, _build_catalogo)
+
+
+def catalogo_regole_generation() -> int:
+    return local_generation(CATALOGO_REGOLE_CACHE_NAMESPACE)
+
+
+def invalida_catalogo_regole() -> None:
+    bump_revision(CATALOGO_REGOLE_CACHE_NAMESPACE)
@@ -4,6 +4,7 @@ import json
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from kor35.perf_metrics import PerfMetricsConsumerMixin
 from personaggi.carte_collezionabili_models import DuelloCarte
 from personaggi.ws_auth import user_notifications_group
 
@@ -12,7 +13,7 @@ from personaggi.ws_auth import user_notifications_group
 GLOBAL_NOTIFICATIONS_GROUP = "kor35_notifications"
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(PerfMetricsConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         user = self.scope.get("user")
         if not user or not getattr(user, "is_authenticated", False):
@@ -45,7 +46,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         )
 
 
-class DuelloCarteConsumer(AsyncWebsocketConsumer):
+class DuelloCarteConsumer(PerfMetricsConsumerMixin, AsyncWebsocketConsumer):
     """WebSocket live per sincronizzare lo stato di un duello carte."""
 
     @database_sync_to_async
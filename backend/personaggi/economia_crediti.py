@@ -13,6 +13,8 @@ from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import Q, Sum
 
+from kor35.config_cache import bump_revision, get_cached
+
 CONTO_CORRENTE = "CORRENTE"
 CONTO_DEPOSITO = "DEPOSITO"
 CONTO_CHOICES = [
@@ -71,6 +73,8 @@ _REGOLA_A_CATEGORIA_ECO = {
 DEFAULT_FRAZIONE_TRASFERIMENTO = Decimal("1.00")
 DEFAULT_FATTORE_VALORE_DEPOSITO = Decimal("0.90")
 
+ECONOMIA_CONFIG_CACHE_NAMESPACE = "economia_config"
+
 DEFAULT_ECONOMIA_CONFIG: dict[str, Any] = {
     "frazione_trasferimento_stipendio": str(DEFAULT_FRAZIONE_TRASFERIMENTO),
     "fattore_valore_deposito": str(DEFAULT_FATTORE_VALORE_DEPOSITO),
@@ -88,6 +92,7 @@ def _invalidate_campagna_eco_cache(campagna) -> None:
     for attr in ("_economia_config_cache", "_regole_tx_ensured"):
         if hasattr(campagna, attr):
             delattr(campagna, attr)
+    bump_revision(ECONOMIA_CONFIG_CACHE_NAMESPACE, campagna.pk)
 
 
 def _invalidate_personaggio_saldi_cache(personaggio) -> None:
@@ -163,12 +168,30 @@ def sync_regole_pagabile_da_categorie(campagna, categorie: Iterable[str]) -> Non
 
 
 def get_economia_config(campagna=None, *, force_refresh: bool = False) -> dict[str, Any]:
-    """Merge default + override JSON su Campagna.economia_config; categorie da regole se presenti."""
-    if campagna is not None and not force_refresh:
+    """
+    Merge default + override JSON su Campagna.economia_config; categorie da regole se presenti.
+
+    Con campagna: cache sull'istanza e cache di processo per campagna (kor35.config_cache),
+    invalidata da _invalidate_campagna_eco_cache e dai salvataggi di Campagna/regole.
+    """
+    if campagna is None:
+        return _build_economia_config(None)
+    if not force_refresh:
         cached = getattr(campagna, "_economia_config_cache", None)
         if isinstance(cached, dict):
             return cached
+        cfg = get_cached(
+            ECONOMIA_CONFIG_CACHE_NAMESPACE,
+            campagna.pk,
+            lambda: _build_economia_config(campagna),
+        )
+    else:
+        cfg = _build_economia_config(campagna)
+    campagna._economia_config_cache = cfg
+    return cfg
 
+
+def _build_economia_config(campagna) -> dict[str, Any]:
     cfg = dict(DEFAULT_ECONOMIA_CONFIG)
     cfg["categorie_spesa_deposito"] = list(CATEGORIE_SPESA_DEPOSITO_DEFAULT)
     raw = getattr(campagna, "economia_config", None) if campagna is not None else None
@@ -199,9 +222,6 @@ def get_economia_config(campagna=None, *, force_refresh: bool = False) -> dict[s
     if from_regole is not None:
         # Fonte di verità: flag sulle regole (anche lista vuota = nessuna categoria).
         cfg["categorie_spesa_deposito"] = from_regole
-
-    if campagna is not None:
-        campagna._economia_config_cache = cfg
     return cfg
 
 
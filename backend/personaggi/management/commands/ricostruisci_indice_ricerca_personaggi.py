@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from personaggi.ricerca_staff import ricostruisci_indice_ricerca
+
+
+class Command(BaseCommand):
+    help = (
+        "Ricostruisce l'indice di ricerca staff di tutti i personaggi "
+        "(dopo import massivi o modifiche fatte senza signal)."
+    )
+
+    def handle(self, *args, **options):
+        totale = ricostruisci_indice_ricerca()
+        self.stdout.write(self.style.SUCCESS(f"Indice ricerca aggiornato. Personaggi: {totale}"))
@@ -0,0 +1,33 @@
+"""
+Management command: rabbocco del pool di puzzle pregenerati per i minigiochi QR.
+
+Esecuzione:
+- one-shot:        python manage.py riempi_pool_minigiochi
+- loop continuo:   python manage.py riempi_pool_minigiochi --loop --interval 60
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from personaggi.minigioco_pool import riempi_pool
+
+
+class Command(BaseCommand):
+    help = "Riempie il pool di puzzle pregenerati per ogni tipo e difficoltà dei minigiochi QR."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", type=int, default=None, help="Puzzle per tipo/difficoltà.")
+        parser.add_argument("--loop", action="store_true", help="Esegui in loop continuo.")
+        parser.add_argument(
+            "--interval", type=float, default=60.0, help="Secondi tra un rabbocco e l'altro (loop)."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            creati = riempi_pool(target=options["target"])
+            self.stdout.write(f"Pool minigiochi: {creati} puzzle creati.")
+            if not options["loop"]:
+                break
+            time.sleep(max(1.0, options["interval"]))
@@ -0,0 +1,79 @@
+# Indice di ricerca denormalizzato per la console staff (personaggi.ricerca_staff)
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+TRIGRAM_INDEX_NAME = "pers_ind_ric_trgm_idx"
+
+
+def crea_indice_trigram(apps, schema_editor):
+    """
+    Indice GIN trigram sul documento: richiede pg_trgm, che non tutti i server
+    hanno disponibile. Senza estensione la ricerca usa solo full-text e sottostringa.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX_NAME} "
+        "ON personaggi_personaggioindicericerca USING gin (testo gin_trgm_ops)"
+    )
+
+
+def rimuovi_indice_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX_NAME}")
+
+
+def popola_indice(apps, schema_editor):
+    from personaggi.ricerca_staff import ricostruisci_indice_ricerca
+
+    ricostruisci_indice_ricerca(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("personaggi", "0254_regola_pagabile_con_deposito"),
+        ("social", "0011_alter_socialprofile_nickname"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PersonaggioIndiceRicerca",
+            fields=[
+                (
+                    "personaggio",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="indice_ricerca",
+                        serialize=False,
+                        to="personaggi.personaggio",
+                    ),
+                ),
+                ("testo", models.TextField(blank=True, default="")),
+                ("aggiornato_il", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Indice ricerca personaggio",
+                "verbose_name_plural": "Indici ricerca personaggi",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="personaggioindicericerca",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector("testo", config="simple"),
+                name="pers_ind_ric_fts_idx",
+            ),
+        ),
+        migrations.RunPython(crea_indice_trigram, rimuovi_indice_trigram),
+        migrations.RunPython(popola_indice, migrations.RunPython.noop),
+    ]
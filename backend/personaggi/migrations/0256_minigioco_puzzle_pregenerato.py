@@ -0,0 +1,32 @@
+# Pool di puzzle pregenerati per i minigiochi QR (personaggi.minigioco_pool)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("personaggi", "0255_personaggio_indice_ricerca"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MinigiocoPuzzlePregenerato",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("tipo", models.CharField(max_length=32)),
+                ("difficolta", models.PositiveSmallIntegerField()),
+                ("seed", models.PositiveIntegerField()),
+                ("stato_gioco", models.JSONField(default=dict)),
+                ("soluzione", models.JSONField(default=dict)),
+                ("creato_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Puzzle minigioco pregenerato",
+                "verbose_name_plural": "Puzzle minigioco pregenerati",
+                "indexes": [
+                    models.Index(fields=["tipo", "difficolta", "id"], name="personaggi__tipo_787127_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Indice funzionale per la risoluzione delle @menzioni InstaFame (social.mention_notifications)
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("personaggi", "0256_minigioco_puzzle_pregenerato"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="a_vista",
+            index=models.Index(
+                django.db.models.functions.text.Upper("nome"), name="a_vista_nome_upper_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Indici composti per le liste paginate/filtrate del mercato carte (personaggi.carte_mercato_service)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("personaggi", "0257_a_vista_nome_upper_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="offertascambiocarte",
+            index=models.Index(
+                fields=["campagna", "stato", "-updated_at", "-id"],
+                name="offerta_scambio_mercato_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="offertascambiocarte",
+            index=models.Index(fields=["offerente", "stato"], name="offerta_scambio_offerente_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="offertascambiocarte",
+            index=models.Index(fields=["carta_offerta", "stato"], name="offerta_scambio_cp_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="offertascambiocarte",
+            index=models.Index(fields=["richiesta_carta", "stato"], name="offerta_scambio_richiesta_idx"),
+        ),
+    ]
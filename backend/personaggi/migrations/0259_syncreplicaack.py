@@ -0,0 +1,26 @@
+# Watermark per nodo delle tombstone ricevute (compattazione sync)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("personaggi", "0258_offerta_scambio_mercato_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncReplicaAck",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("nodo", models.CharField(max_length=120, unique=True)),
+                ("confermato_fino_a", models.DateTimeField()),
+                ("ultimo_contatto", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Conferma tombstone nodo",
+                "verbose_name_plural": "Conferme tombstone nodi",
+            },
+        ),
+    ]
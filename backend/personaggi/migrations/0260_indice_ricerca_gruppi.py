@@ -0,0 +1,20 @@
+# Il documento di ricerca staff include ora i gruppi: riscrittura una tantum.
+
+from django.db import migrations
+
+
+def ripopola_indice(apps, schema_editor):
+    from personaggi.ricerca_staff import ricostruisci_indice_ricerca
+
+    ricostruisci_indice_ricerca(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("personaggi", "0259_syncreplicaack"),
+    ]
+
+    operations = [
+        migrations.RunPython(ripopola_indice, migrations.RunPython.noop),
+    ]
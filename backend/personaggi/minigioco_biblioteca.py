@@ -717,11 +717,12 @@ def biblioteca_immagine_count() -> int:
 def scegli_immagine_biblioteca(seed: int):
     from personaggi.models import MinigiocoBibliotecaImmagine
 
-    ids = list(MinigiocoBibliotecaImmagine.objects.values_list("pk", flat=True))
-    if not ids:
+    # Offset casuale sull'indice della PK: niente caricamento di tutti gli id.
+    totale = biblioteca_immagine_count()
+    if not totale:
         return None
-    pick = random.Random(seed).choice(ids)
-    return MinigiocoBibliotecaImmagine.objects.filter(pk=pick).first()
+    offset = random.Random(seed).randrange(totale)
+    return MinigiocoBibliotecaImmagine.objects.order_by("pk")[offset:offset + 1].first()
 
 
 def immagine_biblioteca_url(row, request=None) -> str:
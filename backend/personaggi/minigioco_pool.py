@@ -0,0 +1,200 @@
+"""
+Pool di puzzle pregenerati per i minigiochi QR.
+
+Per ogni (tipo, difficoltà) il nodo tiene una scorta di stati iniziali già validati
+(non risolti in partenza, soluzione nota e verificata con ``verify_solution``), con il
+seed che li ha prodotti. All'avvio di una sessione si preleva una riga con
+``SELECT … FOR UPDATE SKIP LOCKED`` e la si cancella; sotto la soglia minima parte il
+rabbocco (thread daemon a commit avvenuto, oppure ``manage.py riempi_pool_minigiochi``).
+Se il pool è vuoto si genera al volo come prima.
+"""
+from __future__ import annotations
+
+import logging
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .qr_minigioco import (
+    MINIGIOCO_TIPI,
+    MINIGIOCO_TIPO_MEMORY,
+    MINIGIOCO_TIPO_PATTERN,
+    MINIGIOCO_TIPO_PIPE,
+    MINIGIOCO_TIPO_ROTATE,
+    MINIGIOCO_TIPO_SIMON,
+    MINIGIOCO_TIPO_SLIDING,
+    generate_game_state,
+    pipe_connect_con_soluzione,
+    verify_solution,
+)
+
+logger = logging.getLogger(__name__)
+
+DIFFICOLTA = (1, 2, 3, 4)
+DEFAULT_POOL_TARGET = 32
+DEFAULT_POOL_SOGLIA_MINIMA = 8
+TENTATIVI_GENERAZIONE = 20
+
+_rabbocchi_in_corso: set[tuple[str, int]] = set()
+_rabbocchi_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PuzzleGenerato:
+    tipo: str
+    difficolta: int
+    seed: int
+    stato_gioco: Dict[str, Any]
+    soluzione: Dict[str, Any]
+
+
+def pool_target() -> int:
+    return int(getattr(settings, "MINIGIOCO_POOL_TARGET", DEFAULT_POOL_TARGET))
+
+
+def pool_soglia_minima() -> int:
+    return int(getattr(settings, "MINIGIOCO_POOL_SOGLIA_MINIMA", DEFAULT_POOL_SOGLIA_MINIMA))
+
+
+def soluzione_puzzle(tipo: str, difficolta: int, seed: int, stato: Dict[str, Any]) -> Dict[str, Any]:
+    """Stato client che risolve il puzzle (stesso formato inviato da completa_sessione)."""
+    if tipo == MINIGIOCO_TIPO_SLIDING:
+        size = int(stato["size"])
+        return {"tiles": list(range(size * size))}
+    if tipo == MINIGIOCO_TIPO_MEMORY:
+        return {"matched": list(range(len(stato["cards"])))}
+    if tipo == MINIGIOCO_TIPO_ROTATE:
+        return {"rotations": [0] * len(stato["rotations"])}
+    if tipo == MINIGIOCO_TIPO_SIMON:
+        return {"player_input": list(stato["sequence"])}
+    if tipo == MINIGIOCO_TIPO_PATTERN:
+        return {"player_input": list(stato["pattern"])}
+    if tipo == MINIGIOCO_TIPO_PIPE:
+        return {"rotations": pipe_connect_con_soluzione(difficolta, seed)[1]}
+    raise ValueError(f"Tipo minigioco sconosciuto: {tipo}")
+
+
+def _stato_iniziale_client(stato: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in stato.items() if k != "tipo"}
+
+
+def genera_puzzle_validato(tipo: str, difficolta: int, seed: int) -> PuzzleGenerato:
+    """
+    Genera dal seed (e successivi, se serve) un puzzle non già risolto in partenza
+    e con soluzione verificata.
+    """
+    for tentativo in range(TENTATIVI_GENERAZIONE):
+        s = (seed + tentativo) % 2_147_483_647 or 1
+        stato = generate_game_state(tipo, difficolta, s)
+        soluzione = soluzione_puzzle(tipo, difficolta, s, stato)
+        if verify_solution(tipo, difficolta, _stato_iniziale_client(stato), stato):
+            continue
+        if not verify_solution(tipo, difficolta, soluzione, stato):
+            continue
+        return PuzzleGenerato(tipo, difficolta, s, stato, soluzione)
+    raise ValueError(f"Impossibile generare un puzzle valido per {tipo}/{difficolta}.")
+
+
+def riempi_pool(
+    tipi: Optional[List[str]] = None,
+    difficolta: Optional[List[int]] = None,
+    *,
+    target: Optional[int] = None,
+) -> int:
+    """Porta ogni (tipo, difficoltà) al target; ritorna il numero di puzzle creati."""
+    from .models import MinigiocoPuzzlePregenerato
+
+    target = pool_target() if target is None else int(target)
+    rng = random.SystemRandom()
+    creati = 0
+    for tipo in tipi or MINIGIOCO_TIPI:
+        for d in difficolta or DIFFICOLTA:
+            mancanti = target - MinigiocoPuzzlePregenerato.objects.filter(
+                tipo=tipo, difficolta=d
+            ).count()
+            if mancanti <= 0:
+                continue
+            nuovi = []
+            for _ in range(mancanti):
+                try:
+                    p = genera_puzzle_validato(tipo, d, rng.randint(1, 2_147_483_647))
+                except ValueError:
+                    logger.warning("Pool minigiochi: seed scartato per %s/%s", tipo, d)
+                    continue
+                nuovi.append(
+                    MinigiocoPuzzlePregenerato(
+                        tipo=tipo,
+                        difficolta=d,
+                        seed=p.seed,
+                        stato_gioco=p.stato_gioco,
+                        soluzione=p.soluzione,
+                    )
+                )
+            MinigiocoPuzzlePregenerato.objects.bulk_create(nuovi)
+            creati += len(nuovi)
+    return creati
+
+
+def _rabbocco_in_thread(tipo: str, difficolta: int) -> None:
+    chiave = (tipo, difficolta)
+    with _rabbocchi_lock:
+        if chiave in _rabbocchi_in_corso:
+            return
+        _rabbocchi_in_corso.add(chiave)
+
+    def _worker():
+        try:
+            riempi_pool([tipo], [difficolta])
+        except Exception:
+            logger.exception("Rabbocco pool minigiochi %s/%s fallito", tipo, difficolta)
+        finally:
+            connection.close()
+            with _rabbocchi_lock:
+                _rabbocchi_in_corso.discard(chiave)
+
+    threading.Thread(target=_worker, daemon=True).start()
+
+
+def _pianifica_rabbocco(tipo: str, difficolta: int) -> None:
+    if not getattr(settings, "MINIGIOCO_POOL_RABBOCCO_AUTOMATICO", True):
+        return
+    transaction.on_commit(lambda: _rabbocco_in_thread(tipo, difficolta))
+
+
+def preleva_puzzle(tipo: str, difficolta: int) -> Optional[PuzzleGenerato]:
+    """Estrae e consuma un puzzle dal pool; None se la scorta è esaurita."""
+    from .models import MinigiocoPuzzlePregenerato
+
+    with transaction.atomic():
+        row = (
+            MinigiocoPuzzlePregenerato.objects.select_for_update(skip_locked=True)
+            .filter(tipo=tipo, difficolta=difficolta)
+            .order_by("id")
+            .first()
+        )
+        if row is not None:
+            MinigiocoPuzzlePregenerato.objects.filter(pk=row.pk).delete()
+        rimasti = MinigiocoPuzzlePregenerato.objects.filter(tipo=tipo, difficolta=difficolta).count()
+        if rimasti < pool_soglia_minima():
+            _pianifica_rabbocco(tipo, difficolta)
+    if row is None:
+        return None
+    return PuzzleGenerato(tipo, difficolta, row.seed, row.stato_gioco, row.soluzione)
+
+
+def puzzle_per_sessione(tipo: str, difficolta: int, seed: int) -> PuzzleGenerato:
+    """Puzzle dal pool, oppure generato al volo dal seed se il pool è vuoto."""
+    puzzle = preleva_puzzle(tipo, difficolta)
+    if puzzle is not None:
+        return puzzle
+    try:
+        return genera_puzzle_validato(tipo, difficolta, seed)
+    except ValueError:
+        # Nessun seed valido entro i tentativi: la sessione parte comunque, come prima del pool.
+        logger.warning("Minigioco %s/%s: puzzle non validato dal seed %s", tipo, difficolta, seed)
+        stato = generate_game_state(tipo, difficolta, seed)
+        return PuzzleGenerato(tipo, difficolta, seed, stato, soluzione_puzzle(tipo, difficolta, seed, stato))
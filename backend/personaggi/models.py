@@ -5,11 +5,14 @@ import random
 import hashlib
 import secrets
 import string
-import copy
+import collections
+import functools
+import threading
 from decimal import Decimal
 from io import BytesIO
 from django.db import models, IntegrityError, transaction
 from django.db.models import Q
+from django.db.models.functions import Upper
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
@@ -18,6 +21,9 @@ from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.conf import settings
 from django.contrib.auth.models import User, Group
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from kor35.perf_metrics import segnala_cache
 from kor35.syncing import SyncableModel
 from colorfield.fields import ColorField
 from cms.models.pluginmodel import CMSPlugin
@@ -1064,6 +1070,112 @@ def calcola_metatalenti(personaggio, context, mods_attivi):
     return "".join(testo_parts)
 
 
+# Memo dei testi renderizzati.
+# L'output della sostituzione placeholder dipende solo dal template e dai valori che le sue
+# espressioni leggono: la chiave è (testo, formula, impronta dei soli parametri citati), quindi
+# PG con vettori di statistiche diversi ma stessi valori per quei parametri condividono la voce.
+# Il template fa parte della chiave: modificarlo equivale a una nuova revisione.
+TESTI_MEMO_MAX = 8192
+_RE_IDENTIFICATORE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_RE_BLOCCO_GRAFFE = re.compile(r"\{([^}]*)\}")
+# Chiavi lette dalla sorgente implicita (Chop!/Blam!/Pierce!) oltre ai parametri dei gruppi.
+_PARAMETRI_SORGENTE_IMPLICITA = frozenset(
+    {"dmg_mischia", "dmg_distanza", "dannimis", "dannidis", "dannigen"} | set(IMPLICIT_SOURCE_PARENS)
+)
+
+
+def _identificatori_config(value):
+    if isinstance(value, str):
+        return {m.lower() for m in _RE_IDENTIFICATORE.findall(value)}
+    if isinstance(value, dict):
+        out = set()
+        for k, v in value.items():
+            out |= _identificatori_config(k) | _identificatori_config(v)
+        return out
+    if isinstance(value, (list, tuple)):
+        out = set()
+        for v in value:
+            out |= _identificatori_config(v)
+        return out
+    return set()
+
+
+_PARAMETRI_GRUPPI_ESCLUSIVI = frozenset(
+    _identificatori_config(EXCLUSIVE_FORMAT_GROUPS) | _PARAMETRI_SORGENTE_IMPLICITA
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parametri_letti_template(testo, formula):
+    """Nomi (minuscoli) che le espressioni del template possono leggere dal contesto."""
+    nomi = set()
+    for blocco in _RE_BLOCCO_GRAFFE.findall(f"{testo}\n{formula}"):
+        nomi.update(m.lower() for m in _RE_IDENTIFICATORE.findall(blocco))
+    if nomi & (set(EXCLUSIVE_FORMAT_GROUPS) | {"exclusive"}) or "{formula_source}" in formula:
+        nomi |= _PARAMETRI_GRUPPI_ESCLUSIVI
+    return frozenset(nomi)
+
+
+def _impronta_oggetto(obj):
+    if hasattr(obj, "nome"):
+        nome = obj.nome
+    elif hasattr(obj, "dichiarazione"):
+        nome = obj.dichiarazione
+    else:
+        nome = str(obj)
+    return (type(obj).__name__, getattr(obj, "pk", None), nome)
+
+
+def _chiave_memo_testo(testo, formula, eval_context, object_context, base_values, mods_attivi):
+    nomi = _parametri_letti_template(testo, formula)
+
+    def _letti(mappa, valore=repr):
+        return tuple(sorted(
+            (str(k), valore(v)) for k, v in mappa.items()
+            if str(k).lower() in nomi or str(k).startswith("__")
+        ))
+
+    return (
+        testo,
+        formula,
+        _letti(eval_context),
+        repr(_letti(object_context, _impronta_oggetto)),
+        _letti(base_values),
+        _letti(mods_attivi),
+    )
+
+
+class _MemoTesti:
+    """LRU di processo, thread-safe, per i testi renderizzati."""
+
+    def __init__(self, max_voci):
+        self.max_voci = max_voci
+        self._voci = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chiave):
+        with self._lock:
+            valore = self._voci.get(chiave)
+            if valore is not None:
+                self._voci.move_to_end(chiave)
+        segnala_cache(valore is not None)
+        return valore
+
+    def set(self, chiave, valore):
+        with self._lock:
+            self._voci[chiave] = valore
+            self._voci.move_to_end(chiave)
+            while len(self._voci) > self.max_voci:
+                self._voci.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._voci.clear()
+
+
+_memo_testi = _MemoTesti(TESTI_MEMO_MAX)
+
+
 # 4. FUNZIONE PRINCIPALE
 def formatta_testo_generico(testo, formula=None, statistiche_base=None, personaggio=None, context=None, solo_formula=False):
     testo_out = testo or ""
@@ -1099,8 +1211,8 @@ def formatta_testo_generico(testo, formula=None, statistiche_base=None, personag
     mods_attivi = {}
     testo_metatalenti = ""
     if personaggio:
-        # Copia i modificatori globali
-        mods_attivi = copy.deepcopy(personaggio.modificatori_calcolati)
+        # Copia i modificatori globali (un livello basta: {param: {'add', 'mol'}})
+        mods_attivi = {param: dict(valori) for param, valori in personaggio.modificatori_calcolati.items()}
         
         # Aggiungi modificatori condizionali (specifici del contesto: es. "Solo Fuoco")
         if context:
@@ -1326,7 +1438,16 @@ def formatta_testo_generico(testo, formula=None, statistiche_base=None, personag
             testo_completo = testo_completo.replace("{entity_name}", entity_name)
             formula_out = formula_out.replace("{entity_name}", entity_name)
     # fine sezione aggiunte
-    
+
+    memo_key = None
+    if exclusive_groups_config is EXCLUSIVE_FORMAT_GROUPS:
+        memo_key = _chiave_memo_testo(
+            testo_completo, formula_out, eval_context, object_context, base_values, mods_attivi
+        )
+        cached = _memo_testi.get(memo_key)
+        if cached is not None:
+            return cached
+
     # Esegue le sostituzioni
     pattern_if = re.compile(r'\{if\s+(.+?)\}(.*?)\{endif\}', re.DOTALL | re.IGNORECASE)
     
@@ -1353,8 +1474,11 @@ def formatta_testo_generico(testo, formula=None, statistiche_base=None, personag
     if formula_finale:
         if testo_finale: parts.append("<br/><hr style='margin:5px 0; border:0; border-top:1px dashed #ccc;'/>")
         parts.append(f"<strong>Formula:</strong> {formula_finale}")
-        
-    return "".join(parts)
+
+    out = "".join(parts)
+    if memo_key is not None:
+        _memo_testi.set(memo_key, out)
+    return out
 
 
 def calcola_cariche_massime_da_infusione(infusione, personaggio=None):
@@ -1592,7 +1716,10 @@ class A_vista(SyncableModel, models.Model):
     nome = models.CharField(max_length=100)
     testo = models.TextField(blank=True, null=True)
     def __str__(self): return f"{self.nome} ({self.id})"
-    class Meta: ordering = ['-data_creazione']; verbose_name = "Elemento dell'Oggetto"; verbose_name_plural = "Elementi dell'Oggetto"
+    class Meta:
+        ordering = ['-data_creazione']; verbose_name = "Elemento dell'Oggetto"; verbose_name_plural = "Elementi dell'Oggetto"
+        # Risoluzione @menzioni InstaFame (nome__iexact su Personaggio) in una sola lookup indicizzata.
+        indexes = [models.Index(Upper("nome"), name="a_vista_nome_upper_idx")]
 
 class CondizioneStatisticaMixin(SyncableModel, models.Model):
     usa_limitazione_aura = models.BooleanField("Usa Limitazione Aura", default=False)
@@ -4235,6 +4362,30 @@ class MinigiocoQrSession(SyncableModel, models.Model):
         ]
 
 
+class MinigiocoPuzzlePregenerato(models.Model):
+    """
+    Puzzle minigioco già generato e validato, in attesa di una sessione
+    (pool locale al nodo, non sincronizzato). Vedi personaggi.minigioco_pool.
+    """
+
+    tipo = models.CharField(max_length=32)
+    difficolta = models.PositiveSmallIntegerField()
+    seed = models.PositiveIntegerField()
+    stato_gioco = models.JSONField(default=dict)
+    soluzione = models.JSONField(default=dict)
+    creato_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Puzzle minigioco pregenerato"
+        verbose_name_plural = "Puzzle minigioco pregenerati"
+        indexes = [
+            models.Index(fields=["tipo", "difficolta", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} d{self.difficolta} #{self.pk}"
+
+
 class InnescoTimer(A_vista):
     """
     Innesco timer personale (e broadcast mirato) collegabile a un QrCode come altre A_vista.
@@ -4886,6 +5037,22 @@ class Personaggio(Inventario):
         self.save(update_fields=["era", "prefettura", "prefettura_esterna", "updated_at"])
         self._sync_abilita_default_era()
 
+    def _catalogo_regole(self):
+        """
+        Snapshot catalogo regole (personaggi.catalogo_regole), memorizzato sull'istanza
+        finché nel processo non cambia la revisione: dentro una transazione la cache di
+        processo non viene popolata, così il catalogo si costruisce una volta per istanza.
+        """
+        from .catalogo_regole import catalogo_regole_generation, get_catalogo_regole
+
+        gen = catalogo_regole_generation()
+        memo = getattr(self, '_catalogo_regole_memo', None)
+        if memo is not None and memo[0] == gen:
+            return memo[1]
+        catalogo = get_catalogo_regole()
+        self._catalogo_regole_memo = (gen, catalogo)
+        return catalogo
+
     def get_valore_massimo_risorsa_runtime(self, sigla):
         """
         Tetto massimo per rigenerazioni e consumi pool (risorse_consumabili).
@@ -4894,7 +5061,7 @@ class Personaggio(Inventario):
         sigla = (sigla or '').strip().upper()
         if not sigla:
             return 0
-        st = Statistica.objects.filter(sigla=sigla).first()
+        st = self._catalogo_regole().statistica(sigla)
         ref = ''
         if st and getattr(st, 'massimo_pool_sigla', None):
             ref = (st.massimo_pool_sigla or '').strip().upper()
@@ -4904,8 +5071,8 @@ class Personaggio(Inventario):
 
     def get_risorsa_corrente(self, sigla):
         """Punti correnti nel pool per una statistica contrassegnata come risorsa (es. FRT)."""
-        stat = Statistica.objects.filter(sigla=sigla, is_risorsa_pool=True).first()
-        if not stat:
+        stat = self._catalogo_regole().statistica(sigla)
+        if not stat or not stat.is_risorsa_pool:
             return 0
         max_v = self.get_valore_massimo_risorsa_runtime(sigla)
         if max_v <= 0:
@@ -4922,8 +5089,8 @@ class Personaggio(Inventario):
         return max(0, min(v, max_v))
 
     def _get_cfg_recupero_risorsa(self, sigla):
-        stat = Statistica.objects.filter(sigla=sigla, is_risorsa_pool=True).first()
-        if not stat or not stat.auto_recupero_attivo:
+        stat = self._catalogo_regole().statistica(sigla)
+        if not stat or not stat.is_risorsa_pool or not stat.auto_recupero_attivo:
             return None
         interval_seconds = max(1, int(stat.auto_recupero_intervallo_secondi or 0))
         step = max(1, int(stat.auto_recupero_step or 0))
@@ -5006,7 +5173,7 @@ class Personaggio(Inventario):
             return False
 
     def get_risorsa_corrente_runtime(self, sigla):
-        stat = Statistica.objects.filter(sigla=sigla).first()
+        stat = self._catalogo_regole().statistica(sigla)
         if not stat:
             return 0
         max_v = self.get_valore_massimo_risorsa_runtime(sigla)
@@ -5025,7 +5192,7 @@ class Personaggio(Inventario):
         return max(0, min(v, max_v))
 
     def _set_risorsa_corrente_runtime(self, sigla, valore):
-        stat = Statistica.objects.filter(sigla=sigla).first()
+        stat = self._catalogo_regole().statistica(sigla)
         if stat and stat.is_risorsa_pool:
             self._set_risorsa_corrente(sigla, valore)
             return
@@ -5037,7 +5204,9 @@ class Personaggio(Inventario):
     def get_cfg_recuperi_automatici(self):
         cfg = self._get_cfg_recuperi_da_abilita()
         # Compatibilità con la configurazione legacy su Statistica (pool).
-        for st in Statistica.objects.filter(is_risorsa_pool=True, auto_recupero_attivo=True):
+        for st in self._catalogo_regole().statistiche:
+            if not (st.is_risorsa_pool and st.auto_recupero_attivo):
+                continue
             sigla = st.sigla
             row = cfg.get(sigla)
             interval_seconds = max(1, int(st.auto_recupero_intervallo_secondi or 1))
@@ -5223,7 +5392,7 @@ class Personaggio(Inventario):
             rec.next_tick_at = rec.next_tick_at + timedelta(seconds=ticks * max(1, rec.interval_seconds))
 
             if delta > 0:
-                stat = Statistica.objects.filter(sigla=sigla).first()
+                stat = self._catalogo_regole().statistica(sigla)
                 if stat and stat.is_risorsa_pool:
                     rc[sigla] = new_cur
                 else:
@@ -5288,8 +5457,8 @@ class Personaggio(Inventario):
         """
         Consuma un punto dal pool. Crea movimento, log ed eventuali effetti temporanei dalle abilità.
         """
-        stat = Statistica.objects.filter(sigla=sigla, is_risorsa_pool=True).first()
-        if not stat:
+        stat = self._catalogo_regole().statistica(sigla)
+        if not stat or not stat.is_risorsa_pool:
             raise ValueError('Statistica non configurata come risorsa a pool.')
         max_v = self.get_valore_massimo_risorsa_runtime(sigla)
         if max_v <= 0:
@@ -5332,7 +5501,7 @@ class Personaggio(Inventario):
             raise ValueError('Quantità non valida.')
         if quantita <= 0:
             return self.get_risorsa_corrente_runtime(sigla)
-        stat = Statistica.objects.filter(sigla=sigla).first()
+        stat = self._catalogo_regole().statistica(sigla)
         if not stat:
             raise ValueError(f'Statistica {sigla} non trovata.')
         max_v = self.get_valore_massimo_risorsa_runtime(sigla)
@@ -5376,8 +5545,8 @@ class Personaggio(Inventario):
             raise ValueError('Variazione non valida.')
         if delta == 0:
             raise ValueError('La variazione non può essere zero.')
-        stat = Statistica.objects.filter(sigla=sigla, is_risorsa_pool=True).first()
-        if not stat:
+        stat = self._catalogo_regole().statistica(sigla)
+        if not stat or not stat.is_risorsa_pool:
             raise ValueError('Statistica non configurata come risorsa a pool.')
         max_v = self.get_valore_massimo_risorsa_runtime(sigla)
         if max_v <= 0:
@@ -5513,8 +5682,9 @@ class Personaggio(Inventario):
 
         # Valori base da scheda (PersonaggioStatisticaBase / default statistica): senza questo,
         # punteggi_dipendenti usa solo abilita_punteggio e sorgenti come Chakra restano sempre 0.
-        for stat in Statistica.objects.filter(parametro__isnull=False).exclude(parametro__exact=''):
-            base_pg = int(self.get_valore_statistica_base(stat) or 0)
+        valori_base = self._valori_statistiche_base_map()
+        for stat in self._catalogo_regole().statistiche_con_parametro():
+            base_pg = int(valori_base.get(stat.id, stat.valore_base_predefinito) or 0)
             nome = stat.nome
             from_links = int(p.get(nome, 0) or 0)
             p[nome] = base_pg + from_links
@@ -5583,7 +5753,7 @@ class Personaggio(Inventario):
         così contano anche AbilitaStatistica / oggetti / effetti. Per altri Punteggi,
         usa solo la somma in punteggi_per_nome.
         """
-        stat = Statistica.objects.filter(nome=source_nome).first()
+        stat = self._catalogo_regole().statistica_per_nome(source_nome)
         if not stat or not stat.parametro:
             return int(punteggi_per_nome.get(source_nome, 0) or 0)
         self._punteggi_base_partial_for_mods = punteggi_per_nome
@@ -5761,9 +5931,10 @@ class Personaggio(Inventario):
         regole = self._collect_regole_punteggio_dipendente(exclude_abilita_ids=None)
         p = self._applica_punteggi_dipendenti(p, regole)
 
-        agen = Punteggio.objects.filter(tipo=AURA, is_generica=True).first()
+        catalogo = self._catalogo_regole()
+        agen = catalogo.aura_generica(AURA)
         if agen:
-            others = set(Punteggio.objects.filter(tipo=AURA).exclude(id=agen.id).values_list('nome', flat=True))
+            others = catalogo.nomi_tipo(AURA) - {agen.nome}
             max_val = 0
             for k, v in p.items():
                 if k in others and v > max_val: max_val = v
@@ -5781,11 +5952,10 @@ class Personaggio(Inventario):
         regole = self._collect_regole_punteggio_dipendente(exclude_abilita_ids=exclude_abilita_ids)
         p = self._applica_punteggi_dipendenti(p, regole)
 
-        agen = Punteggio.objects.filter(tipo=AURA, is_generica=True).first()
+        catalogo = self._catalogo_regole()
+        agen = catalogo.aura_generica(AURA)
         if agen:
-            others = set(
-                Punteggio.objects.filter(tipo=AURA).exclude(id=agen.id).values_list('nome', flat=True)
-            )
+            others = catalogo.nomi_tipo(AURA) - {agen.nome}
             max_val = 0
             for k, v in p.items():
                 if k in others and v > max_val:
@@ -5795,9 +5965,7 @@ class Personaggio(Inventario):
 
     def _caratteristiche_dict_da_punteggi_nomi(self, punteggi_per_nome):
         """Filtra un dict {nome_punteggio: valore} lasciando solo le caratteristiche (tipo CA)."""
-        nomi_ca = set(
-            Punteggio.objects.filter(tipo=CARATTERISTICA).values_list('nome', flat=True)
-        )
+        nomi_ca = self._catalogo_regole().nomi_tipo(CARATTERISTICA)
         return {k: v for k, v in punteggi_per_nome.items() if k in nomi_ca}
 
     def _ids_tratti_aura_innata_slot(self, slot):
@@ -5821,14 +5989,21 @@ class Personaggio(Inventario):
         """
         Recupera il valore base di una statistica per questo personaggio.
         Se non esiste il record, usa valore_base_predefinito senza creare righe.
+        Accetta sia Statistica sia StatisticaInfo del catalogo regole.
         """
         link = PersonaggioStatisticaBase.objects.filter(
             personaggio=self,
-            statistica=statistica
+            statistica_id=statistica.id
         ).first()
         if link:
             return link.valore_base
         return statistica.valore_base_predefinito
+
+    def _valori_statistiche_base_map(self):
+        """{statistica_id: valore_base} delle righe PersonaggioStatisticaBase (una query)."""
+        return dict(
+            PersonaggioStatisticaBase.objects.filter(personaggio=self).values_list('statistica_id', 'valore_base')
+        )
     
     @property
     def statistiche_base_dict(self):
@@ -5840,13 +6015,11 @@ class Personaggio(Inventario):
         if hasattr(self, '_statistiche_base_cache'):
             return self._statistiche_base_cache
         
-        # Recupera tutte le statistiche
-        tutte_statistiche = Statistica.objects.all()
+        valori_base = self._valori_statistiche_base_map()
         risultato = {}
         
-        for stat in tutte_statistiche:
-            if stat.parametro:
-                risultato[stat.parametro] = self.get_valore_statistica_base(stat)
+        for stat in self._catalogo_regole().statistiche_con_parametro():
+            risultato[stat.parametro] = valori_base.get(stat.id, stat.valore_base_predefinito)
         
         self._statistiche_base_cache = risultato
         return risultato
@@ -5859,21 +6032,20 @@ class Personaggio(Inventario):
         Durante il calcolo dei punteggi dipendenti, usa _punteggi_base_partial_for_mods
         per evitare ricorsione su punteggi_base completo.
         """
+        nomi_ca = self._catalogo_regole().nomi_tipo(CARATTERISTICA)
         if hasattr(self, '_punteggi_base_partial_for_mods'):
             p = self._punteggi_base_partial_for_mods
-            nomi_ca = set(
-                Punteggio.objects.filter(tipo=CARATTERISTICA).values_list('nome', flat=True)
-            )
             return {k: v for k, v in p.items() if k in nomi_ca}
-        return {
-            k: v
-            for k, v in self.punteggi_base.items()
-            if Punteggio.objects.filter(nome=k, tipo=CARATTERISTICA).exists()
-        }
+        return {k: v for k, v in self.punteggi_base.items() if k in nomi_ca}
     
     def get_valore_aura_effettivo(self, aura):
         pb = self.punteggi_base
-        if aura.is_generica: return max([v for k,v in pb.items() if Punteggio.objects.filter(nome=k, tipo=AURA, is_generica=False).exists()] or [0])
+        if aura.is_generica:
+            catalogo = self._catalogo_regole()
+            nomi_aure_specifiche = {
+                p.nome for p in catalogo.punteggi.values() if p.tipo == AURA and not p.is_generica
+            }
+            return max([v for k, v in pb.items() if k in nomi_aure_specifiche] or [0])
         return pb.get(aura.nome, 0)
 
     def get_valore_aura_per_sigla(self, sigla):
@@ -5881,7 +6053,7 @@ class Personaggio(Inventario):
         Valore effettivo di un'aura (Punteggio tipo AU) per sigla (es. ATE, AMS).
         Non usare get_valore_statistica: le aure non sono Statistiche (tipo ST).
         """
-        aura = Punteggio.objects.filter(sigla=sigla, tipo=AURA).first()
+        aura = self._catalogo_regole().punteggio_per_sigla(sigla, tipo=AURA)
         if not aura:
             return 0
         return self.get_valore_aura_effettivo(aura)
@@ -6152,7 +6324,7 @@ class Personaggio(Inventario):
                 if not s_sig:
                     continue
                 if s_sig not in stat_cache:
-                    stat_cache[s_sig] = Statistica.objects.filter(sigla=s_sig).first()
+                    stat_cache[s_sig] = self._catalogo_regole().statistica(s_sig)
                 st_obj = stat_cache[s_sig]
                 if not st_obj or not st_obj.parametro:
                     continue
@@ -6181,7 +6353,7 @@ class Personaggio(Inventario):
                 if not s_sig:
                     continue
                 if s_sig not in stat_cache:
-                    stat_cache[s_sig] = Statistica.objects.filter(sigla=s_sig).first()
+                    stat_cache[s_sig] = self._catalogo_regole().statistica(s_sig)
                 st_obj = stat_cache[s_sig]
                 if not st_obj or not st_obj.parametro:
                     continue
@@ -6818,7 +6990,7 @@ class Personaggio(Inventario):
         Con _punteggi_base_partial_for_mods (uso interno) la base viene letta dal dict parziale.
         """
         try:
-            stat_obj = Statistica.objects.filter(sigla=sigla).first()
+            stat_obj = self._catalogo_regole().statistica(sigla)
             if not stat_obj or not stat_obj.parametro:
                 return 0
             mods = self.modificatori_calcolati.get(stat_obj.parametro, {'add': 0, 'mol': 1.0})
@@ -6846,6 +7018,37 @@ class Personaggio(Inventario):
             return int(max(0, costo_base - riduzione))
         return int(costo_base)
 
+class PersonaggioIndiceRicerca(models.Model):
+    """
+    Documento di ricerca denormalizzato per la console staff (nome, proprietario,
+    carriere, campagna, …), normalizzato in minuscolo e senza accenti.
+    Derivato dagli altri modelli e mantenuto dai signal: non va in edge sync.
+    Su Postgres ha un indice full-text; l'indice trigram (pg_trgm) è creato dalla
+    migrazione solo se l'estensione è disponibile. Vedi personaggi.ricerca_staff.
+    """
+    personaggio = models.OneToOneField(
+        Personaggio,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="indice_ricerca",
+    )
+    testo = models.TextField(blank=True, default="")
+    aggiornato_il = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Indice ricerca personaggio"
+        verbose_name_plural = "Indici ricerca personaggi"
+        indexes = [
+            GinIndex(
+                SearchVector("testo", config="simple"),
+                name="pers_ind_ric_fts_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Indice ricerca: {self.personaggio_id}"
+
+
 class PersonaggioAbilita(SyncableModel, models.Model):
     personaggio = models.ForeignKey(Personaggio, on_delete=models.CASCADE)
     abilita = models.ForeignKey(Abilita, on_delete=models.CASCADE)
@@ -7383,6 +7586,24 @@ class SyncTombstone(models.Model):
         return f"{self.model_label} {self.sync_id} @ {self.deleted_at}"
 
 
+class SyncReplicaAck(models.Model):
+    """
+    Fin dove un nodo remoto ha ricevuto le tombstone di questo nodo (watermark del suo ultimo
+    sync riuscito). La compattazione elimina solo tombstone confermate da tutti i nodi noti.
+    """
+
+    nodo = models.CharField(max_length=120, unique=True)
+    confermato_fino_a = models.DateTimeField()
+    ultimo_contatto = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Conferma tombstone nodo"
+        verbose_name_plural = "Conferme tombstone nodi"
+
+    def __str__(self):
+        return f"{self.nodo} @ {self.confermato_fino_a}"
+
+
 @receiver(post_save, sender=User)
 def touch_user_sync_state(sender, instance, **kwargs):
     AuthUserSyncState.objects.update_or_create(user=instance, defaults={})
@@ -262,7 +262,8 @@ def _generate_pipe_path(size: int, rng: random.Random) -> List[tuple[int, int]]:
     return path
 
 
-def generate_pipe_connect_state(difficolta: int, seed: int) -> Dict[str, Any]:
+def pipe_connect_con_soluzione(difficolta: int, seed: int) -> Tuple[Dict[str, Any], List[int]]:
+    """Stato iniziale + rotazioni che collegano il percorso (per il pool pregenerato)."""
     d = max(1, min(4, int(difficolta or 2)))
     size = _PIPE_GRID[d]
     rng = _rng(seed)
@@ -270,6 +271,7 @@ def generate_pipe_connect_state(difficolta: int, seed: int) -> Dict[str, Any]:
     path_set = set(path)
     bases: List[int] = []
     rotations: List[int] = []
+    soluzione: List[int] = []
     for r in range(size):
         for c in range(size):
             if (r, c) in path_set:
@@ -279,13 +281,20 @@ def generate_pipe_connect_state(difficolta: int, seed: int) -> Dict[str, Any]:
             base, rot = _encode_pipe_tile(mask, rng)
             bases.append(base)
             rotations.append(rot)
-    return {
+            giusta = next((k for k in range(4) if _rotate_pipe_mask(base, k) == mask), rot)
+            soluzione.append(giusta if mask else rot)
+    stato = {
         "size": size,
         "start": 0,
         "end": size * size - 1,
         "bases": bases,
         "rotations": rotations,
     }
+    return stato, soluzione
+
+
+def generate_pipe_connect_state(difficolta: int, seed: int) -> Dict[str, Any]:
+    return pipe_connect_con_soluzione(difficolta, seed)[0]
 
 
 def generate_game_state(tipo: str, difficolta: int, seed: int) -> Dict[str, Any]:
@@ -684,10 +693,12 @@ def _sessione_payload(sess, config, request=None) -> Dict[str, Any]:
 def _crea_sessione(personaggio, qr_code, config, request=None):
     from .models import MinigiocoQrSession
 
+    from .minigioco_pool import puzzle_per_sessione
+
     seed = random.randint(1, 2_147_483_647)
     tipo, difficolta = scegli_tipo_e_difficolta(config, seed, personaggio=personaggio)
     game_seed = _rng(seed).randint(1, 2_147_483_647)
-    stato = generate_game_state(tipo, difficolta, game_seed)
+    stato = puzzle_per_sessione(tipo, difficolta, game_seed).stato_gioco
     img_url, bib_row = risolvi_immagine_sessione(config, request, seed=seed)
     scadenza_at = None
     if config.timer_secondi and int(config.timer_secondi) > 0:
@@ -0,0 +1,53 @@
+"""
+Rendering immagini QR (PNG/SVG) con cache di processo.
+
+Un QR dipende solo da (contenuto, dimensione modulo, bordo, formato): l'immagine si genera
+una volta per processo e si riusa (LRU limitata). Le pagine stampabili e gli schermi lobby
+puntano all'URL ``personaggi:qr_code_image`` (cache HTTP a lungo termine) invece di incorporare data URI.
+"""
+from __future__ import annotations
+
+import base64
+import io
+import re
+from functools import lru_cache
+
+import qrcode
+import qrcode.image.svg
+
+QR_FORMATI = {"png": "image/png", "svg": "image/svg+xml"}
+QR_BOX_SIZE_DEFAULT = 10
+QR_BOX_SIZE_MAX = 40
+QR_BORDER_DEFAULT = 4
+QR_CACHE_MAX_IMMAGINI = 1024
+# Contenuti ammessi dall'endpoint pubblico (id QrCode e simili): niente testo arbitrario.
+QR_PAYLOAD_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def normalizza_box_size(value, default: int = QR_BOX_SIZE_DEFAULT) -> int:
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, QR_BOX_SIZE_MAX))
+
+
+@lru_cache(maxsize=QR_CACHE_MAX_IMMAGINI)
+def render_qr(payload: str, box_size: int = QR_BOX_SIZE_DEFAULT, border: int = QR_BORDER_DEFAULT, fmt: str = "png") -> bytes:
+    """Bytes dell'immagine QR; ``fmt`` è una chiave di QR_FORMATI."""
+    if fmt not in QR_FORMATI:
+        raise ValueError(f"Formato QR non supportato: {fmt}")
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=box_size, border=border)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    if fmt == "svg":
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def qr_data_uri(payload: str, box_size: int = QR_BOX_SIZE_DEFAULT, border: int = QR_BORDER_DEFAULT) -> str:
+    png = render_qr(str(payload), box_size, border, "png")
+    return f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}"
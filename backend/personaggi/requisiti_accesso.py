@@ -1,117 +1,231 @@
 """
 Valutazione requisiti JSON condivisi (manifesti, negozi mercante, …).
+
+Le liste di requisiti si compilano una volta in predicati tipizzati (LRU di processo per
+contenuto: regole modificate = nuova chiave). Si valutano contro un ``FattiPersonaggio``
+memorizzato sull'istanza personaggio: abilità e membership attive si leggono con una query
+ciascuna alla prima richiesta, aure e nomi statistica dal catalogo regole in memoria, così una
+lista che filtra decine di voci (negozi, gruppi, pagine) interroga il DB una volta sola.
 """
 from __future__ import annotations
 
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Any, Iterable, Tuple
 
+REQUISITI_COMPILATI_MAX = 2048
 
-def personaggio_soddisfa_requisiti(personaggio, requisiti: Iterable[dict] | None) -> Tuple[bool, str]:
-    """Ritorna (ok, messaggio). Lista vuota / None = accesso libero."""
-    from .models import Abilita, Punteggio, AURA, Statistica, PersonaggioCarrieraMembership
 
-    reqs = requisiti or []
+@dataclass(frozen=True)
+class RequisitoCompilato:
+    tipo: str
+    min: int = 1
+    sigla: str = ""
+    nome: str = ""
+    id: Any = None
+
+
+@dataclass
+class FattiPersonaggio:
+    """Fatti del personaggio letti dai requisiti; abilità e membership caricate al primo uso."""
+
+    personaggio: Any
+    _statistiche: dict = field(default_factory=dict)
+    _aure: dict = field(default_factory=dict)
+    _aure_per_nome: dict = field(default_factory=dict)
+    _abilita_ids: set | None = None
+    _membership: list | None = None
+
+    def valore_statistica(self, sigla: str) -> int:
+        if sigla not in self._statistiche:
+            self._statistiche[sigla] = self.personaggio.get_valore_statistica(sigla)
+        return self._statistiche[sigla]
+
+    def aura(self, nome: str):
+        """Aura (PunteggioInfo tipo AURA) per nome dal catalogo regole; None se sconosciuta."""
+        if nome not in self._aure_per_nome:
+            from .catalogo_regole import get_catalogo_regole
+            from .models import AURA
+
+            catalogo = get_catalogo_regole()
+            p = catalogo.per_nome.get(nome)
+            if p is None or p.tipo != AURA:
+                p = next((x for x in catalogo.punteggi.values() if x.nome == nome and x.tipo == AURA), None)
+            self._aure_per_nome[nome] = p
+        return self._aure_per_nome[nome]
+
+    def valore_aura(self, nome: str) -> int:
+        if nome not in self._aure:
+            self._aure[nome] = self.personaggio.get_valore_aura_effettivo(self.aura(nome))
+        return self._aure[nome]
+
+    def abilita_ids(self) -> set:
+        if self._abilita_ids is None:
+            self._abilita_ids = set(self.personaggio.abilita_possedute.values_list("pk", flat=True))
+        return self._abilita_ids
+
+    def membership_attive(self) -> list:
+        """[(carriera_id, carica_id, codice tipo carriera)] delle membership senza data_a."""
+        if self._membership is None:
+            from .models import PersonaggioCarrieraMembership
+
+            self._membership = list(
+                PersonaggioCarrieraMembership.objects.filter(
+                    personaggio=self.personaggio,
+                    data_a__isnull=True,
+                )
+                .order_by()
+                .values_list("carriera_id", "carica_id", "tipo_carriera__codice")
+            )
+        return self._membership
+
+
+def fatti_personaggio(personaggio) -> FattiPersonaggio:
+    """Bundle fatti memorizzato sull'istanza (vive quanto la richiesta che l'ha caricata)."""
+    fatti = getattr(personaggio, "_fatti_requisiti_cache", None)
+    if fatti is None:
+        fatti = FattiPersonaggio(personaggio)
+        personaggio._fatti_requisiti_cache = fatti
+    return fatti
+
+
+def _int_min(req: dict) -> int:
+    return int(req.get("min", 1) or 1)
+
+
+def _compila_requisito(req: dict) -> RequisitoCompilato | None:
+    tipo = (req.get("tipo") or "").strip().lower()
+    if tipo == "statistica":
+        sigla = (req.get("sigla") or "").strip().upper()
+        if not sigla:
+            return None
+        return RequisitoCompilato(tipo=tipo, sigla=sigla, min=_int_min(req))
+    if tipo == "punteggio":
+        nome = (req.get("nome") or "").strip()
+        if not nome:
+            return None
+        return RequisitoCompilato(tipo=tipo, nome=nome, min=_int_min(req))
+    if tipo in ("abilita", "korp", "carriera", "carica"):
+        if req.get("id") is None:
+            return None
+        return RequisitoCompilato(tipo=tipo, id=req["id"])
+    return None
+
+
+@lru_cache(maxsize=REQUISITI_COMPILATI_MAX)
+def _compila_cached(chiave: str) -> tuple[RequisitoCompilato | None, ...]:
+    return tuple(_compila_requisito(req) if isinstance(req, dict) else None for req in json.loads(chiave))
+
+
+def compila_requisiti(requisiti: Iterable[dict] | None) -> tuple[RequisitoCompilato | None, ...]:
+    """
+    Predicati compilati, uno per voce (None = voce non valida, ignorata come sempre).
+    Cache per contenuto della lista.
+    """
+    reqs = list(requisiti or [])
     if not reqs:
-        return True, ""
+        return ()
+    chiave = json.dumps([r if isinstance(r, dict) else None for r in reqs], sort_keys=True, default=str)
+    return _compila_cached(chiave)
 
-    for req in reqs:
-        if not isinstance(req, dict):
-            continue
-        tipo = (req.get("tipo") or "").strip().lower()
-        if tipo == "statistica":
-            sigla = (req.get("sigla") or "").strip().upper()
-            min_v = int(req.get("min", 1) or 1)
-            if not sigla:
-                continue
-            cur = personaggio.get_valore_statistica(sigla)
-            if cur < min_v:
-                st = Statistica.objects.filter(sigla=sigla).first()
-                nome = st.nome if st else sigla
-                return False, f"Richiesto {nome} ({sigla}) ≥ {min_v} (hai {cur})."
-        elif tipo == "abilita":
-            aid = req.get("id")
-            if aid is None:
-                continue
-            if not personaggio.abilita_possedute.filter(pk=aid).exists():
-                ab = Abilita.objects.filter(pk=aid).first()
-                nome = ab.nome if ab else str(aid)
-                return False, f"È richiesta l'abilità: {nome}."
-        elif tipo == "punteggio":
-            nome = (req.get("nome") or "").strip()
-            min_v = int(req.get("min", 1) or 1)
-            if not nome:
-                continue
-            p = Punteggio.objects.filter(nome=nome, tipo=AURA).first()
-            if not p:
-                return False, f"Requisito aura sconosciuto: {nome}."
-            cur = personaggio.get_valore_aura_effettivo(p)
-            if cur < min_v:
-                return False, f"Richiesta aura {nome} ≥ {min_v} (hai {cur})."
-        elif tipo == "korp":
-            kid = req.get("id")
-            if kid is None:
-                continue
-            attiva = PersonaggioCarrieraMembership.objects.filter(
-                personaggio=personaggio,
-                data_a__isnull=True,
-                tipo_carriera__codice="korp",
-                carriera_id=kid,
-            ).exists()
-            if not attiva:
-                return False, "Richiesta appartenenza a una KORP specifica."
-        elif tipo == "carriera":
-            cid = req.get("id")
-            if cid is None:
-                continue
-            attiva = PersonaggioCarrieraMembership.objects.filter(
-                personaggio=personaggio,
-                data_a__isnull=True,
-                carriera_id=cid,
-            ).exists()
-            if not attiva:
-                return False, "Richiesta appartenenza a una carriera specifica."
-        elif tipo == "carica":
-            cid = req.get("id")
-            if cid is None:
-                continue
-            attiva = PersonaggioCarrieraMembership.objects.filter(
-                personaggio=personaggio,
-                data_a__isnull=True,
-                carica_id=cid,
-            ).exists()
-            if not attiva:
-                return False, "Richiesta una carica specifica."
+
+def _soddisfatto(req: RequisitoCompilato, fatti: FattiPersonaggio) -> bool:
+    if req.tipo == "statistica":
+        return fatti.valore_statistica(req.sigla) >= req.min
+    if req.tipo == "punteggio":
+        return fatti.aura(req.nome) is not None and fatti.valore_aura(req.nome) >= req.min
+    if req.tipo == "abilita":
+        return _pk(req.id) in fatti.abilita_ids()
+    if req.tipo == "korp":
+        return any(cid == _pk(req.id) and codice == "korp" for cid, _, codice in fatti.membership_attive())
+    if req.tipo == "carriera":
+        return any(cid == _pk(req.id) for cid, _, _ in fatti.membership_attive())
+    if req.tipo == "carica":
+        return any(kid == _pk(req.id) for _, kid, _ in fatti.membership_attive())
+    return True
+
+
+def _pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _messaggio(req: RequisitoCompilato, fatti: FattiPersonaggio) -> str:
+    if req.tipo == "statistica":
+        from .catalogo_regole import get_catalogo_regole
+
+        st = get_catalogo_regole().statistica(req.sigla)
+        nome = st.nome if st else req.sigla
+        return f"Richiesto {nome} ({req.sigla}) ≥ {req.min} (hai {fatti.valore_statistica(req.sigla)})."
+    if req.tipo == "punteggio":
+        if fatti.aura(req.nome) is None:
+            return f"Requisito aura sconosciuto: {req.nome}."
+        return f"Richiesta aura {req.nome} ≥ {req.min} (hai {fatti.valore_aura(req.nome)})."
+    if req.tipo == "abilita":
+        from .models import Abilita
+
+        nome = Abilita.objects.filter(pk=req.id).values_list("nome", flat=True).first()
+        return f"È richiesta l'abilità: {nome or req.id}."
+    if req.tipo == "korp":
+        return "Richiesta appartenenza a una KORP specifica."
+    if req.tipo == "carriera":
+        return "Richiesta appartenenza a una carriera specifica."
+    return "Richiesta una carica specifica."
+
+
+def _primo_non_soddisfatto(compilati, fatti: FattiPersonaggio) -> RequisitoCompilato | None:
+    for req in compilati:
+        if req is not None and not _soddisfatto(req, fatti):
+            return req
+    return None
+
+
+def personaggio_soddisfa_requisiti(personaggio, requisiti: Iterable[dict] | None) -> Tuple[bool, str]:
+    """Ritorna (ok, messaggio). Lista vuota / None = accesso libero."""
+    compilati = compila_requisiti(requisiti)
+    if not compilati:
+        return True, ""
+    fatti = fatti_personaggio(personaggio)
+    fallito = _primo_non_soddisfatto(compilati, fatti)
+    if fallito is not None:
+        return False, _messaggio(fallito, fatti)
     return True, ""
 
 
+def _gruppo_fallito(personaggio, regole: dict | None):
+    """(fatti, requisito che fa fallire il gruppo | True se OR senza alternative | None se ok)."""
+    if not regole:
+        return None, None
+    compilati = compila_requisiti(regole.get("requisiti") or [])
+    if not compilati:
+        return None, None
+    fatti = fatti_personaggio(personaggio)
+    op = (regole.get("operator") or "AND").strip().upper()
+    if op == "OR":
+        # Una voce non valida conta come condizione soddisfatta.
+        if any(req is None or _soddisfatto(req, fatti) for req in compilati):
+            return fatti, None
+        return fatti, True
+    return fatti, _primo_non_soddisfatto(compilati, fatti)
+
+
 def personaggio_soddisfa_requisiti_gruppo(personaggio, regole: dict | None) -> Tuple[bool, str]:
     """
     regole: {"operator": "OR"|"AND", "requisiti": [...]}
     Default AND se operator assente.
     """
-    if not regole:
-        return True, ""
-    reqs = regole.get("requisiti") or []
-    if not reqs:
+    fatti, fallito = _gruppo_fallito(personaggio, regole)
+    if fallito is None:
         return True, ""
-    op = (regole.get("operator") or "AND").strip().upper()
-    if op == "OR":
-        for req in reqs:
-            ok, _ = personaggio_soddisfa_requisiti(personaggio, [req])
-            if ok:
-                return True, ""
+    if fallito is True:
         return False, "Non soddisfi i requisiti di accesso (nessuna condizione alternativa)."
-    messages = []
-    for req in reqs:
-        ok, msg = personaggio_soddisfa_requisiti(personaggio, [req])
-        if not ok:
-            messages.append(msg)
-    if messages:
-        return False, messages[0]
-    return True, ""
+    return False, _messaggio(fallito, fatti)
 
 
 def gruppo_requisiti_soddisfatto(personaggio, gruppo: dict | None) -> bool:
-    """True se il gruppo {operator, requisiti} è soddisfatto."""
-    ok, _ = personaggio_soddisfa_requisiti_gruppo(personaggio, gruppo)
-    return ok
+    """True se il gruppo {operator, requisiti} è soddisfatto (senza costruire il messaggio)."""
+    _fatti, fallito = _gruppo_fallito(personaggio, gruppo)
+    return fallito is None
@@ -0,0 +1,242 @@
+"""
+Ricerca personaggi per la console staff (check-in, hub personaggi).
+
+Ogni personaggio ha un documento denormalizzato (PersonaggioIndiceRicerca) con nome,
+costume, proprietario, nickname social, campagna, tipologia, era/prefettura, carriere
+attive e gruppi; i signal lo riscrivono quando cambia una delle sorgenti.
+
+Ricerca:
+- Postgres: match full-text con prefisso (indice GIN su tsvector 'simple') o sottostringa;
+  se pg_trgm è installato anche match fuzzy ``%>`` (indice GIN trigram) e ranking per
+  word_similarity, altrimenti ts_rank;
+- altri backend (SQLite nei test locali): stesso documento, punteggio calcolato in Python.
+"""
+from __future__ import annotations
+
+import difflib
+import re
+import unicodedata
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.utils import timezone
+
+SOGLIA_SIMILARITA_PYTHON = 0.75
+BATCH_INDICIZZAZIONE = 500
+
+# Campi di Personaggio che finiscono nel documento: un save con update_fields
+# disgiunto da questi non riscrive l'indice.
+CAMPI_PERSONAGGIO_INDICIZZATI = frozenset(
+    {"nome", "costume", "proprietario", "campagna", "tipologia", "era", "prefettura"}
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_trigram_disponibile: bool | None = None
+
+
+def normalizza_testo_ricerca(testo) -> str:
+    """Minuscolo, senza accenti, spazi compressi."""
+    if not testo:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", str(testo))
+    senza_accenti = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(senza_accenti.lower().split())
+
+
+def _tokens(testo: str) -> list[str]:
+    return _TOKEN_RE.findall(testo)
+
+
+# ---------------------------------------------------------------------------
+# Costruzione documenti
+# ---------------------------------------------------------------------------
+
+def _documenti_per_personaggi(ids, Personaggio, Membership, Gruppo) -> dict[int, str]:
+    # _base_manager: include gli eliminati ed esiste anche sui modelli storici.
+    righe = Personaggio._base_manager.filter(pk__in=ids).values_list(
+        "pk",
+        "nome",
+        "costume",
+        "proprietario__username",
+        "proprietario__first_name",
+        "proprietario__last_name",
+        "proprietario__email",
+        "social_profile__nickname",
+        "campagna__nome",
+        "tipologia__nome",
+        "era__nome",
+        "prefettura__nome",
+    )
+    parti: dict[int, list] = {}
+    for pk, *valori in righe:
+        parti[pk] = list(valori)
+    for pid, carriera, carica in Membership.objects.filter(
+        personaggio_id__in=list(parti), data_a__isnull=True
+    ).values_list("personaggio_id", "carriera__nome", "carica__nome"):
+        parti[pid].extend((carriera, carica))
+    membri_gruppo = Gruppo._meta.get_field("membri").remote_field.through
+    for pid, gruppo in membri_gruppo.objects.filter(personaggio_id__in=list(parti)).values_list(
+        "personaggio_id", "gruppo__nome"
+    ):
+        parti[pid].append(gruppo)
+    return {
+        pk: normalizza_testo_ricerca(" ".join(str(v) for v in valori if v))
+        for pk, valori in parti.items()
+    }
+
+
+def aggiorna_indice_ricerca(personaggio_ids: Iterable[int], *, apps=None) -> int:
+    """
+    Ricostruisce il documento dei personaggi indicati (upsert a blocchi).
+    ``apps`` permette l'uso dalle migrazioni con i modelli storici.
+    """
+    if apps is None:
+        from django.apps import apps
+    Personaggio = apps.get_model("personaggi", "Personaggio")
+    Membership = apps.get_model("personaggi", "PersonaggioCarrieraMembership")
+    Gruppo = apps.get_model("personaggi", "Gruppo")
+    Indice = apps.get_model("personaggi", "PersonaggioIndiceRicerca")
+
+    ids = sorted({int(pk) for pk in personaggio_ids if pk})
+    scritti = 0
+    for start in range(0, len(ids), BATCH_INDICIZZAZIONE):
+        blocco = ids[start:start + BATCH_INDICIZZAZIONE]
+        documenti = _documenti_per_personaggi(blocco, Personaggio, Membership, Gruppo)
+        now = timezone.now()
+        Indice.objects.bulk_create(
+            [
+                Indice(personaggio_id=pk, testo=testo, aggiornato_il=now)
+                for pk, testo in documenti.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["personaggio"],
+            update_fields=["testo", "aggiornato_il"],
+        )
+        scritti += len(documenti)
+    return scritti
+
+
+def ricostruisci_indice_ricerca(*, apps=None) -> int:
+    if apps is None:
+        from django.apps import apps
+    Personaggio = apps.get_model("personaggi", "Personaggio")
+    return aggiorna_indice_ricerca(
+        Personaggio._base_manager.values_list("pk", flat=True).iterator(), apps=apps
+    )
+
+
+# ---------------------------------------------------------------------------
+# Ricerca
+# ---------------------------------------------------------------------------
+
+def trigram_disponibile() -> bool:
+    """True se pg_trgm è installato nel DB corrente (controllo una volta per processo)."""
+    global _trigram_disponibile
+    if connection.vendor != "postgresql":
+        return False
+    if _trigram_disponibile is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_disponibile = cursor.fetchone() is not None
+    return _trigram_disponibile
+
+
+def _tsquery_prefisso(tokens: list[str]) -> str:
+    return " & ".join(f"{t}:*" for t in tokens)
+
+
+def _filtra_postgres(qs, testo: str, tokens: list[str]):
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from django.contrib.postgres.search import (
+        SearchQuery,
+        SearchRank,
+        SearchVector,
+        TrigramWordSimilarity,
+    )
+    from django.db.models import F
+
+    vector = SearchVector("indice_ricerca__testo", config="simple")
+    condizione = Q(indice_ricerca__testo__contains=testo)
+    if tokens:
+        query = SearchQuery(_tsquery_prefisso(tokens), config="simple", search_type="raw")
+        qs = qs.annotate(_fts_vector=vector, _fts_rank=SearchRank(vector, query))
+        condizione |= Q(_fts_vector=query)
+        rank = F("_fts_rank")
+    else:
+        rank = Value(0.0, output_field=FloatField())
+    if trigram_disponibile():
+        qs = qs.annotate(_trgm_rank=TrigramWordSimilarity(testo, "indice_ricerca__testo"))
+        condizione |= TrigramWordSimilar(F("indice_ricerca__testo"), Value(testo))
+        rank = F("_trgm_rank") + rank
+    return qs.annotate(search_rank=rank).filter(condizione).order_by("-search_rank", "nome")
+
+
+def punteggio_documento(tokens: list[str], documento: str) -> float:
+    """
+    Punteggio 0..1 del documento per i token di ricerca (fallback senza Postgres):
+    prefisso di parola 1.0, sottostringa 0.8, parola simile (difflib) il suo ratio.
+    Un token senza corrispondenza azzera il punteggio.
+    """
+    parole = _tokens(documento)
+    if not tokens or not parole:
+        return 0.0
+    totale = 0.0
+    for token in tokens:
+        migliore = 0.0
+        for parola in parole:
+            if parola.startswith(token):
+                migliore = 1.0
+                break
+            if token in parola:
+                migliore = max(migliore, 0.8)
+                continue
+            ratio = difflib.SequenceMatcher(None, token, parola).ratio()
+            if ratio >= SOGLIA_SIMILARITA_PYTHON:
+                migliore = max(migliore, ratio)
+        if migliore == 0.0:
+            return 0.0
+        totale += migliore
+    return totale / len(tokens)
+
+
+def _filtra_python(qs, testo: str, tokens: list[str]):
+    if not tokens:
+        tokens = [testo]
+    candidati = qs.order_by().values_list("pk", "indice_ricerca__testo").distinct()
+    punteggi = {}
+    for pk, documento in candidati:
+        score = punteggio_documento(tokens, documento or "")
+        if score > 0:
+            punteggi[pk] = score
+    ordinati = sorted(punteggi, key=lambda pk: -punteggi[pk])
+    return (
+        qs.filter(pk__in=ordinati)
+        .annotate(
+            search_rank=Case(
+                *[When(pk=pk, then=Value(punteggi[pk])) for pk in ordinati],
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+            _search_pos=Case(
+                *[When(pk=pk, then=Value(pos)) for pos, pk in enumerate(ordinati)],
+                default=Value(len(ordinati)),
+                output_field=IntegerField(),
+            ),
+        )
+        .order_by("_search_pos", "nome")
+    )
+
+
+def filtra_personaggi_per_ricerca(qs, q: str):
+    """
+    Filtra e ordina ``qs`` (Personaggio) per rilevanza rispetto a ``q``.
+    Il queryset risultante ha l'annotazione ``search_rank``.
+    """
+    testo = normalizza_testo_ricerca(q)
+    if not testo:
+        return qs
+    tokens = _tokens(testo)
+    if connection.vendor == "postgresql":
+        return _filtra_postgres(qs, testo, tokens)
+    return _filtra_python(qs, testo, tokens)
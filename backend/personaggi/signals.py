@@ -1,4 +1,4 @@
-from django.db.models.signals import m2m_changed, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from channels.layers import get_channel_layer
@@ -7,9 +7,25 @@ from django.contrib.auth.models import User
 from webpush import send_user_notification
 
 from .models import (
+    Aura,
+    Campagna,
+    CampagnaFeaturePolicy,
+    Caratteristica,
+    Carica,
+    Carriera,
     ClasseOggetto,
+    Era,
+    Gruppo,
     Infusione,
+    Mattone,
     Messaggio,
+    Personaggio,
+    PersonaggioCarrieraMembership,
+    Prefettura,
+    Punteggio,
+    RegolaTransazioneCategoria,
+    Statistica,
+    TipologiaPersonaggio,
 )
 from .campaigns import ensure_user_in_base_campaign
 
@@ -209,4 +225,235 @@ def copia_dati_da_proposta(sender, instance, created, **kwargs):
     """
     if created and instance.proposta_creazione and not instance.slot_corpo_permessi:
         instance.slot_corpo_permessi = instance.proposta_creazione.slot_corpo_permessi
-        instance.save()
\ No newline at end of file
+        instance.save()
+
+
+@receiver(post_save, sender=Campagna)
+@receiver(post_delete, sender=Campagna)
+def invalida_cache_economia_campagna(sender, instance, **kwargs):
+    """Economia_config in cache di processo (kor35.config_cache): ricarica in tutti i worker."""
+    from .economia_crediti import ECONOMIA_CONFIG_CACHE_NAMESPACE
+    from kor35.config_cache import bump_revision
+
+    bump_revision(ECONOMIA_CONFIG_CACHE_NAMESPACE, instance.pk)
+
+
+@receiver(post_save, sender=RegolaTransazioneCategoria)
+@receiver(post_delete, sender=RegolaTransazioneCategoria)
+def invalida_cache_economia_regole(sender, instance, **kwargs):
+    """Le categorie pagabili con deposito derivano dalle regole transazione."""
+    from .economia_crediti import ECONOMIA_CONFIG_CACHE_NAMESPACE
+    from kor35.config_cache import bump_revision
+
+    if instance.campagna_id:
+        bump_revision(ECONOMIA_CONFIG_CACHE_NAMESPACE, instance.campagna_id)
+
+
+@receiver(post_save, sender=CampagnaFeaturePolicy)
+@receiver(post_delete, sender=CampagnaFeaturePolicy)
+def invalida_cache_feature_policy(sender, instance, **kwargs):
+    from .campaigns import FEATURE_POLICY_CACHE_NAMESPACE
+    from kor35.config_cache import bump_revision
+
+    if instance.campagna_id:
+        bump_revision(FEATURE_POLICY_CACHE_NAMESPACE, instance.campagna_id)
+
+
+CATALOGO_REGOLE_SENDERS = (Punteggio, Statistica, Mattone, Caratteristica, Aura)
+
+
+def invalida_catalogo_regole_on_change(sender, instance, **kwargs):
+    """Catalogo regole in memoria (personaggi.catalogo_regole): nuova revisione."""
+    from .catalogo_regole import invalida_catalogo_regole
+
+    invalida_catalogo_regole()
+
+
+for _sender in CATALOGO_REGOLE_SENDERS:
+    post_save.connect(
+        invalida_catalogo_regole_on_change,
+        sender=_sender,
+        dispatch_uid=f"kor35.catalogo_regole.save.{_sender._meta.label_lower}",
+    )
+    post_delete.connect(
+        invalida_catalogo_regole_on_change,
+        sender=_sender,
+        dispatch_uid=f"kor35.catalogo_regole.delete.{_sender._meta.label_lower}",
+    )
+
+
+def invalida_catalogo_errata_on_change(sender, instance, **kwargs):
+    """Snapshot errata carte in memoria (personaggi.carte_errata_runtime): nuova revisione."""
+    from .carte_errata_runtime import invalida_catalogo_errata
+
+    invalida_catalogo_errata()
+
+
+post_save.connect(
+    invalida_catalogo_errata_on_change,
+    sender="personaggi.CartaErrata",
+    dispatch_uid="kor35.carte_errata.save",
+)
+post_delete.connect(
+    invalida_catalogo_errata_on_change,
+    sender="personaggi.CartaErrata",
+    dispatch_uid="kor35.carte_errata.delete",
+)
+
+
+def invalida_indice_combo_on_change(sender, instance, **kwargs):
+    """Indice combo reliquiario della campagna (personaggi.carte_reliquiario_combo): nuova revisione."""
+    from .carte_reliquiario_combo import invalida_indice_combo
+
+    invalida_indice_combo(instance.campagna_id)
+
+
+post_save.connect(
+    invalida_indice_combo_on_change,
+    sender="personaggi.ComboReliquiario",
+    dispatch_uid="kor35.combo_reliquiario.save",
+)
+post_delete.connect(
+    invalida_indice_combo_on_change,
+    sender="personaggi.ComboReliquiario",
+    dispatch_uid="kor35.combo_reliquiario.delete",
+)
+
+
+def invalida_matrice_moduli_on_change(sender, instance, **kwargs):
+    """Matrice accesso moduli della campagna (personaggi.campagna_moduli): nuova revisione."""
+    from .campagna_moduli import invalida_matrice_moduli
+
+    invalida_matrice_moduli(instance.campagna_id)
+
+
+for _sender in ("personaggi.ConfigurazioneCarteCollezionabili", "personaggi.CampagnaUtente"):
+    post_save.connect(
+        invalida_matrice_moduli_on_change,
+        sender=_sender,
+        dispatch_uid=f"kor35.campagna_moduli.save.{_sender.lower()}",
+    )
+    post_delete.connect(
+        invalida_matrice_moduli_on_change,
+        sender=_sender,
+        dispatch_uid=f"kor35.campagna_moduli.delete.{_sender.lower()}",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Indice ricerca staff (personaggi.ricerca_staff)
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Personaggio)
+def aggiorna_indice_ricerca_personaggio(sender, instance, raw=False, update_fields=None, **kwargs):
+    from .ricerca_staff import CAMPI_PERSONAGGIO_INDICIZZATI, aggiorna_indice_ricerca
+
+    if raw:
+        return
+    if update_fields is not None and not CAMPI_PERSONAGGIO_INDICIZZATI.intersection(update_fields):
+        return
+    aggiorna_indice_ricerca([instance.pk])
+
+
+@receiver(post_save, sender=PersonaggioCarrieraMembership)
+@receiver(post_delete, sender=PersonaggioCarrieraMembership)
+def aggiorna_indice_ricerca_membership(sender, instance, raw=False, **kwargs):
+    from .ricerca_staff import aggiorna_indice_ricerca
+
+    if raw:
+        return
+    aggiorna_indice_ricerca([instance.personaggio_id])
+
+
+# Campi di User nel documento: il save di login (update_fields=["last_login"]) non riscrive.
+CAMPI_UTENTE_INDICIZZATI = frozenset({"username", "first_name", "last_name", "email"})
+
+
+@receiver(post_save, sender=User)
+def aggiorna_indice_ricerca_proprietario(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    from .ricerca_staff import aggiorna_indice_ricerca
+
+    if created or raw:
+        return
+    if update_fields is not None and not CAMPI_UTENTE_INDICIZZATI.intersection(update_fields):
+        return
+    aggiorna_indice_ricerca(
+        Personaggio.all_objects.filter(proprietario=instance).values_list("pk", flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=Gruppo.membri.through)
+def aggiorna_indice_ricerca_membri_gruppo(sender, instance, action, reverse, pk_set, **kwargs):
+    from .ricerca_staff import aggiorna_indice_ricerca
+
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+    if not reverse:
+        # Lato Gruppo: il clear svuota pk_set, i membri vanno letti prima.
+        if action == "pre_clear":
+            instance._indice_ricerca_membri = list(instance.membri.values_list("pk", flat=True))
+            return
+        ids = pk_set if action != "post_clear" else getattr(instance, "_indice_ricerca_membri", [])
+        aggiorna_indice_ricerca(ids or [])
+    elif action != "pre_clear":
+        aggiorna_indice_ricerca([instance.pk])
+
+
+@receiver(pre_delete, sender=Gruppo)
+def memorizza_membri_gruppo_indice_ricerca(sender, instance, **kwargs):
+    instance._indice_ricerca_membri = list(instance.membri.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Gruppo)
+def aggiorna_indice_ricerca_gruppo_eliminato(sender, instance, **kwargs):
+    from .ricerca_staff import aggiorna_indice_ricerca
+
+    aggiorna_indice_ricerca(getattr(instance, "_indice_ricerca_membri", []))
+
+
+# Modelli il cui nome entra nel documento → lookup dal Personaggio.
+INDICE_RICERCA_SORGENTI_NOME = {
+    Campagna: "campagna",
+    TipologiaPersonaggio: "tipologia",
+    Era: "era",
+    Prefettura: "prefettura",
+    Carriera: "carriere_membership__carriera",
+    Carica: "carriere_membership__carica",
+    Gruppo: "gruppi_appartenenza",
+}
+
+
+def memorizza_nome_precedente_indice_ricerca(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        instance._indice_ricerca_nome_precedente = None
+        return
+    instance._indice_ricerca_nome_precedente = (
+        sender.objects.filter(pk=instance.pk).values_list("nome", flat=True).first()
+    )
+
+
+def aggiorna_indice_ricerca_su_rinomina(sender, instance, created, raw=False, **kwargs):
+    """Solo se il nome è cambiato: riscrive i documenti dei personaggi collegati."""
+    from .ricerca_staff import aggiorna_indice_ricerca
+
+    if created or raw:
+        return
+    if getattr(instance, "_indice_ricerca_nome_precedente", None) == instance.nome:
+        return
+    lookup = INDICE_RICERCA_SORGENTI_NOME[sender]
+    aggiorna_indice_ricerca(
+        Personaggio.all_objects.filter(**{lookup: instance}).values_list("pk", flat=True).distinct()
+    )
+
+
+for _sender in INDICE_RICERCA_SORGENTI_NOME:
+    pre_save.connect(
+        memorizza_nome_precedente_indice_ricerca,
+        sender=_sender,
+        dispatch_uid=f"kor35.indice_ricerca.pre_save.{_sender._meta.label_lower}",
+    )
+    post_save.connect(
+        aggiorna_indice_ricerca_su_rinomina,
+        sender=_sender,
+        dispatch_uid=f"kor35.indice_ricerca.save.{_sender._meta.label_lower}",
+    )
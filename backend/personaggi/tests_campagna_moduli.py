@@ -4,6 +4,8 @@ from django.core.exceptions import ValidationError
 from django.test import TestCase
 from rest_framework.test import APIClient
 
+from kor35.config_cache import clear_local
+
 from personaggi.campagna_moduli import (
     CAMPAGNA_MODULI_REGISTRY,
     MODULO_ACCESSO_DEFAULT,
@@ -17,6 +19,7 @@ from personaggi.campagna_moduli import (
     MODULO_SCOMMESSE,
     MODULO_SOCIAL,
     MODULO_TASKS,
+    MODULI_ACCESSO_CACHE_NAMESPACE,
     STAFF_TOOL_TO_MODULO,
     apply_moduli_accesso,
     get_modulo_accesso,
@@ -119,6 +122,30 @@ class CampagnaModuliAccessoTests(TestCase):
         self.assertEqual(get_modulo_accesso(self.campagna, MODULO_CARTE), CARTE_ACCESSO_TEST)
         self.assertEqual(get_carte_accesso_modo(self.campagna), CARTE_ACCESSO_TEST)
 
+    def test_matrice_in_cache_e_invalidata_dai_segnali(self):
+        ConfigurazioneCarteCollezionabili.objects.create(
+            campagna=self.campagna,
+            accesso_modo=CARTE_ACCESSO_TEST,
+            abilitata=False,
+        )
+        self.addCleanup(clear_local, MODULI_ACCESSO_CACHE_NAMESPACE)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(personaggio_puo_accedere_modulo(self.pg_player, MODULO_CARTE))
+        with self.assertNumQueries(0):
+            self.assertTrue(personaggio_puo_accedere_modulo(self.pg_staff, MODULO_CARTE))
+            self.assertTrue(user_puo_accedere_modulo(self.staff_user, self.campagna, MODULO_CARTE))
+            self.assertEqual(get_carte_accesso_modo(self.campagna), CARTE_ACCESSO_TEST)
+
+        # Promozione a staff e cambio config: i segnali invalidano la matrice.
+        membership = CampagnaUtente.objects.get(campagna=self.campagna, user=self.player)
+        membership.ruolo = CAMPAGNA_ROLE_STAFFER
+        membership.save()
+        self.assertTrue(personaggio_puo_accedere_modulo(self.pg_player, MODULO_CARTE))
+        cfg = ConfigurazioneCarteCollezionabili.objects.get(campagna=self.campagna)
+        cfg.accesso_modo = CARTE_ACCESSO_OPEN
+        cfg.save()
+        self.assertEqual(get_modulo_accesso(self.campagna, MODULO_CARTE), CARTE_ACCESSO_OPEN)
+
     def test_carte_sync_from_moduli(self):
         apply_moduli_accesso(self.campagna, {MODULO_CARTE: MODULO_ACCESSO_OPEN})
         self.campagna.refresh_from_db()
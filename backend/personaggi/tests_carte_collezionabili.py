@@ -862,9 +862,43 @@ class CartaErrataRuntimeTests(TestCase):
             attacco_override=1,
         )
 
+    def tearDown(self):
+        from kor35.config_cache import clear_local
+        from personaggi.carte_errata_runtime import CARTE_ERRATA_CACHE_NAMESPACE
+
+        clear_local(CARTE_ERRATA_CACHE_NAMESPACE)
+
     def test_gameplay_view_applica_errata_attiva(self):
         eff = gameplay_view(self.carta)
         self.assertEqual(eff["costo_gioco"], 1)
         self.assertEqual(eff["attacco"], 1)
         self.assertEqual(eff["testo_gioco"], "Testo erratato")
         self.assertIsNotNone(eff["errata"])
+
+    def test_snapshot_errata_senza_query_e_prossima_variazione(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+        from personaggi.carte_collezionabili_models import CartaErrata
+        from personaggi.carte_errata_runtime import get_catalogo_errata
+
+        futura = CartaErrata.objects.create(
+            campagna=self.campagna,
+            carta=self.carta,
+            effective_from=timezone.now() + timedelta(days=7),
+            titolo="Buff",
+            costo_gioco_override=5,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            gameplay_view(self.carta)
+        catalogo = get_catalogo_errata()
+        with self.assertNumQueries(0):
+            eff = gameplay_view(self.carta, catalogo=catalogo)
+        self.assertEqual(eff["costo_gioco"], 1)
+        self.assertEqual(eff["prossima_variazione"], futura.effective_from.isoformat())
+
+        eff = gameplay_view(self.carta, when=futura.effective_from + timedelta(seconds=1))
+        self.assertEqual(eff["costo_gioco"], 5)
+
+        futura.delete()
+        self.assertIsNone(gameplay_view(self.carta)["prossima_variazione"])
@@ -3,11 +3,15 @@ from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
 from personaggi.carte_collezionabili_models import (
     CARTA_ENERGIA_MARZIALE,
     CARTA_RARITA_COMUNE,
+    CARTA_RARITA_RARA,
     CARTA_TIPO_PERSONAGGIO,
     CARTE_ACCESSO_OPEN,
     CartaCollezionabile,
@@ -15,6 +19,7 @@ from personaggi.carte_collezionabili_models import (
     ConfigurazioneCarteCollezionabili,
     EspansioneCarte,
     OffertaScambioCarte,
+    ReliquiarioSlot,
     SCAMBIO_STATO_ACCETTATA,
     SCAMBIO_STATO_APERTA,
     SCAMBIO_STATO_ANNULLATA,
@@ -24,8 +29,10 @@ from personaggi.carte_mercato_service import (
     annulla_offerta_scambio,
     build_mercato_payload,
     crea_offerta_scambio,
+    lista_carte_scambio,
+    lista_offerte_mercato,
 )
-from personaggi.models import Campagna, Personaggio, TipologiaPersonaggio
+from personaggi.models import Campagna, CampagnaUtente, Personaggio, TipologiaPersonaggio
 
 User = get_user_model()
 
@@ -137,3 +144,78 @@ class CarteMercatoServiceTests(TestCase):
     def test_crea_offerta_senza_richiesta_fallisce(self):
         with self.assertRaises(ValidationError):
             crea_offerta_scambio(self.pg_a, carta_offerta_id=str(self.cp_a.id))
+
+    def _offerte_di_a(self, n, rarita=CARTA_RARITA_COMUNE):
+        for i in range(n):
+            carta = CartaCollezionabile.objects.create(
+                campagna=self.campagna,
+                codice=f"M-P{rarita}{i}",
+                nome=f"Pagina {i}",
+                tipo=CARTA_TIPO_PERSONAGGIO,
+                energia=CARTA_ENERGIA_MARZIALE,
+                rarita=rarita,
+            )
+            cp = CartaPosseduta.objects.create(personaggio=self.pg_a, carta=carta)
+            crea_offerta_scambio(self.pg_a, carta_offerta_id=str(cp.id), richiesta_crediti="5")
+
+    def test_offerte_paginate_a_cursore_con_filtri(self):
+        self._offerte_di_a(5)
+        self._offerte_di_a(2, rarita=CARTA_RARITA_RARA)
+        visti, cursor = [], None
+        while True:
+            pagina = lista_offerte_mercato(self.pg_b, cursor=cursor, page_size=3)
+            visti.extend(row["id"] for row in pagina["results"])
+            cursor = pagina["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(len(visti), 7)
+        self.assertEqual(len(set(visti)), 7)
+        self.assertTrue(all(
+            row["posso_accettare"] for row in lista_offerte_mercato(self.pg_b)["results"]
+        ))
+
+        rare = lista_offerte_mercato(self.pg_b, filtri={"rarita": CARTA_RARITA_RARA})
+        self.assertEqual(len(rare["results"]), 2)
+        self.assertEqual(lista_offerte_mercato(self.pg_a)["results"], [])
+        self.assertEqual(len(lista_offerte_mercato(self.pg_a, mie=True)["results"]), 7)
+
+    def test_offerte_query_costanti_per_pagina(self):
+        self._offerte_di_a(2)
+        lista_offerte_mercato(self.pg_b)  # saldo crediti già letto sull'istanza
+        with CaptureQueriesContext(connection) as ctx:
+            lista_offerte_mercato(self.pg_b, page_size=10)
+        self._offerte_di_a(6, rarita=CARTA_RARITA_RARA)
+        with self.assertNumQueries(len(ctx.captured_queries)):
+            lista_offerte_mercato(self.pg_b, page_size=10)
+
+    def test_carte_scambio_esclude_bloccate(self):
+        cp_extra = CartaPosseduta.objects.create(personaggio=self.pg_a, carta=self.carta_b)
+        ReliquiarioSlot.objects.create(personaggio=self.pg_a, slot_index=0, carta_posseduta=cp_extra)
+        crea_offerta_scambio(self.pg_a, carta_offerta_id=str(self.cp_a.id), richiesta_crediti="5")
+        CartaPosseduta.objects.create(personaggio=self.pg_a, carta=self.carta_a)
+
+        tutte = lista_carte_scambio(self.pg_a)["results"]
+        self.assertEqual(len(tutte), 3)
+        motivi = {row["id"]: row["motivo_blocco"] for row in tutte}
+        self.assertEqual(motivi[str(cp_extra.id)], "La carta è equipaggiata nel reliquiario.")
+        self.assertEqual(motivi[str(self.cp_a.id)], "La carta è già in un'offerta aperta.")
+
+        libere = lista_carte_scambio(self.pg_a, solo_scambiabili=True)["results"]
+        self.assertEqual(len(libere), 1)
+        self.assertTrue(libere[0]["scambiabile"])
+
+    def test_filtri_mercato_non_validi_rispondono_400(self):
+        crea_offerta_scambio(self.pg_a, carta_offerta_id=str(self.cp_a.id), richiesta_crediti="5")
+        CampagnaUtente.objects.create(campagna=self.campagna, user=self.user_b, ruolo="PLAYER", attivo=True)
+        client = APIClient()
+        client.force_authenticate(user=self.user_b)
+        base = {"char_id": self.pg_b.id, "faccette": "1"}
+        for url in ("/api/personaggi/api/carte/mercato/offerte/", "/api/personaggi/api/carte/mercato/carte/"):
+            for filtro in ({"carta": "non-un-uuid"}, {"espansione": "x"}, {"offerente": "abc"}):
+                response = client.get(url, {**base, **filtro})
+                self.assertEqual(response.status_code, 400, (url, filtro))
+        response = client.get(
+            "/api/personaggi/api/carte/mercato/offerte/", {**base, "carta": str(self.carta_a.id)}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
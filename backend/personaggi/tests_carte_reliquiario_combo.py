@@ -7,13 +7,20 @@ from personaggi.carte_collezionabili_models import (
     CARTA_ENERGIA_MARZIALE,
     CARTA_RARITA_COMUNE,
     CARTA_TIPO_PERSONAGGIO,
+    COMBO_TRIGGER_CARTE,
     COMBO_TRIGGER_LEGAME,
     CartaCollezionabile,
     CartaPosseduta,
     ComboReliquiario,
     ReliquiarioSlot,
 )
-from personaggi.carte_reliquiario_combo import calcola_combo_reliquiario_attive, valuta_combo_reliquiario
+from kor35.config_cache import clear_local
+from personaggi.carte_reliquiario_combo import (
+    COMBO_RELIQUIARIO_CACHE_NAMESPACE,
+    calcola_combo_reliquiario_attive,
+    get_indice_combo,
+    valuta_combo_reliquiario,
+)
 from personaggi.models import Campagna, Personaggio, TipologiaPersonaggio
 
 User = get_user_model()
@@ -87,6 +94,9 @@ class ComboReliquiarioValutaTests(TestCase):
             legame_id="sette-elegie",
         )
 
+    def tearDown(self):
+        clear_local(COMBO_RELIQUIARIO_CACHE_NAMESPACE)
+
     def test_legame_attivo_con_due_carte(self):
         entries = [
             {"slot_index": 0, "carta": self.c1, "codice": "CMB-1", "legame_id": "sette-elegie", "set_collezione": "", "energia": self.c1.energia},
@@ -111,3 +121,42 @@ class ComboReliquiarioValutaTests(TestCase):
         self.assertEqual(len(attive), 1)
         self.assertEqual(attive[0]["nome"], "Legame doppio")
         self.assertEqual(attive[0]["colore"], "#ff00aa")
+
+    def test_indice_valuta_solo_combo_con_chiavi_presenti(self):
+        for i in range(20):
+            ComboReliquiario.objects.create(
+                campagna=self.campagna,
+                codice=f"altro-legame-{i}",
+                nome=f"Altro {i}",
+                tipo_trigger=COMBO_TRIGGER_LEGAME,
+                param_legame_id=f"legame-{i}",
+            )
+        ComboReliquiario.objects.create(
+            campagna=self.campagna,
+            codice="coppia",
+            nome="Coppia",
+            tipo_trigger=COMBO_TRIGGER_CARTE,
+            param_carte_codici=["CMB-1", "CMB-2"],
+        )
+        ComboReliquiario.objects.create(
+            campagna=self.campagna,
+            codice="tris",
+            nome="Tris",
+            tipo_trigger=COMBO_TRIGGER_CARTE,
+            param_carte_codici=["CMB-1", "CMB-2", "CMB-3"],
+        )
+        entries = [
+            {"slot_index": 0, "carta": self.c1, "codice": "CMB-1", "legame_id": "sette-elegie", "set_collezione": "", "energia": "X"},
+            {"slot_index": 1, "carta": self.c2, "codice": "CMB-2", "legame_id": "sette-elegie", "set_collezione": "", "energia": "X"},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            candidate = get_indice_combo(self.campagna.id).candidate(entries)
+        self.assertEqual([c.codice for c in candidate], ["coppia", "legame-x2"])
+        with self.assertNumQueries(0):
+            get_indice_combo(self.campagna.id)
+
+        # Il signal su ComboReliquiario invalida l'indice della campagna.
+        self.combo.attiva = False
+        self.combo.save()
+        candidate = get_indice_combo(self.campagna.id).candidate(entries)
+        self.assertEqual([c.codice for c in candidate], ["coppia"])
@@ -0,0 +1,72 @@
+"""
+Catalogo regole in memoria: lookup per sigla/nome e invalidazione su salvataggio.
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from personaggi.catalogo_regole import StatisticaInfo, get_catalogo_regole
+from personaggi.models import (
+    AURA,
+    CARATTERISTICA,
+    Campagna,
+    Personaggio,
+    PersonaggioStatisticaBase,
+    Punteggio,
+    Statistica,
+    TipologiaPersonaggio,
+)
+
+
+class CatalogoRegoleTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="pg_catalogo", password="x")
+        tipologia = TipologiaPersonaggio.objects.create(
+            nome="Std catalogo",
+            crediti_iniziali=Decimal("0"),
+            caratteristiche_iniziali=0,
+        )
+        campagna = Campagna.objects.create(nome="Camp catalogo", slug="camp-catalogo")
+        self.personaggio = Personaggio.objects.create(
+            nome="Catalogato",
+            proprietario=self.user,
+            tipologia=tipologia,
+            campagna=campagna,
+        )
+        self.forza = Punteggio.objects.create(nome="Forza Cat", sigla="FZC", tipo=CARATTERISTICA)
+        self.aura = Punteggio.objects.create(nome="Aura Cat", sigla="AUC", tipo=AURA)
+        self.stat = Statistica.objects.create(
+            nome="Vigore Cat",
+            sigla="VGC",
+            parametro="vgc",
+            valore_base_predefinito=3,
+        )
+
+    def test_snapshot_indicizzato_per_sigla_e_nome(self):
+        catalogo = get_catalogo_regole()
+        self.assertIsInstance(catalogo.statistica("VGC"), StatisticaInfo)
+        self.assertEqual(catalogo.statistica_per_nome("Vigore Cat").parametro, "vgc")
+        self.assertIsNone(catalogo.statistica("FZC"))
+        self.assertEqual(catalogo.punteggio_per_sigla("AUC", tipo=AURA).id, self.aura.id)
+        self.assertIsNone(catalogo.punteggio_per_sigla("AUC", tipo=CARATTERISTICA))
+        self.assertIn("Forza Cat", catalogo.nomi_tipo(CARATTERISTICA))
+
+    def test_statistiche_base_da_catalogo_e_pivot(self):
+        self.assertEqual(self.personaggio.statistiche_base_dict["vgc"], 3)
+        PersonaggioStatisticaBase.objects.create(
+            personaggio=self.personaggio, statistica=self.stat, valore_base=7
+        )
+        pg = Personaggio.objects.get(pk=self.personaggio.pk)
+        self.assertEqual(pg.statistiche_base_dict["vgc"], 7)
+
+    def test_nuova_statistica_invalida_memo_su_istanza(self):
+        self.assertIsNone(self.personaggio._catalogo_regole().statistica("NVC"))
+        Statistica.objects.create(nome="Nuova Cat", sigla="NVC", parametro="nvc")
+        self.assertIsNotNone(self.personaggio._catalogo_regole().statistica("NVC"))
+
+    def test_caratteristiche_base_non_interroga_il_catalogo_per_chiave(self):
+        self.personaggio._punteggi_base_cache = {"Forza Cat": 2, "Aura Cat": 1, "Altro": 4}
+        self.personaggio._catalogo_regole()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.personaggio.caratteristiche_base, {"Forza Cat": 2})
@@ -2,10 +2,19 @@
 from unittest.mock import MagicMock, patch
 
 from django.contrib.auth import get_user_model
-from django.test import SimpleTestCase, TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.utils import timezone
 
-from personaggi.models import MinigiocoQrConfig, MinigiocoQrSession, QrCode, TipologiaPersonaggio, Personaggio
+from personaggi.models import (
+    AURA,
+    MinigiocoBibliotecaImmagine,
+    MinigiocoPuzzlePregenerato,
+    MinigiocoQrConfig,
+    MinigiocoQrSession,
+    Personaggio,
+    QrCode,
+    TipologiaPersonaggio,
+)
 from personaggi.qr_minigioco import (
     generate_game_state,
     generate_sliding_state,
@@ -35,6 +44,7 @@ from personaggi.qr_minigioco import (
     SESSIONE_COMPLETATO,
     SESSIONE_SCADUTO_ATTIVA,
     BYPASS_TRANSITO_SECONDI,
+    MINIGIOCO_TIPI,
 )
 
 
@@ -111,11 +121,12 @@ class QrMinigiocoLogicTests(SimpleTestCase):
         cfg = _Cfg(difficolta=4, regole_difficolta=[])
         self.assertEqual(risolvi_difficolta(_Pg(), cfg), 4)
 
-    @patch("personaggi.models.Punteggio.objects.filter")
-    def test_risolvi_difficolta_aura(self, mock_punteggio_filter):
+    @patch("personaggi.catalogo_regole.get_catalogo_regole")
+    def test_risolvi_difficolta_aura(self, mock_catalogo):
         mock_p = MagicMock()
         mock_p.nome = "Magica"
-        mock_punteggio_filter.return_value.first.return_value = mock_p
+        mock_p.tipo = AURA
+        mock_catalogo.return_value.per_nome = {"Magica": mock_p}
         cfg = _Cfg(
             difficolta=4,
             regole_difficolta=[
@@ -479,3 +490,53 @@ class MinigiocoSezioneAccessoTests(TestCase):
         gate = check_gate_minigioco(qr_code=self.qr, personaggio=self.pg)
         self.assertEqual(gate["tipo_modello"], "minigioco_richiesto")
 
+
+
+@override_settings(MINIGIOCO_POOL_SOGLIA_MINIMA=2)
+class MinigiocoPoolTests(TestCase):
+    def test_puzzle_validati_per_ogni_tipo_e_difficolta(self):
+        from personaggi.minigioco_pool import genera_puzzle_validato
+
+        for tipo in MINIGIOCO_TIPI:
+            for d in (1, 2, 3, 4):
+                p = genera_puzzle_validato(tipo, d, 1234 + d)
+                self.assertTrue(verify_solution(tipo, d, p.soluzione, p.stato_gioco), (tipo, d))
+
+    def test_prelievo_consuma_e_rabbocca_sotto_soglia(self):
+        from personaggi.minigioco_pool import preleva_puzzle, riempi_pool
+
+        self.assertEqual(riempi_pool([MINIGIOCO_TIPO_PIPE], [3], target=3), 3)
+        self.assertEqual(riempi_pool([MINIGIOCO_TIPO_PIPE], [3], target=3), 0)
+        with patch("personaggi.minigioco_pool._rabbocco_in_thread") as mock_rabbocco:
+            with self.captureOnCommitCallbacks(execute=True):
+                primo = preleva_puzzle(MINIGIOCO_TIPO_PIPE, 3)
+            mock_rabbocco.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                preleva_puzzle(MINIGIOCO_TIPO_PIPE, 3)
+            mock_rabbocco.assert_called_once_with(MINIGIOCO_TIPO_PIPE, 3)
+        self.assertEqual(MinigiocoPuzzlePregenerato.objects.count(), 1)
+        self.assertTrue(
+            verify_solution(MINIGIOCO_TIPO_PIPE, 3, primo.soluzione, primo.stato_gioco)
+        )
+
+    def test_pool_vuoto_genera_dal_seed(self):
+        from personaggi.minigioco_pool import puzzle_per_sessione
+
+        p = puzzle_per_sessione(MINIGIOCO_TIPO_SIMON, 2, 42)
+        self.assertEqual(p.stato_gioco, generate_game_state(MINIGIOCO_TIPO_SIMON, 2, 42))
+
+    def test_pool_vuoto_senza_seed_valido_genera_comunque(self):
+        from personaggi.minigioco_pool import puzzle_per_sessione
+
+        with patch("personaggi.minigioco_pool.verify_solution", return_value=False):
+            p = puzzle_per_sessione(MINIGIOCO_TIPO_SIMON, 2, 42)
+        self.assertEqual(p.stato_gioco, generate_game_state(MINIGIOCO_TIPO_SIMON, 2, 42))
+        self.assertEqual(p.soluzione["player_input"], p.stato_gioco["sequence"])
+
+    def test_scegli_immagine_biblioteca_offset_deterministico(self):
+        from personaggi.minigioco_biblioteca import scegli_immagine_biblioteca
+
+        for i in range(3):
+            MinigiocoBibliotecaImmagine.objects.create(immagine=f"minigioco_biblioteca/t{i}.jpg")
+        self.assertIsNotNone(scegli_immagine_biblioteca(7))
+        self.assertEqual(scegli_immagine_biblioteca(7), scegli_immagine_biblioteca(7))
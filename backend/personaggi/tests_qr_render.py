@@ -0,0 +1,44 @@
+"""Rendering QR con cache e fogli stampabili paginati."""
+
+from django.test import TestCase
+from django.urls import reverse
+
+from personaggi.models import QrCode
+from personaggi.qr_render import qr_data_uri, render_qr
+
+
+class QrRenderTests(TestCase):
+    def test_render_in_cache_e_endpoint_immagine(self):
+        render_qr.cache_clear()
+        png = render_qr("ABC123", 10, 4, "png")
+        self.assertTrue(png.startswith(b"\x89PNG"))
+        self.assertIs(render_qr("ABC123", 10, 4, "png"), png)
+        self.assertEqual(render_qr.cache_info().hits, 1)
+        self.assertTrue(qr_data_uri("ABC123").startswith("data:image/png;base64,"))
+
+        response = self.client.get(reverse("personaggi:qr_code_image", args=["ABC123", "svg"]), {"size": 6})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn(b"<svg", response.content)
+
+        self.assertEqual(self.client.get(reverse("personaggi:qr_code_image", args=["ABC123", "gif"])).status_code, 400)
+        self.assertEqual(self.client.get(reverse("personaggi:qr_code_image", args=["a b", "png"])).status_code, 400)
+
+    def test_lista_paginata_filtrata_e_streaming(self):
+        for i in range(5):
+            QrCode.objects.create(testo=f"Etichetta {i}", qr_stampato=i == 0)
+
+        response = self.client.get(reverse("personaggi:qr_code_list"), {"per_pagina": 2, "stampati": "0"})
+        html = response.content.decode()
+        self.assertEqual(html.count('class="qr-box"'), 2)
+        self.assertIn("Pagina 1 di 2 (4 QR)", html)
+        self.assertIn("pagina=2", html)
+        self.assertNotIn("data:image", html)
+        ultimo = QrCode.objects.get(testo="Etichetta 4")
+        self.assertIn(reverse("personaggi:qr_code_image", args=[ultimo.id, "png"]) + "?size=10", html)
+
+        response = self.client.get(reverse("personaggi:qr_code_list"), {"tutti": "1", "q": "Etichetta 3"})
+        html = b"".join(response.streaming_content).decode()
+        self.assertEqual(html.count('class="qr-box"'), 1)
+        self.assertIn("Etichetta 3", html)
@@ -0,0 +1,78 @@
+"""Valutatore requisiti di accesso: predicati compilati e fatti per personaggio."""
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from personaggi.models import (
+    Abilita,
+    Campagna,
+    CARATTERISTICA,
+    Carica,
+    Carriera,
+    Personaggio,
+    PersonaggioAbilita,
+    PersonaggioCarrieraMembership,
+    Punteggio,
+    TIER_3,
+    TipoCarriera,
+)
+from personaggi.requisiti_accesso import (
+    compila_requisiti,
+    gruppo_requisiti_soddisfatto,
+    personaggio_soddisfa_requisiti,
+    personaggio_soddisfa_requisiti_gruppo,
+)
+
+
+class RequisitiAccessoTests(TestCase):
+    def setUp(self):
+        self.campagna = Campagna.objects.filter(slug="kor35").first() or Campagna.objects.create(
+            slug="kor35", nome="KOR35", attiva=True, is_default=True
+        )
+        caratt = Punteggio.objects.create(nome="CAR_REQ", sigla="CRQ", tipo=CARATTERISTICA, colore="#000000")
+        self.abilita = [
+            Abilita.objects.create(nome=f"Abilità req {i}", descrizione="", caratteristica=caratt, campagna=self.campagna)
+            for i in range(3)
+        ]
+        tipo_korp, _ = TipoCarriera.objects.get_or_create(codice="korp", defaults={"nome": "Korp"})
+        self.korp = Carriera.objects.create(nome="Korp Req", descrizione="", tipo=TIER_3, tipo_carriera=tipo_korp)
+        self.carica = Carica.objects.create(nome="Portavoce")
+        self.carica.carriere.add(self.korp)
+        self.pg = Personaggio.objects.create(nome="PG requisiti", campagna=self.campagna)
+        PersonaggioAbilita.objects.create(personaggio=self.pg, abilita=self.abilita[0])
+        PersonaggioCarrieraMembership.objects.create(
+            personaggio=self.pg,
+            carriera=self.korp,
+            tipo_carriera=tipo_korp,
+            carica=self.carica,
+            data_da=timezone.now() - timezone.timedelta(days=1),
+        )
+
+    def test_semantica_and_or_e_messaggi(self):
+        posseduta = {"tipo": "abilita", "id": self.abilita[0].id}
+        mancante = {"tipo": "abilita", "id": self.abilita[1].id}
+        self.assertEqual(personaggio_soddisfa_requisiti(self.pg, [posseduta, {"tipo": "korp", "id": self.korp.id}]), (True, ""))
+        ok, msg = personaggio_soddisfa_requisiti(self.pg, [posseduta, mancante])
+        self.assertFalse(ok)
+        self.assertIn("Abilità req 1", msg)
+        self.assertTrue(gruppo_requisiti_soddisfatto(self.pg, {"operator": "OR", "requisiti": [mancante, posseduta]}))
+        ok, msg = personaggio_soddisfa_requisiti_gruppo(
+            self.pg, {"operator": "OR", "requisiti": [mancante, {"tipo": "carriera", "id": self.korp.id + 999}]}
+        )
+        self.assertFalse(ok)
+        self.assertIn("nessuna condizione alternativa", msg)
+        self.assertTrue(personaggio_soddisfa_requisiti(self.pg, [{"tipo": "carica", "id": str(self.carica.id)}])[0])
+        self.assertIs(compila_requisiti([posseduta, mancante]), compila_requisiti([posseduta, mancante]))
+
+    def test_query_costanti_su_molte_regole(self):
+        regole = [
+            {"operator": "AND", "requisiti": [{"tipo": "abilita", "id": ab.id}, {"tipo": "korp", "id": self.korp.id}]}
+            for ab in self.abilita * 10
+        ]
+        pg = Personaggio.objects.get(pk=self.pg.pk)
+        with CaptureQueriesContext(connection) as queries:
+            esiti = [gruppo_requisiti_soddisfatto(pg, regola) for regola in regole]
+        self.assertEqual(esiti.count(True), 10)
+        self.assertEqual(len(queries), 2)
@@ -0,0 +1,110 @@
+"""Indice di ricerca staff: documento denormalizzato, signal e ranking."""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from personaggi.models import (
+    Campagna,
+    Carriera,
+    Gruppo,
+    Personaggio,
+    PersonaggioCarrieraMembership,
+    PersonaggioIndiceRicerca,
+    TipoCarriera,
+)
+from personaggi.ricerca_staff import (
+    filtra_personaggi_per_ricerca,
+    normalizza_testo_ricerca,
+    punteggio_documento,
+)
+
+
+class RicercaStaffTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            username="ricerca_staff", password="x", is_staff=True, is_superuser=True
+        )
+        self.giocatore = User.objects.create_user(
+            username="mrossi", password="x", first_name="Mario", last_name="Rossi"
+        )
+        self.campagna = Campagna.objects.create(slug="ricerca-staff", nome="Ricerca Staff", attiva=True)
+        self.pg = Personaggio.objects.create(
+            nome="Élodie Varga", proprietario=self.giocatore, campagna=self.campagna
+        )
+        self.altro = Personaggio.objects.create(nome="Varghese Lodi", campagna=self.campagna)
+
+    def _testo(self, personaggio):
+        return PersonaggioIndiceRicerca.objects.get(personaggio=personaggio).testo
+
+    def test_documento_creato_e_normalizzato(self):
+        testo = self._testo(self.pg)
+        self.assertIn("elodie varga", testo)
+        self.assertIn("mrossi", testo)
+        self.assertIn("ricerca staff", testo)
+
+    def test_signal_aggiornano_documento(self):
+        tipo, _ = TipoCarriera.objects.get_or_create(codice="korp", defaults={"nome": "KORP", "ordine": 0})
+        korp = Carriera.objects.create(nome="KORP Orione", tipo="T3", tipo_carriera=tipo)
+        PersonaggioCarrieraMembership.objects.create(
+            personaggio=self.pg, carriera=korp, tipo_carriera=tipo
+        )
+        self.assertIn("korp orione", self._testo(self.pg))
+
+        korp.nome = "KORP Sirio"
+        korp.save()
+        self.assertIn("korp sirio", self._testo(self.pg))
+
+        self.giocatore.last_name = "Bianchi"
+        self.giocatore.save()
+        self.assertIn("bianchi", self._testo(self.pg))
+
+    def test_gruppi_nel_documento_e_login_non_reindicizza(self):
+        gruppo = Gruppo.objects.create(nome="Ciurma Nebulosa")
+        gruppo.membri.add(self.pg)
+        self.assertIn("ciurma nebulosa", self._testo(self.pg))
+        gruppo.nome = "Ciurma Aurora"
+        gruppo.save()
+        self.assertIn("ciurma aurora", self._testo(self.pg))
+        gruppo.membri.clear()
+        self.assertNotIn("ciurma", self._testo(self.pg))
+
+        with mock.patch("personaggi.ricerca_staff.aggiorna_indice_ricerca") as aggiorna:
+            self.giocatore.save(update_fields=["last_login"])
+            aggiorna.assert_not_called()
+            self.giocatore.save(update_fields=["email"])
+            aggiorna.assert_called_once()
+
+    def test_ricerca_prefisso_senza_accenti_e_ranking(self):
+        qs = Personaggio.objects.filter(campagna=self.campagna)
+        risultati = list(filtra_personaggi_per_ricerca(qs, "elod"))
+        self.assertEqual(risultati, [self.pg])
+
+        risultati = list(filtra_personaggi_per_ricerca(qs, "Rossi mario"))
+        self.assertEqual(risultati, [self.pg])
+
+        risultati = list(filtra_personaggi_per_ricerca(qs, "varg"))
+        self.assertEqual(set(risultati), {self.pg, self.altro})
+
+    def test_endpoint_staff_paginato(self):
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+        resp = client.get(
+            "/api/personaggi/api/staff/personaggi/",
+            {"campagna": self.campagna.slug, "q": "élodie", "page_size": 10},
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["count"], 1)
+        self.assertEqual(resp.data["results"][0]["id"], self.pg.id)
+
+    def test_punteggio_fallback_python(self):
+        doc = normalizza_testo_ricerca("Élodie Varga mrossi KORP Orione")
+        self.assertEqual(punteggio_documento(["elo"], doc), 1.0)
+        self.assertGreater(punteggio_documento(["orinoe"], doc), 0)
+        self.assertEqual(punteggio_documento(["elo", "zzz"], doc), 0.0)
+        self.assertGreater(
+            punteggio_documento(["varga"], doc), punteggio_documento(["arga"], doc)
+        )
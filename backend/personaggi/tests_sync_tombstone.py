@@ -1,6 +1,8 @@
+from unittest import mock
 from uuid import uuid4
 
-from django.test import TestCase
+from django.db import transaction
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from gestione_plot.models import PaginaRegolamento
@@ -10,11 +12,13 @@ from kor35.sync_tombstone import (
     apply_tombstone_rows,
     build_tombstones_outgoing,
     clear_tombstone,
+    compatta_tombstone,
     get_sync_model_registry,
     record_tombstone_for_instance,
+    registra_conferma_nodo,
     tombstone_blocks_record_apply,
 )
-from personaggi.models import Carriera, SyncTombstone, Tessitura, Punteggio, TIER_3, TipoCarriera
+from personaggi.models import Carriera, SyncReplicaAck, SyncTombstone, Tessitura, Punteggio, TIER_3, TipoCarriera
 
 
 class SyncTombstoneTests(TestCase):
@@ -25,7 +29,8 @@ class SyncTombstoneTests(TestCase):
         tess = Tessitura.objects.create(nome="Da cancellare", aura_richiesta=self.aura)
         sync_id = tess.sync_id
         label = tess._meta.label_lower
-        tess.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            tess.delete()
         self.assertTrue(SyncTombstone.objects.filter(model_label=label, sync_id=sync_id).exists())
 
     def test_tombstone_blocks_stale_record_apply(self):
@@ -157,3 +162,86 @@ class SyncTombstoneTests(TestCase):
                 model_label=tipo._meta.label_lower, sync_id=tipo.sync_id
             ).exists()
         )
+
+
+class SyncTombstoneBulkTests(TestCase):
+    def setUp(self):
+        self.aura = Punteggio.objects.create(nome="Aura Bulk", sigla="ABK", tipo="AU")
+
+    def test_delete_multiple_scrivono_in_blocco_al_commit(self):
+        tessiture = [Tessitura.objects.create(nome=f"Bulk {i}", aura_richiesta=self.aura) for i in range(5)]
+        sync_ids = {t.sync_id for t in tessiture}
+        with self.captureOnCommitCallbacks() as callbacks:
+            for t in tessiture:
+                t.delete()
+            self.assertFalse(SyncTombstone.objects.filter(sync_id__in=sync_ids).exists())
+        self.assertEqual(len(callbacks), 1)
+        # Per label (tessitura + parent MTI a_vista): righe vive e tombstone esistenti; poi un
+        # solo INSERT ... ON CONFLICT per tutte le 10 tombstone.
+        with self.assertNumQueries(5):
+            callbacks[0]()
+        rows = SyncTombstone.objects.filter(sync_id__in=sync_ids)
+        self.assertEqual(rows.filter(model_label="personaggi.tessitura").count(), 5)
+        self.assertEqual(rows.filter(model_label="personaggi.a_vista").count(), 5)
+
+    def test_savepoint_annullato_non_lascia_tombstone(self):
+        tess = Tessitura.objects.create(nome="Rollback", aura_richiesta=self.aura)
+        with self.captureOnCommitCallbacks(execute=True):
+            altra = Tessitura.objects.create(nome="Cancellata", aura_richiesta=self.aura)
+            altra.delete()
+            try:
+                with transaction.atomic():
+                    tess.delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(SyncTombstone.objects.filter(sync_id=tess.sync_id).exists())
+        self.assertTrue(SyncTombstone.objects.filter(sync_id=altra.sync_id).exists())
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    def test_compatta_solo_confermate_da_tutti_i_nodi(self):
+        SyncTombstone.objects.all().delete()
+        SyncReplicaAck.objects.all().delete()
+        now = timezone.now()
+        for giorni in (90, 60, 10):
+            SyncTombstone.objects.create(
+                model_label="personaggi.tessitura", sync_id=uuid4(), deleted_at=now - timezone.timedelta(days=giorni)
+            )
+        self.assertEqual(compatta_tombstone(), 0)
+
+        registra_conferma_nodo("mirror", now)
+        registra_conferma_nodo("dev-office", now - timezone.timedelta(days=75))
+        self.assertEqual(compatta_tombstone(dry_run=True), 1)
+        self.assertEqual(compatta_tombstone(), 1)
+
+        registra_conferma_nodo("dev-office", now)
+        self.assertEqual(compatta_tombstone(), 1)
+        self.assertEqual(SyncTombstone.objects.count(), 1)
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30, SYNC_REPLICA_ACK_HORIZON_DAYS=90)
+    def test_nodo_dismesso_non_blocca_la_compattazione(self):
+        SyncTombstone.objects.all().delete()
+        SyncReplicaAck.objects.all().delete()
+        now = timezone.now()
+        SyncTombstone.objects.create(
+            model_label="personaggi.tessitura", sync_id=uuid4(), deleted_at=now - timezone.timedelta(days=60)
+        )
+        registra_conferma_nodo("mirror", now)
+        registra_conferma_nodo("vecchia-replica", now - timezone.timedelta(days=200))
+        self.assertEqual(compatta_tombstone(dry_run=True), 0)
+
+        SyncReplicaAck.objects.filter(nodo="vecchia-replica").update(ultimo_contatto=now - timezone.timedelta(days=120))
+        self.assertEqual(compatta_tombstone(), 1)
+
+    @override_settings(EDGE_SYNC_TOKEN="tombstone-test")
+    def test_conferma_fallita_non_rompe_il_sync(self):
+        SyncReplicaAck.objects.all().delete()
+        with mock.patch("kor35.edge_sync.registra_conferma_nodo", side_effect=RuntimeError("boom")):
+            response = self.client.post(
+                "/api/sync/edge/",
+                {"source_node": "mirror", "since": timezone.now().isoformat(), "records": {}},
+                content_type="application/json",
+                HTTP_AUTHORIZATION="EdgeToken tombstone-test",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(SyncReplicaAck.objects.exists())
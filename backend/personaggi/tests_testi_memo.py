@@ -0,0 +1,63 @@
+"""Memo dei testi regola renderizzati (formatta_testo_generico)."""
+
+from django.test import SimpleTestCase
+
+from personaggi import models as personaggi_models
+from personaggi.models import formatta_testo_generico
+
+
+class _Stat:
+    def __init__(self, parametro):
+        self.parametro = parametro
+
+
+class _Item:
+    def __init__(self, parametro, valore_base):
+        self.statistica = _Stat(parametro)
+        self.valore_base = valore_base
+
+
+class _Aura:
+    def __init__(self, pk, nome):
+        self.pk = pk
+        self.nome = nome
+
+
+class TestiMemoTests(SimpleTestCase):
+    def setUp(self):
+        personaggi_models._memo_testi.clear()
+
+    def _voci(self):
+        return len(personaggi_models._memo_testi._voci)
+
+    def test_chiave_solo_sui_parametri_letti(self):
+        testo = "Infligge {forza|:L} danni {if forza > 2}potenti{endif}."
+        primo = formatta_testo_generico(testo, statistiche_base=[_Item("forza", 3), _Item("destrezza", 1)])
+        secondo = formatta_testo_generico(testo, statistiche_base=[_Item("forza", 3), _Item("destrezza", 7)])
+        self.assertEqual(primo, secondo)
+        self.assertIn("Tre danni potenti", primo)
+        self.assertEqual(self._voci(), 1)
+
+        terzo = formatta_testo_generico(testo, statistiche_base=[_Item("forza", 1), _Item("destrezza", 7)])
+        self.assertNotIn("potenti", terzo)
+        self.assertEqual(self._voci(), 2)
+
+    def test_gruppi_esclusivi_e_oggetti_nella_chiave(self):
+        formula = "{formula_prefix}{aura|NAME}"
+        puro = formatta_testo_generico(
+            "", formula=formula, statistiche_base=[_Item("puro", 1)], context={"aura": _Aura(1, "Fuoco")}
+        )
+        self.assertIn("Puro", puro)
+        self.assertIn("Fuoco", puro)
+
+        diretto = formatta_testo_generico(
+            "", formula=formula, statistiche_base=[_Item("diretto", 1)], context={"aura": _Aura(1, "Fuoco")}
+        )
+        self.assertIn("Diretto", diretto)
+        self.assertNotIn("Puro", diretto)
+
+        rinominata = formatta_testo_generico(
+            "", formula=formula, statistiche_base=[_Item("diretto", 1)], context={"aura": _Aura(1, "Gelo")}
+        )
+        self.assertIn("Gelo", rinominata)
+        self.assertEqual(self._voci(), 3)
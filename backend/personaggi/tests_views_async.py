@@ -0,0 +1,86 @@
+"""Viste async dei poll frequenti: auth equivalente a DRF, stessi JSON delle APIView."""
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from kor35 import async_api
+from personaggi.models import Campagna, Personaggio, WatchDeviceBinding
+
+REDIS_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://cache.invalid:6379/4",
+        "OPTIONS": {"socket_timeout": 2, "password": "segreta"},
+    }
+}
+
+
+class VisteAsyncPollTests(TestCase):
+    def setUp(self):
+        self.campagna = Campagna.objects.filter(slug="kor35").first() or Campagna.objects.create(
+            slug="kor35", nome="KOR35", attiva=True, is_default=True
+        )
+        self.user = User.objects.create_user(username="poll_async", password="x")
+        self.altro = User.objects.create_user(username="poll_altro", password="x")
+        self.pg = Personaggio.objects.create(nome="PG poll", proprietario=self.user, campagna=self.campagna)
+        self.pg_altrui = Personaggio.objects.create(nome="PG altrui", proprietario=self.altro, campagna=self.campagna)
+        self.token = Token.objects.create(user=self.user)
+
+    def _client(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}", HTTP_X_CAMPAGNA="kor35")
+        return client
+
+    def test_autenticazione_come_drf(self):
+        anon = APIClient().get("/api/personaggi/api/cache-revision/?q=punteggi_all")
+        self.assertEqual(anon.status_code, 401)
+        self.assertIn("detail", anon.json())
+        self.assertTrue(anon.has_header("WWW-Authenticate"))
+
+        errato = APIClient()
+        errato.credentials(HTTP_AUTHORIZATION="Token non-esiste")
+        self.assertEqual(errato.get("/api/personaggi/api/messaggi/unread_counts/").status_code, 401)
+
+        sessione = APIClient()
+        sessione.force_login(self.user)
+        self.assertEqual(sessione.get("/api/personaggi/api/messaggi/unread_counts/").status_code, 200)
+        self.assertEqual(self._client().post("/api/personaggi/api/cache-revision/").status_code, 405)
+
+    def test_cache_revision_scoping_personaggio(self):
+        q = f"personaggio:{self.pg.pk},personaggio:{self.pg_altrui.pk},personaggio:x,ignota"
+        data = self._client().get(f"/api/personaggi/api/cache-revision/?q={q}").json()
+        self.assertIsNotNone(data[f"personaggio:{self.pg.pk}"])
+        self.assertIsNone(data[f"personaggio:{self.pg_altrui.pk}"])
+        self.assertIsNone(data["personaggio:x"])
+        self.assertIsNone(data["ignota"])
+
+    def test_unread_vuoto_e_watch_status(self):
+        vuoto = self._client().get("/api/personaggi/api/messaggi/unread_counts/").json()
+        self.assertEqual(vuoto["totals"], {"player": 0, "staff": 0, "all": 0})
+        self.assertEqual(vuoto["by_character"], [])
+
+        url = "/api/personaggi/api/device/watch/status/"
+        res = self._client().get(f"{url}?char_id={self.pg.pk}")
+        self.assertEqual(res.json(), {"watch_enabled": bool(self.pg.watch_enabled), "binding": None})
+        WatchDeviceBinding.objects.create(campagna=self.campagna, personaggio=self.pg, device_id="dev-1", is_active=True)
+        binding = self._client().get(f"{url}?char_id={self.pg.pk}").json()["binding"]
+        self.assertEqual((binding["device_id"], binding["personaggio_nome"]), ("dev-1", "PG poll"))
+
+        altrui = self._client().get(f"{url}?char_id={self.pg_altrui.pk}")
+        self.assertEqual(altrui.status_code, 404)
+        self.assertIn("detail", altrui.json())
+
+    def test_client_redis_da_config_cache_e_condiviso(self):
+        async def due_client():
+            return async_api._redis_async(), async_api._redis_async()
+
+        self.addCleanup(setattr, async_api, "_client_redis", None)
+        async_api._client_redis = None
+        with override_settings(CACHES=REDIS_CACHES):
+            primo, secondo = async_to_sync(due_client)()
+        self.assertIs(primo, secondo)
+        kwargs = primo.connection_pool.connection_kwargs
+        self.assertEqual((kwargs["db"], kwargs["socket_timeout"], kwargs["password"]), (4, 2, "segreta"))
@@ -1,7 +1,7 @@
 from django.urls import path, include
 # from rest_framework.authtoken.views import obtain_auth_token
 
-from . import views, views_staff, views_scommesse, views_carte, views_carte_platform, watch_views, views_economia
+from . import views, views_async, views_staff, views_scommesse, views_carte, views_carte_platform, watch_views, views_economia
 from rest_framework import routers
 
 from rest_framework.routers import DefaultRouter
@@ -162,7 +162,7 @@ urlpatterns = [
     path('api/device/watch/pair/status/', watch_views.WatchPairStatusView.as_view(), name='watch-pair-status'),
     path('api/device/watch/pair/confirm/', watch_views.WatchPairConfirmView.as_view(), name='watch-pair-confirm'),
     path('api/device/watch/disconnect/', watch_views.WatchDisconnectView.as_view(), name='watch-disconnect'),
-    path('api/device/watch/status/', watch_views.WatchBindingStatusView.as_view(), name='watch-status'),
+    path('api/device/watch/status/', views_async.watch_binding_status_view, name='watch-status'),
     path('api/device/watch/profile/', watch_views.WatchProfileView.as_view(), name='watch-profile'),
     path('api/device/watch/sync/', watch_views.WatchSyncView.as_view(), name='watch-sync'),
     path('api/device/watch/ota/manifest/', watch_views.WatchOtaManifestView.as_view(), name='watch-ota-manifest'),
@@ -176,6 +176,9 @@ urlpatterns = [
     # NUOVA VISTA 1: Elenco dei QR (../oggetti/qr/)
     path('qr/', views.qr_code_list_view, name='qr_code_list'),
     
+    # Immagine QR (PNG/SVG) per URL, con cache HTTP a lungo termine
+    path('qr/img/<str:payload>.<str:fmt>', views.qr_code_image_view, name='qr_code_image'),
+
     # NUOVA VISTA 2: Dettaglio del singolo QR (../oggetti/qr/<uuid>/)
     path('qr/<str:pk>/', views.qr_code_detail_view, name='qr_code_detail'),
  
@@ -240,13 +243,13 @@ urlpatterns = [
     path('api/personaggio/me/abilita_acquistabili/', views.AbilitaAcquistabiliView.as_view(), name='abilita-acquistabili'),
     path('api/punteggi/all/', views.PunteggiListView.as_view(), name='api_punteggi_all'),
     path('api/statistiche/containers/', views.StatisticaContainerListView.as_view(), name='api_statistiche_containers'),
-    path('api/cache-revision/', views.CacheRevisionView.as_view(), name='api_cache_revision'),
+    path('api/cache-revision/', views_async.cache_revision_view, name='api_cache_revision'),
     path('api/evento-premi/applica/', views.EventoPremiApplicaView.as_view(), name='api_evento_premi_applica'),
     path('api/gioco/evento-stato/', views.EventoGiocoStatoView.as_view(), name='api_gioco_evento_stato'),
     
     # --- MESSAGING ENDPOINTS (Phase 1) ---
     path('api/messaggi/', views.MessaggioListView.as_view(), name='api_messaggi_list'),
-    path('api/messaggi/unread_counts/', views.MessaggiUnreadCountsView.as_view(), name='api_messaggi_unread_counts'),
+    path('api/messaggi/unread_counts/', views_async.messaggi_unread_counts_view, name='api_messaggi_unread_counts'),
     path('api/messaggi/conversazioni/', views.ConversazioniView.as_view(), name='api_conversazioni'),
     path('api/messaggi/<int:messaggio_id>/rispondi/', views.RispondiMessaggioView.as_view(), name='api_rispondi_messaggio'),
     path('api/messaggi/broadcast/send/', views.MessaggioBroadcastCreateView.as_view(), name='api_messaggi_broadcast_send'),
@@ -376,6 +379,8 @@ urlpatterns = [
     path('api/carte/apri-bustina/', views_carte.CarteApriBustinaView.as_view(), name='carte-apri-bustina'),
     path('api/carte/reliquiario/', views_carte.CarteReliquiarioView.as_view(), name='carte-reliquiario'),
     path('api/carte/mercato/', views_carte.CarteMercatoView.as_view(), name='carte-mercato'),
+    path('api/carte/mercato/offerte/', views_carte.CarteMercatoOfferteView.as_view(), name='carte-mercato-offerte'),
+    path('api/carte/mercato/carte/', views_carte.CarteMercatoCarteView.as_view(), name='carte-mercato-carte'),
     path('api/carte/mercato/accetta/', views_carte.CarteMercatoAccettaView.as_view(), name='carte-mercato-accetta'),
     path('api/carte/mercato/annulla/', views_carte.CarteMercatoAnnullaView.as_view(), name='carte-mercato-annulla'),
     path('api/carte/mazzo/', views_carte.CarteMazzoDuelloView.as_view(), name='carte-mazzo'),
@@ -6,6 +6,7 @@ from django.db.models import Count, Sum, Prefetch, OuterRef, Exists, Subquery, V
 from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse, HttpRequest
+from django.urls import reverse
 from rest_framework import serializers
 from django.utils import timezone
 from django.core.cache import cache
@@ -62,9 +63,6 @@ from .models import (
 )
 
 import uuid 
-import qrcode
-import io
-import base64
 from django.utils.html import escape
 from datetime import timedelta, datetime
 
@@ -91,7 +89,6 @@ import json
 
 from gestione_plot.permissions import IsStaffOrMaster
 
-from . import api_cache_revision
 from . import qr_logic
 
 # --- IMPORT SERVICES ---
@@ -150,14 +147,9 @@ def _get_active_campaign(request):
 
 
 def _feature_mode_for_campaign(campagna, feature_key):
-    if not campagna:
-        return FEATURE_MODE_SHARED
-    if campagna.slug == "kor35":
-        return FEATURE_MODE_SHARED
-    row = CampagnaFeaturePolicy.objects.filter(campagna=campagna, feature_key=feature_key).first()
-    if not row:
-        return FEATURE_MODE_SHARED
-    return row.mode
+    from personaggi.campaigns import feature_mode_for_campaign
+
+    return feature_mode_for_campaign(campagna, feature_key)
 
 
 def _campaign_feature_filter(request, qs, feature_key):
@@ -1286,36 +1278,99 @@ def qr_code_html_view(request: HttpRequest) -> HttpResponse:
     return HttpResponse(html_response)
 
 def generate_qr_data_uri(data_string: str) -> str:
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-    qr.add_data(data_string)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    img_bytes = buffer.getvalue()
-    img_base64 = base64.b64encode(img_bytes).decode("utf-8")
-    return f"data:image/png;base64,{img_base64}"
+    from .qr_render import qr_data_uri
+
+    return qr_data_uri(data_string)
+
+
+QR_LISTA_PER_PAGINA = 60
+QR_LISTA_PER_PAGINA_MAX = 300
+
+
+def qr_code_image_view(request: HttpRequest, payload: str, fmt: str) -> HttpResponse:
+    """Immagine QR (PNG/SVG) per contenuto; ?size= dimensione modulo. Cache HTTP immutabile."""
+    from .qr_render import QR_FORMATI, QR_PAYLOAD_RE, normalizza_box_size, render_qr
+
+    if fmt not in QR_FORMATI or not QR_PAYLOAD_RE.match(payload):
+        return HttpResponse("Richiesta QR non valida.", status=400)
+    box_size = normalizza_box_size(request.GET.get("size"))
+    response = HttpResponse(render_qr(payload, box_size, 4, fmt), content_type=QR_FORMATI[fmt])
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+def _qr_img_src(qr_id: str, fmt: str, size: int) -> str:
+    return escape(f"{reverse('personaggi:qr_code_image', args=[qr_id, fmt])}?size={size}")
+
+
+def _qr_lista_box_html(qr, fmt: str) -> str:
+    qr_id_str = escape(str(qr.id))
+    testo = escape(qr.testo) if qr.testo else "<i>(Nessun testo)</i>"
+    return f"""<div class="qr-box"><img src="{_qr_img_src(str(qr.id), fmt, 10)}" alt="QR Code per {qr_id_str}" width="200" height="200" loading="lazy"><p style="font-family: monospace; font-size: 12px; margin-top: 10px;">{qr_id_str}</p><p>{testo}</p></div>"""
+
 
 def qr_code_list_view(request: HttpRequest) -> HttpResponse:
-    qrcodes = QrCode.objects.all().order_by('-data_creazione')
-    html_items = []
-    box_style = "display: inline-block; vertical-align: top; border: 1px solid #ccc; padding: 15px; margin: 10px; text-align: center; max-width: 250px; word-wrap: break-word;"
-    for qr in qrcodes:
-        qr_id_str = str(qr.id)
-        qr_img_data_uri = generate_qr_data_uri(qr_id_str)
-        testo = escape(qr.testo) if qr.testo else "<i>(Nessun testo)</i>"
-        html_items.append(f"""<div style="{box_style}"><img src="{qr_img_data_uri}" alt="QR Code per {qr_id_str}" width="200" height="200"><p style="font-family: monospace; font-size: 12px; margin-top: 10px;">{qr_id_str}</p><p>{testo}</p></div>""")
-    html_body = "\n".join(html_items)
-    html_response = f"""<!DOCTYPE html><html lang="it"><head><meta charset="UTF-8"><title>Elenco QrCode</title><style>body {{ font-family: sans-serif; padding: 1em; }}</style></head><body><h1>Elenco QrCode</h1><div>{html_body if html_body else "<p>Nessun QrCode trovato.</p>"}</div></body></html>"""
+    """
+    Fogli QR stampabili, paginati. Filtri: ?q= (id o testo), ?stampati=0|1, ?formato=png|svg,
+    ?per_pagina=, ?pagina=. Con ?tutti=1 l'elenco filtrato esce in streaming senza paginare.
+    Le immagini sono URL a ``qr_code_image`` (cache HTTP), non data URI.
+    """
+    from urllib.parse import urlencode
+
+    from django.core.paginator import Paginator
+    from django.db.models import Q
+    from django.http import StreamingHttpResponse
+
+    qrcodes = QrCode.objects.all().order_by('-data_creazione', 'id')
+    q = (request.GET.get("q") or "").strip()
+    if q:
+        qrcodes = qrcodes.filter(Q(id__icontains=q) | Q(testo__icontains=q))
+    stampati = request.GET.get("stampati")
+    if stampati in ("0", "1"):
+        qrcodes = qrcodes.filter(qr_stampato=stampati == "1")
+    fmt = "svg" if request.GET.get("formato") == "svg" else "png"
+
+    head = """<!DOCTYPE html><html lang="it"><head><meta charset="UTF-8"><title>Elenco QrCode</title><style>body { font-family: sans-serif; padding: 1em; } .qr-box { display: inline-block; vertical-align: top; border: 1px solid #ccc; padding: 15px; margin: 10px; text-align: center; max-width: 250px; word-wrap: break-word; break-inside: avoid; } @media print { .qr-nav { display: none; } }</style></head><body><h1>Elenco QrCode</h1>"""
+    vuoto = "<p>Nessun QrCode trovato.</p>"
+
+    if request.GET.get("tutti") == "1":
+        def stream():
+            yield head + "<div>"
+            trovati = False
+            for qr in qrcodes.only("id", "testo").iterator(chunk_size=500):
+                trovati = True
+                yield _qr_lista_box_html(qr, fmt)
+            yield ("" if trovati else vuoto) + "</div></body></html>"
+
+        return StreamingHttpResponse(stream(), content_type="text/html; charset=utf-8")
+
+    try:
+        per_pagina = int(request.GET.get("per_pagina") or QR_LISTA_PER_PAGINA)
+    except ValueError:
+        per_pagina = QR_LISTA_PER_PAGINA
+    per_pagina = max(1, min(per_pagina, QR_LISTA_PER_PAGINA_MAX))
+    pagina = Paginator(qrcodes.only("id", "testo"), per_pagina).get_page(request.GET.get("pagina"))
+
+    def link(numero, etichetta):
+        params = request.GET.copy()
+        params["pagina"] = numero
+        return f'<a href="?{escape(urlencode(sorted(params.items())))}">{etichetta}</a>'
+
+    nav = [f"Pagina {pagina.number} di {pagina.paginator.num_pages} ({pagina.paginator.count} QR)"]
+    if pagina.has_previous():
+        nav.insert(0, link(pagina.previous_page_number(), "&laquo; Precedente"))
+    if pagina.has_next():
+        nav.append(link(pagina.next_page_number(), "Successiva &raquo;"))
+    html_body = "\n".join(_qr_lista_box_html(qr, fmt) for qr in pagina)
+    html_response = f"""{head}<p class="qr-nav">{" | ".join(nav)}</p><div>{html_body if html_body else vuoto}</div></body></html>"""
     return HttpResponse(html_response)
 
 def qr_code_detail_view(request: HttpRequest, pk: string) -> HttpResponse:
     qr = get_object_or_404(QrCode, pk=pk)
-    qr_id_str = str(qr.id)
-    qr_img_data_uri = generate_qr_data_uri(qr_id_str)
+    qr_id_str = escape(str(qr.id))
     testo = escape(qr.testo) if qr.testo else "<i>(Nessun testo)</i>"
     box_style = "display: inline-block; border: 1px solid #ccc; padding: 20px; text-align: center;"
-    html_item = f"""<div style="{box_style}"><img src="{qr_img_data_uri}" alt="QR Code per {qr_id_str}" width="300" height="300"><p style="font-family: monospace; font-size: 14px; margin-top: 15px;">{qr_id_str}</p><p style="font-size: 1.2em;">{testo}</p></div>"""
+    html_item = f"""<div style="{box_style}"><img src="{_qr_img_src(str(qr.id), "png", 10)}" alt="QR Code per {qr_id_str}" width="300" height="300"><p style="font-family: monospace; font-size: 14px; margin-top: 15px;">{qr_id_str}</p><p style="font-size: 1.2em;">{testo}</p></div>"""
     html_response = f"""<!DOCTYPE html><html lang="it"><head><meta charset="UTF-8"><title>Dettaglio QrCode</title><style>body {{ font-family: sans-serif; padding: 1em; }}</style></head><body><h1>Dettaglio QrCode</h1><div>{html_item}</div></body></html>"""
     return HttpResponse(html_response)
 
@@ -2341,55 +2396,6 @@ def download_icon_patch(request):
     except Exception as e: return HttpResponse(f"Internal server error: {e}", status=500)
 
 
-class CacheRevisionView(APIView):
-    """
-    GET ?q=punteggi_all,personaggi_list:0,personaggio:42,negozio_listino
-    Restituisce JSON { "punteggi_all": "<iso>", ... } per saltare fetch pesanti lato client.
-    """
-
-    permission_classes = [IsAuthenticated]
-
-    def get(self, request, format=None):
-        raw = request.query_params.get("q", "")
-        parts = [p.strip() for p in raw.split(",") if p.strip()]
-        out = {}
-        for part in parts:
-            if part == "punteggi_all":
-                out[part] = api_cache_revision.format_revision_iso(api_cache_revision.revision_punteggi_all())
-            elif part == "negozio_listino":
-                out[part] = api_cache_revision.format_revision_iso(api_cache_revision.revision_negozio_listino())
-            elif part.startswith("personaggi_list:"):
-                try:
-                    view_all = part.split(":", 1)[1].strip() == "1"
-                except IndexError:
-                    out[part] = None
-                    continue
-                dt = api_cache_revision.revision_personaggi_list(request.user, view_all)
-                out[part] = api_cache_revision.format_revision_iso(dt)
-            elif part.startswith("personaggio:"):
-                pk_str = part.split(":", 1)[1].strip()
-                try:
-                    pk = int(pk_str)
-                except ValueError:
-                    out[part] = None
-                    continue
-                personaggio = Personaggio.objects.filter(pk=pk).first()
-                if not personaggio:
-                    out[part] = None
-                    continue
-                user = request.user
-                if personaggio.proprietario != user and not (
-                    user.is_superuser or _can_operate_in_campaign(user, personaggio.campagna, needs_master=True)
-                ):
-                    out[part] = None
-                    continue
-                dt = api_cache_revision.revision_personaggio_detail(pk)
-                out[part] = api_cache_revision.format_revision_iso(dt)
-            else:
-                out[part] = None
-        return Response(out, status=status.HTTP_200_OK)
-
-
 class EventoPremiApplicaView(APIView):
     """
     POST idempotente: accredita PC e crediti d'evento ai PG dell'utente iscritti,
@@ -2547,136 +2553,6 @@ class MessaggioActionView(APIView):
         return Response({"error": "Azione non valida"}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class MessaggiUnreadCountsView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def get(self, request):
-        """
-        Ritorna gli unread a livello GIOCATORE (utente loggato), con dettaglio
-        per personaggio e separazione player/staff.
-        """
-        user = request.user
-        active_campaign = _get_active_campaign(request)
-        personaggi = list(
-            Personaggio.objects.filter(proprietario=user, campagna=active_campaign)
-            .values("id", "nome")
-            .order_by("id")
-        )
-        if not personaggi:
-            return Response(
-                {
-                    "totals": {"player": 0, "staff": 0, "all": 0},
-                    "by_scope": {"player": [], "staff": []},
-                    "by_character": [],
-                }
-            )
-
-        player_rows = []
-        staff_rows = []
-        pg_ids = [pg["id"] for pg in personaggi]
-        pg_by_id = {pg["id"]: pg for pg in personaggi}
-        membership = (
-            Personaggio.objects.filter(id__in=pg_ids)
-            .prefetch_related("gruppi_appartenenza")
-            .in_bulk(pg_ids)
-        )
-
-        for pg_id in pg_ids:
-            target_pg = membership.get(pg_id)
-            if not target_pg:
-                continue
-            pg = pg_by_id[pg_id]
-
-            q_broadcast = Q(tipo_messaggio=Messaggio.TIPO_BROADCAST, campagna=active_campaign)
-            q_individuale = (
-                Q(tipo_messaggio=Messaggio.TIPO_INDIVIDUALE)
-                & Q(destinatario_personaggio=target_pg)
-                & Q(campagna=active_campaign)
-            )
-            gruppi_id = [g.id for g in target_pg.gruppi_appartenenza.all()]
-            q_gruppo = (
-                Q(tipo_messaggio=Messaggio.TIPO_GRUPPO)
-                & Q(destinatario_gruppo__id__in=gruppi_id)
-                & Q(campagna=active_campaign)
-            )
-            q_staff = (
-                Q(tipo_messaggio=Messaggio.TIPO_STAFF)
-                & Q(destinatario_personaggio=target_pg)
-                & Q(campagna=active_campaign)
-            )
-
-            messaggi = Messaggio.objects.filter(q_broadcast | q_individuale | q_gruppo)
-            ids_cancellati = LetturaMessaggio.objects.filter(
-                personaggio=target_pg,
-                cancellato=True,
-            ).values_list("messaggio_id", flat=True)
-            lettura_stato = LetturaMessaggio.objects.filter(
-                messaggio=OuterRef("pk"),
-                personaggio=target_pg,
-            ).values("letto")[:1]
-
-            unread_count = (
-                messaggi.exclude(id__in=ids_cancellati)
-                .annotate(is_letto_db=Coalesce(Subquery(lettura_stato), Value(False)))
-                .filter(is_letto_db=False)
-                .count()
-            )
-            unread_staff_count = (
-                Messaggio.objects.filter(q_staff, cancellato_staff=False)
-                .filter(letto_staff=False)
-                .count()
-            )
-
-            if int(unread_count) > 0:
-                player_rows.append(
-                    {
-                        "personaggio_id": pg["id"],
-                        "personaggio_nome": pg["nome"],
-                        "unread_count": int(unread_count),
-                    }
-                )
-            if int(unread_staff_count) > 0:
-                staff_rows.append(
-                    {
-                        "personaggio_id": pg["id"],
-                        "personaggio_nome": pg["nome"],
-                        "unread_count": int(unread_staff_count),
-                    }
-                )
-
-        player_rows.sort(key=lambda r: (-int(r["unread_count"]), str(r["personaggio_nome"] or "")))
-        staff_rows.sort(key=lambda r: (-int(r["unread_count"]), str(r["personaggio_nome"] or "")))
-
-        merged = {}
-        for row in player_rows + staff_rows:
-            pid = row["personaggio_id"]
-            if pid not in merged:
-                merged[pid] = {
-                    "personaggio_id": row["personaggio_id"],
-                    "personaggio_nome": row["personaggio_nome"],
-                    "unread_count": 0,
-                }
-            merged[pid]["unread_count"] += int(row["unread_count"])
-        by_character = sorted(
-            merged.values(),
-            key=lambda r: (-int(r["unread_count"]), str(r["personaggio_nome"] or "")),
-        )
-
-        total_player = sum(int(r["unread_count"]) for r in player_rows)
-        total_staff = sum(int(r["unread_count"]) for r in staff_rows)
-        return Response(
-            {
-                "totals": {
-                    "player": total_player,
-                    "staff": total_staff,
-                    "all": total_player + total_staff,
-                },
-                "by_scope": {"player": player_rows, "staff": staff_rows},
-                "by_character": by_character,
-            }
-        )
-
-
 class ConversazioniView(APIView):
     """Messaggi organizzati per conversazione (thread per controparte / staff)."""
 
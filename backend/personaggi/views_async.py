@@ -0,0 +1,192 @@
+"""
+Viste async per i poll più frequenti della web app (vedi kor35.async_api): revisioni cache,
+contatori messaggi non letti, stato orologio. Stessi URL, auth, campagna e JSON delle
+precedenti APIView; nginx le instrada a Daphne.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from rest_framework import exceptions
+
+from kor35.async_api import risposta_errore_api, risposta_json, vista_get_async
+
+from . import api_cache_revision
+from .models import Campagna, Gruppo, LetturaMessaggio, Messaggio, Personaggio, WatchDeviceBinding
+from .watch_serializers import WatchDeviceBindingSerializer
+
+
+async def _campagna_attiva(request):
+    """Come views._get_active_campaign (header X-Campagna o ?campagna=, fallback kor35/default)."""
+    slug = (request.headers.get("X-Campagna") or request.GET.get("campagna") or "kor35").strip().lower()
+    campagna = await Campagna.objects.filter(slug=slug, attiva=True).afirst()
+    if campagna:
+        return campagna
+    return (
+        await Campagna.objects.filter(slug="kor35").afirst()
+        or await Campagna.objects.filter(is_default=True).afirst()
+    )
+
+
+def _revisioni_cache(user, parts):
+    from .views import _can_operate_in_campaign
+
+    out = {}
+    for part in parts:
+        if part == "punteggi_all":
+            out[part] = api_cache_revision.format_revision_iso(api_cache_revision.revision_punteggi_all())
+        elif part == "negozio_listino":
+            out[part] = api_cache_revision.format_revision_iso(api_cache_revision.revision_negozio_listino())
+        elif part.startswith("personaggi_list:"):
+            view_all = part.split(":", 1)[1].strip() == "1"
+            dt = api_cache_revision.revision_personaggi_list(user, view_all)
+            out[part] = api_cache_revision.format_revision_iso(dt)
+        elif part.startswith("personaggio:"):
+            pk_str = part.split(":", 1)[1].strip()
+            try:
+                pk = int(pk_str)
+            except ValueError:
+                out[part] = None
+                continue
+            personaggio = Personaggio.objects.filter(pk=pk).select_related("campagna").first()
+            if not personaggio:
+                out[part] = None
+                continue
+            if personaggio.proprietario_id != user.pk and not (
+                user.is_superuser or _can_operate_in_campaign(user, personaggio.campagna, needs_master=True)
+            ):
+                out[part] = None
+                continue
+            dt = api_cache_revision.revision_personaggio_detail(pk)
+            out[part] = api_cache_revision.format_revision_iso(dt)
+        else:
+            out[part] = None
+    return out
+
+
+@vista_get_async()
+async def cache_revision_view(request):
+    """
+    GET ?q=punteggi_all,personaggi_list:0,personaggio:42,negozio_listino
+    Restituisce JSON { "punteggi_all": "<iso>", ... } per saltare fetch pesanti lato client.
+    Le revisioni sono più aggregati per chiave: un solo passaggio nel thread ORM per richiesta.
+    """
+    raw = request.GET.get("q", "")
+    parts = [p.strip() for p in raw.split(",") if p.strip()]
+    if not parts:
+        return risposta_json({})
+    return risposta_json(await sync_to_async(_revisioni_cache)(request.user, parts))
+
+
+def _ordina_righe(rows):
+    rows.sort(key=lambda r: (-int(r["unread_count"]), str(r["personaggio_nome"] or "")))
+    return rows
+
+
+@vista_get_async()
+async def messaggi_unread_counts_view(request):
+    """
+    Ritorna gli unread a livello GIOCATORE (utente loggato), con dettaglio
+    per personaggio e separazione player/staff.
+    """
+    campagna = await _campagna_attiva(request)
+    personaggi = [
+        pg
+        async for pg in Personaggio.objects.filter(proprietario=request.user, campagna=campagna)
+        .values("id", "nome")
+        .order_by("id")
+    ]
+    if not personaggi:
+        return risposta_json(
+            {
+                "totals": {"player": 0, "staff": 0, "all": 0},
+                "by_scope": {"player": [], "staff": []},
+                "by_character": [],
+            }
+        )
+
+    pg_ids = [pg["id"] for pg in personaggi]
+    gruppi_per_pg = {pg_id: [] for pg_id in pg_ids}
+    async for pg_id, gruppo_id in Gruppo.membri.through.objects.filter(personaggio_id__in=pg_ids).values_list(
+        "personaggio_id", "gruppo_id"
+    ):
+        gruppi_per_pg[pg_id].append(gruppo_id)
+
+    player_rows = []
+    staff_rows = []
+    for pg in personaggi:
+        pg_id = pg["id"]
+        q_broadcast = Q(tipo_messaggio=Messaggio.TIPO_BROADCAST, campagna=campagna)
+        q_individuale = Q(
+            tipo_messaggio=Messaggio.TIPO_INDIVIDUALE, destinatario_personaggio_id=pg_id, campagna=campagna
+        )
+        q_gruppo = Q(
+            tipo_messaggio=Messaggio.TIPO_GRUPPO, destinatario_gruppo__id__in=gruppi_per_pg[pg_id], campagna=campagna
+        )
+        q_staff = Q(tipo_messaggio=Messaggio.TIPO_STAFF, destinatario_personaggio_id=pg_id, campagna=campagna)
+
+        ids_cancellati = LetturaMessaggio.objects.filter(personaggio_id=pg_id, cancellato=True).values_list(
+            "messaggio_id", flat=True
+        )
+        lettura_stato = LetturaMessaggio.objects.filter(messaggio=OuterRef("pk"), personaggio_id=pg_id).values(
+            "letto"
+        )[:1]
+        unread_count = await (
+            Messaggio.objects.filter(q_broadcast | q_individuale | q_gruppo)
+            .exclude(id__in=ids_cancellati)
+            .annotate(is_letto_db=Coalesce(Subquery(lettura_stato), Value(False)))
+            .filter(is_letto_db=False)
+            .acount()
+        )
+        unread_staff_count = await Messaggio.objects.filter(q_staff, cancellato_staff=False, letto_staff=False).acount()
+
+        riga = {"personaggio_id": pg_id, "personaggio_nome": pg["nome"]}
+        if unread_count > 0:
+            player_rows.append({**riga, "unread_count": unread_count})
+        if unread_staff_count > 0:
+            staff_rows.append({**riga, "unread_count": unread_staff_count})
+
+    _ordina_righe(player_rows)
+    _ordina_righe(staff_rows)
+    merged = {}
+    for row in player_rows + staff_rows:
+        pid = row["personaggio_id"]
+        if pid not in merged:
+            merged[pid] = {**row, "unread_count": 0}
+        merged[pid]["unread_count"] += int(row["unread_count"])
+
+    total_player = sum(int(r["unread_count"]) for r in player_rows)
+    total_staff = sum(int(r["unread_count"]) for r in staff_rows)
+    return risposta_json(
+        {
+            "totals": {
+                "player": total_player,
+                "staff": total_staff,
+                "all": total_player + total_staff,
+            },
+            "by_scope": {"player": player_rows, "staff": staff_rows},
+            "by_character": _ordina_righe(list(merged.values())),
+        }
+    )
+
+
+@vista_get_async()
+async def watch_binding_status_view(request):
+    """GET ?char_id= — orologio abbinato al PG dell'utente (sync/pairing lato web app)."""
+    try:
+        pg = await aget_object_or_404(Personaggio, pk=request.GET.get("char_id"), proprietario=request.user)
+    except Http404 as exc:
+        return risposta_errore_api(exceptions.NotFound(*exc.args))
+    binding = (
+        await WatchDeviceBinding.objects.filter(personaggio=pg, is_active=True)
+        .select_related("personaggio")
+        .order_by("-updated_at")
+        .afirst()
+    )
+    return risposta_json(
+        {
+            "watch_enabled": bool(pg.watch_enabled),
+            "binding": WatchDeviceBindingSerializer(binding).data if binding else None,
+        }
+    )
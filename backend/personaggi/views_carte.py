@@ -1,6 +1,7 @@
 """
 API giocatore e staff per carte collezionabili.
 """
+import uuid
 import zipfile
 
 from django.core.exceptions import ValidationError
@@ -53,6 +54,9 @@ from personaggi.carte_mercato_service import (
     annulla_offerta_scambio,
     build_mercato_payload,
     crea_offerta_scambio,
+    faccette_offerte_mercato,
+    lista_carte_scambio,
+    lista_offerte_mercato,
     lista_scambi_staff,
 )
 from personaggi.carte_lobby_service import (
@@ -195,6 +199,81 @@ class CarteMercatoView(APIView):
             return Response({"error": "Carta richiesta non trovata."}, status=404)
 
 
+def _filtri_mercato(params) -> dict:
+    """Filtri da query string; id non validi diventano ValidationError (400), non 500 dal DB."""
+    filtri = {
+        chiave: (params.get(chiave) or "").strip()
+        for chiave in ("carta", "rarita", "espansione", "offerente", "richiesta")
+        if (params.get(chiave) or "").strip()
+    }
+    for chiave in ("carta", "espansione", "richiesta"):
+        if chiave in filtri:
+            try:
+                filtri[chiave] = uuid.UUID(filtri[chiave])
+            except ValueError:
+                raise ValidationError(f"Filtro {chiave} non valido.")
+    if "offerente" in filtri:
+        try:
+            filtri["offerente"] = int(filtri["offerente"])
+        except ValueError:
+            raise ValidationError("Filtro offerente non valido.")
+    return filtri
+
+
+class CarteMercatoOfferteView(APIView):
+    """Offerte aperte paginate (cursore) e filtrabili; ``faccette=1`` aggiunge i conteggi."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        char_id = request.query_params.get("char_id")
+        if not char_id:
+            return Response({"error": "char_id richiesto."}, status=400)
+        pg = _get_pg(request, char_id)
+        if not personaggio_puo_accedere_carte(pg):
+            return Response({"error": "Mercato non disponibile."}, status=403)
+        try:
+            filtri = _filtri_mercato(request.query_params)
+            payload = lista_offerte_mercato(
+                pg,
+                filtri=filtri,
+                mie=request.query_params.get("mie") in ("1", "true"),
+                cursor=request.query_params.get("cursor") or None,
+                page_size=request.query_params.get("page_size"),
+            )
+            if request.query_params.get("faccette") in ("1", "true"):
+                payload["faccette"] = faccette_offerte_mercato(pg, filtri)
+        except ValidationError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response(payload)
+
+
+class CarteMercatoCarteView(APIView):
+    """Copie possedute con scambiabilità, a pagine (``offset``); ``scambiabili=1`` esclude le bloccate."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        char_id = request.query_params.get("char_id")
+        if not char_id:
+            return Response({"error": "char_id richiesto."}, status=400)
+        pg = _get_pg(request, char_id)
+        if not personaggio_puo_accedere_carte(pg):
+            return Response({"error": "Mercato non disponibile."}, status=403)
+        try:
+            return Response(
+                lista_carte_scambio(
+                    pg,
+                    filtri=_filtri_mercato(request.query_params),
+                    solo_scambiabili=request.query_params.get("scambiabili") in ("1", "true"),
+                    offset=request.query_params.get("offset"),
+                    page_size=request.query_params.get("page_size"),
+                )
+            )
+        except ValidationError as e:
+            return Response({"error": str(e)}, status=400)
+
+
 class CarteMercatoAccettaView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -25,7 +25,7 @@ from .models import (
     Era, Prefettura, Regione, Korp, Carriera, TipoCarriera, Carica,
     PersonaggioCarrieraMembership, CarrieraTierSblocco,
     Dichiarazione,
-    Campagna, CampagnaFeaturePolicy,
+    Campagna,
     RegolaTransazioneCategoria,
     PersonaggioLog,
     FEATURE_ABILITA, FEATURE_TESSITURE, FEATURE_INFUSIONI, FEATURE_OGGETTI_BASE, FEATURE_CERIMONIALI,
@@ -36,6 +36,7 @@ from decimal import Decimal
 
 from .acquisto_costi import calcola_costo_creazione_proposta
 from .qr_logic import annotate_staff_avista_qr
+from .ricerca_staff import filtra_personaggi_per_ricerca
 from .services import GestioneCraftingService
 from .formula_builder import (
     FORMULA_BUILDER_SCHEMA,
@@ -103,10 +104,9 @@ def _get_active_campaign(request):
 
 
 def _feature_mode_for_campaign(campagna, feature_key):
-    if not campagna or campagna.slug == "kor35":
-        return FEATURE_MODE_SHARED
-    row = CampagnaFeaturePolicy.objects.filter(campagna=campagna, feature_key=feature_key).first()
-    return row.mode if row else FEATURE_MODE_SHARED
+    from personaggi.campaigns import feature_mode_for_campaign
+
+    return feature_mode_for_campaign(campagna, feature_key)
 
 
 def _campaign_feature_filter(request, qs, feature_key):
@@ -1761,16 +1761,6 @@ class PersonaggioStaffViewSet(viewsets.ModelViewSet):
         elif tipo == 'png':
             qs = qs.filter(tipologia__giocante=False)
 
-        q = (params.get('q') or '').strip()
-        if q:
-            qs = qs.filter(
-                Q(nome__icontains=q)
-                | Q(proprietario__username__icontains=q)
-                | Q(proprietario__first_name__icontains=q)
-                | Q(proprietario__last_name__icontains=q)
-                | Q(costume__icontains=q)
-            )
-
         era_id = params.get('era')
         if era_id:
             qs = qs.filter(era_id=era_id)
@@ -1788,7 +1778,12 @@ class PersonaggioStaffViewSet(viewsets.ModelViewSet):
         elif morto == 'morto':
             qs = qs.filter(data_morte__isnull=False)
 
-        return qs.distinct().order_by('nome')
+        qs = qs.distinct()
+        q = (params.get('q') or '').strip()
+        if q:
+            # Documento denormalizzato + ranking (personaggi.ricerca_staff).
+            return filtra_personaggi_per_ricerca(qs, q)
+        return qs.order_by('nome')
 
     def get_queryset(self):
         return self._staff_personaggi_queryset()
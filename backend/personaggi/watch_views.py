@@ -226,25 +226,6 @@ class WatchDisconnectView(APIView):
         return Response({"status": "ok", "disconnected": int(updated)})
 
 
-class WatchBindingStatusView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def get(self, request):
-        char_id = request.query_params.get("char_id")
-        pg = get_object_or_404(Personaggio, pk=char_id, proprietario=request.user)
-        binding = (
-            WatchDeviceBinding.objects.filter(personaggio=pg, is_active=True)
-            .order_by("-updated_at")
-            .first()
-        )
-        return Response(
-            {
-                "watch_enabled": bool(pg.watch_enabled),
-                "binding": WatchDeviceBindingSerializer(binding).data if binding else None,
-            }
-        )
-
-
 class WatchProfileView(APIView):
     permission_classes = [AllowAny]
 
@@ -3,6 +3,8 @@ Allarme equipaggio nave (Giallo / Rosso / Nero / Blu / crociera).
 
 Predisposizione LED WiFi: i dispositivi in LAN possono leggere lo stato cromatico
 da GET /api/pilot/allarme-led/state/ (nessuna autenticazione; solo rete locale).
+In alternativa al polling, GET /api/pilot/stream/allarme-led/ (SSE, pilotaggio.eventi_stream)
+invia un evento solo quando l'allarme cambia.
 """
 from __future__ import annotations
 
@@ -10,3 +10,6 @@ class PilotaggioConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "pilotaggio"
     verbose_name = "Pilotaggio nave"
+
+    def ready(self):
+        import pilotaggio.signals  # noqa: F401
@@ -57,3 +57,24 @@ def get_pilot_from_request(request) -> Optional["personaggi.Personaggio"]:  # no
     if isinstance(token, PilotConsoleToken):
         return token.pilota
     return None
+
+
+async def token_console_da_richiesta(request) -> Optional[PilotConsoleToken]:
+    """
+    Come `PilotConsoleTokenAuthentication` per le viste async (ORM async):
+    None senza header, `AuthenticationFailed` se il token è sconosciuto o revocato.
+    """
+    auth_header = (request.headers.get("Authorization") or "").strip()
+    prefisso = f"{PilotConsoleTokenAuthentication.keyword} "
+    if not auth_header.startswith(prefisso):
+        return None
+    provided = auth_header.removeprefix(prefisso).strip()
+    if not provided:
+        return None
+    token_obj = await PilotConsoleToken.objects.select_related("pilota").filter(
+        token=provided, revocato_at__isnull=True
+    ).afirst()
+    if not token_obj:
+        raise exceptions.AuthenticationFailed("Token console pilota non valido o revocato.")
+    await PilotConsoleToken.objects.filter(pk=token_obj.pk).aupdate(last_seen_at=timezone.now())
+    return token_obj
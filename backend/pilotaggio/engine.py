@@ -711,7 +711,7 @@ def _avanza_energia_sessione(sessione: SessioneVolo) -> None:
     Simulazione energia/carburante/distanza per tick.
     """
     from pilotaggio.nave_sync_context import suppress_sessione_nave_sync
-    from pilotaggio.stato_nave import sync_stato_sessione_a_nave
+    from pilotaggio.stato_nave import sync_stati_sessione_a_nave
 
     stati = list(
         StatoSottosistemaSessione.objects.select_related("sottosistema").filter(
@@ -906,8 +906,7 @@ def _avanza_energia_sessione(sessione: SessioneVolo) -> None:
                 log_guasto_sottosistema(sessione, st, causa="random")
                 applica_effetto_guasto(sessione, st)
 
-    for st in guasti_sync:
-        sync_stato_sessione_a_nave(st)
+    sync_stati_sessione_a_nave(guasti_sync)
 
 
 def _opposto_direzione(d: str) -> str:
@@ -1674,20 +1673,22 @@ def spegni_tutti_sottosistemi(sessione: SessioneVolo, *, sync_nave: bool = True)
     Non impostare online=False: nel modello runtime indica un guasto, non uno spegnimento a terra.
     I guasti reali (guasto_at) e le espulsioni restano invariati.
     """
-    stati = StatoSottosistemaSessione.objects.filter(sessione=sessione).select_related(
-        "sottosistema"
-    )
-    off_fields = [
-        "livello_attuale",
-        "livello_target",
-        "recovery_at",
-        "updated_at",
-    ]
+    from pilotaggio.nave_sync_context import sessione_nave_sync_enabled
+    from pilotaggio.stato_nave import sync_stati_sessione_a_nave
+
+    stati = list(StatoSottosistemaSessione.objects.filter(sessione=sessione))
+    now = timezone.now()
     for st in stati:
         st.livello_attuale = 0
         st.livello_target = 0
         st.recovery_at = None
-        st.save(update_fields=off_fields, sync_nave=sync_nave)
+        st.updated_at = now
+    if stati:
+        StatoSottosistemaSessione.objects.filter(pk__in=[st.pk for st in stati]).update(
+            livello_attuale=0, livello_target=0, recovery_at=None, updated_at=now
+        )
+        if sync_nave and sessione_nave_sync_enabled():
+            sync_stati_sessione_a_nave(stati)
     for key in list(_repair_immunity_until.keys()):
         if key.startswith(f"{sessione.pk}:"):
             _repair_immunity_until.pop(key, None)
@@ -1953,15 +1954,16 @@ def genera_evento_se_dovuto(sessione: SessioneVolo) -> Optional[EventoAttivoSess
 # ---------------------------------------------------------------------------
 
 
+def sessioni_nave_operative():
+    """Sessioni idle/volo non terminate, la più recente prima (queryset, anche per viste async)."""
+    return SessioneVolo.objects.exclude(
+        stato__in=[SESSIONE_STATO_ARRIVATA, SESSIONE_STATO_CRASHED]
+    ).order_by("-created_at")
+
+
 def sessione_nave_operativa() -> Optional[SessioneVolo]:
     """Singleton nave: unica sessione idle/volo non terminata."""
-    return (
-        SessioneVolo.objects.exclude(
-            stato__in=[SESSIONE_STATO_ARRIVATA, SESSIONE_STATO_CRASHED]
-        )
-        .order_by("-created_at")
-        .first()
-    )
+    return sessioni_nave_operative().first()
 
 
 def sessioni_per_tick_motore() -> List[SessioneVolo]:
@@ -1998,7 +2000,16 @@ def tick_sessione(sessione: SessioneVolo, *, force: bool = False) -> TickResult:
     - chiude eventi pending scaduti (timeout) e applica DEFCON;
     - genera nuovo evento se necessario;
     - marca arrivata quando la distanza target e' stata raggiunta.
+
+    Le voci diario del tick si scrivono in blocco alla fine (``diario_volo_bufferizzato``).
     """
+    from .flight_log import diario_volo_bufferizzato
+
+    with diario_volo_bufferizzato():
+        return _tick_sessione(sessione, force=force)
+
+
+def _tick_sessione(sessione: SessioneVolo, *, force: bool) -> TickResult:
     sessione = SessioneVolo.objects.select_for_update().get(pk=sessione.pk)
     if sessione.is_terminata:
         return TickResult(sessione, None, False, False)
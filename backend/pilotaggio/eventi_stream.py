@@ -0,0 +1,128 @@
+"""
+Stream SSE per kiosk e controller LED (allarme equipaggio, stato tick, ticket login console).
+
+Ogni canale ha una revisione nella cache Django (Redis), cambiata a commit avvenuto da chi
+modifica lo stato (vedi pilotaggio.signals). Una connessione aperta legge solo la revisione
+(un GET Redis asincrono ogni ``STREAM_POLL_SECONDS``) e ricostruisce il payload dal DB quando cambia
+o ogni ``STREAM_KEEPALIVE_SECONDS`` (stati che dipendono dal tempo: heartbeat tick, scadenza
+ticket). L'evento si invia solo se l'impronta del payload è cambiata; l'impronta è anche
+l'``id`` SSE, così alla riconnessione (``Last-Event-ID``) non si rispedisce lo stato già noto.
+
+Le connessioni durano al massimo ``STREAM_DURATA_MAX_SECONDS``: il client (EventSource)
+si ricollega da solo dopo ``retry``.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+from kor35.async_api import cache_aget_many
+
+logger = logging.getLogger(__name__)
+
+STREAM_REV_PREFIX = "kor35:pilotstream"
+STREAM_REV_TTL_SECONDS = 24 * 3600
+STREAM_POLL_SECONDS = 1.0
+STREAM_KEEPALIVE_SECONDS = 15.0
+STREAM_DURATA_MAX_SECONDS = 300.0
+STREAM_RETRY_MS = 2000
+
+CANALE_ALLARME = "allarme"
+CANALE_RUNTIME = "runtime"
+
+
+def canale_ticket(ticket_id) -> str:
+    return f"ticket:{ticket_id}"
+
+
+def revisione_key(canale: str) -> str:
+    return f"{STREAM_REV_PREFIX}:{canale}"
+
+
+def _pubblica(canale: str) -> None:
+    try:
+        cache.set(revisione_key(canale), uuid.uuid4().hex, timeout=STREAM_REV_TTL_SECONDS)
+    except Exception as exc:
+        logger.warning("Stream pilot: revisione %s non aggiornata (%s)", canale, exc)
+
+
+def notifica_canale(canale: str) -> None:
+    """Segnala un cambio di stato sul canale (a commit avvenuto, subito fuori transazione)."""
+    transaction.on_commit(lambda: _pubblica(canale))
+
+
+def impronta_payload(payload: dict, volatili: Iterable[str] = ()) -> str:
+    """Hash stabile del payload, esclusi i campi che cambiano senza cambio di stato."""
+    esclusi = set(volatili)
+    stabile = {k: v for k, v in payload.items() if k not in esclusi}
+    raw = json.dumps(stabile, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def formatta_evento_sse(evento: str, payload: dict, event_id: str) -> str:
+    data = json.dumps(payload, default=str, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {evento}\ndata: {data}\n\n"
+
+
+async def _revisioni(chiavi: list[str]) -> Optional[tuple]:
+    try:
+        valori = await cache_aget_many(chiavi)
+    except Exception:
+        return None
+    return tuple(valori.get(k) for k in chiavi)
+
+
+async def stream_eventi(
+    canali: Iterable[str],
+    costruisci: Callable[[], dict],
+    *,
+    evento: str,
+    ultimo_id: str = "",
+    volatili: Iterable[str] = (),
+    terminale: Optional[Callable[[dict], bool]] = None,
+    poll_seconds: float = STREAM_POLL_SECONDS,
+    keepalive_seconds: float = STREAM_KEEPALIVE_SECONDS,
+    durata_max_seconds: float = STREAM_DURATA_MAX_SECONDS,
+) -> AsyncIterator[str]:
+    """
+    Generatore SSE: ``costruisci`` (sincrono, accede al DB) gira solo a revisione cambiata
+    o allo scadere del keepalive; ``terminale(payload)`` True chiude lo stream dopo l'invio.
+    """
+    chiavi = [revisione_key(c) for c in canali]
+    volatili = tuple(volatili)
+    costruisci_async = sync_to_async(costruisci)
+    yield f"retry: {STREAM_RETRY_MS}\n\n"
+
+    inizio = time.monotonic()
+    ultima_revisione: Any = object()
+    ultima_costruzione = float("-inf")
+    ultimo_invio = inizio
+    while True:
+        ora = time.monotonic()
+        revisione = await _revisioni(chiavi)
+        if (revisione is not None and revisione != ultima_revisione) or ora - ultima_costruzione >= keepalive_seconds:
+            ultima_revisione = revisione
+            ultima_costruzione = ora
+            payload = await costruisci_async()
+            impronta = impronta_payload(payload, volatili)
+            if impronta != ultimo_id:
+                ultimo_id = impronta
+                ultimo_invio = ora
+                yield formatta_evento_sse(evento, payload, impronta)
+            if terminale is not None and terminale(payload):
+                return
+        if ora - ultimo_invio >= keepalive_seconds:
+            ultimo_invio = ora
+            yield ": keepalive\n\n"
+        if ora - inizio >= durata_max_seconds:
+            return
+        await asyncio.sleep(poll_seconds)
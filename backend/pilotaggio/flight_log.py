@@ -2,16 +2,26 @@
 Diario di volo: log leggibile per analisi post-partita (precipizi, eventi, DEFCON).
 
 Le voci sono append-only per sessione; non devono mai bloccare il motore di gioco.
+Dentro ``diario_volo_bufferizzato`` (il tick) le voci si accumulano in memoria e si scrivono
+con un solo ``bulk_create`` all'uscita; ogni scrittura aggiorna anche ``RiepilogoVolo``,
+così il resoconto per il pilota non riconta il diario. Le voci applicate dal sync edge
+aggiornano il riepilogo dal ``post_save`` in pilotaggio.signals.
 """
 from __future__ import annotations
 
 import logging
-from typing import Any, Optional
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
 
+from django.db import transaction
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+_buffer_diario: ContextVar[Optional[list]] = ContextVar("pilotaggio_buffer_diario", default=None)
+
 # Motivi tecnici sessione.crash_reason → spiegazione per il pilota
 SPIEGAZIONE_CRASH: dict[str, str] = {
     "catastrophic_event": (
@@ -63,6 +73,100 @@ def spiega_esito_tick(esito: str) -> str:
     )
 
 
+@contextmanager
+def diario_volo_bufferizzato() -> Iterator[None]:
+    """
+    Accumula le voci diario del blocco e le scrive insieme all'uscita senza errori
+    (un'eccezione scarta il buffer insieme al rollback). Annidato: usa il buffer esterno.
+    """
+    if _buffer_diario.get() is not None:
+        yield
+        return
+    voci: list = []
+    token = _buffer_diario.set(voci)
+    try:
+        yield
+    finally:
+        _buffer_diario.reset(token)
+    _scrivi_voci(voci)
+
+
+def _scrivi_voci(voci: list) -> None:
+    """Insert in blocco delle voci e aggiornamento dei riepiloghi; errori non propagati al motore."""
+    if not voci:
+        return
+    try:
+        from .models import VoceDiarioVolo
+
+        with transaction.atomic():
+            VoceDiarioVolo.objects.bulk_create(voci)
+            per_sessione: dict[Any, list] = {}
+            for voce in voci:
+                per_sessione.setdefault(voce.sessione_id, []).append(voce)
+            for sessione_id, gruppo in per_sessione.items():
+                _aggiorna_riepilogo(sessione_id, gruppo)
+    except Exception:
+        logger.exception(
+            "Impossibile registrare voci diario volo sessioni=%s",
+            sorted({str(v.sessione_id) for v in voci}),
+        )
+
+
+def _applica_voci(riepilogo, voci) -> None:
+    from .models import EVENTO_ESITO_PENDING, EVENTO_ESITO_RISOLTO
+
+    conteggi = Counter(riepilogo.conteggi_categoria or {})
+    for voce in voci:
+        conteggi[voce.categoria] += 1
+        dati = voce.dati_json or {}
+        if voce.categoria == "evento_comparso":
+            riepilogo.eventi_comparsi += 1
+        elif voce.categoria == "evento_valutato":
+            esito = dati.get("esito_evento")
+            if esito and esito != EVENTO_ESITO_PENDING:
+                riepilogo.eventi_conclusi += 1
+                riepilogo.eventi_risolti += int(esito == EVENTO_ESITO_RISOLTO)
+                riepilogo.ultimo_evento_nome = str(dati.get("evento_nome") or "")[:80]
+        elif voce.categoria == "precipizio":
+            riepilogo.crash_reason = str(dati.get("crash_reason") or "")[:32]
+    riepilogo.conteggi_categoria = dict(conteggi)
+    riepilogo.voci_totali += len(voci)
+
+
+def _aggiorna_riepilogo(sessione_id, voci: list) -> None:
+    from .models import RiepilogoVolo, VoceDiarioVolo
+
+    riepilogo, creato = RiepilogoVolo.objects.select_for_update().get_or_create(sessione_id=sessione_id)
+    if creato:
+        # Prima riga per la sessione: si parte dall'intero diario (voci appena scritte incluse),
+        # così un volo iniziato prima del riepilogo non riparte da zero.
+        voci = VoceDiarioVolo.objects.filter(sessione_id=sessione_id).order_by("created_at", "id")
+    _applica_voci(riepilogo, list(voci))
+    riepilogo.save()
+
+
+def ricostruisci_riepiloghi(*, apps=None) -> int:
+    """Crea dal diario i riepiloghi mancanti (sessioni precedenti al riepilogo); ritorna quanti."""
+    if apps is None:
+        from django.apps import apps
+    RiepilogoVolo = apps.get_model("pilotaggio", "RiepilogoVolo")
+    VoceDiarioVolo = apps.get_model("pilotaggio", "VoceDiarioVolo")
+
+    sessioni = set(VoceDiarioVolo.objects.values_list("sessione_id", flat=True).distinct()) - set(
+        RiepilogoVolo.objects.values_list("sessione_id", flat=True)
+    )
+    nuovi = []
+    for sessione_id in sessioni:
+        riepilogo = RiepilogoVolo(sessione_id=sessione_id)
+        _applica_voci(
+            riepilogo,
+            list(VoceDiarioVolo.objects.filter(sessione_id=sessione_id).order_by("created_at", "id")),
+        )
+        nuovi.append(riepilogo)
+    RiepilogoVolo.objects.bulk_create(nuovi, batch_size=500)
+    return len(nuovi)
+
+
 def registra_voce_diario(
     sessione,
     categoria: str,
@@ -73,13 +177,13 @@ def registra_voce_diario(
     defcon_pre: Optional[int] = None,
     defcon_post: Optional[int] = None,
 ) -> None:
-    """Scrive una riga diario; errori non propagati al motore."""
+    """Scrive una riga diario (o la accoda al buffer del tick); errori non propagati al motore."""
     if sessione is None or not getattr(sessione, "pk", None):
         return
     try:
         from .models import VoceDiarioVolo
 
-        VoceDiarioVolo.objects.create(
+        voce = VoceDiarioVolo(
             sessione=sessione,
             categoria=str(categoria or "info")[:32],
             messaggio=str(messaggio or "").strip()[:4000],
@@ -90,6 +194,12 @@ def registra_voce_diario(
         )
     except Exception:
         logger.exception("Impossibile registrare voce diario volo sessione=%s", sessione.pk)
+        return
+    buffer = _buffer_diario.get()
+    if buffer is not None:
+        buffer.append(voce)
+    else:
+        _scrivi_voci([voce])
 
 
 def log_volo_iniziato(sessione, *, partenza: str, arrivo: str) -> None:
@@ -250,8 +360,18 @@ def log_guasto_sottosistema(sessione, stato, *, causa: str = "random") -> None:
     )
 
 
+def _riepilogo_volo(sessione):
+    """RiepilogoVolo della sessione (usa ``select_related("riepilogo_volo")`` se presente)."""
+    from .models import RiepilogoVolo
+
+    try:
+        return sessione.riepilogo_volo
+    except RiepilogoVolo.DoesNotExist:
+        return None
+
+
 def riepilogo_sessione_per_pilota(sessione) -> dict:
-    """Sintesi leggibile per elenco voli passati."""
+    """Sintesi leggibile per elenco voli passati (una riga RiepilogoVolo per sessione)."""
     from .models import EVENTO_ESITO_PENDING, EventoAttivoSessione, VoceDiarioVolo
 
     stato = sessione.stato
@@ -261,14 +381,21 @@ def riepilogo_sessione_per_pilota(sessione) -> dict:
         "volo": "In volo",
         "idle": "Idle",
     }.get(stato, stato)
-    ultimo_evento = (
-        EventoAttivoSessione.objects.filter(sessione=sessione)
-        .exclude(esito=EVENTO_ESITO_PENDING)
-        .order_by("-risolto_at", "-created_at")
-        .select_related("evento")
-        .first()
-    )
-    voci = VoceDiarioVolo.objects.filter(sessione=sessione).count()
+    riepilogo = _riepilogo_volo(sessione)
+    if riepilogo is not None:
+        ultimo_evento_nome = riepilogo.ultimo_evento_nome or None
+        voci = riepilogo.voci_totali
+    else:
+        # Sessioni precedenti al riepilogo incrementale: ricalcolo dal DB.
+        ultimo_evento = (
+            EventoAttivoSessione.objects.filter(sessione=sessione)
+            .exclude(esito=EVENTO_ESITO_PENDING)
+            .order_by("-risolto_at", "-created_at")
+            .select_related("evento")
+            .first()
+        )
+        ultimo_evento_nome = getattr(ultimo_evento.evento, "nome", None) if ultimo_evento else None
+        voci = VoceDiarioVolo.objects.filter(sessione=sessione).count()
     durata = None
     if sessione.started_at and sessione.ended_at:
         durata = int((sessione.ended_at - sessione.started_at).total_seconds())
@@ -288,8 +415,8 @@ def riepilogo_sessione_per_pilota(sessione) -> dict:
         "started_at": sessione.started_at.isoformat() if sessione.started_at else None,
         "ended_at": sessione.ended_at.isoformat() if sessione.ended_at else None,
         "durata_secondi": durata,
-        "ultimo_evento_nome": getattr(ultimo_evento.evento, "nome", None)
-        if ultimo_evento
-        else None,
+        "ultimo_evento_nome": ultimo_evento_nome,
         "voci_diario": voci,
+        "conteggi_diario": dict(riepilogo.conteggi_categoria or {}) if riepilogo else None,
+        "eventi_risolti": riepilogo.eventi_risolti if riepilogo else None,
     }
@@ -0,0 +1,43 @@
+# Riepilogo incrementale per sessione (resoconto di fine volo in una riga)
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pilotaggio", "0041_scientifica_energia_esotici"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RiepilogoVolo",
+            fields=[
+                ("sync_id", models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, unique=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("voci_totali", models.PositiveIntegerField(default=0)),
+                ("conteggi_categoria", models.JSONField(blank=True, default=dict)),
+                ("eventi_comparsi", models.PositiveIntegerField(default=0)),
+                ("eventi_conclusi", models.PositiveIntegerField(default=0)),
+                ("eventi_risolti", models.PositiveIntegerField(default=0)),
+                ("ultimo_evento_nome", models.CharField(blank=True, default="", max_length=80)),
+                ("crash_reason", models.CharField(blank=True, default="", max_length=32)),
+                (
+                    "sessione",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="riepilogo_volo",
+                        to="pilotaggio.sessionevolo",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Riepilogo volo",
+                "verbose_name_plural": "Riepiloghi volo",
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# RiepilogoVolo è derivato dal diario: fuori dal sync edge, riepiloghi mancanti ricostruiti.
+
+from django.db import migrations
+
+
+def crea_riepiloghi_mancanti(apps, schema_editor):
+    from pilotaggio.flight_log import ricostruisci_riepiloghi
+
+    ricostruisci_riepiloghi(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pilotaggio", "0042_riepilogo_volo"),
+    ]
+
+    operations = [
+        migrations.RemoveField(model_name="riepilogovolo", name="sync_id"),
+        migrations.RemoveField(model_name="riepilogovolo", name="updated_at"),
+        migrations.RunPython(crea_riepiloghi_mancanti, migrations.RunPython.noop),
+    ]
@@ -1333,3 +1333,30 @@ class ScientificoStatoNave(SyncableModel, models.Model):
     def get_solo(cls):
         obj, _ = cls.objects.get_or_create(singleton_id=1)
         return obj
+
+
+class RiepilogoVolo(models.Model):
+    """
+    Sintesi di una sessione aggiornata a ogni scrittura del diario (conteggi per categoria,
+    eventi conclusi/risolti, causa precipizio): il resoconto di fine volo è una riga sola.
+    Derivata dal diario, locale al nodo e non sincronizzata (pilotaggio.flight_log).
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    sessione = models.OneToOneField(
+        SessioneVolo, on_delete=models.CASCADE, related_name="riepilogo_volo"
+    )
+    voci_totali = models.PositiveIntegerField(default=0)
+    conteggi_categoria = models.JSONField(default=dict, blank=True)
+    eventi_comparsi = models.PositiveIntegerField(default=0)
+    eventi_conclusi = models.PositiveIntegerField(default=0)
+    eventi_risolti = models.PositiveIntegerField(default=0)
+    ultimo_evento_nome = models.CharField(max_length=80, blank=True, default="")
+    crash_reason = models.CharField(max_length=32, blank=True, default="")
+
+    class Meta:
+        verbose_name = "Riepilogo volo"
+        verbose_name_plural = "Riepiloghi volo"
+
+    def __str__(self):
+        return f"Riepilogo {self.sessione_id}: {self.voci_totali} voci"
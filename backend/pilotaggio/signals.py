@@ -0,0 +1,40 @@
+"""
+Segnali pilotaggio: revisioni degli stream SSE kiosk/LED (pilotaggio.eventi_stream) e
+riepilogo volo per le voci diario arrivate dal sync edge.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .eventi_stream import CANALE_ALLARME, CANALE_RUNTIME, canale_ticket, notifica_canale
+from .flight_log import _aggiorna_riepilogo
+from .models import PilotConsoleLoginTicket, PilotRuntimeConfig, SessioneVolo, VoceDiarioVolo
+
+# Campi sessione che cambiano il payload LED (allarme, sessione attiva/terminata).
+CAMPI_SESSIONE_ALLARME = frozenset({"stato", "allarme_equipaggio", "allarme_equipaggio_at", "ended_at"})
+# Scritture del worker tick a ogni giro: non cambiano lo stato mostrato dal kiosk.
+CAMPI_RUNTIME_TICK = frozenset({"tick_last_heartbeat", "stiva_ultimo_tick_at", "updated_at"})
+
+
+@receiver(post_save, sender=SessioneVolo)
+def notifica_stream_allarme(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or CAMPI_SESSIONE_ALLARME.intersection(update_fields):
+        notifica_canale(CANALE_ALLARME)
+
+
+@receiver(post_save, sender=PilotRuntimeConfig)
+def notifica_stream_runtime(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or not set(update_fields) <= CAMPI_RUNTIME_TICK:
+        notifica_canale(CANALE_RUNTIME)
+
+
+@receiver(post_save, sender=PilotConsoleLoginTicket)
+def notifica_stream_ticket(sender, instance, **kwargs):
+    notifica_canale(canale_ticket(instance.pk))
+
+
+@receiver(post_save, sender=VoceDiarioVolo)
+def riepilogo_voce_diario_sincronizzata(sender, instance, created, raw=False, **kwargs):
+    # Le scritture locali passano da bulk_create (nessun segnale) e aggiornano già il riepilogo:
+    # qui arrivano solo le voci salvate una a una, cioè quelle applicate dal sync edge.
+    if created and not raw:
+        _aggiorna_riepilogo(instance.sessione_id, [instance])
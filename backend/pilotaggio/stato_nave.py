@@ -3,10 +3,12 @@ Stato persistente dei sottosistemi a livello nave (sopravvive tra sessioni/voli)
 
 La sessione runtime (idle o volo) resta la vista operativa per tick e plancia;
 ogni save su sessione o su nave mantiene le due tabelle allineate.
+I mirror tra le due tabelle sono upsert a insiemi (INSERT ... ON CONFLICT): uno statement
+per tutti i sottosistemi, qualunque sia la loro quantità.
 """
 from __future__ import annotations
 
-from typing import Any, Dict, Optional, TYPE_CHECKING
+from typing import Any, Dict, Iterable, Optional, TYPE_CHECKING
 
 from django.utils import timezone
 
@@ -25,6 +27,14 @@ CAMPI_STATO_SINCRONI = (
 )
 
 
+DEFAULT_STATO_NAVE = {
+    "online": True,
+    "livello_target": 0,
+    "livello_attuale": 0,
+    "direzione": "avanti",
+}
+
+
 def _campi_stato_dict(obj) -> Dict[str, Any]:
     return {k: getattr(obj, k) for k in CAMPI_STATO_SINCRONI}
 
@@ -34,36 +44,62 @@ def get_o_crea_stato_nave(sottosistema: "SottosistemaNave") -> "StatoSottosistem
 
     stato, _ = StatoSottosistemaNave.objects.get_or_create(
         sottosistema=sottosistema,
-        defaults={
-            "online": True,
-            "livello_target": 0,
-            "livello_attuale": 0,
-            "direzione": "avanti",
-        },
+        defaults=dict(DEFAULT_STATO_NAVE),
     )
     return stato
 
 
+def stati_nave_per_sottosistemi(sottosistema_ids: Iterable) -> Dict[Any, "StatoSottosistemaNave"]:
+    """{sottosistema_id: StatoSottosistemaNave}; crea in blocco i record mancanti coi default."""
+    from .models import StatoSottosistemaNave
+
+    ids = list(sottosistema_ids)
+    if not ids:
+        return {}
+    stati = {s.sottosistema_id: s for s in StatoSottosistemaNave.objects.filter(sottosistema_id__in=ids)}
+    mancanti = [sid for sid in ids if sid not in stati]
+    if mancanti:
+        StatoSottosistemaNave.objects.bulk_create(
+            [StatoSottosistemaNave(sottosistema_id=sid, **DEFAULT_STATO_NAVE) for sid in mancanti],
+            ignore_conflicts=True,
+        )
+        stati.update(
+            (s.sottosistema_id, s)
+            for s in StatoSottosistemaNave.objects.filter(sottosistema_id__in=mancanti)
+        )
+    return stati
+
+
 def defaults_stato_da_nave(sottosistema: "SottosistemaNave") -> Dict[str, Any]:
     return _campi_stato_dict(get_o_crea_stato_nave(sottosistema))
 
 
-def sync_stato_sessione_a_nave(stato: "StatoSottosistemaSessione") -> None:
+def sync_stati_sessione_a_nave(stati: Iterable["StatoSottosistemaSessione"]) -> None:
     """
-    Mirror sessione → nave (UPDATE first per ridurre deadlock con poll concorrenti).
+    Mirror sessione → nave di più sottosistemi con un solo upsert.
+
+    Righe ordinate per sottosistema: lock acquisiti sempre nello stesso ordine,
+    niente deadlock con poll o tick concorrenti.
     """
     from .models import StatoSottosistemaNave
 
-    fields = _campi_stato_dict(stato)
-    now = timezone.now()
-    updated = StatoSottosistemaNave.objects.filter(
-        sottosistema_id=stato.sottosistema_id,
-    ).update(**fields, updated_at=now)
-    if updated == 0:
-        StatoSottosistemaNave.objects.create(
-            sottosistema_id=stato.sottosistema_id,
-            **fields,
-        )
+    per_sottosistema = {st.sottosistema_id: st for st in stati}
+    if not per_sottosistema:
+        return
+    StatoSottosistemaNave.objects.bulk_create(
+        [
+            StatoSottosistemaNave(sottosistema_id=sid, **_campi_stato_dict(st))
+            for sid, st in sorted(per_sottosistema.items(), key=lambda item: str(item[0]))
+        ],
+        update_conflicts=True,
+        unique_fields=["sottosistema"],
+        update_fields=[*CAMPI_STATO_SINCRONI, "updated_at"],
+    )
+
+
+def sync_stato_sessione_a_nave(stato: "StatoSottosistemaSessione") -> None:
+    """Mirror sessione → nave di un singolo sottosistema."""
+    sync_stati_sessione_a_nave([stato])
 
 
 def sync_nave_a_sessione(sessione: "SessioneVolo", nave: "StatoSottosistemaNave") -> None:
@@ -79,16 +115,23 @@ def sync_nave_a_sessione(sessione: "SessioneVolo", nave: "StatoSottosistemaNave"
 
 
 def propaga_stati_nave_a_sessione(sessione: "SessioneVolo") -> None:
-    """Allinea tutti i sottosistemi attivi della sessione allo stato nave persistente."""
+    """Allinea tutti i sottosistemi attivi della sessione allo stato nave persistente (un upsert)."""
     from .models import SottosistemaNave, StatoSottosistemaSessione
 
-    for sdef in SottosistemaNave.objects.filter(attivo=True).only("pk"):
-        nave = get_o_crea_stato_nave(sdef)
-        StatoSottosistemaSessione.objects.update_or_create(
-            sessione=sessione,
-            sottosistema_id=sdef.pk,
-            defaults=_campi_stato_dict(nave),
-        )
+    ids = list(SottosistemaNave.objects.filter(attivo=True).order_by("pk").values_list("pk", flat=True))
+    stati_nave = stati_nave_per_sottosistemi(ids)
+    if not stati_nave:
+        return
+    StatoSottosistemaSessione.objects.bulk_create(
+        [
+            StatoSottosistemaSessione(sessione=sessione, sottosistema_id=sid, **_campi_stato_dict(stati_nave[sid]))
+            for sid in ids
+            if sid in stati_nave
+        ],
+        update_conflicts=True,
+        unique_fields=["sessione", "sottosistema"],
+        update_fields=[*CAMPI_STATO_SINCRONI, "updated_at"],
+    )
 
 
 def stato_operativo_sottosistema(
@@ -52,6 +52,7 @@ from pilotaggio.models import (
     SessioneVolo,
     SottosistemaNave,
     StatoAllertaPilot,
+    StatoSottosistemaNave,
     StatoSottosistemaSessione,
 )
 
@@ -1424,6 +1425,47 @@ class SpegnimentoFineVoloTests(TestCase):
         self.assertIsNotNone(stato.guasto_at)
 
 
+class StatoNaveUpsertTests(TestCase):
+    """Mirror nave ↔ sessione a insiemi: statement costanti rispetto ai sottosistemi."""
+
+    def _sottosistemi(self, n):
+        import string
+
+        used = set(SottosistemaNave.objects.values_list("codice", flat=True))
+        liberi = [c for c in string.ascii_uppercase + string.digits if c not in used]
+        return [SottosistemaNave.objects.create(codice=c, nome=f"Upsert {c}") for c in liberi[:n]]
+
+    def test_propaga_e_mirror_con_statement_costanti(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from pilotaggio.engine import spegni_tutti_sottosistemi
+        from pilotaggio.stato_nave import propaga_stati_nave_a_sessione
+
+        pilota = _crea_pilota()
+        sessione = SessioneVolo.objects.create(pilota=pilota, stato=SESSIONE_STATO_VOLO, durata_pianificata_secondi=600)
+        primi = self._sottosistemi(2)
+        with CaptureQueriesContext(connection) as pochi:
+            propaga_stati_nave_a_sessione(sessione)
+        altri = self._sottosistemi(5)
+        StatoSottosistemaNave.objects.filter(sottosistema=primi[0]).update(online=False, livello_target=4)
+        with CaptureQueriesContext(connection) as tanti:
+            propaga_stati_nave_a_sessione(sessione)
+        self.assertEqual(len(tanti), len(pochi))
+        stati = StatoSottosistemaSessione.objects.filter(sessione=sessione)
+        self.assertEqual(stati.filter(sottosistema__in=primi + altri).count(), 7)
+        self.assertFalse(stati.get(sottosistema=primi[0]).online)
+        self.assertEqual(stati.get(sottosistema=primi[0]).livello_target, 4)
+
+        StatoSottosistemaSessione.objects.filter(sessione=sessione).update(livello_attuale=6, livello_target=6)
+        with self.assertNumQueries(3):
+            spegni_tutti_sottosistemi(sessione)
+        self.assertFalse(
+            StatoSottosistemaNave.objects.filter(sottosistema__in=primi + altri, livello_target__gt=0).exists()
+        )
+        self.assertFalse(StatoSottosistemaNave.objects.get(sottosistema=primi[0]).online)
+
+
 class EnergiaBilancioTests(TestCase):
     def test_senza_carburante_produzione_zero(self):
         import string
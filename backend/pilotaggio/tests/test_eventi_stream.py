@@ -0,0 +1,85 @@
+"""
+Stream SSE kiosk / LED: eventi solo a cambio stato, ripresa con Last-Event-ID.
+"""
+from __future__ import annotations
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from pilotaggio.allarme_equipaggio import imposta_allarme_equipaggio_sessione
+from pilotaggio.eventi_stream import (
+    CANALE_ALLARME,
+    _pubblica,
+    impronta_payload,
+    revisione_key,
+    stream_eventi,
+)
+from pilotaggio.models import SESSIONE_STATO_VOLO, SessioneVolo
+from pilotaggio.tests.test_engine import _crea_pilota
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+async def _raccogli(gen, n):
+    out = []
+    async for chunk in gen:
+        out.append(chunk)
+        if len(out) >= n:
+            break
+    return out
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StreamEventiTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    async def test_emette_solo_a_cambio_stato_e_riprende_da_last_event_id(self):
+        stato = {"allarme": "crociera", "updated_at": "t0"}
+        letture = []
+
+        def costruisci():
+            letture.append(1)
+            payload = dict(stato, updated_at=f"t{len(letture)}")
+            if len(letture) == 1:
+                # Cambio di stato concorrente: la revisione nuova forza una sola ricostruzione.
+                stato["allarme"] = "rosso"
+                _pubblica("test")
+            return payload
+
+        gen = stream_eventi(["test"], costruisci, evento="allarme", volatili=("updated_at",), poll_seconds=0, durata_max_seconds=0.2)
+        chunks = [c async for c in gen]
+        eventi = [c for c in chunks if c.startswith("id: ")]
+        self.assertTrue(chunks[0].startswith("retry: "))
+        self.assertEqual(len(eventi), 2)
+        self.assertIn('"allarme":"crociera"', eventi[0])
+        self.assertIn('"allarme":"rosso"', eventi[1])
+        # Revisione ferma dopo il cambio: niente ricostruzioni a vuoto.
+        self.assertEqual(len(letture), 2)
+
+        noto = impronta_payload({"allarme": "rosso"})
+        gen = stream_eventi(["test"], lambda: {"allarme": "rosso"}, evento="allarme", ultimo_id=noto, poll_seconds=0, durata_max_seconds=0.05)
+        self.assertFalse([c async for c in gen if c.startswith("id: ")])
+
+    async def test_terminale_chiude_lo_stream(self):
+        gen = stream_eventi(["t"], lambda: {"status": "expired"}, evento="ticket", terminale=lambda p: p["status"] == "expired")
+        chunks = await _raccogli(gen, 10)
+        self.assertEqual(len(chunks), 2)
+        self.assertIn("event: ticket", chunks[1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StreamRevisioniTests(TestCase):
+    def test_allarme_cambia_revisione_a_commit(self):
+        cache.clear()
+        sessione = SessioneVolo.objects.create(pilota=_crea_pilota(), stato=SESSIONE_STATO_VOLO, durata_pianificata_secondi=600)
+        with self.captureOnCommitCallbacks(execute=True):
+            imposta_allarme_equipaggio_sessione(sessione, "rosso")
+        prima = cache.get(revisione_key(CANALE_ALLARME))
+        self.assertIsNotNone(prima)
+        with self.captureOnCommitCallbacks(execute=True):
+            sessione.save(update_fields=["distanza_percorsa", "updated_at"])
+        self.assertEqual(cache.get(revisione_key(CANALE_ALLARME)), prima)
+
+        response = self.client.get("/api/pilot/stream/console-ticket/00000000-0000-0000-0000-000000000000/?c=x")
+        self.assertIn(response.status_code, (400, 404))
@@ -12,6 +12,7 @@ from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APIClient
 
+from kor35.perf_testing import QueryBudgetMixin
 from personaggi.models import (
     A_vista,
     Era,
@@ -24,7 +25,9 @@ from personaggi.models import (
 )
 from pilotaggio.models import (
     EventoNave,
+    PilotConsoleLoginTicket,
     PilotConsoleToken,
+    PilotRuntimeConfig,
     SequenzaVolo,
     SessioneVolo,
     SottosistemaNave,
@@ -85,7 +88,12 @@ class QrLoginTests(TestCase):
         self.assertEqual(res.status_code, 404)
 
 
-class SessioneEndToEndTests(TestCase):
+# Polling della console: budget misurato con una sessione in volo (+ piccolo margine),
+# indipendente dal numero di sottosistemi.
+BUDGET_PILOT_STATE = 34
+
+
+class SessioneEndToEndTests(QueryBudgetMixin, TestCase):
     def setUp(self):
         self.user, self.pg = _crea_pilota_con_0pi(valore_0pi=1)
         self.qr = _crea_qr_per_personaggio(self.pg)
@@ -113,6 +121,22 @@ class SessioneEndToEndTests(TestCase):
         res = self.client_api.get("/api/pilot/session/state/")
         self.assertEqual(res.status_code, 200, res.content)
 
+    def test_budget_state_in_volo(self):
+        sessione = SessioneVolo.objects.create(
+            pilota=self.pg,
+            prefettura_partenza=self.partenza,
+            prefettura_arrivo=self.arrivo,
+            stato=SESSIONE_STATO_VOLO,
+            durata_pianificata_secondi=600,
+            started_at=timezone.now(),
+        )
+        for codice in ("1", "2", "3"):
+            sottosistema, _ = SottosistemaNave.objects.get_or_create(codice=codice, defaults={"nome": codice})
+            StatoSottosistemaSessione.objects.create(sessione=sessione, sottosistema=sottosistema)
+        self.client_api.get("/api/pilot/session/state/")
+        res = self.assertEndpointQueryBudget(self.client_api, "get", "/api/pilot/session/state/", BUDGET_PILOT_STATE)
+        self.assertEqual(res.json()["sessione"]["id"], str(sessione.pk))
+
     def test_state_espone_sessione_terminata_per_schermata_finale(self):
         sessione = SessioneVolo.objects.create(
             pilota=self.pg,
@@ -276,6 +300,50 @@ class TicketLoginFlowTests(TestCase):
         self.assertIn("token", body)
 
 
+class PollAsyncConsoleTests(TestCase):
+    """Poll console serviti dalle viste async (ticket status, tick-status)."""
+
+    def setUp(self):
+        PilotRuntimeConfig.objects.update_or_create(singleton_id=1, defaults={"login_required_console": True})
+        _user, self.pg = _crea_pilota_con_0pi(nome="PilotaPoll", valore_0pi=2)
+        self.ticket = PilotConsoleLoginTicket.objects.create(
+            codice="ABCD1234", expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        self.url = f"/api/pilot/auth/console-ticket/{self.ticket.pk}/status/"
+
+    def test_ticket_status_emette_token_una_volta(self):
+        client = APIClient()
+        self.assertEqual(client.get(f"{self.url}?c=ABCD1234").json(), {"status": "pending"})
+        self.assertEqual(client.get(f"{self.url}?c=XXXX").status_code, 403)
+
+        PilotConsoleLoginTicket.objects.filter(pk=self.ticket.pk).update(pilota=self.pg)
+        primo = client.get(f"{self.url}?c=ABCD1234").json()
+        secondo = client.get(f"{self.url}?c=ABCD1234").json()
+        self.assertEqual(primo["status"], "authorized")
+        self.assertEqual(primo["pilota"], {"id": self.pg.pk, "nome": "PilotaPoll"})
+        self.assertEqual(secondo["token"], primo["token"])
+        self.assertEqual(PilotConsoleToken.objects.filter(pilota=self.pg).count(), 1)
+
+    def test_tick_status_richiede_token_console(self):
+        anon = APIClient().get("/api/pilot/runtime/tick-status/")
+        self.assertEqual(anon.status_code, 401)
+        self.assertEqual(anon["WWW-Authenticate"], "PilotToken")
+        self.assertIn("detail", anon.json())
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="PilotToken sconosciuto")
+        self.assertEqual(client.get("/api/pilot/runtime/tick-status/").status_code, 401)
+
+        token = PilotConsoleToken.objects.create(pilota=self.pg, token=PilotConsoleToken.genera_token())
+        client.credentials(HTTP_AUTHORIZATION=f"PilotToken {token.token}")
+        res = client.get("/api/pilot/runtime/tick-status/")
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertTrue(res.json()["login_required_console"])
+        self.assertFalse(res.json()["alive"])
+        token.refresh_from_db()
+        self.assertIsNotNone(token.last_seen_at)
+
+
 class StaffSottosistemaAssociaQrTests(TestCase):
     def setUp(self):
         self.staff = User.objects.create_user(
@@ -1,21 +1,29 @@
 """Test diario di volo (flight_log)."""
-from django.test import TestCase
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
+from kor35.syncing import serialize_for_sync
 from personaggi.models import Era, Personaggio, Prefettura
 
 from .flight_log import (
+    diario_volo_bufferizzato,
+    log_valutazione_evento,
     log_evento_comparso,
     log_precipizio,
     log_volo_iniziato,
     registra_voce_diario,
+    ricostruisci_riepiloghi,
     riepilogo_sessione_per_pilota,
     spiega_crash,
 )
 from .models import (
     EVENTO_ESITO_PENDING,
+    EVENTO_ESITO_RISOLTO,
     EventoAttivoSessione,
     EventoNave,
+    RiepilogoVolo,
     SessioneVolo,
     VoceDiarioVolo,
 )
@@ -86,3 +94,102 @@ class FlightLogTests(TestCase):
         self.assertEqual(riep["stato"], "crashed")
         self.assertEqual(riep["stato_etichetta"], "Precipitata")
         self.assertIn("Energia", riep["crash_spiegazione"])
+
+    def _istanza(self, esito=EVENTO_ESITO_PENDING):
+        now = timezone.now()
+        return EventoAttivoSessione.objects.create(
+            sessione=self.sessione,
+            evento=self.evento_nave,
+            esito=esito,
+            deadline_at=now,
+            prossima_valutazione_at=now,
+        )
+
+    def test_buffer_tick_un_solo_insert_e_riepilogo(self):
+        istanza = self._istanza()
+        with CaptureQueriesContext(connection) as queries:
+            with diario_volo_bufferizzato():
+                log_evento_comparso(self.sessione, istanza)
+                istanza.esito = EVENTO_ESITO_RISOLTO
+                log_valutazione_evento(self.sessione, istanza, "st", 2, 1)
+                log_precipizio(self.sessione, "defcon_overflow")
+                self.assertFalse(VoceDiarioVolo.objects.filter(sessione=self.sessione).exists())
+        insert = [q for q in queries if q["sql"].startswith('INSERT INTO "pilotaggio_vocediariovolo"')]
+        self.assertEqual(len(insert), 1)
+        self.assertEqual(VoceDiarioVolo.objects.filter(sessione=self.sessione).count(), 3)
+
+        riep = RiepilogoVolo.objects.get(sessione=self.sessione)
+        self.assertEqual(riep.voci_totali, 3)
+        self.assertEqual(riep.conteggi_categoria["evento_valutato"], 1)
+        self.assertEqual((riep.eventi_comparsi, riep.eventi_conclusi, riep.eventi_risolti), (1, 1, 1))
+        self.assertEqual(riep.ultimo_evento_nome, "Ammutinamento")
+        self.assertEqual(riep.crash_reason, "defcon_overflow")
+
+        registra_voce_diario(self.sessione, "info", "Fuori dal tick")
+        self.assertEqual(RiepilogoVolo.objects.get(sessione=self.sessione).voci_totali, 4)
+
+    def test_riepilogo_nato_a_volo_iniziato_conta_il_diario_precedente(self):
+        log_volo_iniziato(self.sessione, partenza="Alpha", arrivo="Beta")
+        log_evento_comparso(self.sessione, self._istanza())
+        RiepilogoVolo.objects.filter(sessione=self.sessione).delete()  # volo partito prima del riepilogo
+
+        log_precipizio(self.sessione, "defcon_overflow")
+        riep = RiepilogoVolo.objects.get(sessione=self.sessione)
+        self.assertEqual(riep.voci_totali, 3)
+        self.assertEqual(riep.eventi_comparsi, 1)
+        self.assertEqual(riep.crash_reason, "defcon_overflow")
+
+        RiepilogoVolo.objects.filter(sessione=self.sessione).delete()
+        self.assertEqual(ricostruisci_riepiloghi(), 1)
+        self.assertEqual(ricostruisci_riepiloghi(), 0)
+        riep = RiepilogoVolo.objects.get(sessione=self.sessione)
+        self.assertEqual((riep.voci_totali, riep.conteggi_categoria["precipizio"]), (3, 1))
+
+    @override_settings(EDGE_SYNC_TOKEN="diario-test")
+    def test_voce_dal_sync_edge_aggiorna_il_riepilogo(self):
+        log_volo_iniziato(self.sessione, partenza="Alpha", arrivo="Beta")
+        with transaction.atomic():
+            voce = VoceDiarioVolo.objects.create(
+                sessione=self.sessione,
+                categoria="precipizio",
+                messaggio="Precipitata sull'altro nodo",
+                dati_json={"crash_reason": "defcon_overflow"},
+            )
+            riga = serialize_for_sync(voce)
+            transaction.set_rollback(True)
+
+        response = self.client.post(
+            "/api/sync/edge/",
+            {"records": {"pilotaggio.vocediariovolo": [riga]}},
+            content_type="application/json",
+            HTTP_AUTHORIZATION="EdgeToken diario-test",
+        )
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        riep = RiepilogoVolo.objects.get(sessione=self.sessione)
+        self.assertEqual(riep.voci_totali, 2)
+        self.assertEqual(riep.conteggi_categoria, {"volo_iniziato": 1, "precipizio": 1})
+        self.assertEqual(riep.crash_reason, "defcon_overflow")
+
+    def test_buffer_scartato_su_eccezione(self):
+        with self.assertRaises(RuntimeError):
+            with diario_volo_bufferizzato():
+                registra_voce_diario(self.sessione, "info", "Tick fallito")
+                raise RuntimeError("tick")
+        self.assertFalse(VoceDiarioVolo.objects.filter(sessione=self.sessione).exists())
+
+    def test_riepilogo_da_una_riga(self):
+        log_volo_iniziato(self.sessione, partenza="Alpha", arrivo="Beta")
+        sessione = SessioneVolo.objects.select_related(
+            "prefettura_partenza", "prefettura_arrivo", "riepilogo_volo"
+        ).get(pk=self.sessione.pk)
+        with self.assertNumQueries(0):
+            riep = riepilogo_sessione_per_pilota(sessione)
+        self.assertEqual(riep["voci_diario"], 1)
+        self.assertEqual(riep["conteggi_diario"], {"volo_iniziato": 1})
+        self.assertIsNone(riep["ultimo_evento_nome"])
+
+        self._istanza(esito=EVENTO_ESITO_RISOLTO)
+        RiepilogoVolo.objects.filter(sessione=self.sessione).delete()
+        legacy = riepilogo_sessione_per_pilota(SessioneVolo.objects.get(pk=self.sessione.pk))
+        self.assertEqual(legacy["ultimo_evento_nome"], "Ammutinamento")
+        self.assertEqual(legacy["voci_diario"], 1)
@@ -4,6 +4,7 @@ URL configuration per l'app pilotaggio.
 Rotte sotto `/api/pilot/...`:
 - auth/qr-login, auth/logout
 - session/start, session/state, session/command, session/abort, session/history
+- stream/allarme-led, stream/tick-status, stream/console-ticket  (SSE, via Daphne)
 - subsystems/qr-action  (login DRF token: usato da app principale)
 - catalog, prefetture
 - staff/sottosistemi, staff/comandi, staff/intensita, staff/eventi, staff/sequenze,
@@ -45,7 +46,7 @@ urlpatterns = [
     path("auth/auto-login/", views.PilotConsoleAutoLoginView.as_view(), name="pilot-auto-login"),
     path("auth/console-ticket/", views.PilotConsoleTicketCreateView.as_view(), name="pilot-ticket-create"),
     path("auth/console-ticket/<uuid:ticket_id>/claim/", views.PilotConsoleTicketClaimView.as_view(), name="pilot-ticket-claim"),
-    path("auth/console-ticket/<uuid:ticket_id>/status/", views.PilotConsoleTicketStatusView.as_view(), name="pilot-ticket-status"),
+    path("auth/console-ticket/<uuid:ticket_id>/status/", views.pilot_console_ticket_status_view, name="pilot-ticket-status"),
     path("auth/qr-login/", views.PilotQrLoginView.as_view(), name="pilot-qr-login"),
     path("auth/logout/", views.PilotLogoutView.as_view(), name="pilot-logout"),
 
@@ -60,11 +61,18 @@ urlpatterns = [
     path("session/takeoff/complete/", views.PilotSessionTakeoffCompleteView.as_view(), name="pilot-session-takeoff-complete"),
     path("session/landing/", views.PilotSessionLandingView.as_view(), name="pilot-session-landing"),
     path("session/allarme-equipaggio/", views.PilotSessionAllarmeEquipaggioView.as_view(), name="pilot-session-allarme-equipaggio"),
-    path("allarme-led/state/", views.PilotAllarmeLedStateView.as_view(), name="pilot-allarme-led-state"),
+    path("allarme-led/state/", views.pilot_allarme_led_state_view, name="pilot-allarme-led-state"),
+    path("stream/allarme-led/", views.pilot_allarme_led_stream_view, name="pilot-stream-allarme-led"),
+    path("stream/tick-status/", views.pilot_tick_runtime_stream_view, name="pilot-stream-tick-status"),
+    path(
+        "stream/console-ticket/<uuid:ticket_id>/",
+        views.pilot_console_ticket_stream_view,
+        name="pilot-stream-console-ticket",
+    ),
     path("session/history/", views.PilotSessionHistoryView.as_view(), name="pilot-session-history"),
     path("session/diario/", views.PilotSessionDiarioView.as_view(), name="pilot-session-diario"),
     path("session/voli/", views.PilotSessionVoliView.as_view(), name="pilot-session-voli"),
-    path("runtime/tick-status/", views.PilotTickRuntimeStatusView.as_view(), name="pilot-runtime-tick-status"),
+    path("runtime/tick-status/", views.pilot_tick_runtime_status_view, name="pilot-runtime-tick-status"),
     path("runtime/tick-control/", views.PilotTickRuntimeControlView.as_view(), name="pilot-runtime-tick-control"),
 
     path("subsystems/qr-action/", views.PilotSubsystemQrActionView.as_view(), name="pilot-subsystem-qr"),
@@ -12,13 +12,15 @@ from __future__ import annotations
 from datetime import timedelta
 from typing import Optional
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.db import transaction
 from django.db.models import Sum
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
-from rest_framework import generics, permissions, status, viewsets
+from rest_framework import exceptions, generics, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -36,7 +38,8 @@ from .allarme_equipaggio import (
     build_allarme_led_payload,
     imposta_allarme_equipaggio_sessione,
 )
-from .auth import PilotConsoleTokenAuthentication, get_pilot_from_request
+from .auth import PilotConsoleTokenAuthentication, get_pilot_from_request, token_console_da_richiesta
+from .eventi_stream import CANALE_ALLARME, CANALE_RUNTIME, canale_ticket, stream_eventi
 from .engine import (
     _clamp_livello,
     _sessione_ha_decollato,
@@ -60,6 +63,7 @@ from .engine import (
     termina_sessione_volo,
     tick_sessione_se_dovuto,
     sessione_nave_operativa,
+    sessioni_nave_operative,
     valida_livello_sottosistema_energia,
 )
 from .models import (
@@ -87,6 +91,7 @@ from .models import (
     VoceDiarioVolo,
 )
 from gestione_plot.permissions import IsStaffOrMaster
+from kor35.async_api import risposta_errore_api, risposta_json
 
 from .permissions import IsPilotConsole, IsScientificConsole
 from .serializers import (
@@ -417,15 +422,27 @@ def _ensure_runtime_subsystems(sessione: SessioneVolo) -> None:
 
 def _tick_runtime_payload(sessione: Optional[SessioneVolo] = None) -> dict:
     cfg = PilotRuntimeConfig.get_solo()
+    if sessione is not None and sessione.is_attiva:
+        return _tick_runtime_payload_config(
+            cfg,
+            effective_interval=float(intervallo_tick_effettivo_sessione(sessione)),
+            evento_attivo=EventoAttivoSessione.objects.filter(
+                sessione=sessione, esito=EVENTO_ESITO_PENDING
+            ).exists(),
+        )
+    return _tick_runtime_payload_config(cfg)
+
+
+def _tick_runtime_payload_config(
+    cfg: PilotRuntimeConfig,
+    *,
+    effective_interval: Optional[float] = None,
+    evento_attivo: bool = False,
+) -> dict:
     heartbeat = cfg.tick_last_heartbeat
     base_interval = float(cfg.tick_interval_secondi or 5.0)
-    effective_interval = base_interval
-    evento_attivo = False
-    if sessione is not None and sessione.is_attiva:
-        effective_interval = float(intervallo_tick_effettivo_sessione(sessione))
-        evento_attivo = EventoAttivoSessione.objects.filter(
-            sessione=sessione, esito=EVENTO_ESITO_PENDING
-        ).exists()
+    if effective_interval is None:
+        effective_interval = base_interval
     alive = False
     if heartbeat is not None:
         delta = (timezone.now() - heartbeat).total_seconds()
@@ -782,32 +799,17 @@ class PilotConsoleTicketClaimView(APIView):
         )
 
 
-class PilotConsoleTicketStatusView(APIView):
-    authentication_classes: list = []
-    permission_classes: list = [permissions.AllowAny]
-
-    def get(self, request, ticket_id):
-        if not _login_required_console():
-            return Response({"error": "Login ticket disattivato (console senza login)."}, status=status.HTTP_400_BAD_REQUEST)
-        codice = (request.query_params.get("c") or "").strip()
-        ticket = get_object_or_404(PilotConsoleLoginTicket, pk=ticket_id)
-        if not codice or ticket.codice != codice:
-            return Response({"error": "Ticket non valido."}, status=status.HTTP_403_FORBIDDEN)
-        if ticket.scaduto:
-            return Response({"status": "expired"}, status=status.HTTP_200_OK)
-        if ticket.pilota_id is None:
-            return Response({"status": "pending"}, status=status.HTTP_200_OK)
-
-        if ticket.token_console:
-            return Response(
-                {
-                    "status": "authorized",
-                    "token": ticket.token_console,
-                    "pilota": {"id": ticket.pilota.pk, "nome": getattr(ticket.pilota, "nome", str(ticket.pilota))},
-                },
-                status=status.HTTP_200_OK,
-            )
+def _stato_ticket_console(ticket: PilotConsoleLoginTicket) -> dict:
+    """
+    Stato del ticket login inverso (pending / expired / authorized).
+    Al primo controllo dopo il claim emette il PilotConsoleToken (revocando i precedenti).
+    """
+    if ticket.scaduto:
+        return {"status": "expired"}
+    if ticket.pilota_id is None:
+        return {"status": "pending"}
 
+    if not ticket.token_console:
         with transaction.atomic():
             PilotConsoleToken.objects.filter(
                 pilota=ticket.pilota, revocato_at__isnull=True
@@ -819,14 +821,11 @@ class PilotConsoleTicketStatusView(APIView):
             ticket.token_issued_at = timezone.now()
             ticket.save(update_fields=["token_console", "token_issued_at", "updated_at"])
 
-        return Response(
-            {
-                "status": "authorized",
-                "token": token.token,
-                "pilota": {"id": ticket.pilota.pk, "nome": getattr(ticket.pilota, "nome", str(ticket.pilota))},
-            },
-            status=status.HTTP_200_OK,
-        )
+    return {
+        "status": "authorized",
+        "token": ticket.token_console,
+        "pilota": {"id": ticket.pilota.pk, "nome": getattr(ticket.pilota, "nome", str(ticket.pilota))},
+    }
 
 
 class PilotLogoutView(APIView):
@@ -1400,26 +1399,155 @@ class PilotSessionAllarmeEquipaggioView(APIView):
         return Response(payload, status=status.HTTP_200_OK)
 
 
-class PilotAllarmeLedStateView(APIView):
+# ---------------------------------------------------------------------------
+# Poll e stream SSE kiosk / LED (kor35.async_api, pilotaggio.eventi_stream):
+# viste async, servite da Daphne
+# ---------------------------------------------------------------------------
+
+
+async def _runtime_config_async() -> PilotRuntimeConfig:
+    obj, _ = await PilotRuntimeConfig.objects.aget_or_create(singleton_id=1)
+    return obj
+
+
+async def pilot_allarme_led_state_view(request):
     """
     GET /api/pilot/allarme-led/state/
     Stato cromatico per futuri dispositivi LED WiFi (polling LAN, senza auth).
     """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    sessione = await sessioni_nave_operative().afirst()
+    return risposta_json(build_allarme_led_payload(sessione))
+
+
+async def pilot_tick_runtime_status_view(request):
+    """GET /api/pilot/runtime/tick-status/ (token console pilota)."""
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    try:
+        token = await token_console_da_richiesta(request)
+    except exceptions.AuthenticationFailed as exc:
+        return risposta_errore_api(exc, PilotConsoleTokenAuthentication.keyword)
+    if token is None:
+        return risposta_errore_api(exceptions.NotAuthenticated(), PilotConsoleTokenAuthentication.keyword)
+    if not token.attivo:
+        return risposta_errore_api(exceptions.PermissionDenied(IsPilotConsole.message))
+    return risposta_json(_tick_runtime_payload_config(await _runtime_config_async()))
+
+
+async def pilot_console_ticket_status_view(request, ticket_id):
+    """
+    GET /api/pilot/auth/console-ticket/<id>/status/?c=<codice>
+    Poll della console in attesa del claim; l'emissione del token (una volta) resta sincrona.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not (await _runtime_config_async()).login_required_console:
+        return risposta_json(
+            {"error": "Login ticket disattivato (console senza login)."}, status.HTTP_400_BAD_REQUEST
+        )
+    codice = (request.GET.get("c") or "").strip()
+    ticket = await PilotConsoleLoginTicket.objects.select_related("pilota").filter(pk=ticket_id).afirst()
+    if ticket is None:
+        return risposta_errore_api(exceptions.NotFound("No PilotConsoleLoginTicket matches the given query."))
+    if not codice or ticket.codice != codice:
+        return risposta_json({"error": "Ticket non valido."}, status.HTTP_403_FORBIDDEN)
+    if ticket.scaduto or ticket.pilota_id is None or ticket.token_console:
+        return risposta_json(_stato_ticket_console(ticket))
+    return risposta_json(await sync_to_async(_stato_ticket_console)(ticket))
 
-    authentication_classes = []
-    permission_classes = []
 
-    def get(self, request):
-        sessione = _sessione_attiva_corrente()
-        return Response(build_allarme_led_payload(sessione))
+def _risposta_sse(eventi) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(eventi, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
-class PilotTickRuntimeStatusView(APIView):
-    authentication_classes = [PilotConsoleTokenAuthentication]
-    permission_classes = [IsPilotConsole]
+def _last_event_id(request) -> str:
+    return (request.headers.get("Last-Event-ID") or request.GET.get("last_id") or "").strip()
 
-    def get(self, request):
-        return Response(_tick_runtime_payload())
+
+def _token_console_valido(token: str) -> bool:
+    return bool(token) and PilotConsoleToken.objects.filter(token=token, revocato_at__isnull=True).exists()
+
+
+def _payload_allarme_led_corrente() -> dict:
+    return build_allarme_led_payload(_sessione_attiva_corrente())
+
+
+async def pilot_allarme_led_stream_view(request):
+    """
+    GET /api/pilot/stream/allarme-led/
+    Come allarme-led/state/ (rete locale, senza auth) ma in SSE: un evento a ogni cambio allarme.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    return _risposta_sse(
+        stream_eventi(
+            [CANALE_ALLARME],
+            _payload_allarme_led_corrente,
+            evento="allarme",
+            ultimo_id=_last_event_id(request),
+            volatili=("updated_at",),
+        )
+    )
+
+
+async def pilot_tick_runtime_stream_view(request):
+    """
+    GET /api/pilot/stream/tick-status/?token=<PilotToken>
+    SSE di runtime/tick-status/ (EventSource non invia header: token anche in query).
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    auth_header = (request.headers.get("Authorization") or "").strip()
+    token = request.GET.get("token") or auth_header.removeprefix(f"{PilotConsoleTokenAuthentication.keyword} ").strip()
+    if not await sync_to_async(_token_console_valido)(token):
+        return JsonResponse({"detail": "Token console pilota non valido o revocato."}, status=status.HTTP_401_UNAUTHORIZED)
+    return _risposta_sse(
+        stream_eventi(
+            [CANALE_RUNTIME],
+            _tick_runtime_payload,
+            evento="tick-status",
+            ultimo_id=_last_event_id(request),
+            volatili=("last_heartbeat",),
+        )
+    )
+
+
+async def pilot_console_ticket_stream_view(request, ticket_id):
+    """
+    GET /api/pilot/stream/console-ticket/<id>/?c=<codice>
+    SSE di auth/console-ticket/<id>/status/: si chiude all'autorizzazione o alla scadenza.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    codice = (request.GET.get("c") or "").strip()
+
+    def _verifica():
+        if not _login_required_console():
+            return "Login ticket disattivato (console senza login).", status.HTTP_400_BAD_REQUEST
+        ticket = PilotConsoleLoginTicket.objects.filter(pk=ticket_id).only("codice").first()
+        if ticket is None:
+            return "Ticket non trovato.", status.HTTP_404_NOT_FOUND
+        if not codice or ticket.codice != codice:
+            return "Ticket non valido.", status.HTTP_403_FORBIDDEN
+        return None, None
+
+    errore, http_status = await sync_to_async(_verifica)()
+    if errore:
+        return JsonResponse({"error": errore}, status=http_status)
+    return _risposta_sse(
+        stream_eventi(
+            [canale_ticket(ticket_id)],
+            lambda: _stato_ticket_console(PilotConsoleLoginTicket.objects.select_related("pilota").get(pk=ticket_id)),
+            evento="ticket",
+            ultimo_id=_last_event_id(request),
+            terminale=lambda payload: payload["status"] in ("authorized", "expired"),
+        )
+    )
 
 
 class PilotTickRuntimeControlView(APIView):
@@ -1489,7 +1617,7 @@ class PilotSessionVoliView(APIView):
 
         qs = (
             SessioneVolo.objects.exclude(stato=SESSIONE_STATO_IDLE)
-            .select_related("prefettura_partenza", "prefettura_arrivo", "pilota")
+            .select_related("prefettura_partenza", "prefettura_arrivo", "pilota", "riepilogo_volo")
             .order_by("-ended_at", "-created_at")[:25]
         )
         return Response({"voli": [riepilogo_sessione_per_pilota(s) for s in qs]})
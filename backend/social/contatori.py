@@ -0,0 +1,77 @@
+"""
+Contatori denormalizzati dei post InstaFame (``likes_total``, ``comments_count``).
+
+Il feed li legge direttamente dalla riga del post, senza join/GROUP BY su like e
+commenti. Sono aggiornati nella stessa transazione che crea/cancella like e commenti
+(signal in social.signals) con UPDATE atomici ``F()``; ``ricalcola_contatori_post``
+li riallinea dalle righe (cambio peso_like, comando ``riconcilia_contatori_social``).
+"""
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import SocialComment, SocialLike, SocialPost
+
+
+def applica_delta_like(post_id, delta):
+    if not delta:
+        return
+    SocialPost.objects.filter(pk=post_id).update(
+        likes_total=Greatest(F("likes_total") + int(delta), Value(0))
+    )
+
+
+def applica_delta_commenti(post_id, delta):
+    if not delta:
+        return
+    SocialPost.objects.filter(pk=post_id).update(
+        comments_count=Greatest(F("comments_count") + int(delta), Value(0))
+    )
+
+
+def _somma_like_subquery():
+    return Subquery(
+        SocialLike.objects.filter(post_id=OuterRef("pk"))
+        .order_by()
+        .values("post_id")
+        .annotate(totale=Sum("peso_like"))
+        .values("totale"),
+        output_field=IntegerField(),
+    )
+
+
+def _conta_commenti_subquery():
+    return Subquery(
+        SocialComment.objects.filter(post_id=OuterRef("pk"))
+        .order_by()
+        .values("post_id")
+        .annotate(totale=Count("id"))
+        .values("totale"),
+        output_field=IntegerField(),
+    )
+
+
+def ricalcola_contatori_post(post_ids=None):
+    """
+    Riallinea i contatori dalle righe di like/commenti con un solo UPDATE.
+    ``post_ids=None`` = tutti i post. Ritorna il numero di post aggiornati.
+    """
+    qs = SocialPost.objects.all()
+    if post_ids is not None:
+        qs = qs.filter(pk__in=list(post_ids))
+    return qs.update(
+        likes_total=F("likes_base") + Coalesce(_somma_like_subquery(), Value(0)),
+        comments_count=Coalesce(_conta_commenti_subquery(), Value(0)),
+    )
+
+
+def post_con_contatori_disallineati(post_ids=None):
+    """Queryset dei post i cui contatori differiscono dal ricalcolo (per il dry-run)."""
+    qs = SocialPost.objects.all()
+    if post_ids is not None:
+        qs = qs.filter(pk__in=list(post_ids))
+    qs = qs.annotate(
+        _likes_atteso=F("likes_base") + Coalesce(_somma_like_subquery(), Value(0)),
+        _commenti_atteso=Coalesce(_conta_commenti_subquery(), Value(0)),
+    )
+    return qs.exclude(likes_total=F("_likes_atteso"), comments_count=F("_commenti_atteso"))
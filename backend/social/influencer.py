@@ -5,6 +5,7 @@ import random
 
 from django.db.models import Sum
 from django.db.utils import ProgrammingError
+from django.utils import timezone
 
 from personaggi.models import PersonaggioCarrieraMembership
 
@@ -15,19 +16,45 @@ class RigeneraLikeInfluencerError(Exception):
     """Errore durante la rigenerazione dei like storici di un personaggio."""
 
 
+def _bonus_cariche(personaggio_ids):
+    """Somma dei bonus_peso_influencer delle cariche attive, per personaggio (una query)."""
+    rows = (
+        PersonaggioCarrieraMembership.objects.filter(
+            personaggio_id__in=personaggio_ids,
+            data_a__isnull=True,
+            carica__isnull=False,
+        )
+        .values("personaggio_id")
+        .annotate(bonus=Sum("carica__bonus_peso_influencer"))
+        .values_list("personaggio_id", "bonus")
+    )
+    return {pid: int(bonus or 0) for pid, bonus in rows}
+
+
+def _peso_effettivo(peso_base, bonus):
+    base = max(1, int(peso_base or 1))
+    return max(1, base + int(bonus or 0))
+
+
 def get_effective_peso_influencer(personaggio):
     """Peso base del personaggio + bonus dalle cariche attive."""
-    base = max(1, int(getattr(personaggio, "peso_influencer", None) or 1))
-    bonus = 0
-    memberships = PersonaggioCarrieraMembership.objects.filter(
-        personaggio=personaggio,
-        data_a__isnull=True,
-    ).select_related("carica")
-    for membership in memberships:
-        carica = membership.carica
-        if carica:
-            bonus += int(getattr(carica, "bonus_peso_influencer", None) or 0)
-    return max(1, base + bonus)
+    bonus = _bonus_cariche([personaggio.pk]).get(personaggio.pk, 0)
+    return _peso_effettivo(getattr(personaggio, "peso_influencer", None), bonus)
+
+
+def pesi_influencer_effettivi(personaggio_ids):
+    """
+    Peso effettivo di più personaggi in due query (peso base + bonus cariche):
+    da usare nei batch invece di get_effective_peso_influencer per ogni like.
+    """
+    from personaggi.models import Personaggio
+
+    ids = {int(pid) for pid in personaggio_ids if pid}
+    if not ids:
+        return {}
+    bonus = _bonus_cariche(ids)
+    base = Personaggio.all_objects.filter(pk__in=ids).values_list("pk", "peso_influencer")
+    return {pid: _peso_effettivo(peso, bonus.get(pid, 0)) for pid, peso in base}
 
 
 def random_likes_base(personaggio):
@@ -35,13 +62,22 @@ def random_likes_base(personaggio):
     return random.randint(1, peso)
 
 
-def compute_like_peso(liker, content_owner):
+def compute_like_peso(liker, content_owner, pesi=None):
     """
     Peso statico di un singolo like:
     random(1, peso_liker) + random(1, peso_autore_post/commento).
+
+    ``pesi`` (da pesi_influencer_effettivi) evita le query quando si calcolano molti like.
     """
-    peso_liker = get_effective_peso_influencer(liker)
-    peso_owner = get_effective_peso_influencer(content_owner)
+    if pesi is None:
+        bonus = _bonus_cariche({liker.pk, content_owner.pk})
+        peso_liker = _peso_effettivo(getattr(liker, "peso_influencer", None), bonus.get(liker.pk, 0))
+        peso_owner = _peso_effettivo(
+            getattr(content_owner, "peso_influencer", None), bonus.get(content_owner.pk, 0)
+        )
+    else:
+        peso_liker = pesi.get(liker.pk, 1)
+        peso_owner = pesi.get(content_owner.pk, 1)
     return random.randint(1, peso_liker) + random.randint(1, peso_owner)
 
 
@@ -69,23 +105,59 @@ def total_comment_likes(comment, exclude_like_pk=None):
     return int(likes_base or 0) + _sum_like_peso(qs)
 
 
-def _rigenera_post_likes_queryset(qs):
+RIGENERA_CHUNK_SIZE = 1000
+
+
+def _rigenera_likes_queryset(model, qs, owner_field, chunk_size=RIGENERA_CHUNK_SIZE):
+    """
+    Ricalcola peso_like a blocchi: pesi influencer una volta per personaggio
+    (memo sull'intero batch), scrittura con bulk_update.
+    Ritorna (like aggiornati, id dei contenuti toccati).
+    """
+    pesi = {}
     count = 0
-    for like in qs.select_related("autore", "post", "post__autore").iterator():
-        like.peso_like = compute_like_peso(like.autore, like.post.autore)
-        like.save(update_fields=["peso_like", "updated_at"])
-        count += 1
+    toccati = set()
+    rows = qs.order_by("pk").values_list("pk", "autore_id", owner_field, f"{owner_field}__autore_id")
+    chunk = []
+
+    def _scrivi(chunk):
+        mancanti = {pid for _, liker_id, _, owner_id in chunk for pid in (liker_id, owner_id)} - set(pesi)
+        pesi.update(pesi_influencer_effettivi(mancanti))
+        now = timezone.now()
+        likes = []
+        for pk, liker_id, content_id, owner_id in chunk:
+            peso = random.randint(1, pesi.get(liker_id, 1)) + random.randint(1, pesi.get(owner_id, 1))
+            likes.append(model(pk=pk, peso_like=peso, updated_at=now))
+            toccati.add(content_id)
+        model.objects.bulk_update(likes, ["peso_like", "updated_at"])
+        return len(likes)
+
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            count += _scrivi(chunk)
+            chunk = []
+    if chunk:
+        count += _scrivi(chunk)
+    return count, toccati
+
+
+def _rigenera_post_likes_queryset(qs):
+    from .contatori import ricalcola_contatori_post
+    from .models import SocialLike
+
+    count, post_ids = _rigenera_likes_queryset(SocialLike, qs, "post")
+    # bulk_update non passa dai signal: riallinea likes_total dei post toccati.
+    post_ids = list(post_ids)
+    for i in range(0, len(post_ids), RIGENERA_CHUNK_SIZE):
+        ricalcola_contatori_post(post_ids[i : i + RIGENERA_CHUNK_SIZE])
     return count
 
 
 def _rigenera_comment_likes_queryset(qs):
     from .models import SocialCommentLike
 
-    count = 0
-    for like in qs.select_related("autore", "comment", "comment__autore").iterator():
-        like.peso_like = compute_like_peso(like.autore, like.comment.autore)
-        like.save(update_fields=["peso_like", "updated_at"])
-        count += 1
+    count, _ = _rigenera_likes_queryset(SocialCommentLike, qs, "comment")
     return count
 
 
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from social.contatori import post_con_contatori_disallineati, ricalcola_contatori_post
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica (e con --apply riallinea) i contatori denormalizzati dei post InstaFame "
+        "(likes_total, comments_count) rispetto a like e commenti reali."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Riallinea i contatori. Senza flag: solo elenco dei post disallineati.",
+        )
+        parser.add_argument(
+            "--post-id",
+            type=int,
+            action="append",
+            default=None,
+            help="Limita la verifica a questi post (ripetibile).",
+        )
+
+    def handle(self, *args, **options):
+        post_ids = options.get("post_id")
+        disallineati = list(
+            post_con_contatori_disallineati(post_ids).values_list(
+                "id", "likes_total", "_likes_atteso", "comments_count", "_commenti_atteso"
+            )
+        )
+        for post_id, likes, likes_atteso, commenti, commenti_atteso in disallineati[:50]:
+            self.stdout.write(
+                f"Post {post_id}: like {likes} -> {likes_atteso}, commenti {commenti} -> {commenti_atteso}"
+            )
+        if not options.get("apply"):
+            self.stdout.write(f"Dry-run: {len(disallineati)} post con contatori disallineati.")
+            if disallineati:
+                self.stdout.write("Aggiungi --apply per riallinearli.")
+            return
+
+        aggiornati = ricalcola_contatori_post([row[0] for row in disallineati])
+        self.stdout.write(self.style.SUCCESS(f"Riallineati i contatori di {aggiornati} post."))
@@ -4,10 +4,12 @@ from __future__ import annotations
 
 import logging
 
-from django.db.models import Q
+from django.db.models import CharField, F
+from django.db.models.functions import Cast, Upper
 
 from personaggi.models import Personaggio
 from social.display_names import social_display_name
+from social.models import SocialProfile
 
 logger = logging.getLogger(__name__)
 
@@ -100,25 +102,66 @@ def notify_instafame_mentions(citer, mentioned_ids, source_kind, *, post=None, c
             )
 
 
-def personaggi_ids_for_mention_tokens(tokens):
-    """Risolve token @nome, @nickname o @123 in id personaggio."""
-    if not tokens:
-        return []
+def _chiave_menzione(token) -> str:
+    """Chiave confrontata con UPPER(nome)/UPPER(nickname): i token sono ASCII (@[A-Za-z0-9_]+)."""
+    return str(token).replace("_", " ").strip().upper()
 
-    explicit_ids = {int(t) for t in tokens if str(t).isdigit()}
-    names = {str(t).replace("_", " ").strip() for t in tokens if not str(t).isdigit()}
 
-    found_ids = set()
-    if explicit_ids:
-        found_ids.update(Personaggio.objects.filter(id__in=explicit_ids).values_list("id", flat=True))
+def risolvi_token_menzioni(tokens) -> dict[str, set[int]]:
+    """
+    Risolve in una sola query (UNION su indici ``UPPER(nome)`` / ``UPPER(nickname)``)
+    tutti i token @nome, @nickname o @123 di uno o più testi: token -> id personaggio.
+    """
+    tokens = {str(t) for t in tokens or () if str(t)}
+    if not tokens:
+        return {}
 
-    for nome in names:
-        if not nome:
+    explicit_ids = {int(t) for t in tokens if t.isdigit()}
+    token_per_chiave: dict[str, set[str]] = {}
+    for token in tokens:
+        if token.isdigit():
             continue
-        found_ids.update(
-            Personaggio.objects.filter(
-                Q(nome__iexact=nome) | Q(social_profile__nickname__iexact=nome)
-            ).values_list("id", flat=True)
+        chiave = _chiave_menzione(token)
+        if chiave:
+            token_per_chiave.setdefault(chiave, set()).add(token)
+
+    # Stesso ordine di annotate in ogni ramo: le colonne della UNION devono combaciare.
+    parti = []
+    if explicit_ids:
+        parti.append(
+            Personaggio.objects.filter(id__in=explicit_ids)
+            .annotate(chiave=Cast("id", CharField()), pid=F("id"))
+            .values_list("chiave", "pid")
+        )
+    if token_per_chiave:
+        chiavi = list(token_per_chiave)
+        parti.append(
+            Personaggio.objects.annotate(chiave=Upper("nome"), pid=F("id"))
+            .filter(chiave__in=chiavi)
+            .values_list("chiave", "pid")
         )
+        parti.append(
+            SocialProfile.objects.filter(personaggio__eliminato_at__isnull=True)
+            .annotate(chiave=Upper("nickname"), pid=F("personaggio_id"))
+            .filter(chiave__in=chiavi)
+            .values_list("chiave", "pid")
+        )
+    if not parti:
+        return {}
+
+    qs = parti[0].union(*parti[1:]) if len(parti) > 1 else parti[0]
+    risolti: dict[str, set[int]] = {}
+    for chiave, pid in qs:
+        if chiave.isdigit() and int(chiave) in explicit_ids:
+            risolti.setdefault(chiave, set()).add(pid)
+        for token in token_per_chiave.get(chiave, ()):
+            risolti.setdefault(token, set()).add(pid)
+    return risolti
 
+
+def personaggi_ids_for_mention_tokens(tokens):
+    """Risolve token @nome, @nickname o @123 in id personaggio."""
+    found_ids = set()
+    for ids in risolvi_token_menzioni(tokens).values():
+        found_ids.update(ids)
     return list(found_ids)
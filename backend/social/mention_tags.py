@@ -7,6 +7,8 @@ import threading
 from contextlib import contextmanager
 from typing import Iterator
 
+from django.db.models import Q
+
 from .models import (
     SocialComment,
     SocialCommentTag,
@@ -97,17 +99,44 @@ def sync_story_tags(story: SocialStory, *, notify: bool | None = None) -> list[i
     return new_ids
 
 
-def post_ids_needing_tag_resync() -> list[int]:
-    """Post con @ nel testo ma tag DB assenti o incompleti."""
+def post_ids_needing_tag_resync(batch_size: int = 500) -> list[int]:
+    """
+    Post con @ nel testo ma tag DB assenti o incompleti.
+
+    Lavora a blocchi: per ogni blocco una sola risoluzione dei token e una sola query
+    sui tag esistenti.
+    """
+    from .mention_notifications import risolvi_token_menzioni
+
     missing: list[int] = []
-    for post in SocialPost.objects.only("id", "titolo", "testo").iterator():
-        text = f"{post.titolo or ''}\n{post.testo or ''}"
-        if not MENTION_IN_TEXT_REGEX.search(text or ""):
-            continue
-        expected = set(extract_mentioned_personaggi_ids(text))
-        if not expected:
+    posts = (
+        SocialPost.objects.filter(Q(titolo__contains="@") | Q(testo__contains="@"))
+        .order_by("id")
+        .values_list("id", "titolo", "testo")
+    )
+    blocco: list[tuple[int, set[str]]] = []
+
+    def _verifica_blocco():
+        tutti_token = set().union(*(tokens for _, tokens in blocco))
+        risolti = risolvi_token_menzioni(tutti_token)
+        actual: dict[int, set[int]] = {}
+        for post_id, pid in SocialPostTag.objects.filter(
+            post_id__in=[post_id for post_id, _ in blocco]
+        ).values_list("post_id", "personaggio_id"):
+            actual.setdefault(post_id, set()).add(pid)
+        for post_id, tokens in blocco:
+            expected = set().union(*(risolti.get(t, set()) for t in tokens))
+            if expected and expected != actual.get(post_id, set()):
+                missing.append(post_id)
+        blocco.clear()
+
+    for post_id, titolo, testo in posts.iterator(chunk_size=batch_size):
+        tokens = set(MENTION_IN_TEXT_REGEX.findall(f"{titolo or ''}\n{testo or ''}"))
+        if not tokens:
             continue
-        actual = set(SocialPostTag.objects.filter(post_id=post.id).values_list("personaggio_id", flat=True))
-        if expected != actual:
-            missing.append(post.id)
+        blocco.append((post_id, tokens))
+        if len(blocco) >= batch_size:
+            _verifica_blocco()
+    if blocco:
+        _verifica_blocco()
     return missing
@@ -0,0 +1,58 @@
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_contatori_post(apps, schema_editor):
+    SocialPost = apps.get_model("social", "SocialPost")
+    SocialLike = apps.get_model("social", "SocialLike")
+    SocialComment = apps.get_model("social", "SocialComment")
+    somma_like = Subquery(
+        SocialLike.objects.filter(post_id=OuterRef("pk"))
+        .order_by()
+        .values("post_id")
+        .annotate(totale=Sum("peso_like"))
+        .values("totale"),
+        output_field=IntegerField(),
+    )
+    conta_commenti = Subquery(
+        SocialComment.objects.filter(post_id=OuterRef("pk"))
+        .order_by()
+        .values("post_id")
+        .annotate(totale=Count("id"))
+        .values("totale"),
+        output_field=IntegerField(),
+    )
+    SocialPost.objects.update(
+        likes_total=F("likes_base") + Coalesce(somma_like, Value(0)),
+        comments_count=Coalesce(conta_commenti, Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("social", "0011_alter_socialprofile_nickname"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="socialpost",
+            name="likes_total",
+            field=models.PositiveIntegerField(
+                default=1,
+                editable=False,
+                help_text="likes_base + somma peso_like dei like al post.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="socialpost",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="socialpost",
+            index=models.Index(fields=["-created_at", "-id"], name="social_post_feed_idx"),
+        ),
+        migrations.RunPython(backfill_contatori_post, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("social", "0012_socialpost_contatori_feed"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="socialprofile",
+            index=models.Index(
+                django.db.models.functions.text.Upper("nickname"), name="social_prof_nick_upper_idx"
+            ),
+        ),
+    ]
@@ -7,6 +7,7 @@ from PIL import Image
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 from gestione_plot.models import Evento
@@ -25,6 +26,7 @@ MAX_IMAGE_SIZE = (1600, 1600)
 MAX_VIDEO_BYTES = 30 * 1024 * 1024
 MAX_POST_IMAGES = 8
 STORY_TTL_HOURS = 24
+CONTATORI_POST = frozenset({"likes_total", "comments_count"})
 
 SOCIAL_GROUP_ROLE_MEMBER = "MEMBER"
 SOCIAL_GROUP_ROLE_ADMIN = "ADMIN"
@@ -75,6 +77,7 @@ class SocialProfile(SyncableModel, models.Model):
     class Meta:
         verbose_name = "Profilo Social"
         verbose_name_plural = "Profili Social"
+        indexes = [models.Index(Upper("nickname"), name="social_prof_nick_upper_idx")]
 
     def __str__(self):
         return f"Profilo social {self.personaggio.nome}"
@@ -107,11 +110,21 @@ class SocialPost(SyncableModel, models.Model):
         default=1,
         help_text="Like iniziali simulati (statici) alla creazione del post.",
     )
+    # Contatori denormalizzati (social.contatori): derivati dalle righe locali, mai dal payload sync.
+    likes_total = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="likes_base + somma peso_like dei like al post.",
+    )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = "Post Social"
         verbose_name_plural = "Post Social"
         ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="social_post_feed_idx"),
+        ]
 
     def __str__(self):
         return f"{self.autore.nome} - {self.titolo}"
@@ -155,7 +168,28 @@ class SocialPost(SyncableModel, models.Model):
                 self.immagine, f"social/posts/{self.autore_id}"
             )
         self.clean()
+        if self._state.adding:
+            # Nessun like/commento può esistere prima del post: i contatori partono da qui.
+            self.likes_total = self.likes_base
+            self.comments_count = 0
+            super().save(*args, **kwargs)
+            return
+        # Un'istanza in memoria ha contatori potenzialmente vecchi: non riscriverli mai.
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            update_fields = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in CONTATORI_POST
+            ]
+        else:
+            update_fields = [f for f in update_fields if f not in CONTATORI_POST]
+        kwargs["update_fields"] = update_fields
         super().save(*args, **kwargs)
+        if "likes_base" in update_fields:
+            from .contatori import ricalcola_contatori_post
+
+            ricalcola_contatori_post([self.pk])
 
 
 class SocialPostImage(SyncableModel, models.Model):
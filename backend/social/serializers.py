@@ -1,5 +1,4 @@
-from django.db.models import Count, F, Q, Sum, Value
-from django.db.models.functions import Coalesce
+from django.db.models import Q
 from rest_framework import serializers
 
 from personaggi.models import (
@@ -8,7 +7,6 @@ from personaggi.models import (
     get_active_korp_ids,
     get_active_korp_membership,
     Campagna,
-    CampagnaFeaturePolicy,
     FEATURE_SOCIAL,
     FEATURE_MODE_SHARED,
 )
@@ -311,11 +309,7 @@ class SocialPostSerializer(serializers.ModelSerializer):
         return SocialLike.objects.filter(post=obj, autore=personaggio).exists()
 
     def get_likes_count(self, obj):
-        if hasattr(obj, "likes_total"):
-            return int(obj.likes_total or 0)
-        from .influencer import total_post_likes
-
-        return total_post_likes(obj)
+        return int(obj.likes_total or 0)
 
     def get_autore_avatar(self, obj):
         return _personaggio_avatar_url(obj.autore, self.context.get("request"))
@@ -612,10 +606,9 @@ def _get_active_campaign_from_request(request):
 
 
 def _social_mode_for_campaign(campagna):
-    if not campagna or campagna.slug == "kor35":
-        return FEATURE_MODE_SHARED
-    row = CampagnaFeaturePolicy.objects.filter(campagna=campagna, feature_key=FEATURE_SOCIAL).first()
-    return row.mode if row else FEATURE_MODE_SHARED
+    from personaggi.campaigns import feature_mode_for_campaign
+
+    return feature_mode_for_campaign(campagna, FEATURE_SOCIAL)
 
 
 def _single_active_campaign_mode():
@@ -753,10 +746,6 @@ def resolve_active_personaggio(user, explicit_personaggio_id=None, request=None)
 def visible_posts_queryset_for_personaggio(personaggio, request=None):
     base = SocialPost.objects.select_related("autore", "autore__social_profile", "evento", "korp_visibilita").prefetch_related(
         "post_images",
-    ).annotate(
-        _likes_user_sum=Coalesce(Sum("likes__peso_like"), Value(0)),
-        likes_total=F("likes_base") + F("_likes_user_sum"),
-        comments_count=Count("comments", distinct=True),
     )
     base = _apply_social_author_campaign_filter(base, request)
     if not personaggio:
@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from .contatori import applica_delta_commenti, applica_delta_like, ricalcola_contatori_post
 from .mention_tags import sync_comment_tags, sync_post_tags, sync_story_tags
-from .models import SocialComment, SocialPost, SocialStory
+from .models import SocialComment, SocialLike, SocialPost, SocialProfile, SocialStory
 
 
 @receiver(post_save, sender=SocialPost)
@@ -18,3 +19,37 @@ def social_comment_sync_mention_tags(sender, instance: SocialComment, **kwargs):
 @receiver(post_save, sender=SocialStory)
 def social_story_sync_mention_tags(sender, instance: SocialStory, **kwargs):
     sync_story_tags(instance)
+
+
+@receiver(post_save, sender=SocialProfile)
+def social_profile_aggiorna_indice_ricerca(sender, instance: SocialProfile, update_fields=None, **kwargs):
+    from personaggi.ricerca_staff import aggiorna_indice_ricerca
+
+    if update_fields is not None and "nickname" not in update_fields:
+        return
+    aggiorna_indice_ricerca([instance.personaggio_id])
+
+
+@receiver(post_save, sender=SocialLike)
+def social_like_aggiorna_contatore(sender, instance: SocialLike, created=False, **kwargs):
+    if created:
+        applica_delta_like(instance.post_id, instance.peso_like)
+    else:
+        # peso_like (o post) può essere cambiato: riallinea dalla somma reale.
+        ricalcola_contatori_post([instance.post_id])
+
+
+@receiver(post_delete, sender=SocialLike)
+def social_like_scala_contatore(sender, instance: SocialLike, **kwargs):
+    applica_delta_like(instance.post_id, -int(instance.peso_like or 0))
+
+
+@receiver(post_save, sender=SocialComment)
+def social_comment_aggiorna_contatore(sender, instance: SocialComment, created=False, **kwargs):
+    if created:
+        applica_delta_commenti(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=SocialComment)
+def social_comment_scala_contatore(sender, instance: SocialComment, **kwargs):
+    applica_delta_commenti(instance.post_id, -1)
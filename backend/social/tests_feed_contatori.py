@@ -0,0 +1,127 @@
+"""Contatori denormalizzati dei post e feed a cursore (created_at, id)."""
+
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from kor35.perf_testing import QueryBudgetMixin
+from personaggi.models import Campagna, Personaggio
+from social.models import SocialComment, SocialGroup, SocialGroupPost, SocialLike, SocialPost
+from social.views import SocialPostViewSet
+
+# Prima pagina del feed: budget misurato (+ piccolo margine), indipendente dal numero di post.
+BUDGET_FEED_PAGINA = 18
+
+
+class SocialFeedContatoriTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="feed_contatori", password="x")
+        self.campagna = Campagna.objects.filter(slug="kor35").first() or Campagna.objects.create(
+            slug="kor35", nome="KOR35", attiva=True, is_default=True
+        )
+        self.autore = Personaggio.objects.create(nome="Autore Feed", campagna=self.campagna)
+        self.lettore = Personaggio.objects.create(
+            nome="Lettore Feed", proprietario=self.user, campagna=self.campagna
+        )
+        self.post = SocialPost.objects.create(
+            autore=self.autore, titolo="Post", testo="x", visibilita="PUB", likes_base=3
+        )
+        self.factory = APIRequestFactory()
+
+    def _contatori(self, post=None):
+        post = post or self.post
+        return SocialPost.objects.values_list("likes_total", "comments_count").get(pk=post.pk)
+
+    def test_like_e_commenti_aggiornano_contatori(self):
+        self.assertEqual(self._contatori(), (3, 0))
+        view = SocialPostViewSet.as_view({"post": "like"})
+        request = self.factory.post(f"/api/social/posts/{self.post.id}/like/?personaggio_id={self.lettore.id}")
+        force_authenticate(request, user=self.user)
+        response = view(request, pk=self.post.id)
+        self.assertEqual(response.status_code, 201, response.data)
+        peso = response.data["peso_like"]
+        self.assertEqual(self._contatori(), (3 + peso, 0))
+
+        commento = SocialComment.objects.create(post=self.post, autore=self.lettore, testo="ciao")
+        self.assertEqual(self._contatori(), (3 + peso, 1))
+
+        like = SocialLike.objects.get(post=self.post, autore=self.lettore)
+        like.peso_like = peso + 5
+        like.save(update_fields=["peso_like", "updated_at"])
+        self.assertEqual(self._contatori(), (3 + peso + 5, 1))
+
+        # Un salvataggio completo di un'istanza vecchia non riscrive i contatori.
+        self.post.titolo = "Post modificato"
+        self.post.save()
+        self.assertEqual(self._contatori(), (3 + peso + 5, 1))
+
+        commento.delete()
+        like.delete()
+        self.assertEqual(self._contatori(), (3, 0))
+
+    def test_post_di_gruppo_senza_contatori(self):
+        gruppo = SocialGroup.objects.create(nome="Gruppo Feed", creatore=self.autore)
+        post = SocialGroupPost.objects.create(group=gruppo, autore=self.autore, titolo="G", testo="x")
+        post.titolo = "G modificato"
+        post.save()
+        self.assertEqual(SocialGroupPost.objects.get(pk=post.pk).titolo, "G modificato")
+
+    def test_feed_a_cursore_senza_buchi_ne_duplicati(self):
+        base = timezone.now()
+        stesso_istante = base - timedelta(minutes=5)
+        for i in range(5):
+            SocialPost.objects.create(
+                autore=self.autore,
+                titolo=f"P{i}",
+                testo="x",
+                visibilita="PUB",
+                created_at=stesso_istante if i < 3 else base - timedelta(minutes=i),
+            )
+        attesi = list(SocialPost.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+        view = SocialPostViewSet.as_view({"get": "list"})
+        visti, cursor = [], None
+        while True:
+            params = {"personaggio_id": self.lettore.id, "page_size": 2}
+            if cursor:
+                params["cursor"] = cursor
+            request = self.factory.get("/api/social/posts/", params)
+            force_authenticate(request, user=self.user)
+            response = view(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            visti.extend(row["id"] for row in response.data["results"])
+            cursor = response.data["next_cursor"]
+            if not cursor:
+                self.assertIsNone(response.data["next"])
+                break
+        self.assertEqual(visti, attesi)
+
+        request = self.factory.get("/api/social/posts/", {"page": 1, "page_size": 2})
+        response = view(request)
+        self.assertEqual(response.data["count"], len(attesi))
+
+    def test_budget_feed_prima_pagina(self):
+        for i in range(6):
+            SocialPost.objects.create(autore=self.autore, titolo=f"B{i}", testo="x", visibilita="PUB")
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        params = {"personaggio_id": self.lettore.id, "page_size": 5}
+        client.get("/api/social/posts/", params)
+        response = self.assertEndpointQueryBudget(client, "get", "/api/social/posts/", BUDGET_FEED_PAGINA, data=params)
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_comando_riconciliazione(self):
+        SocialPost.objects.filter(pk=self.post.pk).update(likes_total=99, comments_count=7)
+        out = StringIO()
+        call_command("riconcilia_contatori_social", stdout=out)
+        self.assertIn("1 post con contatori disallineati", out.getvalue())
+        self.assertEqual(self._contatori(), (99, 7))
+
+        call_command("riconcilia_contatori_social", "--apply", stdout=StringIO())
+        self.assertEqual(self._contatori(), (3, 0))
@@ -1,10 +1,24 @@
 """Like InstaFame: un like per personaggio, non per giocatore."""
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIRequestFactory, force_authenticate
 
-from personaggi.models import Campagna, Personaggio
+from personaggi.models import (
+    Campagna,
+    Carica,
+    Carriera,
+    Personaggio,
+    PersonaggioCarrieraMembership,
+    TipoCarriera,
+)
+from social.influencer import (
+    get_effective_peso_influencer,
+    pesi_influencer_effettivi,
+    rigenera_tutti_like_instafame,
+)
 from social.models import SocialLike, SocialPost
 from social.serializers import resolve_active_personaggio
 from social.views import SocialPostViewSet
@@ -78,3 +92,41 @@ class InstafameMultiCharacterLikeTests(TestCase):
             items = response.data.get("results", response.data)
             row = next(item for item in items if item["id"] == self.post.id)
             self.assertEqual(row["liked_by_me"], expected, pg.nome)
+
+
+class InfluencerPesiBatchTests(TestCase):
+    def setUp(self):
+        self.campagna = Campagna.objects.filter(slug="kor35").first() or Campagna.objects.create(
+            slug="kor35", nome="KOR35", attiva=True, is_default=True
+        )
+        tipo, _ = TipoCarriera.objects.get_or_create(codice="korp", defaults={"nome": "KORP", "ordine": 0})
+        korp = Carriera.objects.create(nome="KORP Pesi", tipo="T3", tipo_carriera=tipo)
+        carica = Carica.objects.create(nome="Portavoce", bonus_peso_influencer=4)
+        self.autore = Personaggio.objects.create(nome="Autore Pesi", campagna=self.campagna, peso_influencer=3)
+        PersonaggioCarrieraMembership.objects.create(
+            personaggio=self.autore, carriera=korp, tipo_carriera=tipo, carica=carica
+        )
+        self.fan = [
+            Personaggio.objects.create(nome=f"Fan {i}", campagna=self.campagna, peso_influencer=1)
+            for i in range(6)
+        ]
+        self.post = SocialPost.objects.create(autore=self.autore, titolo="P", testo="x", likes_base=2)
+        for fan in self.fan:
+            SocialLike.objects.create(post=self.post, autore=fan, peso_like=999)
+
+    def test_pesi_in_batch_coincidono_con_il_calcolo_singolo(self):
+        pesi = pesi_influencer_effettivi([self.autore.id] + [f.id for f in self.fan])
+        self.assertEqual(pesi[self.autore.id], 7)
+        self.assertEqual(pesi[self.autore.id], get_effective_peso_influencer(self.autore))
+        self.assertEqual(pesi[self.fan[0].id], 1)
+
+    def test_rigenerazione_bulk_con_query_costanti(self):
+        with CaptureQueriesContext(connection) as ctx:
+            post_n, _ = rigenera_tutti_like_instafame()
+        self.assertEqual(post_n, len(self.fan))
+        # Pesi (2) + lettura like + bulk_update + ricalcolo contatori: indipendente dal numero di like.
+        self.assertLess(len(ctx.captured_queries), 12)
+        pesi = list(SocialLike.objects.filter(post=self.post).values_list("peso_like", flat=True))
+        self.assertTrue(all(2 <= p <= 1 + 7 for p in pesi), pesi)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_total, 2 + sum(pesi))
@@ -2,11 +2,16 @@
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
 from unittest.mock import patch
 
 from personaggi.models import Campagna, Personaggio
 from social.models import SocialProfile, extract_mentioned_personaggi_ids
-from social.mention_notifications import format_mention_message, notify_instafame_mentions
+from social.mention_notifications import (
+    format_mention_message,
+    notify_instafame_mentions,
+    risolvi_token_menzioni,
+)
 
 
 class MentionExtractionTests(TestCase):
@@ -28,6 +33,24 @@ class MentionExtractionTests(TestCase):
         ids = extract_mentioned_personaggi_ids("Hey @Vance_Premium")
         self.assertIn(self.cited.id, ids)
 
+    def test_tutti_i_token_in_una_query(self):
+        altri = [
+            Personaggio.objects.create(nome=f"Comparsa {i}", campagna=self.campagna) for i in range(6)
+        ]
+        SocialProfile.objects.create(personaggio=altri[0], nickname="La Volpe")
+        eliminato = Personaggio.objects.create(nome="Fantasma", campagna=self.campagna)
+        Personaggio.all_objects.filter(pk=eliminato.pk).update(eliminato_at=timezone.now())
+
+        testo = " ".join(f"@comparsa_{i}" for i in range(1, 6))
+        testo += f" @la_volpe @{self.cited.id} @Fantasma @nessuno"
+        with self.assertNumQueries(1):
+            ids = extract_mentioned_personaggi_ids(testo)
+        self.assertEqual(set(ids), {a.id for a in altri} | {self.cited.id})
+
+        risolti = risolvi_token_menzioni({"vance_premium", "Comparsa_1"})
+        self.assertEqual(risolti["vance_premium"], {self.cited.id})
+        self.assertEqual(risolti["Comparsa_1"], {altri[1].id})
+
 
 class MentionNotificationTests(TestCase):
     def test_format_message(self):
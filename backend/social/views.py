@@ -1,15 +1,18 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime
 import logging
 
 from django.utils import timezone
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from django.db.models import Count, Exists, F, OuterRef, Q, Sum, Value
 from django.db.models.functions import Coalesce
 from rest_framework import permissions, status, viewsets
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
 from gestione_plot.models import Evento
@@ -50,6 +53,7 @@ from .models import (
 )
 from .influencer import (
     compute_like_peso,
+    pesi_influencer_effettivi,
     random_likes_base,
     rigenera_like_personaggio,
 )
@@ -103,9 +107,70 @@ def get_evento_in_corso(reference_dt=None):
 
 
 class SocialPostPagination(PageNumberPagination):
+    """
+    Feed a keyset su ``(created_at, id)`` (indice ``social_post_feed_idx``): ogni pagina
+    è una range scan, senza COUNT. ``?cursor=`` è il ``next_cursor`` della risposta
+    precedente. Con ``?page=`` resta la paginazione numerata (con ``count``) per i client
+    che non usano ancora il cursore.
+    """
+
     page_size = 30
     page_size_query_param = "page_size"
     max_page_size = 50
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.page_query_param not in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view=view)
+        self.request = request
+        size = self.get_page_size(request) or self.page_size
+        raw_cursor = request.query_params.get(self.cursor_query_param)
+        if raw_cursor:
+            created_at, last_id = self.decode_cursor(raw_cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id)
+            )
+        rows = list(queryset.order_by("-created_at", "-id")[: size + 1])
+        self.has_next = len(rows) > size
+        rows = rows[:size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_next else None
+        return rows
+
+    @staticmethod
+    def encode_cursor(post):
+        raw = f"{post.created_at.isoformat()}|{post.id}"
+        return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(value):
+        try:
+            raw = urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+            created_raw, id_raw = raw.rsplit("|", 1)
+            created_at = datetime.fromisoformat(created_raw)
+            return created_at, int(id_raw)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound("Cursore non valido.")
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": None,
+                "next_cursor": self.next_cursor,
+                "results": data,
+            }
+        )
 
 
 class SocialCommentPagination(PageNumberPagination):
@@ -273,8 +338,10 @@ class SocialStoryViewSet(viewsets.ModelViewSet):
             )
 
         # Migra reactions -> like post (1 per autore)
-        for r in story.reactions.select_related("autore", "autore__social_profile").all():
-            peso = compute_like_peso(r.autore, post.autore)
+        reactions = list(story.reactions.select_related("autore", "autore__social_profile").all())
+        pesi = pesi_influencer_effettivi([post.autore_id] + [r.autore_id for r in reactions])
+        for r in reactions:
+            peso = compute_like_peso(r.autore, post.autore, pesi=pesi)
             like, created = SocialLike.objects.get_or_create(
                 post=post,
                 autore=r.autore,
@@ -611,12 +678,14 @@ class SocialPostViewSet(viewsets.ModelViewSet):
         personaggio = self.get_personaggio()
         if not personaggio:
             return Response({"detail": "Nessun personaggio disponibile."}, status=status.HTTP_400_BAD_REQUEST)
-        like = SocialLike.objects.filter(post=post, autore=personaggio).first()
-        if like:
-            like.delete()
-            return Response({"liked": False}, status=status.HTTP_200_OK)
-        peso = compute_like_peso(personaggio, post.autore)
-        SocialLike.objects.create(post=post, autore=personaggio, peso_like=peso)
+        # Like e contatore del post (signal) nella stessa transazione.
+        with transaction.atomic():
+            like = SocialLike.objects.filter(post=post, autore=personaggio).first()
+            if like:
+                like.delete()
+                return Response({"liked": False}, status=status.HTTP_200_OK)
+            peso = compute_like_peso(personaggio, post.autore)
+            SocialLike.objects.create(post=post, autore=personaggio, peso_like=peso)
         return Response({"liked": True, "peso_like": peso}, status=status.HTTP_201_CREATED)
 
     def _comments_queryset(self, post, personaggio=None):
@@ -652,12 +721,13 @@ class SocialPostViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Nessun personaggio disponibile."}, status=status.HTTP_400_BAD_REQUEST)
         serializer = SocialCommentSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        comment = serializer.save(
-            post=post,
-            autore=personaggio,
-            evento=get_evento_in_corso(),
-            likes_base=random_likes_base(personaggio),
-        )
+        with transaction.atomic():
+            comment = serializer.save(
+                post=post,
+                autore=personaggio,
+                evento=get_evento_in_corso(),
+                likes_base=random_likes_base(personaggio),
+            )
         return Response(
             SocialCommentSerializer(comment, context=self.get_serializer_context()).data,
             status=status.HTTP_201_CREATED,
@@ -704,7 +774,8 @@ class SocialPostViewSet(viewsets.ModelViewSet):
             raise permissions.PermissionDenied("Permessi insufficienti per modificare il commento.")
 
         if request.method.lower() == "delete":
-            comment.delete()
+            with transaction.atomic():
+                comment.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         serializer = SocialCommentSerializer(comment, data=request.data, partial=True)
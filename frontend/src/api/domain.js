@@ -3582,6 +3582,22 @@ export const carteEquipReliquiario = (charId, slotIndex, cartaPossedutaId, onLog
 export const carteGetMercato = (charId, onLogout) =>
     fetchAuthenticated(`/api/personaggi/api/carte/mercato/?char_id=${encodeURIComponent(charId)}`, { method: 'GET' }, onLogout);
 
+export const carteGetMercatoOfferte = (charId, params = {}, onLogout) => {
+    const qs = new URLSearchParams({ char_id: charId });
+    Object.entries(params).forEach(([k, v]) => {
+        if (v !== undefined && v !== null && v !== '') qs.set(k, v);
+    });
+    return fetchAuthenticated(`/api/personaggi/api/carte/mercato/offerte/?${qs.toString()}`, { method: 'GET' }, onLogout);
+};
+
+export const carteGetMercatoCarte = (charId, params = {}, onLogout) => {
+    const qs = new URLSearchParams({ char_id: charId });
+    Object.entries(params).forEach(([k, v]) => {
+        if (v !== undefined && v !== null && v !== '') qs.set(k, v);
+    });
+    return fetchAuthenticated(`/api/personaggi/api/carte/mercato/carte/?${qs.toString()}`, { method: 'GET' }, onLogout);
+};
+
 export const carteCreaOffertaMercato = (charId, data, onLogout) =>
     fetchAuthenticated('/api/personaggi/api/carte/mercato/', {
         method: 'POST',
@@ -4,7 +4,9 @@ import { fetchAuthenticated, fetchPublic } from './core';
 export const socialGetPosts = (personaggioId, onLogout, page = 1, pageSize = 30, options = {}) => {
   const params = new URLSearchParams();
   if (personaggioId) params.set('personaggio_id', String(personaggioId));
-  params.set('page', String(page));
+  // Feed a cursore (keyset): senza `page` il backend risponde con `next_cursor`.
+  if (options?.cursor) params.set('cursor', String(options.cursor));
+  else if (page > 1) params.set('page', String(page));
   params.set('page_size', String(pageSize));
   if (options?.hashtag) params.set('hashtag', String(options.hashtag).replace(/^#/, ''));
   return fetchAuthenticated(`/api/social/posts/?${params.toString()}`, { method: 'GET' }, onLogout);
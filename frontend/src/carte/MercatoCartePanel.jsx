@@ -1,7 +1,9 @@
-import React, { useCallback, useEffect, useMemo, useState } from 'react';
+import React, { useCallback, useEffect, useState } from 'react';
 import { Loader2, Plus, RefreshCw, Store, X } from 'lucide-react';
 import {
   carteGetMercato,
+  carteGetMercatoCarte,
+  carteGetMercatoOfferte,
   carteCreaOffertaMercato,
   carteAccettaOffertaMercato,
   carteAnnullaOffertaMercato,
@@ -82,6 +84,10 @@ export default function MercatoCartePanel({ charId, onLogout, onCollezioneUpdate
     tipo_richiesta: 'carta',
   });
   const [contropartitaId, setContropartitaId] = useState('');
+  const [filtri, setFiltri] = useState({ rarita: '', espansione: '' });
+  const [offerte, setOfferte] = useState({ results: [], nextCursor: null });
+  const [carteLibere, setCarteLibere] = useState({ results: [], nextOffset: null });
+  const [contropartite, setContropartite] = useState([]);
 
   const load = useCallback(async () => {
     if (!charId) return;
@@ -100,17 +106,61 @@ export default function MercatoCartePanel({ charId, onLogout, onCollezioneUpdate
     load();
   }, [load]);
 
-  const carteScambiabili = useMemo(
-    () => (mercato?.carte_scambiabili || []).filter((c) => c.scambiabile),
-    [mercato?.carte_scambiabili],
-  );
+  const filtriAttivi = Boolean(filtri.rarita || filtri.espansione);
 
-  const contropartiteDisponibili = useMemo(() => {
-    if (!acceptTarget?.richiesta_carta?.id) return [];
-    return (mercato?.carte_scambiabili || []).filter(
-      (c) => c.scambiabile && c.carta?.id === acceptTarget.richiesta_carta.id,
-    );
-  }, [acceptTarget, mercato?.carte_scambiabili]);
+  // Senza filtri la prima pagina arriva già con il riepilogo del mercato.
+  useEffect(() => {
+    if (!mercato?.puo_accedere || filtriAttivi) return;
+    setOfferte({
+      results: mercato.offerte_aperte || [],
+      nextCursor: mercato.offerte_aperte_next_cursor || null,
+    });
+  }, [mercato, filtriAttivi]);
+
+  const loadOfferte = useCallback(async (cursor = null) => {
+    try {
+      const payload = await carteGetMercatoOfferte(charId, { ...filtri, cursor }, onLogout);
+      setOfferte((prev) => ({
+        results: cursor ? [...prev.results, ...(payload.results || [])] : (payload.results || []),
+        nextCursor: payload.next_cursor || null,
+      }));
+    } catch (e) {
+      onError?.(e?.message || 'Errore caricamento offerte.');
+    }
+  }, [charId, filtri, onLogout, onError]);
+
+  useEffect(() => {
+    if (filtriAttivi) loadOfferte();
+  }, [filtriAttivi, loadOfferte, mercato]);
+
+  const loadCarteLibere = useCallback(async (offset = 0) => {
+    try {
+      const payload = await carteGetMercatoCarte(charId, { scambiabili: 1, offset }, onLogout);
+      setCarteLibere((prev) => ({
+        results: offset ? [...prev.results, ...(payload.results || [])] : (payload.results || []),
+        nextOffset: payload.next_offset ?? null,
+      }));
+    } catch (e) {
+      onError?.(e?.message || 'Errore caricamento carte.');
+    }
+  }, [charId, onLogout, onError]);
+
+  useEffect(() => {
+    if (createOpen) loadCarteLibere(0);
+  }, [createOpen, loadCarteLibere]);
+
+  useEffect(() => {
+    const cartaId = acceptTarget?.richiesta_carta?.id;
+    if (!cartaId) {
+      setContropartite([]);
+      return;
+    }
+    carteGetMercatoCarte(charId, { scambiabili: 1, carta: cartaId }, onLogout)
+      .then((payload) => setContropartite(payload.results || []))
+      .catch((e) => onError?.(e?.message || 'Errore caricamento contropartite.'));
+  }, [acceptTarget, charId, onLogout, onError]);
+
+  const faccette = mercato?.faccette || { rarita: {}, espansioni: [] };
 
   const handleCreate = async () => {
     if (!form.carta_offerta_id) {
@@ -225,13 +275,22 @@ export default function MercatoCartePanel({ charId, onLogout, onCollezioneUpdate
                 onChange={(e) => setForm((p) => ({ ...p, carta_offerta_id: e.target.value }))}
               >
                 <option value="">— Seleziona —</option>
-                {carteScambiabili.map((c) => (
+                {carteLibere.results.map((c) => (
                   <option key={c.id} value={c.id}>
                     {c.carta?.nome} ({c.carta?.codice})
                   </option>
                 ))}
               </select>
             </label>
+            {carteLibere.nextOffset != null && (
+              <button
+                type="button"
+                className="text-xs text-emerald-300 underline"
+                onClick={() => loadCarteLibere(carteLibere.nextOffset)}
+              >
+                Mostra altre carte
+              </button>
+            )}
             <div className="flex flex-wrap gap-2 text-xs">
               <label className="flex items-center gap-1">
                 <input
@@ -305,11 +364,35 @@ export default function MercatoCartePanel({ charId, onLogout, onCollezioneUpdate
         )}
       </section>
 
-      {(mercato.offerte_aperte || []).length > 0 && (
+      {(offerte.results.length > 0 || filtriAttivi) && (
         <section>
           <h4 className="mb-2 text-xs font-bold uppercase tracking-wide text-gray-400">Offerte al mercato</h4>
+          <div className="mb-2 flex flex-wrap gap-2 text-xs">
+            <select
+              className="rounded bg-gray-950 px-2 py-1 text-white"
+              value={filtri.rarita}
+              onChange={(e) => setFiltri((p) => ({ ...p, rarita: e.target.value }))}
+            >
+              <option value="">Tutte le rarità</option>
+              {Object.entries(faccette.rarita || {}).map(([codice, n]) => (
+                <option key={codice} value={codice}>
+                  {CARTA_RARITA_LABEL[codice] || codice} ({n})
+                </option>
+              ))}
+            </select>
+            <select
+              className="rounded bg-gray-950 px-2 py-1 text-white"
+              value={filtri.espansione}
+              onChange={(e) => setFiltri((p) => ({ ...p, espansione: e.target.value }))}
+            >
+              <option value="">Tutte le espansioni</option>
+              {(faccette.espansioni || []).filter((esp) => esp.id).map((esp) => (
+                <option key={esp.id} value={esp.id}>{esp.nome} ({esp.count})</option>
+              ))}
+            </select>
+          </div>
           <div className="space-y-2">
-            {mercato.offerte_aperte.map((o) => (
+            {offerte.results.map((o) => (
               <OffertaRow
                 key={o.id}
                 offerta={o}
@@ -326,6 +409,15 @@ export default function MercatoCartePanel({ charId, onLogout, onCollezioneUpdate
               />
             ))}
           </div>
+          {offerte.nextCursor && (
+            <button
+              type="button"
+              className="mt-2 text-xs text-emerald-300 underline"
+              onClick={() => loadOfferte(offerte.nextCursor)}
+            >
+              Mostra altre offerte
+            </button>
+          )}
         </section>
       )}
 
@@ -375,7 +467,7 @@ export default function MercatoCartePanel({ charId, onLogout, onCollezioneUpdate
               onChange={(e) => setContropartitaId(e.target.value)}
             >
               <option value="">— Seleziona copia —</option>
-              {contropartiteDisponibili.map((c) => (
+              {contropartite.map((c) => (
                 <option key={c.id} value={c.id}>{c.carta?.nome}</option>
               ))}
             </select>
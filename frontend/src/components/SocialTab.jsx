@@ -222,6 +222,7 @@ const SocialTab = ({ onLogout, onOpenMessages }) => {
   const [feedSort, setFeedSort] = useState('RECENT');
   const [hashtagFilter, setHashtagFilter] = useState('');
   const [feedPage, setFeedPage] = useState(1);
+  const [feedCursor, setFeedCursor] = useState(null);
   const [feedTotalCount, setFeedTotalCount] = useState(null);
   const [hasMorePosts, setHasMorePosts] = useState(false);
   const [loadingMorePosts, setLoadingMorePosts] = useState(false);
@@ -387,6 +388,7 @@ const SocialTab = ({ onLogout, onOpenMessages }) => {
     return {
       items: Array.isArray(payload?.results) ? payload.results : [],
       hasNext: Boolean(payload?.next),
+      nextCursor: payload?.next_cursor || null,
       total: Number.isFinite(total) ? total : null,
     };
   }, []);
@@ -589,6 +591,7 @@ const SocialTab = ({ onLogout, onOpenMessages }) => {
       const normalized = normalizePostsPayload(postsData);
       setPosts(normalized.items);
       setFeedPage(1);
+      setFeedCursor(normalized.nextCursor);
       setFeedTotalCount(normalized.total);
       setHasMorePosts(normalized.hasNext);
       setKorpList(Array.isArray(korpData) ? korpData : []);
@@ -1637,7 +1640,10 @@ const SocialTab = ({ onLogout, onOpenMessages }) => {
     const nextPage = feedPage + 1;
     setLoadingMorePosts(true);
     try {
-      const payload = await socialGetPosts(selectedCharacterId, onLogout, nextPage, PAGE_SIZE, { hashtag: hashtagFilter || undefined });
+      const payload = await socialGetPosts(selectedCharacterId, onLogout, nextPage, PAGE_SIZE, {
+        hashtag: hashtagFilter || undefined,
+        cursor: feedCursor || undefined,
+      });
       const normalized = normalizePostsPayload(payload);
       setPosts((prev) => {
         const seen = new Set(prev.map((p) => p.id));
@@ -1645,6 +1651,7 @@ const SocialTab = ({ onLogout, onOpenMessages }) => {
         return [...prev, ...fresh];
       });
       setFeedPage(nextPage);
+      setFeedCursor(normalized.nextCursor);
       if (normalized.total != null) setFeedTotalCount(normalized.total);
       setHasMorePosts(normalized.hasNext);
     } catch (err) {
@@ -1652,7 +1659,7 @@ const SocialTab = ({ onLogout, onOpenMessages }) => {
     } finally {
       setLoadingMorePosts(false);
     }
-  }, [loading, loadingMorePosts, hasMorePosts, feedPage, selectedCharacterId, onLogout, normalizePostsPayload, hashtagFilter]);
+  }, [loading, loadingMorePosts, hasMorePosts, feedPage, feedCursor, selectedCharacterId, onLogout, normalizePostsPayload, hashtagFilter]);
 
   useEffect(() => {
     const node = sentinelRef.current;
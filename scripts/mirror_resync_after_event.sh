@@ -2,7 +2,7 @@
 set -euo pipefail
 
 # Riallineamento post-evento del mirror Pi:
-# 1) full sync DB con diagnostica
+# 1) sync DB incrementale con diagnostica + verifica a digest (solo bucket divergenti)
 # 2) push media locali -> master (senza delete)
 # 3) pull media master -> locale (con delete lato locale)
 #
@@ -36,8 +36,9 @@ if [ "$ENV_PROFILE" != "mirror" ]; then
   exit 1
 fi
 
-echo "[1/3] Sync DB full con diagnostica..."
-make -C "$ROOT_DIR" sync-db-full-diagnose ENV="$ENV_PROFILE"
+echo "[1/3] Sync DB con diagnostica e verifica digest..."
+make -C "$ROOT_DIR" sync-db-diagnose ENV="$ENV_PROFILE"
+make -C "$ROOT_DIR" sync-db-verify ENV="$ENV_PROFILE"
 
 echo "[2/3] Push media locale -> master..."
 make -C "$ROOT_DIR" sync-media-push
@@ -79,7 +79,7 @@ if [ -n "${WSL_PI_REMOTE_SSH_IDENTITY:-}" ]; then
   echo "  identity: ${WSL_PI_REMOTE_SSH_IDENTITY/#\~/$HOME}"
 fi
 
-rsync -avz --delete \
+rsync -avz --delete --exclude ".blobs/" \
   -e "$RSYNC_SSH" \
   "${REMOTE_USER}@${REMOTE_HOST}:${REMOTE_MEDIA_DIR}" \
   "${LOCAL_MEDIA_DIR}"
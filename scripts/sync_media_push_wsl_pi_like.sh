@@ -75,7 +75,7 @@ if [ -n "${WSL_PI_REMOTE_SSH_IDENTITY:-}" ]; then
   echo "  identity: ${WSL_PI_REMOTE_SSH_IDENTITY/#\~/$HOME}"
 fi
 
-rsync -avz \
+rsync -avz --exclude ".blobs/" \
   -e "$RSYNC_SSH" \
   "${LOCAL_MEDIA_DIR}" \
   "${REMOTE_USER}@${REMOTE_HOST}:${REMOTE_MEDIA_DIR}"